@@ -19,7 +19,11 @@
 
 from supervisor.xmlrpc import capped_int
 
-from supvisors.ttypes import AddressStates, InvalidTransition
+from supvisors.ttypes import AddressStates, InvalidTransition, ProcessStates
+
+# time in seconds after which a Supvisors instance that has never sent
+# any heartbeat is considered silent, based on the ticks received
+SILENCE_TIMEOUT = 10
 
 
 class AddressStatus(object):
@@ -32,9 +36,16 @@ class AddressStatus(object):
     - remote_time: the last date received from the Supvisors instance,
     - local_time: the last date received from the Supvisors instance,
     in the local reference time,
-    - processes: the list of processes that are available on this address. """
-
-    def __init__(self, address_name, logger):
+    - detector: the failure detector fed with the heartbeats received from
+    the Supvisors instance,
+    - processes: the list of processes that are available on this address,
+    - running_load: the sum of the expected loading of the processes running
+    on this address,
+    - states_index: the sets of address names per state, shared by all the
+    AddressStatus of the context and kept up to date by the state changes,
+    - _running_processes: the set of processes running on this address. """
+
+    def __init__(self, address_name, logger, detector=None, states_index=None):
         """ Initialization of the attributes. """
         # keep a reference to the common logger
         self.logger = logger
@@ -43,7 +54,13 @@ class AddressStatus(object):
         self._state = AddressStates.UNKNOWN
         self.remote_time = 0
         self.local_time = 0
+        self.detector = detector
         self.processes = {}
+        self.running_load = 0
+        self._running_processes = set()
+        self.states_index = states_index
+        if states_index is not None:
+            states_index[self._state].add(address_name)
 
     # accessors / mutators
     @property
@@ -55,7 +72,12 @@ class AddressStatus(object):
     def state(self, newState):
         if self._state != newState:
             if self.check_transition(newState):
-                self._state = newState
+                self.force_state(newState)
+                # the heartbeats received before the loss are not relevant
+                # anymore
+                if self.detector and newState in [AddressStates.SILENT,
+                                                  AddressStates.ISOLATING]:
+                    self.detector.reset()
                 self.logger.info('Address {} is {}'.format(
                     self.address_name, self.state_string()))
             else:
@@ -63,6 +85,19 @@ class AddressStatus(object):
                     format(self.state_string(),
                            AddressStates._to_string(newState)))
 
+    def force_state(self, new_state):
+        """ Set the state without checking the transition and update the
+        index of the addresses per state. """
+        if self.states_index is not None:
+            self.states_index[self._state].discard(self.address_name)
+            self.states_index[new_state].add(self.address_name)
+        self._state = new_state
+
+    @property
+    def running_count(self):
+        """ Property for the number of processes running on the address. """
+        return len(self._running_processes)
+
     # serialization
     def serial(self):
         """ Return a serializable form of the AddressStatus. """
@@ -83,12 +118,20 @@ class AddressStatus(object):
         return self.state in [AddressStates.ISOLATING, AddressStates.ISOLATED]
 
     def update_times(self, remote_time, local_time):
-        """ Update the last times attributes of the AddressStatus and
-        of all the processes running on it. """
+        """ Update the last times attributes of the AddressStatus.
+        The uptimes of the processes are derived from remote_time
+        when they are read. """
         self.remote_time = remote_time
         self.local_time = local_time
-        for process in self.processes.values():
-            process.update_times(self.address_name, remote_time)
+
+    def suspected(self, now):
+        """ Return True if the Supvisors instance is suspected to be lost.
+        The failure detector is used as soon as a heartbeat has been received.
+        Otherwise, the Supvisors instance is suspected when no tick has been
+        received for SILENCE_TIMEOUT seconds. """
+        if self.detector and self.detector.last_time is not None:
+            return self.detector.suspected(now)
+        return now - self.local_time > SILENCE_TIMEOUT
 
     def check_transition(self, new_state):
         """ Check that the state transition is valid. """
@@ -99,12 +142,30 @@ class AddressStatus(object):
         """ Add a new process to the process list. """
         self.processes[process.namespec()] = process
 
+    def remove_process(self, process):
+        """ Remove the process from the process list. """
+        self.processes.pop(process.namespec(), None)
+        self.remove_running(process)
+
+    def last_seen(self):
+        """ Return the date of the last sign of life received from the
+        Supvisors instance, i.e. its last heartbeat or its last tick. """
+        if self.detector and self.detector.last_time is not None:
+            return max(self.detector.last_time, self.local_time)
+        return self.local_time
+
     def running_processes(self):
         """ Return the process running on the address.
         Here, 'running' means that the process state is in Supervisor
         RUNNING_STATES. """
-        return [process for process in self.processes.values()
-                if process.running_on(self.address_name)]
+        return list(self._running_processes)
+
+    def invalidated_processes(self):
+        """ Return the namespecs of the processes whose state on the address
+        is unknown, typically because the address has been invalidated. """
+        return [namespec for namespec, process in self.processes.items()
+                if process.infos[self.address_name]['state'] ==
+                    ProcessStates.UNKNOWN]
 
     def pid_processes(self):
         """ Return the process running on the address and having a pid.
@@ -114,14 +175,22 @@ class AddressStatus(object):
             for process in self.processes.values()
                 if process.pid_running_on(self.address_name)]
 
+    def add_running(self, process):
+        """ Account for a process that has started running on the address. """
+        if process not in self._running_processes:
+            self._running_processes.add(process)
+            self.running_load += process.rules.expected_loading
+
+    def remove_running(self, process):
+        """ Account for a process that is not running anymore on the address. """
+        if process in self._running_processes:
+            self._running_processes.remove(process)
+            self.running_load -= process.rules.expected_loading
+
     def loading(self):
-        """ Return the loading of the address, by summing the declared loading
-        of the processes running on that address """
-        loading = sum(process.rules.expected_loading
-                      for process in self.running_processes())
-        self.logger.debug('address={} loading={}'.
-                          format(self.address_name, loading))
-        return loading
+        """ Return the loading of the address, i.e. the sum of the declared
+        loading of the processes running on that address. """
+        return self.running_load
 
     # dictionary for transitions
     _Transitions = {
@@ -76,9 +76,17 @@ class ApplicationStatus(object):
         - start_sequence: the sequencing to start the processes belonging to the application, as a dictionary.
             The value corresponds to a list of processes having the same sequence order, used as key.
         - stop_sequence: the sequencing to stop the processes belonging to the application, as a dictionary.
-            The value corresponds to a list of processes having the same sequence order, used as key.
+            The value corresponds to a list of processes having the same sequence order, used as key,
+        - _serial: the serializable form of the application, reset when the status changes,
+        - _running_processes: the set of the ProcessStatus running, kept up to date by the context,
+        - _contributions: the contribution of each process (key is process name) to the application status,
+        - _counters: the number of processes per contribution, so that the application status is evaluated
+            without iterating over the processes.
     """
 
+    # contributions of a process to the application status
+    Contributions = ('starting', 'stopping', 'running', 'major_failure', 'minor_failure', 'none')
+
     def __init__(self, application_name, logger):
         """ Initialization of the attributes. """
         # keep reference to common logger
@@ -86,13 +94,17 @@ class ApplicationStatus(object):
         # information part
         self.application_name = application_name
         self._state = ApplicationStates.STOPPED
-        self.major_failure = False
-        self.minor_failure = False
+        self._major_failure = False
+        self._minor_failure = False
+        self._serial = None
         # process part
         self.processes = {} # {process_name: [process]}
         self.rules = ApplicationRules()
         self.start_sequence = {} # {sequence: [process]}
         self.stop_sequence = {} # {sequence: [process]}
+        self._running_processes = set()
+        self._contributions = {} # {process_name: contribution}
+        self._counters = dict.fromkeys(self.Contributions, 0)
 
     # access
     def running(self):
@@ -112,16 +124,43 @@ class ApplicationStatus(object):
     def state(self, newState):
         if self._state != newState:
             self._state = newState
+            self._serial = None
             self.logger.info('Application {} is {}'.format(
                 self.application_name, self.state_string()))
 
+    @property
+    def major_failure(self):
+        """ Property for the 'major_failure' attribute. """
+        return self._major_failure
+
+    @major_failure.setter
+    def major_failure(self, failure):
+        if self._major_failure != failure:
+            self._major_failure = failure
+            self._serial = None
+
+    @property
+    def minor_failure(self):
+        """ Property for the 'minor_failure' attribute. """
+        return self._minor_failure
+
+    @minor_failure.setter
+    def minor_failure(self, failure):
+        if self._minor_failure != failure:
+            self._minor_failure = failure
+            self._serial = None
+
     # serialization
     def serial(self):
-        """ Return a serializable form of the ApplicationStatus. """
-        return { 'application_name': self.application_name,
-            'statecode': self.state, 'statename': self.state_string(),
-            'major_failure': self.major_failure,
-            'minor_failure': self.minor_failure }
+        """ Return a serializable form of the ApplicationStatus.
+        The same structure is returned until the status changes,
+        so it must not be modified by the caller. """
+        if self._serial is None:
+            self._serial = {'application_name': self.application_name,
+                'statecode': self.state, 'statename': self.state_string(),
+                'major_failure': self.major_failure,
+                'minor_failure': self.minor_failure}
+        return self._serial
 
     # methods
     def state_string(self):
@@ -131,6 +170,63 @@ class ApplicationStatus(object):
     def add_process(self, process):
         """ Add a new process to the process list. """
         self.processes[process.process_name] = process
+        self.update_process(process)
+
+    def remove_process(self, process):
+        """ Remove the process from the process list and from the counters. """
+        del self.processes[process.process_name]
+        contribution = self._contributions.pop(process.process_name, None)
+        if contribution:
+            self._counters[contribution] -= 1
+        self._running_processes.discard(process)
+
+    def update_process(self, process):
+        """ Update the counters iaw the contribution of the process.
+        This is called each time the state of the process may have changed. """
+        contribution = self.contribution(process)
+        previous = self._contributions.get(process.process_name)
+        if contribution != previous:
+            if previous:
+                self._counters[previous] -= 1
+            self._counters[contribution] += 1
+            self._contributions[process.process_name] = contribution
+
+    @staticmethod
+    def contribution(process):
+        """ Return the contribution of the process to the application status. """
+        if process.state == ProcessStates.RUNNING:
+            return 'running'
+        if process.state in [ProcessStates.STARTING, ProcessStates.BACKOFF]:
+            return 'starting'
+        # STOPPING is not in STOPPED_STATES
+        if process.state == ProcessStates.STOPPING:
+            return 'stopping'
+        if process.state in STOPPED_STATES:
+            if process.rules.required:
+                # any required stopped process is a major failure for a running application
+                # exception is made for an EXITED process with an expected exit code
+                if process.state != ProcessStates.EXITED or not process.expected_exit:
+                    return 'major_failure'
+            else:
+                # an optional process is a minor failure for a running application
+                # when its state is FATAL or unexpectedly EXITED
+                if (process.state == ProcessStates.FATAL) or \
+                        (process.state == ProcessStates.EXITED and not process.expected_exit):
+                    return 'minor_failure'
+        # all other STOPPED-like states are considered normal
+        return 'none'
+
+    def add_running(self, process):
+        """ Add the process to the running processes. """
+        self._running_processes.add(process)
+
+    def remove_running(self, process):
+        """ Remove the process from the running processes. """
+        self._running_processes.discard(process)
+
+    def running_processes(self):
+        """ Return the processes running, wherever they are running. """
+        return list(self._running_processes)
 
     def update_sequences(self):
         """ Evaluate the sequencing of the starting / stopping application from its list of processes. """
@@ -144,45 +240,20 @@ class ApplicationStatus(object):
             self.application_name, self.start_sequence, self.stop_sequence))
 
     def update_status(self):
-        """ Update the state of the application iaw the state of its processes. """
-        starting, running, stopping, major_failure, minor_failure = (False, )*5
-        for process in self.processes.values():
-            self.logger.trace('Process {}: state={} required={} exit_expected={}'.
-                format(process.namespec(), process.state_string(),
-                    process.rules.required, process.expected_exit))
-            if process.state == ProcessStates.RUNNING:
-                running = True
-            elif process.state in [ProcessStates.STARTING, ProcessStates.BACKOFF]:
-                starting = True
-            # STOPPING is not in STOPPED_STATES
-            elif process.state == ProcessStates.STOPPING:
-                stopping = True
-            elif process.state in STOPPED_STATES:
-                if process.rules.required:
-                    # any required stopped process is a major failure for a running application
-                    # exception is made for an EXITED process with an expected exit code
-                    if process.state != ProcessStates.EXITED or not process.expected_exit:
-                        major_failure = True
-                else:
-                    # an optional process is a minor failure for a running application
-                    # when its state is FATAL or unexpectedly EXITED
-                    if (process.state == ProcessStates.FATAL) or \
-                            (process.state == ProcessStates.EXITED and not process.expected_exit):
-                        minor_failure = True
-            # all other STOPPED-like states are considered normal
-        self.logger.trace('Application {}: starting={} running={} stopping={} '
-            'major_failure={} minor_failure={}'.
-            format(self.application_name, starting, running, stopping,
-                major_failure, minor_failure))
+        """ Update the state of the application iaw the counters of its processes. """
+        counters = self._counters
+        self.logger.trace('Application {}: {}'.format(self.application_name,
+            ' '.join('{}={}'.format(contribution, counters[contribution])
+                for contribution in self.Contributions)))
         # apply rules for state
-        if starting:
+        if counters['starting']:
             self.state = ApplicationStates.STARTING
-        elif stopping:
+        elif counters['stopping']:
             self.state = ApplicationStates.STOPPING
-        elif running:
+        elif counters['running']:
             self.state = ApplicationStates.RUNNING
         else:
             self.state = ApplicationStates.STOPPED
         # update major_failure and minor_failure status (only for running applications)
-        self.major_failure = major_failure and self.running()
-        self.minor_failure = minor_failure and self.running()
+        self.major_failure = counters['major_failure'] > 0 and self.running()
+        self.minor_failure = counters['minor_failure'] > 0 and self.running()
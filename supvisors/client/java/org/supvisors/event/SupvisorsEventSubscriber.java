@@ -217,8 +217,13 @@ public class SupvisorsEventSubscriber implements Runnable {
             // check if something happened on socket
             if (poller.pollin(0)) {
                 // get the data
-                String header = this.subscriber.recvStr();
+                // the header is the first part of the topic
+                String header = this.subscriber.recvStr().split("/", 2)[0];
                 String body = this.subscriber.recvStr();
+                // skip the sequence number
+                while (this.subscriber.hasReceiveMore()) {
+                    this.subscriber.recv();
+                }
 
                 // notify subscribers if any
                 if (listener != null) {
@@ -43,17 +43,32 @@ class SupvisorsEventInterface(threading.Thread):
 
         - a ZeroMQ context,
         - the event port number used by **Supvisors** to publish its events,
-        - a logger reference to log traces.
+        - a logger reference to log traces,
+        - optionally, the snapshot port number used by **Supvisors** to serve
+        the last statuses published.
 
     This event port number MUST correspond to the ``event_port`` value set
     in the ``[supvisors]`` section of the Supervisor configuration file.
-
-    The default behaviour is to print the messages received.
+    The same applies to the snapshot port number and the ``snapshot_port``
+    value.
+
+    When the snapshot port number is set, the thread gets the current
+    statuses when starting, so that there is no need to wait for the next
+    changes. The events already included in the snapshot are then ignored.
+
+    The default behaviour is to subscribe to all the messages and to print
+    the messages received.
+    To restrict the subscriptions, just specialize the method `configure`,
+    using the methods `subscribe_application` and `subscribe_process`
+    or the methods of the subscriber attribute.
     For any other behaviour, just specialize the methods `on_xxx_status`.
 
     Attributes:
 
         - logger: the reference to the logger,
+        - snapshot_port: the port number used to request the snapshot,
+        - sequence: the sequence number of the snapshot, until an event
+        published after the snapshot is received,
         - subscriber: the wrapper of the ZeroMQ socket connected to **Supvisors**,
         - stop_event: when set, breaks the infinite loop of the thread.
 
@@ -65,7 +80,7 @@ class SupvisorsEventInterface(threading.Thread):
 
     _Poll_timeout = 500
 
-    def __init__(self, zmq_context, event_port, logger):
+    def __init__(self, zmq_context, event_port, logger, snapshot_port=None):
         """ Initialization of the attributes. """
         # thread attributes
         threading.Thread.__init__(self)
@@ -73,6 +88,8 @@ class SupvisorsEventInterface(threading.Thread):
         self.zmq_context = zmq_context
         self.event_port = event_port
         self.logger = logger
+        self.snapshot_port = snapshot_port
+        self.sequence = None
         # create stop event
         self.stop_event = threading.Event()
 
@@ -88,6 +105,9 @@ class SupvisorsEventInterface(threading.Thread):
                                           self.event_port,
                                           self.logger)
         self.configure()
+        # get the current statuses
+        if self.snapshot_port:
+            self.bootstrap()
         # create poller and register event subscriber
         poller = zmq.Poller()
         poller.register(self.subscriber.socket, zmq.POLLIN)
@@ -100,30 +120,69 @@ class SupvisorsEventInterface(threading.Thread):
                 socks[self.subscriber.socket] == zmq.POLLIN:
                 self.logger.debug('got message on subscriber')
                 try:
-                    message = self.subscriber.receive()
+                    sequence, header, data = self.subscriber.receive_sequenced()
                 except Exception, e:
                     self.logger.error(
                         'failed to get data from subscriber: {}'.format(
                             e.message))
                 else:
-                    if message[0] == EventHeaders.SUPVISORS:
-                        self.on_supvisors_status(message[1])
-                    elif message[0] == EventHeaders.ADDRESS:
-                        self.on_address_status(message[1])
-                    elif message[0] == EventHeaders.APPLICATION:
-                        self.on_application_status(message[1])
-                    elif message[0] == EventHeaders.PROCESS_EVENT:
-                        self.on_process_event(message[1])
-                    elif message[0] == EventHeaders.PROCESS_STATUS:
-                        self.on_process_status(message[1])
+                    if not self.outdated(sequence):
+                        self.dispatch(header, data)
         self.logger.warn('exiting main loop')
         self.subscriber.close()
 
+    def bootstrap(self):
+        """ Notify the last statuses published by **Supvisors**,
+        restricted to the subscriptions. """
+        snapshot = self.subscriber.request_snapshot(self.snapshot_port)
+        if snapshot:
+            self.sequence, events = snapshot
+            self.logger.info('got snapshot at sequence {}'.format(self.sequence))
+            for header, data in events:
+                self.dispatch(header, data)
+
+    def outdated(self, sequence):
+        """ Return True if the event is already included in the snapshot.
+        The check ends with the first event published after the snapshot. """
+        if self.sequence is None or sequence is None:
+            return False
+        if sequence <= self.sequence:
+            return True
+        self.sequence = None
+        return False
+
+    def dispatch(self, header, data):
+        """ Call the method corresponding to the header of the message. """
+        if header == EventHeaders.SUPVISORS:
+            self.on_supvisors_status(data)
+        elif header == EventHeaders.ADDRESS:
+            self.on_address_status(data)
+        elif header == EventHeaders.APPLICATION:
+            self.on_application_status(data)
+        elif header == EventHeaders.PROCESS_EVENT:
+            self.on_process_event(data)
+        elif header == EventHeaders.PROCESS_STATUS:
+            self.on_process_status(data)
+
     def configure(self):
         """ Default is subscription to everything. """
         self.logger.info('subscribe to all messages')
         self.subscriber.subscribe_all()
 
+    def subscribe_application(self, application_name):
+        """ Subscription to the statuses and events of the application.
+        To be used in a specialization of the configure method. """
+        self.logger.info('subscribe to application {}'.format(application_name))
+        self.subscriber.subscribe_application(application_name)
+
+    def subscribe_process(self, application_name, process_name):
+        """ Subscription to the statuses and events of the process.
+        To be used in a specialization of the configure method. """
+        self.logger.info('subscribe to process {}:{}'.format(application_name,
+                                                             process_name))
+        self.subscriber.subscribe_process_status(application_name, process_name)
+        self.subscriber.subscribe_process_event(application_name, process_name)
+
     def on_supvisors_status(self, data):
         """ Just logs the contents of the Supvisors Status message. """
         self.logger.info('got Supvisors Status message: {}'.format(data))
@@ -152,6 +211,8 @@ if __name__ == '__main__':
         description='Start a subscriber to Supvisors events.')
     parser.add_argument('-p', '--port', type=int, default=60002,
                         help="the event port of Supvisors")
+    parser.add_argument('-n', '--snapshot', type=int, metavar='PORT',
+                        help="the snapshot port of Supvisors")
     parser.add_argument('-s', '--sleep', type=int, metavar='SEC', default=10,
                         help="the duration of the subscription")
     args = parser.parse_args()
@@ -159,7 +220,8 @@ if __name__ == '__main__':
 
     loop = SupvisorsEventInterface(zmq.Context.instance(),
                                    args.port,
-                                   create_logger())
+                                   create_logger(),
+                                   args.snapshot)
     loop.subscriber.subscribe_all()
     # start thread and sleep for a while
     loop.start()
@@ -0,0 +1,297 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import cPickle
+
+from struct import Struct
+
+from supvisors.utils import InternalEventHeaders
+
+# Binary encoding of the messages exchanged between Supvisors instances.
+#
+# Each message starts with a magic byte and the codec version, followed by
+# the event header, the sequence number and the address name of the sender.
+# The sequence number is incremented by the sender for each message, so that
+# the receiver is able to detect the messages lost.
+# The payload is then encoded according to a fixed schema depending on the
+# event header:
+#
+#     - TICK: when,
+#     - PROCESS: name, group, state, now, pid, expected,
+#     - STATISTICS: time, cpu list, memory, io dict, process dict,
+#     - HEARTBEAT: nothing,
+#     - JOBS: starter jobs, stopper jobs, each job being made of
+#       stage, application sequence, process sequence, application name
+#       and namespecs.
+#
+# Strings are encoded in UTF-8 and prefixed with their length.
+# The magic byte cannot be confused with the first byte of a pickle
+# (protocol 2), so that a receiver is able to decode both formats.
+# This is used during a rolling upgrade, when some Supvisors instances still
+# publish pickled messages.
+# The messages of the version 1 of the codec, that have no sequence number,
+# are still decoded for the same reason.
+# The version 3 of the codec adds the HEARTBEAT and JOBS events.
+# The epoch of the sender, i.e. the identifier of its run, may follow the
+# payload, so that the receiver is able to tell a restart of the sender from
+# the messages lost, even when the new sequence numbers overtake the old ones.
+# As the trailing data is ignored by the older decoders, it does not require
+# a new version of the codec. The epoch is None when it is not provided.
+# Each message is encoded with the lowest version able to decode it, so that
+# the Supvisors instances of the version 2 still decode the other messages.
+# The messages using a version or an event type unknown to the receiver
+# raise an UnsupportedMessage exception, so that they can be skipped.
+
+# magic byte and current version of the codec
+CODEC_MAGIC = 0xa5
+CODEC_VERSION = 3
+
+# the sequence number is kept in the range of the XML-RPC integers
+SEQUENCE_MASK = 0x7fffffff
+
+# pre-compiled structures (network byte order)
+_HEAD = Struct('!BBB')
+_SEQUENCE = Struct('!I')
+_LENGTH = Struct('!H')
+_TICK = Struct('!q')
+_PROCESS = Struct('!Hqi?')
+_TIME_MEMORY = Struct('!dd')
+_CPU = Struct('!dd')
+_IO = Struct('!QQ')
+_PROC = Struct('!idd')
+_JOB = Struct('!Bii')
+
+
+class CodecError(ValueError):
+    """ Exception raised when a message cannot be decoded. """
+
+
+class UnsupportedMessage(CodecError):
+    """ Exception raised when a message uses a codec version or an event type
+    that is unknown to this version of the codec. """
+
+
+# encoding part
+def _pack_string(value):
+    """ Return the length-prefixed UTF-8 encoding of the string. """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return _LENGTH.pack(len(value)) + value
+
+
+def _encode_tick(payload):
+    """ Encode the tick payload. """
+    return _TICK.pack(payload['when'])
+
+
+def _encode_process(payload):
+    """ Encode the process event payload. """
+    return ''.join([_pack_string(payload['name']),
+                    _pack_string(payload['group']),
+                    _PROCESS.pack(payload['state'], payload['now'],
+                                  payload['pid'] or 0, payload['expected'])])
+
+
+def _encode_statistics(payload):
+    """ Encode the statistics payload. """
+    when, cpu, memory, io, processes = payload
+    chunks = [_TIME_MEMORY.pack(when, memory), _LENGTH.pack(len(cpu))]
+    chunks.extend(_CPU.pack(work, idle) for work, idle in cpu)
+    chunks.append(_LENGTH.pack(len(io)))
+    for intf, (recv_bytes, sent_bytes) in io.items():
+        chunks.append(_pack_string(intf))
+        chunks.append(_IO.pack(recv_bytes, sent_bytes))
+    chunks.append(_LENGTH.pack(len(processes)))
+    for namespec, (pid, (work, proc_memory)) in processes.items():
+        chunks.append(_pack_string(namespec))
+        chunks.append(_PROC.pack(pid, work, proc_memory))
+    return ''.join(chunks)
+
+
+def _encode_heartbeat(payload):
+    """ Encode the heartbeat payload. """
+    return ''
+
+
+def _encode_job_list(jobs):
+    """ Encode the jobs of a commander. """
+    chunks = [_LENGTH.pack(len(jobs))]
+    for stage, application_sequence, application_name, process_sequence, \
+            namespecs in jobs:
+        chunks.append(_JOB.pack(stage, application_sequence, process_sequence))
+        chunks.append(_pack_string(application_name))
+        chunks.append(_LENGTH.pack(len(namespecs)))
+        chunks.extend(_pack_string(namespec) for namespec in namespecs)
+    return ''.join(chunks)
+
+
+def _encode_jobs(payload):
+    """ Encode the jobs payload. """
+    return _encode_job_list(payload['starter']) + \
+        _encode_job_list(payload['stopper'])
+
+
+_ENCODERS = {InternalEventHeaders.TICK: _encode_tick,
+             InternalEventHeaders.PROCESS: _encode_process,
+             InternalEventHeaders.STATISTICS: _encode_statistics,
+             InternalEventHeaders.HEARTBEAT: _encode_heartbeat,
+             InternalEventHeaders.JOBS: _encode_jobs}
+
+# lowest version of the codec able to decode the event (2 by default)
+_VERSIONS = {InternalEventHeaders.HEARTBEAT: 3,
+             InternalEventHeaders.JOBS: 3}
+
+
+def encode(event_type, address, epoch, sequence, payload):
+    """ Return the binary encoding of the internal event.
+    The epoch is not encoded if None. """
+    version = _VERSIONS.get(event_type, 2)
+    chunks = [_HEAD.pack(CODEC_MAGIC, version, event_type),
+              _SEQUENCE.pack(sequence),
+              _pack_string(address),
+              _ENCODERS[event_type](payload)]
+    if epoch is not None:
+        chunks.append(_pack_string(epoch))
+    return ''.join(chunks)
+
+
+# decoding part
+class _Reader(object):
+    """ Sequential reader of a binary message. """
+
+    def __init__(self, data):
+        """ Initialization of the attributes. """
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, structure):
+        """ Return the values of the structure read at current offset. """
+        values = structure.unpack_from(self.data, self.offset)
+        self.offset += structure.size
+        return values
+
+    def string(self):
+        """ Return the length-prefixed string read at current offset. """
+        length, = self.unpack(_LENGTH)
+        end = self.offset + length
+        if end > len(self.data):
+            raise CodecError('truncated string in message')
+        value = self.data[self.offset:end]
+        self.offset = end
+        return value
+
+    def remaining(self):
+        """ Return True if data remains after the current offset. """
+        return self.offset < len(self.data)
+
+
+def _decode_tick(reader):
+    """ Decode the tick payload. """
+    when, = reader.unpack(_TICK)
+    return {'when': when}
+
+
+def _decode_process(reader):
+    """ Decode the process event payload. """
+    name = reader.string()
+    group = reader.string()
+    state, now, pid, expected = reader.unpack(_PROCESS)
+    return {'name': name, 'group': group, 'state': state, 'now': now,
+            'pid': pid, 'expected': expected}
+
+
+def _decode_statistics(reader):
+    """ Decode the statistics payload. """
+    when, memory = reader.unpack(_TIME_MEMORY)
+    nb_cpu, = reader.unpack(_LENGTH)
+    cpu = [reader.unpack(_CPU) for _ in range(nb_cpu)]
+    nb_io, = reader.unpack(_LENGTH)
+    io = {}
+    for _ in range(nb_io):
+        intf = reader.string()
+        io[intf] = reader.unpack(_IO)
+    nb_proc, = reader.unpack(_LENGTH)
+    processes = {}
+    for _ in range(nb_proc):
+        namespec = reader.string()
+        pid, work, proc_memory = reader.unpack(_PROC)
+        processes[namespec] = pid, (work, proc_memory)
+    return when, cpu, memory, io, processes
+
+
+def _decode_heartbeat(reader):
+    """ Decode the heartbeat payload. """
+    return {}
+
+
+def _decode_job_list(reader):
+    """ Decode the jobs of a commander. """
+    nb_jobs, = reader.unpack(_LENGTH)
+    jobs = []
+    for _ in range(nb_jobs):
+        stage, application_sequence, process_sequence = reader.unpack(_JOB)
+        application_name = reader.string()
+        nb_namespecs, = reader.unpack(_LENGTH)
+        namespecs = [reader.string() for _ in range(nb_namespecs)]
+        jobs.append((stage, application_sequence, application_name,
+                     process_sequence, namespecs))
+    return jobs
+
+
+def _decode_jobs(reader):
+    """ Decode the jobs payload. """
+    starter = _decode_job_list(reader)
+    return {'starter': starter, 'stopper': _decode_job_list(reader)}
+
+
+_DECODERS = {InternalEventHeaders.TICK: _decode_tick,
+             InternalEventHeaders.PROCESS: _decode_process,
+             InternalEventHeaders.STATISTICS: _decode_statistics,
+             InternalEventHeaders.HEARTBEAT: _decode_heartbeat,
+             InternalEventHeaders.JOBS: _decode_jobs}
+
+
+def decode(data):
+    """ Return the internal event as a tuple
+    (event_type, address, epoch, sequence, payload).
+    Pickled messages are accepted for compatibility with Supvisors instances
+    that do not use the binary codec. As they have no epoch and no sequence
+    number, the epoch and the sequence returned are None. """
+    if not data or ord(data[0]) != CODEC_MAGIC:
+        event_type, address, payload = cPickle.loads(data)
+        return event_type, address, None, None, payload
+    reader = _Reader(data)
+    try:
+        _, version, event_type = reader.unpack(_HEAD)
+        if not 1 <= version <= CODEC_VERSION:
+            raise UnsupportedMessage('unsupported codec version: {}'
+                                     .format(version))
+        decoder = _DECODERS.get(event_type)
+        if decoder is None:
+            raise UnsupportedMessage('unknown event type: {}'
+                                     .format(event_type))
+        sequence = reader.unpack(_SEQUENCE)[0] if version > 1 else None
+        address = reader.string()
+        payload = decoder(reader)
+        epoch = reader.string() if reader.remaining() else None
+        return event_type, address, epoch, sequence, payload
+    except CodecError:
+        raise
+    except Exception as exc:
+        raise CodecError('cannot decode message: {}'.format(exc))
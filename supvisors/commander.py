@@ -23,7 +23,8 @@ from supervisor.childutils import get_asctime
 from supervisor.states import ProcessStates
 
 from supvisors.strategy import get_address
-from supvisors.ttypes import StartingStrategies, StartingFailureStrategies
+from supvisors.ttypes import (JobStages, StartingStrategies,
+                              StartingFailureStrategies)
 from supvisors.utils import supvisors_short_cuts
 
 
@@ -36,7 +37,9 @@ class Commander(object):
             grouped by application sequence order, application name and process sequence order,
         - planned_jobs: the current sequence of applications to be commanded,
             as a dictionary of processes, grouped by application name and process sequence order,
-        - current_jobs: a dictionary of commanded processes, grouped by application name.
+        - current_jobs: a dictionary of commanded processes, grouped by application name,
+        - batched_requests: while a sequence group is processed, the requests to be sent, grouped by address,
+        - replica: the jobs replicated from the Supvisors master, as given by its serial_jobs method.
     """
 
     def __init__(self, supvisors):
@@ -49,6 +52,8 @@ class Commander(object):
         self.planned_sequence = {} # {application_sequence: {application_name: {process_sequence: [process]}}}
         self.planned_jobs = {} # {application_name: {process_sequence: [process]}}
         self.current_jobs = {} # {application_name: [process]}
+        self.batched_requests = None # {address: [request]}
+        self.replica = []
 
     def in_progress(self):
         """ Return True if there are jobs planned or in progress. """
@@ -66,6 +71,12 @@ class Commander(object):
             or application_name in self.planned_jobs \
             or application_name in self.current_jobs
 
+    def abort(self):
+        """ Abort all planned and current jobs. """
+        self.planned_sequence = {}
+        self.planned_jobs = {}
+        self.current_jobs = {}
+
     # log facilities
     def printable_planned_sequence(self):
         """ Simple form of planned_sequence, so that it can be printed. """
@@ -91,6 +102,66 @@ class Commander(object):
         """ Simple form of process_list, so that it can be printed. """
         return [process.namespec() for process in processes]
 
+    def serial_jobs(self):
+        """ Return the planned and current jobs in a serializable form,
+        i.e. a sorted list of (stage, application sequence, application name,
+        process sequence, namespecs). """
+        jobs = [(JobStages.PLANNED_SEQUENCE, application_sequence,
+                 application_name, process_sequence,
+                 [process.namespec() for process in processes])
+                for application_sequence, applications in self.planned_sequence.items()
+                for application_name, sequences in applications.items()
+                for process_sequence, processes in sequences.items()]
+        jobs.extend((JobStages.PLANNED_JOBS, 0, application_name,
+                     process_sequence,
+                     [process.namespec() for process in processes])
+                    for application_name, sequences in self.planned_jobs.items()
+                    for process_sequence, processes in sequences.items())
+        jobs.extend((JobStages.CURRENT_JOBS, 0, application_name, 0,
+                     [process.namespec() for process in processes])
+                    for application_name, processes in self.current_jobs.items())
+        return sorted(jobs)
+
+    def take_over(self, invalidated=()):
+        """ Resume the jobs replicated from the former Supvisors master.
+        The requests of the current jobs are considered as sent now, so that
+        they are given the usual delay to be acknowledged.
+        The current jobs of the processes being invalidated are dropped,
+        as their failure is handled by the failure handler.
+        The applications having no job in progress are triggered. """
+        if not self.replica:
+            return
+        self.logger.warn('take over {} jobs from former master'.format(
+            len(self.replica)))
+        processes = self.supvisors.context.processes
+        now = time.time()
+        for stage, application_sequence, application_name, process_sequence, \
+                namespecs in self.replica:
+            # ignore the processes that are unknown to this Supvisors instance
+            group = [processes[namespec] for namespec in namespecs
+                     if namespec in processes]
+            if stage == JobStages.PLANNED_SEQUENCE:
+                applications = self.planned_sequence.setdefault(
+                    application_sequence, {})
+                applications.setdefault(application_name, {})[process_sequence] = group
+            elif stage == JobStages.PLANNED_JOBS:
+                self.planned_jobs.setdefault(application_name, {})[process_sequence] = group
+            else:
+                group = [process for process in group
+                         if process not in invalidated]
+                for process in group:
+                    process.request_time = now
+                if group:
+                    self.current_jobs.setdefault(application_name, []).extend(group)
+        self.replica = []
+        # trigger the applications having no job in progress
+        if self.planned_jobs:
+            for application_name in self.planned_jobs.keys():
+                if application_name not in self.current_jobs:
+                    self.process_application_jobs(application_name)
+        elif not self.current_jobs:
+            self.initial_jobs()
+
     def initial_jobs(self):
         """ Initializes the planning of the jobs (start or stop). """
         self.logger.debug('planned_sequence={}'.format(self.printable_planned_sequence()))
@@ -114,9 +185,16 @@ class Commander(object):
                 # pop lower group from sequence
                 group = sequence.pop(min(sequence.keys()))
                 self.logger.debug('application {} - next group: {}'.format(application_name, self.printable_process_list(group)))
-                for process in group:
-                    self.logger.trace('{} - state={}'.format(process.namespec(), process.state_string()))
-                    self.process_job(process, jobs)
+                # the requests of the group are sent at once per address
+                self.batched_requests = {}
+                try:
+                    for process in group:
+                        self.logger.trace('{} - state={}'.format(process.namespec(), process.state_string()))
+                        self.process_job(process, jobs)
+                finally:
+                    batched_requests, self.batched_requests = self.batched_requests, None
+                for address, requests in batched_requests.items():
+                    self.send_requests(address, requests)
             self.logger.debug('current_jobs={}'.format(self.printable_current_jobs()))
             # if nothing in progress when exiting the loop, delete application entry in current_jobs
             if not jobs:
@@ -134,13 +212,29 @@ class Commander(object):
         Method must be implemented in subclasses. """
         raise NotImplementedError
 
+    def push_request(self, address, request):
+        """ Send the request to the address, unless a sequence group
+        is being processed. In the latter case, the request is sent later
+        with the other requests of the group having the same address. """
+        if self.batched_requests is None:
+            self.send_requests(address, [request])
+        else:
+            self.batched_requests.setdefault(address, []).append(request)
+
+    def send_requests(self, address, requests):
+        """ Send the requests to the address.
+        Method must be implemented in subclasses. """
+        raise NotImplementedError
+
 
 class Starter(Commander):
     """ Class handling the starting of processes and applications.
 
     Attributes are:
         - strategy: the starting strategy applied, defaulted to the value
-        set in the Supervisor configuration file.
+        set in the Supervisor configuration file,
+        - planned_loading: while several processes are placed at once,
+        the loading of the processes already placed, per address.
     """
 
     def __init__(self, supvisors):
@@ -148,6 +242,7 @@ class Starter(Commander):
         Commander.__init__(self, supvisors)
         #attributes
         self._strategy = supvisors.options.starting_strategy
+        self.planned_loading = None # {address: loading}
 
     @property
     def strategy(self):
@@ -160,12 +255,6 @@ class Starter(Commander):
         self.logger.info('start processes using strategy {}'.format(StartingStrategies._to_string(strategy)))
         self._strategy = strategy
 
-    def abort(self):
-        """ Abort all planned and current jobs. """
-        self.planned_sequence = {}
-        self.planned_jobs = {}
-        self.current_jobs = {}
-
     def start_applications(self):
         """ Plan and start the necessary jobs to start all the applications having a start_sequence.
         It uses the default strategy, as defined in the Supervisor configuration file. """
@@ -230,6 +319,36 @@ class Starter(Commander):
         # return True when starting
         return starting
 
+    def start_processes(self, strategy, processes):
+        """ Plan and start the necessary jobs to start the processes in
+        parameter at once, with the strategy requested.
+        The addresses of all the processes are chosen before any request is
+        sent, considering the loading of the processes already placed.
+        The requests are then sent at once per address, so that the addresses
+        start their processes in parallel.
+        Return the processes starting. """
+        self.logger.info('start processes {}'.format(
+            self.printable_process_list(processes)))
+        self.strategy = strategy
+        starting = []
+        self.planned_loading = {}
+        self.batched_requests = {}
+        try:
+            for process in processes:
+                # same as a single process starting: ignore the 'wait_exit' rule
+                process.ignore_wait_exit = True
+                job = self.current_jobs.setdefault(process.application_name, [])
+                if self.process_job(process, job):
+                    starting.append(process)
+                if not job:
+                    del self.current_jobs[process.application_name]
+        finally:
+            batched_requests, self.batched_requests = self.batched_requests, None
+            self.planned_loading = None
+        for address, requests in batched_requests.items():
+            self.send_requests(address, requests)
+        return starting
+
     def check_starting(self):
         """ Check the progress of the application starting. """
         self.logger.debug('starting progress: planned_sequence={} planned_jobs={} current_jobs={}'.format(
@@ -250,6 +369,14 @@ class Starter(Commander):
         # return True when starting is completed
         return not self.in_progress()
 
+    def on_fault(self, namespec, reason):
+        """ Force the process state to FATAL when its start request has been
+        rejected, instead of waiting for the timeout of check_starting. """
+        process = self.supvisors.context.processes.get(namespec)
+        if process and process.stopped() and \
+                process in self.current_jobs.get(process.application_name, []):
+            self.force_process_fatal(namespec, reason)
+
     def on_event(self, process):
         """ Triggers the following of the start sequencing, depending on the new process status. """
         try:
@@ -354,13 +481,17 @@ class Starter(Commander):
         if process.stopped():
             namespec = process.namespec()
             address = get_address(self.supvisors, self.strategy,
-                process.rules.addresses, process.rules.expected_loading)
+                process.rules.addresses, process.rules.expected_loading,
+                self.planned_loading)
             if address:
+                if self.planned_loading is not None:
+                    self.planned_loading[address] = \
+                        self.planned_loading.get(address, 0) + \
+                        process.rules.expected_loading
                 self.logger.info('try to start {} at address={}'.format(
                     namespec, address))
                 # use asynchronous xml rpc to start program
-                self.supvisors.zmq.pusher.send_start_process(address,
-                    namespec, process.extra_args)
+                self.push_request(address, (namespec, process.extra_args))
                 # push to jobs and timestamp process
                 process.request_time = time.time()
                 self.logger.debug('{} requested to start at {}'.format(
@@ -379,6 +510,16 @@ class Starter(Commander):
         # return True when process is starting
         return not reset_flag
 
+    def send_requests(self, address, requests):
+        """ Send the start requests to the address.
+        Several requests are sent in one single XML-RPC. """
+        pusher = self.supvisors.zmq.pusher
+        if len(requests) == 1:
+            namespec, extra_args = requests[0]
+            pusher.send_start_process(address, namespec, extra_args)
+        else:
+            pusher.send_start_processes(address, requests)
+
     def process_failure(self, process):
         """ Updates the start sequence when a process could not be started. """
         application_name = process.application_name
@@ -484,14 +625,22 @@ class Stopper(Commander):
             for address in process.addresses:
                 self.logger.info('stopping process {} on {}'.format(
                     process.namespec(), address))
-                self.supvisors.zmq.pusher.send_stop_process(address,
-                                                            process.namespec())
+                self.push_request(address, process.namespec())
             # push to jobs and timestamp process
             process.request_time = time.time()
             self.logger.debug('{} requested to stop at {}'.format(
                 process.namespec(), get_asctime(process.request_time)))
             jobs.append(process)
 
+    def send_requests(self, address, requests):
+        """ Send the stop requests to the address.
+        Several requests are sent in one single XML-RPC. """
+        pusher = self.supvisors.zmq.pusher
+        if len(requests) == 1:
+            pusher.send_stop_process(address, requests[0])
+        else:
+            pusher.send_stop_processes(address, requests)
+
     def check_stopping(self):
         """ Check the progress of the application stopping. """
         self.logger.debug('stopping progress: planned_sequence={} '\
@@ -521,6 +670,14 @@ class Stopper(Commander):
         # return True when starting is completed
         return not self.in_progress()
 
+    def on_fault(self, namespec, reason):
+        """ Force the process state to UNKNOWN when its stop request has been
+        rejected, instead of waiting for the timeout of check_stopping. """
+        process = self.supvisors.context.processes.get(namespec)
+        if process and process.running() and \
+                process in self.current_jobs.get(process.application_name, []):
+            self.force_process_unknown(namespec, reason)
+
     def on_event(self, process):
         """ Triggers the following of the stop sequencing, depending on
         the new process status. """
@@ -17,10 +17,13 @@
 # limitations under the License.
 # ======================================================================
 
+from collections import OrderedDict
 from time import time
 
 from supvisors.address import *
 from supvisors.application import ApplicationStatus
+from supvisors.detector import PhiAccrualDetector
+from supvisors.membership import MembershipCache
 from supvisors.process import *
 from supvisors.ttypes import AddressStates
 from supvisors.utils import supvisors_short_cuts
@@ -29,11 +32,21 @@ from supvisors.utils import supvisors_short_cuts
 class Context(object):
     """ The Context class holds the main data of Supvisors:
     - addresses: the dictionary of all AddressStatus (key is address),
+    - addresses_per_state: the set of address names per AddressStates,
+    kept up to date by the AddressStatus,
     - applications: the dictionary of all ApplicationStatus
     (key is application name),
     - processes: the dictionary of all ProcessStatus (key is process namespec),
+    - _conflicts: the set of conflicting ProcessStatus, kept up to date by
+    the ProcessStatus themselves,
     - master_address: the address of the Supvisors master,
-    - master: a boolean telling if the local address is the master address. """
+    - master: a boolean telling if the local address is the master address,
+    - announced_master: the address of a Supvisors master already in use,
+    as announced while the local address has no master,
+    - membership: the persistence of the running addresses,
+    - heartbeat_period: the period in seconds of the heartbeats,
+    - relay_time: the date of the last event received through the relay,
+    None if the addresses are directly connected. """
 
     def __init__(self, supvisors):
         """ Initialization of the attributes. """
@@ -42,12 +55,24 @@ class Context(object):
         # shortcuts for readability
         supvisors_short_cuts(self, ['address_mapper', 'logger'])
         # attributes
-        self.addresses = {address: AddressStatus(address, self.logger)
+        options = supvisors.options
+        self.addresses_per_state = {state: set()
+                                    for state in AddressStates._values()}
+        self.addresses = {address: AddressStatus(address, self.logger,
+                                                 PhiAccrualDetector(
+                                                     options.heartbeat_period / 1000.0,
+                                                     options.phi_threshold),
+                                                 self.addresses_per_state)
                           for address in self.address_mapper.addresses}
         self.applications = {}
         self.processes = {}
+        self._conflicts = set()
         self._master_address = ''
         self.master = False
+        self.announced_master = ''
+        self.membership = MembershipCache(options.membership_file, self.logger)
+        self.heartbeat_period = options.heartbeat_period / 1000.0
+        self.relay_time = None
 
     @property
     def master_address(self):
@@ -82,25 +107,81 @@ class Context(object):
 
     def addresses_by_states(self, states):
         """ Return the AddressStatus instances sorted by state. """
-        return [status.address_name
-                for status in self.addresses.values()
-                    if status.state in states]
+        return [address_name for state in states
+                for address_name in self.addresses_per_state[state]]
 
     def invalid(self, status):
         """ Declare SILENT or ISOLATING the AddressStatus in parameter,
         according to the auto_fence option.
         A local address is never ISOLATING, whatever the option is set or not.
-        Give it a chance to restart. """
+        Give it a chance to restart.
+        If local Supvisors is master, a failover incident is recorded for the
+        processes that were running on this address.
+        The processes restored from the context file for this address,
+        and not confirmed by a check yet, are removed. """
+        last_seen = status.last_seen()
         if self.supvisors.options.auto_fence and \
             status.address_name != self.address_mapper.local_address:
             status.state = AddressStates.ISOLATING
         else:
             status.state = AddressStates.SILENT
+        # the successor of a lost master is elected before the processes
+        # are invalidated, so that the new master handles their failures
+        processes = status.running_processes()
+        if status.address_name == self.master_address:
+            self.elect_master(processes)
         # invalidate address in concerned processes
         # if local Supvisors is master, failure handler will be notified
         # for processes running on this address
-        for process in status.running_processes():
+        for process in processes:
             process.invalidate_address(status.address_name, self.master)
+        if self.master:
+            self.supvisors.failure_handler.add_incident(status.address_name,
+                                                        last_seen, processes)
+        # the processes restored from the context file cannot be confirmed
+        # anymore by the lost address, so they are removed
+        namespecs = self.supvisors.snapshot.obsolete_processes(
+            status.address_name, [])
+        if namespecs:
+            self.unload_processes(status.address_name, namespecs)
+
+    def elect_master(self, invalidated=()):
+        """ Elect a successor to the lost Supvisors master, without going
+        back to the INITIALIZATION state.
+        The rule is the same as at the end of the INITIALIZATION state, i.e.
+        the 'lowest' running address, so that all Supvisors instances elect
+        the same master without exchanging any message.
+        The new master takes over the jobs replicated from the former one,
+        except the current jobs of the processes being invalidated.
+        Return False if the local address is not running. """
+        addresses = self.running_addresses()
+        if self.address_mapper.local_address not in addresses:
+            return False
+        former_master = self.master_address
+        self.master_address = min(addresses)
+        self.logger.warn('master {} lost: {} elected'.format(
+            former_master, self.master_address))
+        for commander in [self.supvisors.starter, self.supvisors.stopper]:
+            if self.master:
+                commander.take_over(invalidated)
+            else:
+                commander.replica = []
+        return True
+
+    def adopt_master(self, address_name):
+        """ Adopt the Supvisors master announced by another address.
+        This happens when the Supvisors instances have elected different
+        masters, because their failure detectors did not detect the loss of
+        the former master at the same time.
+        If the local address is master, it steps down and drops its jobs,
+        as the announced master handles them. """
+        self.logger.warn('master {} announced: replaces {}'.format(
+            address_name, self.master_address))
+        if self.master:
+            self.supvisors.starter.abort()
+            self.supvisors.stopper.abort()
+            self.supvisors.failure_handler.clear_jobs()
+        self.master_address = address_name
 
     def end_synchro(self):
         """ Declare as SILENT the AddressStatus that are still not responsive
@@ -109,16 +190,50 @@ class Context(object):
         map(self.invalid, filter(lambda x: x.state == AddressStates.UNKNOWN,
                                  self.addresses.values()))
 
+    def load_membership(self):
+        """ Return the known addresses that were running when the membership
+        was last saved. """
+        return self.membership.load() & set(self.addresses.keys())
+
+    def save_membership(self):
+        """ Save the addresses currently running. """
+        self.membership.save(self.running_addresses())
+
     # methods on applications / processes
     def conflicting(self):
         """ Return True if any conflicting ProcessStatus is detected. """
-        return next((True for process in self.processes.values()
-                     if process.conflicting()), False)
+        return bool(self._conflicts)
 
     def conflicts(self):
         """ Return all conflicting ProcessStatus. """
-        return [process for process in self.processes.values()
-                if process.conflicting()]
+        return list(self._conflicts)
+
+    def update_running(self, process, previous_addresses):
+        """ Update the running processes of the AddressStatus where the
+        ProcessStatus has started or stopped running, and the running processes
+        and the counters of its ApplicationStatus.
+        This is called by the ProcessStatus each time its state or its running
+        addresses may have changed. """
+        addresses = process.running_on_addresses()
+        for address_name in previous_addresses - addresses:
+            self.addresses[address_name].remove_running(process)
+        for address_name in addresses - previous_addresses:
+            self.addresses[address_name].add_running(process)
+        application = self.applications[process.application_name]
+        if addresses:
+            application.add_running(process)
+        else:
+            application.remove_running(process)
+        application.update_process(process)
+
+    def update_conflict(self, process, conflicting):
+        """ Add or remove the ProcessStatus from the conflicting processes.
+        This is called by the ProcessStatus each time its running addresses
+        are evaluated. """
+        if conflicting:
+            self._conflicts.add(process)
+        else:
+            self._conflicts.discard(process)
 
     def setdefault_application(self, application_name):
         """ Return the application corresponding to application_name if found.
@@ -174,6 +289,31 @@ class Context(object):
             # share the instance to the Supervisor instance that holds it
             status.add_process(process)
 
+    def unload_processes(self, address, namespecs):
+        """ Remove the process information of address, for the processes
+        that are not handled by the Supervisor of address anymore.
+        The processes and the applications left without any information
+        are removed. """
+        status = self.addresses[address]
+        applications = set()
+        for namespec in namespecs:
+            process = self.processes.get(namespec)
+            if process and address in process.infos:
+                self.logger.info('remove {} from {}'.format(namespec, address))
+                process.remove_info(address)
+                status.remove_process(process)
+                application = self.applications[process.application_name]
+                if not process.infos:
+                    del self.processes[namespec]
+                    application.remove_process(process)
+                applications.add(application)
+        for application in applications:
+            if application.processes:
+                application.update_sequences()
+                application.update_status()
+            else:
+                del self.applications[application.application_name]
+
     # methods on events
     def on_authorization(self, address_name, authorized):
         """ Method called upon reception of an authorization event telling
@@ -213,7 +353,8 @@ class Context(object):
                 # instance considers local instance as isolated
                 if status.state in [AddressStates.UNKNOWN, AddressStates.SILENT]:
                     status.state = AddressStates.CHECKING
-                    self.supvisors.zmq.pusher.send_check_address(address_name)
+                    self.supvisors.zmq.pusher.send_check_address(address_name,
+                        status.invalidated_processes())
                 # update internal times
                 status.update_times(event['when'], int(time()))
                 # publish AddressStatus event
@@ -222,15 +363,29 @@ class Context(object):
             self.logger.warn('got tick from unexpected location={}'
                              .format(address_name))
 
+    def on_heartbeat_event(self, address_name):
+        """ Method called upon reception of a heartbeat from the remote
+        Supvisors instance.
+        The heartbeat feeds the failure detector of the AddressStatus. """
+        if self.address_mapper.valid(address_name):
+            status = self.addresses[address_name]
+            # ISOLATED address is not updated anymore
+            if not status.in_isolation():
+                status.detector.heartbeat(time())
+        else:
+            self.logger.warn('got heartbeat from unexpected location={}'
+                             .format(address_name))
+
     def on_process_event(self, address_name, event):
         """ Method called upon reception of a process event from the remote
         Supvisors instance.
         Supvisors checks that the handling of the event is valid in case of
         auto fencing.
-        The method updates the ProcessStatus corresponding to the event, and
-        thus the wrapping ApplicationStatus.
-        Finally, the updated ProcessStatus and ApplicationStatus are published.
-        """
+        The method updates the ProcessStatus corresponding to the event
+        and publishes the process event.
+        The wrapping ApplicationStatus is NOT updated here. This is deferred
+        to publish_process_status so that it is done only once for a batch
+        of events. """
         if self.address_mapper.valid(address_name):
             status = self.addresses[address_name]
             # ISOLATED address is not updated anymore
@@ -248,29 +403,58 @@ class Context(object):
                                       .format(event, address_name))
                 else:
                     process.update_info(address_name, event)
-                    # refresh application status
-                    application = self.applications[process.application_name]
-                    application.update_status()
-                    # publish process event, status and application status
-                    publisher = self.supvisors.zmq.publisher
-                    publisher.send_process_event(address_name, event)
-                    publisher.send_process_status(process)
-                    publisher.send_application_status(application)
+                    # publish process event
+                    self.supvisors.zmq.publisher.send_process_event(
+                        address_name, event)
                     return process
         else:
             self.logger.error('got process event from unexpected location={}'
                               .format(address_name))
 
+    def publish_process_status(self, processes):
+        """ Refresh the status of the applications wrapping the processes
+        and publish the process and application statuses.
+        Each status is evaluated and published only once, whatever the number
+        of events received for the same process or application. """
+        publisher = self.supvisors.zmq.publisher
+        applications = OrderedDict()
+        for process in OrderedDict.fromkeys(processes):
+            publisher.send_process_status(process)
+            applications.setdefault(process.application_name)
+        for application_name in applications:
+            application = self.applications[application_name]
+            application.update_status()
+            publisher.send_application_status(application)
+
+    def on_local_heartbeat(self, relay_time):
+        """ Method called upon the local heartbeat, which is the timer of the
+        failure detectors. relay_time is the date of the last event received
+        through the relay, if any.
+        Return the addresses invalidated. """
+        self.relay_time = relay_time
+        return self.on_timer_event()
+
     def on_timer_event(self):
         """ Check that all Supvisors instances are still publishing.
-        Supvisors considers that there a Supvisors instance is not active
-        if no tick received in last 10s. """
+        Supvisors considers that a Supvisors instance is not active
+        when its failure detector suspects it.
+        When the events are received through a relay, the failure detectors
+        are not evaluated beyond one heartbeat period after the last event
+        received through it, so that the failure of the relay is not taken
+        for the failure of all the Supvisors instances while it is replaced.
+        Return the addresses invalidated. """
+        now = time()
+        if self.relay_time is not None:
+            now = min(now, self.relay_time + self.heartbeat_period)
+        addresses = []
         for status in self.addresses.values():
             if status.state == AddressStates.RUNNING and \
-                (time() - status.local_time) > 10:
+                status.suspected(now):
                 self.invalid(status)
+                addresses.append(status.address_name)
                 # publish AddressStatus event
                 self.supvisors.zmq.publisher.send_address_status(status)
+        return addresses
 
     def handle_isolation(self):
         """ Move ISOLATING addresses to ISOLATED and publish related events. """
@@ -0,0 +1,106 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+from collections import deque
+from math import exp, log10, sqrt
+
+
+class PhiAccrualDetector(object):
+    """ Adaptive failure detector based on the intervals between the
+    heartbeats received from a Supvisors instance.
+
+    Instead of a fixed timeout, the detector gives a suspicion level phi,
+    that grows with the time elapsed since the last heartbeat, according to
+    the distribution of the last intervals observed.
+    A phi of 1 means that the probability of a false suspicion is about 10%,
+    a phi of 2 means 1%, and so on.
+    The normal distribution is approximated by a logistic function.
+
+    Attributes are:
+
+        - period: the expected interval between heartbeats, in seconds,
+        - threshold: the phi above which the Supvisors instance is suspected,
+        - min_std_deviation: the minimum standard deviation used, so that
+        a very regular heartbeat does not lead to false suspicions,
+        - intervals: the last intervals observed,
+        - total: the sum of the intervals observed,
+        - squares: the sum of the squares of the intervals observed,
+        - last_time: the date of the last heartbeat received.
+    """
+
+    # maximum number of intervals kept
+    WINDOW_SIZE = 100
+
+    def __init__(self, period, threshold):
+        """ Initialization of the attributes. """
+        self.period = period
+        self.threshold = threshold
+        self.min_std_deviation = period / 10.0
+        self.intervals = deque()
+        self.total = 0.0
+        self.squares = 0.0
+        self.last_time = None
+
+    def reset(self):
+        """ Forget the heartbeats received. """
+        self.intervals.clear()
+        self.total = 0.0
+        self.squares = 0.0
+        self.last_time = None
+
+    def heartbeat(self, now):
+        """ Record the interval since the last heartbeat.
+        The first heartbeat is given a mean equal to the expected period
+        and a standard deviation equal to a quarter of it. """
+        if self.last_time is None:
+            deviation = self.period / 4.0
+            self._add(self.period - deviation)
+            self._add(self.period + deviation)
+        else:
+            self._add(now - self.last_time)
+        self.last_time = now
+
+    def phi(self, now):
+        """ Return the suspicion level at the date given. """
+        if self.last_time is None:
+            return 0.0
+        count = len(self.intervals)
+        mean = self.total / count
+        variance = self.squares / count - mean * mean
+        std_deviation = max(sqrt(max(variance, 0.0)), self.min_std_deviation)
+        # the value is bounded so that the exponential cannot overflow
+        y = min(max((now - self.last_time - mean) / std_deviation, -20.0), 20.0)
+        e = exp(-y * (1.5976 + 0.070566 * y * y))
+        if now - self.last_time > mean:
+            return -log10(e / (1.0 + e))
+        return -log10(1.0 - 1.0 / (1.0 + e))
+
+    def suspected(self, now):
+        """ Return True if the suspicion level has reached the threshold. """
+        return self.phi(now) >= self.threshold
+
+    def _add(self, interval):
+        """ Add an interval to the window. """
+        if len(self.intervals) == self.WINDOW_SIZE:
+            removed = self.intervals.popleft()
+            self.total -= removed
+            self.squares -= removed * removed
+        self.intervals.append(interval)
+        self.total += interval
+        self.squares += interval * interval
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import errno
+import fcntl
+import os
+
+from collections import deque
+from Queue import Queue, Empty
+
+from supervisor.medusa.asyncore_25 import file_dispatcher
+
+# Constant for the size of the pipe reads
+WAKEUP_SIZE = 4096
+
+
+class EventQueue(file_dispatcher):
+    """ Class used to hand over the events received in the Supvisors thread
+    to the Supervisor thread, with no XML-RPC nor serialization in between.
+
+    The events are stored in a thread-safe queue and a byte is written
+    into a pipe to wake up the supervisord loop. The read end of the pipe is
+    registered in the medusa socket map polled by supervisord, so the events
+    are unstacked in the Supervisor thread.
+    WARN: the standard asyncore socket map is not polled by supervisord.
+
+    The events produced in the Supervisor thread are processed directly,
+    after the events already queued, so that the order of the events is kept.
+
+    Attributes are:
+
+        - callback: the function called in the Supervisor thread for each
+        event, with the event type and the event data as parameters,
+        - logger: a reference to the Supvisors logger,
+        - queue: the thread-safe queue of events,
+        - nested: the events produced in the Supervisor thread while an event
+        is being processed,
+        - processing: True while the events are being processed,
+        - wakeup_fd: the write end of the pipe.
+    """
+
+    def __init__(self, callback, logger, socket_map):
+        """ Initialization of the attributes.
+        WARN: this MUST be done in the Supervisor thread. """
+        self.callback = callback
+        self.logger = logger
+        self.queue = Queue()
+        self.nested = deque()
+        self.processing = False
+        read_fd, self.wakeup_fd = os.pipe()
+        # the write end must never block the Supvisors thread
+        flags = fcntl.fcntl(self.wakeup_fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.wakeup_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        # file_dispatcher takes ownership of the read end, sets it
+        # non-blocking and adds it to the socket map
+        file_dispatcher.__init__(self, read_fd, socket_map)
+
+    def close(self):
+        """ Remove the dispatcher from the socket map and close the pipe. """
+        file_dispatcher.close(self)
+        os.close(self.wakeup_fd)
+
+    def push(self, event_type, event_data):
+        """ Store the event and wake up the Supervisor thread.
+        This method is called from the Supvisors thread. """
+        self.queue.put((event_type, event_data))
+        try:
+            os.write(self.wakeup_fd, '.')
+        except OSError as why:
+            # a full pipe means that a wake-up is already pending
+            if why.errno != errno.EAGAIN:
+                raise
+
+    def process(self, event_type, event_data):
+        """ Process the event after the events already queued.
+        This method is called from the Supervisor thread.
+        When called while the events are being processed, i.e. when the event
+        results from the processing of another event, the event is processed
+        right after the current event, before the other events queued. """
+        if self.processing:
+            self.nested.append((event_type, event_data))
+        else:
+            self.queue.put((event_type, event_data))
+            self.flush()
+
+    def flush(self):
+        """ Process all the events available.
+        The nested events are processed before the events queued.
+        This method is called from the Supervisor thread. """
+        self.processing = True
+        try:
+            while True:
+                if self.nested:
+                    event_type, event_data = self.nested.popleft()
+                else:
+                    try:
+                        event_type, event_data = self.queue.get_nowait()
+                    except Empty:
+                        break
+                # an exception raised here would lead supervisord
+                # to close the dispatcher
+                try:
+                    self.callback(event_type, event_data)
+                except Exception as exc:
+                    self.logger.error('failed to process event {}: {}'.format(
+                        event_type, exc))
+        finally:
+            self.processing = False
+
+    # asyncore part
+    def readable(self):
+        """ The pipe is always listened. """
+        return True
+
+    def writable(self):
+        """ Nothing is ever written through the dispatcher. """
+        return False
+
+    def handle_read(self):
+        """ Empty the pipe and process all the events available.
+        One wake-up byte may correspond to several events. """
+        try:
+            os.read(self._fileno, WAKEUP_SIZE)
+        except OSError as why:
+            if why.errno != errno.EAGAIN:
+                raise
+        if not self.processing:
+            self.flush()
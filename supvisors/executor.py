@@ -0,0 +1,237 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+from collections import deque
+from itertools import count
+from Queue import PriorityQueue
+from sys import stderr
+from threading import Lock, Thread
+from time import time
+
+from supvisors.ttypes import RequestPriorities
+from supvisors.utils import DeferredRequestHeaders
+
+
+# priority of the deferred requests, per request type
+REQUEST_PRIORITIES = {
+    DeferredRequestHeaders.SHUTDOWN: RequestPriorities.SUPERVISOR,
+    DeferredRequestHeaders.RESTART: RequestPriorities.SUPERVISOR,
+    DeferredRequestHeaders.STOP_PROCESS: RequestPriorities.STOP,
+    DeferredRequestHeaders.STOP_PROCESSES: RequestPriorities.STOP,
+    DeferredRequestHeaders.START_PROCESS: RequestPriorities.START,
+    DeferredRequestHeaders.START_PROCESSES: RequestPriorities.START,
+    DeferredRequestHeaders.CHECK_ADDRESS: RequestPriorities.CHECK,
+    DeferredRequestHeaders.RESYNC_PROCESSES: RequestPriorities.CHECK,
+    DeferredRequestHeaders.SAVE_CONTEXT: RequestPriorities.CHECK}
+
+
+class RequestExecutor(object):
+    """ Bounded pool of threads used to perform the deferred XML-RPC requests.
+
+    The requests related to the same address are performed in sequence,
+    whereas the requests related to different addresses are performed
+    in parallel.
+    So an unresponsive address cannot delay the requests to the other
+    addresses.
+
+    The requests related to the same address are performed in the order
+    of submission, so that a START followed by a STOP of the same process
+    are not inverted. The priority of the requests is used to choose the next
+    address to be served: the addresses having the most urgent pending request
+    are served first.
+    The number of requests waiting is bounded by the depth. When the queue
+    is full, the most recent request of lower priority is dropped to make
+    room for the new request. If there is none, the new request is dropped.
+    The dropped requests are given to the drop handler, if any.
+
+    As the Supervisor logger is not thread-safe, it is NOT used here.
+
+    Attributes are:
+
+        - handler: the function called for each request, with the header
+        and the body of the request as parameters,
+        - depth: the maximum number of requests waiting,
+        - drop_handler: the function called for each request dropped because
+        the queue is full, with the header and the body of the request
+        as parameters,
+        - pending: the requests waiting to be performed, per address name
+        and in the order of submission,
+        - queued: the number of requests waiting,
+        - busy: the addresses having a request in progress,
+        - stats: the usage counters, per priority,
+        - lock: the lock protecting the pending requests and the counters,
+        - ready: the priority queue of the addresses having pending requests,
+        - order: the sequence used to keep the submission order in the queue,
+        - workers: the worker threads.
+    """
+
+    def __init__(self, handler, nb_workers, depth, drop_handler=None):
+        """ Initialization of the attributes and start of the threads. """
+        self.handler = handler
+        self.depth = depth
+        self.drop_handler = drop_handler
+        self.pending = {}
+        self.queued = 0
+        self.busy = set()
+        self.stats = {priority: {'enqueued': 0, 'dropped': 0, 'performed': 0,
+                                 'latency_total': 0.0, 'latency_max': 0.0}
+                      for priority in RequestPriorities._values()}
+        self.lock = Lock()
+        self.ready = PriorityQueue()
+        self.order = count()
+        self.workers = [Thread(target=self.work) for _ in range(nb_workers)]
+        for worker in self.workers:
+            worker.daemon = True
+            worker.start()
+
+    def stop(self):
+        """ Discard the pending requests and stop the threads.
+        The requests in progress are completed. """
+        with self.lock:
+            self.pending.clear()
+            self.queued = 0
+        for _ in self.workers:
+            # the sentinel has the highest priority
+            self.ready.put((-1, next(self.order), None))
+        for worker in self.workers:
+            worker.join()
+
+    def submit(self, address_name, header, body):
+        """ Store the request and schedule its address.
+        Return False if the request has been dropped.
+        The drop handler is called outside the lock. """
+        priority = REQUEST_PRIORITIES[header]
+        dropped, accepted = None, True
+        with self.lock:
+            if self.queued >= self.depth:
+                dropped = self._evict(priority)
+                if dropped is None:
+                    self.stats[priority]['dropped'] += 1
+                    print >> stderr, '[WARN] request {} on {} dropped:' \
+                        ' queue full'.format(header, address_name)
+                    dropped, accepted = (header, body), False
+            if accepted:
+                requests = self.pending.setdefault(address_name, deque())
+                requests.append((header, body, priority, time()))
+                self.queued += 1
+                self.stats[priority]['enqueued'] += 1
+                if address_name not in self.busy:
+                    self.ready.put((priority, next(self.order), address_name))
+        if dropped and self.drop_handler:
+            self.drop_handler(*dropped)
+        return accepted
+
+    def pending_requests(self):
+        """ Return the number of requests waiting or in progress. """
+        with self.lock:
+            return self.queued + len(self.busy)
+
+    def statistics(self):
+        """ Return the state of the queue, including the usage counters
+        and the mean latency per priority.
+        The latency is the time spent by a request in the queue. """
+        with self.lock:
+            priorities = []
+            for priority in sorted(self.stats.keys()):
+                stats = self.stats[priority].copy()
+                latency_total = stats.pop('latency_total')
+                stats['latency_mean'] = (latency_total / stats['performed']
+                                         if stats['performed'] else 0.0)
+                stats['priority'] = RequestPriorities._to_string(priority)
+                stats['queued'] = sum(1 for requests in self.pending.values()
+                                      for request in requests
+                                      if request[2] == priority)
+                priorities.append(stats)
+            return {'depth': self.depth, 'queued': self.queued,
+                    'in_progress': len(self.busy), 'priorities': priorities}
+
+    def work(self):
+        """ Contents of the worker threads.
+        One request is performed at a time for an address. The address is
+        re-scheduled afterwards with the priority of its most urgent
+        pending request. """
+        while True:
+            _, _, address_name = self.ready.get()
+            if address_name is None:
+                break
+            with self.lock:
+                if address_name in self.busy:
+                    # already in progress: re-scheduled at completion
+                    continue
+                request = self._pop(address_name)
+                if request is None:
+                    # already performed or discarded on stop
+                    continue
+                header, body, priority, latency = request
+                self.busy.add(address_name)
+                stats = self.stats[priority]
+                stats['performed'] += 1
+                stats['latency_total'] += latency
+                stats['latency_max'] = max(stats['latency_max'], latency)
+            try:
+                self.handler(header, body)
+            except:
+                print >> stderr, '[ERROR] failed to perform request {}' \
+                    ' on {}'.format(header, address_name)
+            with self.lock:
+                self.busy.discard(address_name)
+                requests = self.pending.get(address_name)
+                if requests is not None:
+                    priority = min(request[2] for request in requests)
+                    self.ready.put((priority, next(self.order), address_name))
+
+    def _pop(self, address_name):
+        """ Remove and return the oldest request of the address,
+        with its priority and its latency.
+        The lock must be held by the caller. """
+        requests = self.pending.get(address_name)
+        if requests is None:
+            return None
+        header, body, priority, submit_time = requests.popleft()
+        self.queued -= 1
+        if not requests:
+            del self.pending[address_name]
+        return header, body, priority, time() - submit_time
+
+    def _evict(self, priority):
+        """ Drop the most recent request having a priority lower than
+        the priority given.
+        Return the header and the body of the request dropped,
+        or None if there is no such request.
+        The lock must be held by the caller. """
+        for lower in sorted(RequestPriorities._values(), reverse=True):
+            if lower <= priority:
+                break
+            candidates = [(request[3], address_name, request)
+                          for address_name, requests in self.pending.items()
+                          for request in requests if request[2] == lower]
+            if candidates:
+                _, address_name, request = max(candidates,
+                                               key=lambda entry: entry[0])
+                requests = self.pending[address_name]
+                requests.remove(request)
+                header, body = request[:2]
+                self.queued -= 1
+                if not requests:
+                    del self.pending[address_name]
+                self.stats[lower]['dropped'] += 1
+                print >> stderr, '[WARN] request {} on {} dropped:' \
+                    ' queue full'.format(header, address_name)
+                return header, body
+        return None
@@ -83,6 +83,10 @@ class SupervisordSource(object):
         self.supervisord.options.close_httpservers()
         self.supervisord.options.httpservers = ()
 
+    def get_socket_map(self):
+        """ Return the socket map polled by the supervisord loop. """
+        return self.supervisord.options.get_socket_map()
+
     def get_group_config(self, application_name):
         """ This method returns the group configuration related to an application. """
         # WARN: the following line may throw a KeyError exception
@@ -26,6 +26,7 @@ from supvisors.context import Context
 from supvisors.infosource import SupervisordSource
 from supvisors.listener import SupervisorListener
 from supvisors.options import SupvisorsServerOptions
+from supvisors.snapshot import ContextSnapshot
 from supvisors.sparser import Parser
 from supvisors.statemachine import FiniteStateMachine
 from supvisors.statscompiler import StatisticsCompiler
@@ -76,5 +77,10 @@ class Supvisors(object):
         except:
             self.logger.warn('cannot parse rules file: {}'.format(self.options.rules_file))
             self.parser = None
+        # restore the context saved before the last restart
+        # the process rules cannot be applied without parser
+        self.snapshot = ContextSnapshot(self)
+        if self.parser:
+            self.snapshot.restore()
         # create event subscriber
         self.listener = SupervisorListener(self)
@@ -17,13 +17,12 @@
 # limitations under the License.
 # ======================================================================
 
-import json
 import time
 
 from supervisor import events
-from supervisor.datatypes import boolean
 from supervisor.options import split_namespec
 
+from supvisors.eventqueue import EventQueue
 from supvisors.mainloop import SupvisorsMainLoop
 from supvisors.ttypes import ProcessStates
 from supvisors.utils import (supvisors_short_cuts,
@@ -35,14 +34,21 @@ from supvisors.supvisorszmq import SupervisorZmq
 class SupervisorListener(object):
     """ This class subscribes directly to the internal Supervisor events.
     These events are published to all Supvisors instances.
+    They are also applied directly to the local context, so that they are
+    not received back through the internal publisher.
 
     Attributes are:
 
         - supvisors: a reference to the Supvisors context,
         - address: the address name where this process is running,
         - main_loop: the Supvisors' event thread,
+        - event_queue: the queue used by the Supvisors' event thread to hand
+        over events to the Supervisor thread, also used to sequence the local
+        events with the remote events,
         - publisher: the ZeroMQ socket used to publish Supervisor events
-        to all Supvisors threads.
+        to all Supvisors threads,
+        - jobs: the jobs of the commanders last published, when the local
+        Supvisors instance is master.
     """
 
     def __init__(self, supvisors):
@@ -63,12 +69,13 @@ class SupervisorListener(object):
         self.address = self.supvisors.address_mapper.local_address
         self.publisher = None
         self.main_loop = None
+        self.event_queue = None
+        self.jobs = None
         # subscribe to internal events
         events.subscribe(events.SupervisorRunningEvent, self.on_running)
         events.subscribe(events.SupervisorStoppingEvent, self.on_stopping)
         events.subscribe(events.ProcessStateEvent, self.on_process)
         events.subscribe(events.Tick5Event, self.on_tick)
-        events.subscribe(events.RemoteCommunicationEvent, self.on_remote_event)
 
     def on_running(self, event):
         """ Called when Supervisor is RUNNING.
@@ -80,9 +87,13 @@ class SupervisorListener(object):
         self.supvisors.zmq = SupervisorZmq(self.supvisors)
         # keep a reference to the internal events publisher
         self.publisher = self.supvisors.zmq.internal_publisher
+        # create the queue used by the main loop to push events
+        # into the Supervisor thread
+        self.event_queue = EventQueue(self.on_remote_event, self.logger,
+                                      self.info_source.get_socket_map())
         # start the main loop
         # env is needed to create XML-RPC proxy
-        self.main_loop = SupvisorsMainLoop(self.supvisors)
+        self.main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         self.main_loop.start()
 
 
@@ -97,8 +108,12 @@ class SupervisorListener(object):
         self.logger.info('request to stop main loop')
         self.main_loop.stop()
         self.logger.info('end of main loop')
+        # close the event queue once the main loop cannot push anymore
+        self.event_queue.close()
         # close zmq sockets
         self.supvisors.zmq.close()
+        # save the last context
+        self.supvisors.snapshot.save()
         # unsubscribe from events
         events.clear()
         # finally, close logger
@@ -107,7 +122,8 @@ class SupervisorListener(object):
 
     def on_process(self, event):
         """ Called when a ProcessEvent is sent by the local Supervisor.
-        The event is published to all Supvisors instances. """
+        The event is published to all Supvisors instances
+        and applied to the local context. """
         event_name = events.getEventNameByType(event.__class__)
         self.logger.debug('got Process event from supervisord: {} {}'.format(
             event_name, event))
@@ -120,68 +136,139 @@ class SupervisorListener(object):
             'expected': event.expected}
         self.logger.debug('payload={}'.format(payload))
         self.publisher.send_process_event(payload)
+        self.on_local_event(InternalEventHeaders.PROCESS, payload)
 
     def on_tick(self, event):
         """ Called when a TickEvent is notified.
-        The event is published to all Supvisors instances.
+        The event is published to all Supvisors instances
+        and applied to the local context.
         Then statistics are published and periodic task is triggered. """
         self.logger.debug('got Tick event from supervisord: {}'.format(event))
         payload = {'when': event.when}
         self.publisher.send_tick_event(payload)
+        self.on_local_event(InternalEventHeaders.TICK, payload)
         # get and publish statistics at tick time (optional)
         if self.collector:
             status = self.supvisors.context.addresses[self.address]
-            self.publisher.send_statistics(
-                self.collector(status.pid_processes()))
+            statistics = self.collector(status.pid_processes())
+            self.publisher.send_statistics(statistics)
+            self.on_local_event(InternalEventHeaders.STATISTICS, statistics)
         # periodic task
+        # the jobs are published at least once per tick, in the event
+        # that a Supvisors instance has missed them
+        self.jobs = None
+        self.periodic_check()
+        # save the context periodically
+        self.supvisors.snapshot.on_tick(event.when)
+
+    def periodic_check(self):
+        """ Periodic task used to check the Supvisors instances.
+        It is triggered by the ticks, and by the local heartbeats when a
+        Supvisors instance has been invalidated by its failure detector. """
         addresses = self.fsm.on_timer_event()
         # pushes isolated addresses to main loop
         self.supvisors.zmq.pusher.send_isolate_addresses(addresses)
+        # replicate the jobs of the master
+        self.publish_jobs()
+
+    def publish_jobs(self):
+        """ Publish the jobs of the commanders when the local Supvisors
+        instance is master and when they have changed, so that a successor is
+        able to resume them if the local Supvisors instance is lost. """
+        if self.supvisors.context.master:
+            jobs = self.fsm.serial_jobs()
+            if jobs != self.jobs:
+                self.jobs = jobs
+                self.publisher.send_jobs(jobs)
+        else:
+            self.jobs = None
+
+    def on_local_event(self, event_type, payload):
+        """ Apply an event of the local Supervisor to the local context,
+        without going through the internal publisher.
+        The event queue processes it after the remote events already handed
+        over by the Supvisors thread, so that the order of the events is
+        kept. """
+        self.event_queue.process(RemoteCommEvents.SUPVISORS_EVENT,
+                                 [(event_type, self.address, payload)])
 
-    def on_remote_event(self, event):
-        """ Called when a RemoteCommunicationEvent is notified.
+    def on_remote_event(self, event_type, event_data):
+        """ Called when an event is unstacked from the event queue.
         This is used to sequence the events received from the Supvisors thread
         with the other events handled by the local Supervisor. """
-        self.logger.debug('got Remote event from supervisord: {}'.format(event))
-        if event.type == RemoteCommEvents.SUPVISORS_AUTH:
-            self.authorization(event.data)
-        elif event.type == RemoteCommEvents.SUPVISORS_EVENT:
-            self.unstack_event(event.data)
-        elif event.type == RemoteCommEvents.SUPVISORS_INFO:
-            self.unstack_info(event.data)
-
-    def unstack_event(self, message):
-        """ Unstack and process one event from the event queue. """
-        event_type, event_address, event_data = json.loads(message)
-        if event_type == InternalEventHeaders.TICK:
-            self.logger.trace('got tick event from {}: {}'.format(
-                event_address, event_data))
-            self.fsm.on_tick_event(event_address, event_data)
-        elif event_type == InternalEventHeaders.PROCESS:
-            self.logger.trace('got process event from {}: {}'.format(
-                event_address, event_data))
-            self.fsm.on_process_event(event_address, event_data)
-        elif event_type == InternalEventHeaders.STATISTICS:
-            # this Supvisors could handle statistics
-            # even if psutil is not installed
-            self.logger.trace('got statistics event from {}: {}'.format(
-                event_address, event_data))
-            self.statistician.push_statistics(event_address, event_data)
+        self.logger.debug('got Remote event from Supvisors thread: {}'.format(
+            event_type))
+        if event_type == RemoteCommEvents.SUPVISORS_AUTH:
+            self.authorization(event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_EVENT:
+            self.unstack_events(event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_INFO:
+            self.unstack_info(event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_FAULT:
+            self.unstack_faults(event_data)
+
+    def unstack_events(self, messages):
+        """ Unstack and process a batch of events from the event queue.
+        Consecutive process events are given at once to the state machine,
+        so that the application statuses are evaluated only once for them.
+        The order of the events is preserved. """
+        process_events = []
+        for event_type, event_address, event_data in messages:
+            if event_type == InternalEventHeaders.PROCESS:
+                self.logger.trace('got process event from {}: {}'.format(
+                    event_address, event_data))
+                process_events.append((event_address, event_data))
+                continue
+            # flush the pending process events before any other event
+            if process_events:
+                self.fsm.on_process_events(process_events)
+                process_events = []
+            if event_type == InternalEventHeaders.TICK:
+                self.logger.trace('got tick event from {}: {}'.format(
+                    event_address, event_data))
+                self.fsm.on_tick_event(event_address, event_data)
+            elif event_type == InternalEventHeaders.STATISTICS:
+                # this Supvisors could handle statistics
+                # even if psutil is not installed
+                self.logger.trace('got statistics event from {}: {}'.format(
+                    event_address, event_data))
+                self.statistician.push_statistics(event_address, event_data)
+            elif event_type == InternalEventHeaders.HEARTBEAT:
+                # the local heartbeat is the timer of the failure detectors
+                # the periodic task is anticipated only when an address
+                # has been invalidated
+                if event_address == self.address:
+                    if self.fsm.on_local_heartbeat(
+                            event_data.get('relay_time')):
+                        self.periodic_check()
+                else:
+                    self.fsm.on_heartbeat_event(event_address)
+            elif event_type == InternalEventHeaders.JOBS:
+                self.logger.trace('got jobs event from {}: {}'.format(
+                    event_address, event_data))
+                self.fsm.on_jobs_event(event_address, event_data)
+        if process_events:
+            self.fsm.on_process_events(process_events)
 
     def unstack_info(self, message):
         """ Unstack the process info received. """
         # unstack the queue for process info
-        address_name, info = json.loads(message)
+        address_name, info = message
         self.logger.trace('got process info event from {}'.format(
             address_name))
         self.fsm.on_process_info(address_name, info)
 
+    def unstack_faults(self, message):
+        """ Unstack the processes whose request has been rejected. """
+        header, faults = message
+        self.logger.trace('got request faults: {}'.format(faults))
+        self.fsm.on_request_faults(header, faults)
+
     def authorization(self, data):
         """ Extract authorization and address from data and process event. """
         self.logger.trace('got authorization event: {}'.format(data))
-        # split the line received
-        address_name, authorized = tuple(x.split(':')[1] for x in data.split())
-        self.fsm.on_authorization(address_name, boolean(authorized))
+        address_name, authorized = data
+        self.fsm.on_authorization(address_name, authorized)
 
     def force_process_fatal(self, namespec):
         """ Publishes a fake process event showing a FATAL state for
@@ -197,11 +284,12 @@ class SupervisorListener(object):
         """ Publishes a fake process event showing a state for the process. """
         application_name, process_name = split_namespec(namespec)
         # create payload from event
-        payload = {'processname': process_name,
-            'groupname': application_name,
+        payload = {'name': process_name,
+            'group': application_name,
             'state': state,
             'now': int(time.time()),
             'pid': 0,
             'expected': False}
         self.logger.debug('payload={}'.format(payload))
         self.publisher.send_process_event(payload)
+        self.on_local_event(InternalEventHeaders.PROCESS, payload)
@@ -17,17 +17,23 @@
 # limitations under the License.
 # ======================================================================
 
-import json
+import xmlrpclib
 import zmq
 
-from threading import Event, Thread
+from threading import Event, Lock, Thread
 from sys import stderr
+from time import time
 
-from supvisors.rpcrequests import getRPCInterface
+from supervisor.xmlrpc import Faults
+
+from supvisors.codec import UnsupportedMessage
+from supvisors.executor import RequestExecutor
+from supvisors.rpcrequests import RPCProxyPool
 from supvisors.supvisorszmq import SupvisorsZmq
 from supvisors.ttypes import AddressStates
-from supvisors.utils import (supvisors_short_cuts, extract_process_info,
-    DeferredRequestHeaders, RemoteCommEvents)
+from supvisors.utils import (supvisors_short_cuts, expand_process_info,
+    extract_process_info, DeferredRequestHeaders, InternalEventHeaders,
+    RemoteCommEvents)
 from zmq.error import ZMQError
 
 
@@ -37,10 +43,32 @@ class SupvisorsMainLoop(Thread):
 
     Attributes:
         - supvisors: a reference to the Supvisors context,
+        - event_queue: the queue used to hand over events to the Supervisor
+        thread,
+        - batch_size: the maximum number of events handed over at once,
+        - proxies: the pool of XML-RPC proxies to the Supervisor instances,
+        - timeouts: the timeouts of the XML-RPC requests, per request type,
+        - executor: the pool of threads performing the XML-RPC requests,
+        - sequences: the epoch and the sequence number of the last event
+        received, per address,
+        - process_sequences: the sequence number of the last event received,
+        per address and per process,
+        - sequence_lock: the lock ensuring that the events and the
+        resynchronized events are handed over in the sequence order,
+        also protecting the generations,
+        - generations: the epoch and the generation of the last process
+        information received, per address,
+        - conflation_period: the period in seconds at which the conflated
+        statuses are published, 0 if the statuses are not conflated,
+        - flush_time: the date of the last publication of the conflated
+        statuses,
+        - heartbeat_period: the period in seconds at which the heartbeats
+        are published,
+        - heartbeat_time: the date of the last heartbeat published,
         - loop: the infinite loop flag.
     """
 
-    def __init__(self, supvisors):
+    def __init__(self, supvisors, event_queue):
         """ Initialization of the attributes. """
         # thread attributes
         Thread.__init__(self)
@@ -49,8 +77,28 @@ class SupvisorsMainLoop(Thread):
         # keep a reference to the Supvisors instance and to the environment
         self.supvisors = supvisors
         self.env = supvisors.info_source.get_env()
-        # create a XML-RPC client to the local Supervisor instance
-        self.proxy = getRPCInterface('localhost', self.env)
+        # keep a reference to the queue shared with the Supervisor thread
+        self.event_queue = event_queue
+        self.batch_size = supvisors.options.event_batch_size
+        # the XML-RPC proxies are kept alive between requests
+        self.proxies = RPCProxyPool(self.env)
+        self.timeouts = supvisors.options.request_timeouts
+        # the executor threads are created when the main loop is started
+        self.executor = None
+        # the sequence numbers are used to detect the events lost
+        self.sequences = {}
+        self.process_sequences = {}
+        self.sequence_lock = Lock()
+        # only the processes changed are requested when checking an address
+        self.generations = {}
+        # the statuses conflated by the event publisher are flushed from here
+        self.conflation_period = \
+            supvisors.options.event_conflation_period / 1000.0
+        self.flush_time = 0
+        # the heartbeats are published from here so that they are not delayed
+        # by the Supervisor thread
+        self.heartbeat_period = supvisors.options.heartbeat_period / 1000.0
+        self.heartbeat_time = 0
 
     def stopping(self):
         """ Access to the loop attribute (used to drive tests on run method). """
@@ -69,108 +117,346 @@ class SupvisorsMainLoop(Thread):
         """ Contents of the infinite loop. """
         # Create zmq sockets
         sockets = SupvisorsZmq(self.supvisors)
+        # create the threads performing the XML-RPC requests
+        options = self.supvisors.options
+        self.executor = RequestExecutor(self.send_request,
+                                        options.request_workers,
+                                        options.request_queue_depth,
+                                        self.drop_request)
         # create poller
         poller = zmq.Poller()
         # register sockets
         poller.register(sockets.internal_subscriber.socket, zmq.POLLIN)
         poller.register(sockets.puller.socket, zmq.POLLIN)
+        poller.register(sockets.snapshot_server.socket, zmq.POLLIN)
+        if sockets.relay:
+            poller.register(sockets.relay.frontend, zmq.POLLIN)
+            poller.register(sockets.relay.backend, zmq.POLLIN)
         # poll events forever
+        # the heartbeats are published and the conflated statuses are flushed
+        # at their own period
+        poll_timeout = min(500, int(self.heartbeat_period * 1000))
+        if self.conflation_period:
+            poll_timeout = min(poll_timeout,
+                               int(self.conflation_period * 1000))
         while not self.stopping():
-            socks = dict(poller.poll(500))
+            socks = dict(poller.poll(poll_timeout))
             # test stop condition again: if Supervisor is stopping,
             # any XML-RPC call would block this thread, and the other
             # because of the join
             if not self.stopping():
                 self.check_requests(sockets, socks)
                 self.check_events(sockets.internal_subscriber, socks)
+                self.check_snapshot(sockets.snapshot_server, socks)
+                self.check_relay(sockets, socks)
+                self.check_heartbeat(sockets.internal_publisher,
+                                     sockets.internal_subscriber)
+                if self.conflation_period:
+                    self.check_conflation(sockets.publisher)
         # close resources gracefully
+        if sockets.relay:
+            poller.unregister(sockets.relay.backend)
+            poller.unregister(sockets.relay.frontend)
+        poller.unregister(sockets.snapshot_server.socket)
         poller.unregister(sockets.puller.socket)
         poller.unregister(sockets.internal_subscriber.socket)
         sockets.close()
+        self.executor.stop()
+        self.proxies.close()
 
     def check_events(self, subscriber, socks):
-        """ Forward external Supervisor events to main thread. """
+        """ Forward external Supervisor events to main thread.
+        All the events available are drained, up to the batch size,
+        and handed over in one single push. """
         if subscriber.socket in socks and \
             socks[subscriber.socket] == zmq.POLLIN:
+            messages = []
+            with self.sequence_lock:
+                while len(messages) < self.batch_size:
+                    try:
+                        event_type, address_name, epoch, sequence, payload = \
+                            subscriber.receive()
+                    except zmq.Again:
+                        # no more event available
+                        break
+                    except UnsupportedMessage as exc:
+                        # message of a more recent Supvisors instance
+                        # skip it and keep draining the socket
+                        print >> stderr, '[WARN] message skipped: {}'.format(exc)
+                        continue
+                    except:
+                        print >> stderr, '[ERROR] failed to get data from subscriber'
+                        break
+                    # legacy events have no sequence number
+                    # and heartbeats do not consume any
+                    if sequence is not None and \
+                        event_type != InternalEventHeaders.HEARTBEAT:
+                        self.check_sequence(address_name, epoch, sequence)
+                        if event_type == InternalEventHeaders.PROCESS:
+                            process_sequences = self.process_sequences \
+                                .setdefault(address_name, {})
+                            process_sequences[(payload['group'],
+                                               payload['name'])] = sequence
+                    messages.append((event_type, address_name, payload))
+                if messages:
+                    # The events received are not processed directly in this
+                    # thread because it would conflict with the processing in
+                    # the Supervisor thread, as they use the same data.
+                    # That's why the event queue is used to push the events
+                    # in the Supervisor thread.
+                    self.event_queue.push(RemoteCommEvents.SUPVISORS_EVENT,
+                                          messages)
+
+    def check_relay(self, zmq_sockets, socks):
+        """ Forward the internal events if this address is a relay
+        and replace the relay used by the subscriber if it is silent. """
+        if zmq_sockets.relay:
+            try:
+                zmq_sockets.relay.forward(socks)
+            except:
+                print >> stderr, '[ERROR] failed to forward internal events'
+        if zmq_sockets.internal_subscriber.check_relay():
+            print >> stderr, '[WARN] no event received from relay: switch' \
+                ' to relay {}'.format(zmq_sockets.internal_subscriber.relay)
+
+    def check_snapshot(self, snapshot_server, socks):
+        """ Reply to the snapshot request of an event client.
+        The snapshot is served from this thread so that a client cannot
+        delay the Supervisor thread. """
+        if snapshot_server.socket in socks and \
+            socks[snapshot_server.socket] == zmq.POLLIN:
+            try:
+                snapshot_server.reply()
+            except:
+                print >> stderr, '[ERROR] failed to reply to snapshot request'
+
+    def check_heartbeat(self, internal_publisher, internal_subscriber):
+        """ Publish a heartbeat if the heartbeat period is reached.
+        The heartbeat is also handed over to the Supervisor thread,
+        where it triggers the check of the failure detectors.
+        When the events are received through a relay, it comes with the date
+        of the last event received, so that the failure detectors are
+        suspended while the relay is silent. """
+        now = time()
+        if now - self.heartbeat_time >= self.heartbeat_period:
+            self.heartbeat_time = now
+            try:
+                internal_publisher.send_heartbeat()
+            except:
+                print >> stderr, '[ERROR] failed to publish heartbeat'
+            payload = {}
+            if internal_subscriber.relay:
+                payload['relay_time'] = internal_subscriber.event_time
+            self.event_queue.push(RemoteCommEvents.SUPVISORS_EVENT,
+                                  [(InternalEventHeaders.HEARTBEAT,
+                                    internal_publisher.address, payload)])
+
+    def check_conflation(self, publisher):
+        """ Publish the statuses conflated by the event publisher
+        if the conflation period is reached. """
+        now = time()
+        if now - self.flush_time >= self.conflation_period:
+            self.flush_time = now
             try:
-                message = subscriber.receive()
+                publisher.flush()
             except:
-                print >> stderr, '[ERROR] failed to get data from subscriber'
-            else:
-                # The events received are not processed directly in this thread
-                # because it would conflict with the processing in the
-                # Supervisor thread, as they use the same data.
-                # That's why a RemoteCommunicationEvent is used to push the
-                # event in the Supervisor thread.
-                self.send_remote_comm_event(
-                    RemoteCommEvents.SUPVISORS_EVENT,
-                    json.dumps(message))
+                print >> stderr, '[ERROR] failed to publish conflated statuses'
+
+    def check_sequence(self, address_name, epoch, sequence):
+        """ Request a resynchronization of the processes if events have been
+        lost since the last event received from the address.
+        The epoch is None if the remote Supvisors instance does not provide it.
+        The sequence lock must be held by the caller. """
+        last_epoch, last_sequence = self.sequences.get(address_name,
+                                                       (None, None))
+        self.sequences[address_name] = epoch, sequence
+        if last_sequence is not None:
+            if epoch != last_epoch and None not in (epoch, last_epoch):
+                # the remote Supvisors instance has been restarted
+                # the first events of its new run may have been lost
+                print >> stderr, '[WARN] {} restarted'.format(address_name)
+                self.process_sequences.pop(address_name, None)
+                self.executor.submit(address_name,
+                                     DeferredRequestHeaders.RESYNC_PROCESSES,
+                                     (address_name, 0))
+            elif sequence <= last_sequence:
+                # the remote Supvisors instance has been restarted
+                # (detected only if its new sequence numbers are lower)
+                self.process_sequences.pop(address_name, None)
+            elif sequence > last_sequence + 1:
+                print >> stderr, '[WARN] {} events lost from {}'.format(
+                    sequence - last_sequence - 1, address_name)
+                self.executor.submit(address_name,
+                                     DeferredRequestHeaders.RESYNC_PROCESSES,
+                                     (address_name, last_sequence))
 
     def check_requests(self, zmq_sockets, socks):
-        """ Defer internal requests. """
+        """ Defer internal requests.
+        All the requests available are drained, so that they are performed
+        according to their priority and not to their order of arrival. """
         if zmq_sockets.puller.socket in socks and \
             socks[zmq_sockets.puller.socket] == zmq.POLLIN:
-            try:
-                header, body = zmq_sockets.puller.receive()
-            except:
-                print >> stderr, '[ERROR] failed to get data from puller'
-            else:
+            while True:
+                try:
+                    header, body = zmq_sockets.puller.receive(zmq.NOBLOCK)
+                except zmq.Again:
+                    # no more request available
+                    break
+                except:
+                    print >> stderr, '[ERROR] failed to get data from puller'
+                    break
                 if header == DeferredRequestHeaders.ISOLATE_ADDRESSES:
                     # isolation request: disconnect the address from subscriber
+                    # and drop the corresponding XML-RPC proxies
                     zmq_sockets.internal_subscriber.disconnect(body)
+                    self.proxies.invalidate(body)
+                    with self.sequence_lock:
+                        for address_name in body:
+                            self.sequences.pop(address_name, None)
+                            self.process_sequences.pop(address_name, None)
+                            self.generations.pop(address_name, None)
                 else:
-                    # XML-RPC request
-                    self.send_request(header, body)
+                    # XML-RPC request: the first element of the body is
+                    # always the address name
+                    # (the file name for the writing of the context file)
+                    self.executor.submit(body[0], header, body)
+
+    def request_statistics(self):
+        """ Return the state of the queue of deferred requests.
+        This is called from the Supervisor thread. """
+        executor = self.executor
+        if executor is None:
+            return {}
+        return executor.statistics()
+
+    def proxy_statistics(self):
+        """ Return the usage counters of the XML-RPC proxies per address.
+        This is called from the Supervisor thread. """
+        return self.proxies.statistics()
 
     def send_request(self, header, body):
-        """ Perform the XML-RPC according to the header. """
+        """ Perform the XML-RPC according to the header.
+        This is called from the executor threads. """
         if header == DeferredRequestHeaders.CHECK_ADDRESS:
-            address_name, = body
-            self.check_address(address_name)
+            address_name, namespecs = body
+            self.check_address(address_name, namespecs)
         elif header == DeferredRequestHeaders.START_PROCESS:
             address_name, namespec, extra_args = body
             self.start_process(address_name, namespec, extra_args)
         elif header == DeferredRequestHeaders.STOP_PROCESS:
             address_name, namespec = body
             self.stop_process(address_name, namespec)
+        elif header == DeferredRequestHeaders.START_PROCESSES:
+            address_name, processes = body
+            self.start_processes(address_name, processes)
+        elif header == DeferredRequestHeaders.STOP_PROCESSES:
+            address_name, namespecs = body
+            self.stop_processes(address_name, namespecs)
+        elif header == DeferredRequestHeaders.RESYNC_PROCESSES:
+            address_name, sequence = body
+            self.resync_processes(address_name, sequence)
         elif header == DeferredRequestHeaders.RESTART:
             address_name, = body
             self.restart(address_name)
         elif header == DeferredRequestHeaders.SHUTDOWN:
             address_name, = body
             self.shutdown(address_name)
+        elif header == DeferredRequestHeaders.SAVE_CONTEXT:
+            _, data = body
+            self.save_context(data)
 
-    def check_address(self, address_name):
-        """ Check isolation and get all process info asynchronously. """
+    def check_address(self, address_name, namespecs=()):
+        """ Check isolation and get process info asynchronously. """
         try:
-            remote_proxy = getRPCInterface(address_name, self.env)
             # check authorization
-            status = remote_proxy.supvisors.get_address_info(address_name)
+            timeout = self.timeouts[DeferredRequestHeaders.CHECK_ADDRESS]
+            status = self.proxies.call(address_name,
+                                       'supvisors.get_address_info',
+                                       address_name, timeout=timeout)
             authorized = status['statecode'] not in [AddressStates.ISOLATING,
                                                      AddressStates.ISOLATED]
             # get process info if authorized
             if authorized:
-                # get information about all processes handled by Supervisor
-                all_info = remote_proxy.supervisor.getAllProcessInfo()
-                # create a payload from Supervisor process info
-                payload = [extract_process_info(info) for info in all_info]
+                payload = self.get_process_info(address_name, namespecs,
+                                                timeout)
                 # post the payload internally
-                self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_INFO,
-                                            json.dumps((address_name, payload)))
+                self.event_queue.push(RemoteCommEvents.SUPVISORS_INFO,
+                                      (address_name, payload))
             # inform local Supvisors that authorization is available
-            self.send_remote_comm_event(
-                RemoteCommEvents.SUPVISORS_AUTH,
-                'address_name:{} authorized:{}'.format(
-                    address_name, authorized))
+            self.event_queue.push(RemoteCommEvents.SUPVISORS_AUTH,
+                                  (address_name, authorized))
         except:
             print >> stderr, '[ERROR] failed to check address {}'.format(
                 address_name)
 
+    def get_process_info(self, address_name, namespecs, timeout):
+        """ Return the information about the processes handled by the
+        Supervisor of the address.
+        Only the processes changed since the last call and the processes
+        in namespecs are requested, unless the remote Supvisors instance has
+        been restarted in the meantime.
+        This is called from the threads of the executor, so the generations
+        are protected by the sequence lock. """
+        with self.sequence_lock:
+            epoch, generation = self.generations.get(address_name, (None, 0))
+        try:
+            result = self.proxies.call(address_name,
+                                       'supvisors.get_compact_process_info',
+                                       generation, namespecs, timeout=timeout)
+            if generation and result['epoch'] != epoch:
+                # the generation is meaningless for the new instance
+                result = self.proxies.call(address_name,
+                                           'supvisors.get_compact_process_info',
+                                           0, [], timeout=timeout)
+        except xmlrpclib.Fault:
+            # the remote Supvisors does not provide the compact form
+            all_info = self.proxies.call(address_name,
+                                         'supervisor.getAllProcessInfo',
+                                         timeout=timeout)
+            return [extract_process_info(info) for info in all_info]
+        with self.sequence_lock:
+            self.generations[address_name] = (result['epoch'],
+                                              result['generation'])
+        return [expand_process_info(values)
+                for values in result['processes']]
+
+    def resync_processes(self, address_name, sequence):
+        """ Get the process events published by the address after the
+        sequence number and hand them over as if they had been received.
+        The events already superseded by a more recent event received
+        in the meantime are discarded. """
+        try:
+            events = self.proxies.call(address_name,
+                'supvisors.get_process_events', sequence,
+                timeout=self.timeouts[DeferredRequestHeaders.CHECK_ADDRESS])
+        except:
+            print >> stderr, '[ERROR] failed to resync processes of {}'.format(
+                address_name)
+            return
+        with self.sequence_lock:
+            if address_name not in self.sequences:
+                # the address has been isolated in the meantime
+                return
+            process_sequences = self.process_sequences.setdefault(
+                address_name, {})
+            messages = []
+            for event in sorted(events, key=lambda x: x['sequence']):
+                event_sequence = event.pop('sequence')
+                key = event['group'], event['name']
+                if event_sequence > process_sequences.get(key, 0):
+                    process_sequences[key] = event_sequence
+                    messages.append((InternalEventHeaders.PROCESS,
+                                     address_name, event))
+            if messages:
+                self.event_queue.push(RemoteCommEvents.SUPVISORS_EVENT,
+                                      messages)
+
     def start_process(self, address_name, namespec, extra_args):
         """ Start process asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supvisors.start_args(namespec, extra_args, False)
+            self.proxies.call(address_name, 'supvisors.start_args',
+                              namespec, extra_args, False, timeout=
+                              self.timeouts[DeferredRequestHeaders.START_PROCESS])
         except:
             print >> stderr, '[ERROR] failed to start process {} on {} with {}'.format(
                 namespec, address_name, extra_args)
@@ -178,35 +464,116 @@ class SupvisorsMainLoop(Thread):
     def stop_process(self, address_name, namespec):
         """ Stop process asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.stopProcess(namespec, False)
+            self.proxies.call(address_name, 'supervisor.stopProcess',
+                              namespec, False, timeout=
+                              self.timeouts[DeferredRequestHeaders.STOP_PROCESS])
         except:
             print >> stderr, '[ERROR] failed to stop process {} on {}'.format(
                 namespec, address_name)
 
+    def start_processes(self, address_name, processes):
+        """ Start processes asynchronously, using one single multicall. """
+        calls = [{'methodName': 'supvisors.start_args',
+                  'params': [namespec, extra_args, False]}
+                 for namespec, extra_args in processes]
+        try:
+            results = self.proxies.call(address_name, 'system.multicall', calls,
+                timeout=self.timeouts[DeferredRequestHeaders.START_PROCESS])
+        except:
+            print >> stderr, '[ERROR] failed to start processes {} on {}'.format(
+                [namespec for namespec, _ in processes], address_name)
+        else:
+            # a fault is returned as a dictionary for each failed call
+            faults = []
+            for (namespec, extra_args), result in zip(processes, results):
+                if isinstance(result, dict):
+                    print >> stderr, '[ERROR] failed to start process {} on {}' \
+                        ' with {}: {}'.format(namespec, address_name,
+                                              extra_args, result['faultString'])
+                    faults.append((namespec, result))
+            self.push_faults(DeferredRequestHeaders.START_PROCESSES,
+                             address_name, faults)
+
+    def stop_processes(self, address_name, namespecs):
+        """ Stop processes asynchronously, using one single multicall. """
+        calls = [{'methodName': 'supervisor.stopProcess',
+                  'params': [namespec, False]}
+                 for namespec in namespecs]
+        try:
+            results = self.proxies.call(address_name, 'system.multicall', calls,
+                timeout=self.timeouts[DeferredRequestHeaders.STOP_PROCESS])
+        except:
+            print >> stderr, '[ERROR] failed to stop processes {} on {}'.format(
+                namespecs, address_name)
+        else:
+            # a fault is returned as a dictionary for each failed call
+            faults = []
+            for namespec, result in zip(namespecs, results):
+                if isinstance(result, dict):
+                    print >> stderr, '[ERROR] failed to stop process {} on {}:' \
+                        ' {}'.format(namespec, address_name,
+                                     result['faultString'])
+                    faults.append((namespec, result))
+            self.push_faults(DeferredRequestHeaders.STOP_PROCESSES,
+                             address_name, faults)
+
+    def push_faults(self, header, address_name, faults):
+        """ Hand over the processes whose request has been rejected by the
+        remote Supervisor, so that the commanders do not wait for the timeout.
+        The faults telling that the process is already in the expected state
+        are ignored. """
+        failures = [(namespec, 'request rejected by {}: {}'.format(
+                        address_name, fault['faultString']))
+                    for namespec, fault in faults
+                    if fault['faultCode'] not in [Faults.ALREADY_STARTED,
+                                                  Faults.NOT_RUNNING]]
+        if failures:
+            self.event_queue.push(RemoteCommEvents.SUPVISORS_FAULT,
+                                  (header, failures))
+
+    def drop_request(self, header, body):
+        """ Hand over the processes whose request has been dropped because
+        the queue of deferred requests is full, so that the commanders
+        do not wait for the timeout.
+        This is called from the main loop thread. """
+        if header in [DeferredRequestHeaders.START_PROCESS,
+                      DeferredRequestHeaders.STOP_PROCESS]:
+            namespecs = [body[1]]
+        elif header == DeferredRequestHeaders.START_PROCESSES:
+            namespecs = [namespec for namespec, _ in body[1]]
+        elif header == DeferredRequestHeaders.STOP_PROCESSES:
+            namespecs = body[1]
+        else:
+            return
+        reason = 'request to {} dropped: queue full'.format(body[0])
+        self.event_queue.push(RemoteCommEvents.SUPVISORS_FAULT,
+            (header, [(namespec, reason) for namespec in namespecs]))
+
+    def save_context(self, data):
+        """ Write the context file with the data copied at tick time. """
+        try:
+            self.supvisors.snapshot.write(data)
+        except (IOError, OSError, ValueError) as exc:
+            print >> stderr, '[ERROR] cannot save context file: {}'.format(exc)
+
     def restart(self, address_name):
         """ Restart a Supervisor instance asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.restart()
+            self.proxies.call(address_name, 'supervisor.restart', timeout=
+                              self.timeouts[DeferredRequestHeaders.RESTART])
         except:
             print >> stderr, '[ERROR] failed to restart address {}'.format(
                 address_name)
+        # the connection will be closed by the remote Supervisor
+        self.proxies.invalidate([address_name])
 
     def shutdown(self, address_name):
         """ Stop process asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.shutdown()
+            self.proxies.call(address_name, 'supervisor.shutdown', timeout=
+                              self.timeouts[DeferredRequestHeaders.SHUTDOWN])
         except:
             print >> stderr, '[ERROR] failed to shutdown address {}'.format(
                 address_name)
-
-    def send_remote_comm_event(self, event_type, event_data):
-        """ Shortcut for the use of sendRemoteCommEvent. """
-        try:
-            self.proxy.supervisor.sendRemoteCommEvent(event_type, event_data)
-        except:
-            # expected on restart / shutdown
-            print >> stderr, \
-            '[WARN] failed to send event to Supervisor: {}'.format(event_type)
+        # the connection will be closed by the remote Supervisor
+        self.proxies.invalidate([address_name])
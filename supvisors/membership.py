@@ -0,0 +1,74 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import os
+
+
+class MembershipCache(object):
+    """ Persistence of the addresses whose Supvisors instance is running,
+    so that a restarted Supvisors instance knows which addresses to wait for.
+
+    The file holds one address name per line. It is written in a temporary
+    file that is renamed afterwards, so that a crash cannot leave a truncated
+    file behind.
+
+    Attributes are:
+
+        - filename: the path of the file, empty to disable the persistence,
+        - logger: a reference to the Supvisors logger,
+        - addresses: the addresses last loaded or saved.
+    """
+
+    def __init__(self, filename, logger):
+        """ Initialization of the attributes. """
+        self.filename = filename
+        self.logger = logger
+        self.addresses = set()
+
+    def load(self):
+        """ Return the set of addresses saved in the file.
+        The set is empty if the file is disabled, missing or unreadable. """
+        self.addresses = set()
+        if self.filename:
+            try:
+                with open(self.filename) as stream:
+                    self.addresses = set(filter(None, (line.strip()
+                                                       for line in stream)))
+            except IOError as exc:
+                self.logger.warn('cannot load membership file {}: {}'.format(
+                    self.filename, exc))
+        return self.addresses
+
+    def save(self, addresses):
+        """ Write the addresses in the file if they have changed. """
+        addresses = set(addresses)
+        if self.filename and addresses != self.addresses:
+            temp_filename = self.filename + '.tmp'
+            try:
+                with open(temp_filename, 'w') as stream:
+                    stream.writelines('{}\n'.format(address)
+                                      for address in sorted(addresses))
+                    stream.flush()
+                    os.fsync(stream.fileno())
+                os.rename(temp_filename, self.filename)
+            except (IOError, OSError) as exc:
+                self.logger.error('cannot save membership file {}: {}'.format(
+                    self.filename, exc))
+            else:
+                self.addresses = addresses
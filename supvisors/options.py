@@ -25,6 +25,7 @@ from supervisor.datatypes import (boolean, integer, existing_dirpath,
 from supervisor.options import ServerOptions
 
 from supvisors.ttypes import ConciliationStrategies, StartingStrategies
+from supvisors.utils import DeferredRequestHeaders, string_to_enum
 
 
 # Options of main section
@@ -37,12 +38,29 @@ class SupvisorsOptions():
         - rules_file: absolute or relative path to the XML rules file,
         - internal_port: port number used to publish local events to remote Supvisors instances,
         - event_port: port number used to publish all Supvisors events,
+        - snapshot_port: port number used to serve the last Supvisors events published,
+        - relay_list: list of the addresses relaying the internal events, empty to subscribe directly to all addresses,
+        - relay_port: port number used by the relays to forward the internal events,
+        - event_hwm: maximum number of Supvisors events queued for a slow subscriber,
+        - event_conflation_period: period in milliseconds at which the last Supvisors status are published, 0 to publish every change,
         - auto_fence: when True, Supvisors won't try to reconnect to a Supvisors instance that has been inactive,
         - synchro_timeout: time in seconds that Supvisors waits for all expected Supvisors instances to publish,
+        - synchro_quorum: number of Supvisors instances whose publication ends the synchronization, 0 to wait for all of them,
+        - membership_file: absolute or relative path of the file used to remember the Supvisors instances running, empty to disable,
+        - heartbeat_period: period in milliseconds at which Supvisors publishes heartbeats to the other Supvisors instances,
+        - phi_threshold: suspicion level above which a Supvisors instance is considered lost by the failure detector,
+        - event_batch_size: maximum number of internal events handed over to the Supervisor thread at once,
+        - legacy_codec: when True, internal events are published using pickle instead of the binary codec,
+        - request_workers: number of threads used to perform the deferred XML-RPC requests,
+        - request_queue_depth: maximum number of deferred XML-RPC requests waiting to be performed,
+        - request_timeouts: timeout in seconds of the deferred XML-RPC requests, per request type,
         - conciliation_strategy: strategy used to solve conflicts when Supvisors has detected that multiple instances of the same program are running,
         - starting_strategy: strategy used to start processes on addresses,
+        - fast_failover: when True, the processes of a lost address are restarted at once, using a single placement plan,
         - stats_periods: list of periods for which the statistics will be provided in the Supvisors web page,
         - stats_histo: depth of statistics history,
+        - context_file: absolute or relative path of the file used to save the context and the statistics, empty to disable,
+        - context_period: period in seconds at which the context and the statistics are saved,
         - logfile: absolute or relative path of the Supvisors log file,
         - logfile_maxbytes: maximum size of the Supvisors log file,
         - logfile_backups: number of Supvisors backup log files,
@@ -51,9 +69,9 @@ class SupvisorsOptions():
         - procnumbers: a dictionary giving the number of the program in a homogeneous group.
     """
 
-    _Options = ['address_list', 'rules_file', 'internal_port', 'event_port', 'auto_fence', 'synchro_timeout',
-            'conciliation_strategy', 'starting_strategy', 'stats_periods', 'stats_histo', 'stats_irix_mode',
-            'logfile', 'logfile_maxbytes', 'logfile_backups', 'loglevel']
+    _Options = ['address_list', 'rules_file', 'internal_port', 'event_port', 'snapshot_port', 'relay_list', 'relay_port', 'event_hwm', 'event_conflation_period', 'auto_fence', 'synchro_timeout', 'synchro_quorum', 'membership_file', 'heartbeat_period', 'phi_threshold',
+            'event_batch_size', 'legacy_codec', 'request_workers', 'request_queue_depth', 'request_timeouts', 'conciliation_strategy', 'starting_strategy', 'fast_failover', 'stats_periods', 'stats_histo', 'stats_irix_mode',
+            'context_file', 'context_period', 'logfile', 'logfile_maxbytes', 'logfile_backups', 'loglevel']
 
     def __init__(self):
         """ Initialization of the attributes. """
@@ -65,12 +83,13 @@ class SupvisorsOptions():
 
     def __str__(self):
         """ Contents as string. """
-        return ('address_list={} rules_file={} internal_port={} event_port={} auto_fence={} synchro_timeout={} '
-            'conciliation_strategy={} starting_strategy={} stats_periods={} stats_histo={} stats_irix_mode={} '
-            'logfile={} logfile_maxbytes={} logfile_backups={} loglevel={}'.format(self.address_list,
-            self.rules_file, self.internal_port, self.event_port, self.auto_fence, self.synchro_timeout, 
-            self.conciliation_strategy, self.starting_strategy, self.stats_periods, self.stats_histo, self.stats_irix_mode,
-            self.logfile, self.logfile_maxbytes, self.logfile_backups, self.loglevel))
+        return ('address_list={} rules_file={} internal_port={} event_port={} snapshot_port={} relay_list={} relay_port={} event_hwm={} event_conflation_period={} auto_fence={} synchro_timeout={} synchro_quorum={} membership_file={} heartbeat_period={} phi_threshold={} '
+            'event_batch_size={} legacy_codec={} request_workers={} request_queue_depth={} request_timeouts={} conciliation_strategy={} starting_strategy={} fast_failover={} stats_periods={} stats_histo={} stats_irix_mode={} '
+            'context_file={} context_period={} logfile={} logfile_maxbytes={} logfile_backups={} loglevel={}'.format(self.address_list,
+            self.rules_file, self.internal_port, self.event_port, self.snapshot_port, self.relay_list, self.relay_port, self.event_hwm, self.event_conflation_period, self.auto_fence, self.synchro_timeout, self.synchro_quorum, self.membership_file, self.heartbeat_period, self.phi_threshold,
+            self.event_batch_size, self.legacy_codec, self.request_workers, self.request_queue_depth, self.request_timeouts,
+            self.conciliation_strategy, self.starting_strategy, self.fast_failover, self.stats_periods, self.stats_histo, self.stats_irix_mode,
+            self.context_file, self.context_period, self.logfile, self.logfile_maxbytes, self.logfile_backups, self.loglevel))
 
 
 class SupvisorsServerOptions(ServerOptions):
@@ -119,14 +138,37 @@ class SupvisorsServerOptions(ServerOptions):
             opt.rules_file = existing_dirpath(opt.rules_file)
         opt.internal_port = self.to_port_num(parser.getdefault('internal_port', '65001'))
         opt.event_port = self.to_port_num(parser.getdefault('event_port', '65002'))
+        opt.snapshot_port = self.to_port_num(parser.getdefault('snapshot_port', '65003'))
+        opt.relay_list = self.to_relay_list(parser.getdefault('relay_list', ''), opt.address_list)
+        opt.relay_port = self.to_port_num(parser.getdefault('relay_port', '65004'))
+        opt.event_hwm = self.to_hwm(parser.getdefault('event_hwm', '1000'))
+        opt.event_conflation_period = self.to_conflation_period(parser.getdefault('event_conflation_period', '0'))
         opt.auto_fence = boolean(parser.getdefault('auto_fence', 'false'))
         opt.synchro_timeout = self.to_timeout(parser.getdefault('synchro_timeout', '15'))
+        opt.synchro_quorum = self.to_synchro_quorum(parser.getdefault('synchro_quorum', '0'), opt.address_list)
+        opt.membership_file = parser.getdefault('membership_file', '')
+        if opt.membership_file:
+            opt.membership_file = existing_dirpath(opt.membership_file)
+        opt.heartbeat_period = self.to_heartbeat_period(parser.getdefault('heartbeat_period', '1000'))
+        opt.phi_threshold = self.to_phi_threshold(parser.getdefault('phi_threshold', '8'))
+        opt.event_batch_size = self.to_batch_size(parser.getdefault('event_batch_size', '100'))
+        opt.legacy_codec = boolean(parser.getdefault('legacy_codec', 'false'))
+        # configure deferred requests
+        opt.request_workers = self.to_workers(parser.getdefault('request_workers', '4'))
+        opt.request_queue_depth = self.to_queue_depth(parser.getdefault('request_queue_depth', '1000'))
+        opt.request_timeouts = self.to_request_timeouts(list_of_strings(parser.getdefault('request_timeouts', '')))
         opt.conciliation_strategy = self.to_conciliation_strategy(parser.getdefault('conciliation_strategy', 'USER'))
         opt.starting_strategy = self.to_starting_strategy(parser.getdefault('starting_strategy', 'CONFIG'))
+        opt.fast_failover = boolean(parser.getdefault('fast_failover', 'false'))
         # configure statistics
         opt.stats_periods = self.to_periods(list_of_strings(parser.getdefault('stats_periods', '10')))
         opt.stats_histo = self.to_histo(parser.getdefault('stats_histo', 200))
         opt.stats_irix_mode = boolean(parser.getdefault('stats_irix_mode', 'false'))
+        # configure context persistence
+        opt.context_file = parser.getdefault('context_file', '')
+        if opt.context_file:
+            opt.context_file = existing_dirpath(opt.context_file)
+        opt.context_period = self.to_context_period(parser.getdefault('context_period', '60'))
         # configure logger
         opt.logfile = existing_dirpath(parser.getdefault('logfile', '{}.log'.format(SupvisorsServerOptions._Section)))
         opt.logfile_maxbytes = byte_size(parser.getdefault('logfile_maxbytes', '50MB'))
@@ -145,6 +187,31 @@ class SupvisorsServerOptions(ServerOptions):
             return value
         raise ValueError('invalid value for port: %d. expected in [1;65535]' % value)
 
+    @staticmethod
+    def to_relay_list(value, address_list):
+        """ Convert a string into a list of relays, all of them being part of the address list. """
+        relays = list(OrderedDict.fromkeys(filter(None, list_of_strings(value))))
+        unknown = [relay for relay in relays if relay not in address_list]
+        if unknown:
+            raise ValueError('invalid value for relay_list: {}. expected in address_list'.format(unknown))
+        return relays
+
+    @staticmethod
+    def to_hwm(value):
+        """ Convert a string into a high water mark. """
+        value = integer(value)
+        if 0 <= value <= 1000000:
+            return value
+        raise ValueError('invalid value for event_hwm: %d. expected in [0;1000000]' % value)
+
+    @staticmethod
+    def to_conflation_period(value):
+        """ Convert a string into a conflation period. """
+        value = integer(value)
+        if 0 <= value <= 60000:
+            return value
+        raise ValueError('invalid value for event_conflation_period: %d. expected in [0;60000] (milliseconds)' % value)
+
     @staticmethod
     def to_timeout(value):
         """ Convert a string into a timeout value. """
@@ -153,6 +220,76 @@ class SupvisorsServerOptions(ServerOptions):
             return value
         raise ValueError('invalid value for synchro_timeout: %d. expected in [1;1000] (seconds)' % value)
 
+    @staticmethod
+    def to_synchro_quorum(value, address_list):
+        """ Convert a string into a number of Supvisors instances, bounded by the address list. """
+        value = integer(value)
+        if 0 <= value <= len(address_list):
+            return value
+        raise ValueError('invalid value for synchro_quorum: {}. expected in [0;{}]'.format(value, len(address_list)))
+
+    @staticmethod
+    def to_heartbeat_period(value):
+        """ Convert a string into a heartbeat period. """
+        value = integer(value)
+        if 100 <= value <= 60000:
+            return value
+        raise ValueError('invalid value for heartbeat_period: %d. expected in [100;60000] (milliseconds)' % value)
+
+    @staticmethod
+    def to_phi_threshold(value):
+        """ Convert a string into a suspicion threshold. """
+        value = float(value)
+        if 0 < value <= 100:
+            return value
+        raise ValueError('invalid value for phi_threshold: %s. expected in ]0;100]' % value)
+
+    @staticmethod
+    def to_batch_size(value):
+        """ Convert a string into a batch size. """
+        value = integer(value)
+        if 0 < value <= 10000:
+            return value
+        raise ValueError('invalid value for event_batch_size: %d. expected in [1;10000]' % value)
+
+    @staticmethod
+    def to_workers(value):
+        """ Convert a string into a number of worker threads. """
+        value = integer(value)
+        if 0 < value <= 64:
+            return value
+        raise ValueError('invalid value for request_workers: %d. expected in [1;64]' % value)
+
+    @staticmethod
+    def to_queue_depth(value):
+        """ Convert a string into a queue depth. """
+        value = integer(value)
+        if 0 < value <= 100000:
+            return value
+        raise ValueError('invalid value for request_queue_depth: %d. expected in [1;100000]' % value)
+
+    @staticmethod
+    def to_request_timeouts(value):
+        """ Convert a list of strings 'request:timeout' into a dictionary of timeouts per request type.
+        The request types that are not defined keep their default timeout. """
+        timeouts = {DeferredRequestHeaders.CHECK_ADDRESS: 30, DeferredRequestHeaders.START_PROCESS: 10,
+            DeferredRequestHeaders.STOP_PROCESS: 10, DeferredRequestHeaders.RESTART: 10,
+            DeferredRequestHeaders.SHUTDOWN: 10}
+        for val in value:
+            try:
+                name, timeout = val.split(':')
+                header = string_to_enum(DeferredRequestHeaders.__dict__, name.strip().upper())
+                timeout = integer(timeout)
+            except ValueError:
+                raise ValueError('invalid value for request_timeouts: {}. expected request:timeout'.format(val))
+            if header not in timeouts:
+                raise ValueError('invalid value for request_timeouts: {}. expected request in {}'.format(
+                    val, ['check_address', 'start_process', 'stop_process', 'restart', 'shutdown']))
+            if not 0 < timeout <= 1000:
+                raise ValueError('invalid value for request_timeouts: {}. expected in [1;1000] (seconds)'.format(val))
+            timeouts[header] = timeout
+        return timeouts
+
     @staticmethod
     def to_conciliation_strategy(value):
         """ Convert a string into a ConciliationStrategies enum. """
@@ -195,3 +332,11 @@ class SupvisorsServerOptions(ServerOptions):
         if 10 <= histo <= 1500:
             return histo
         raise ValueError('invalid value for stats_histo: {}. expected in [10;1500] (seconds)'.format(value))
+
+    @staticmethod
+    def to_context_period(value):
+        """ Convert a string into a period of context persistence. """
+        period = integer(value)
+        if 5 <= period <= 3600:
+            return period
+        raise ValueError('invalid value for context_period: {}. expected in [5;3600] (seconds)'.format(value))
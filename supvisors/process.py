@@ -135,7 +135,9 @@ class ProcessStatus(object):
         - rules: the rules related to this process,
         - extra_args: optional extra arguments to be passed to the command line,
         - ignore_wait_exit: a status telling if the wait_exit rule is applicable
-            (should be temporary).
+            (should be temporary),
+        - _serial: the serializable form of the process, reset when the status
+            changes.
     """
 
     def __init__(self, application_name, process_name, supvisors):
@@ -148,10 +150,11 @@ class ProcessStatus(object):
         self.application_name = application_name
         self.process_name = process_name
         self._state = ProcessStates.UNKNOWN
-        self.expected_exit = True
-        self.last_event_time = 0
+        self._expected_exit = True
+        self._last_event_time = 0
         # expected one single applicable address
-        self.addresses = set() # addresses
+        self._addresses = set() # addresses
+        self._serial = None
         self.infos = {} # address: processInfo
         # rules part
         self.rules = ProcessRules(supvisors)
@@ -180,6 +183,10 @@ class ProcessStatus(object):
         """ Return True if process is running on address. """
         return self.running() and address in self.addresses
 
+    def running_on_addresses(self):
+        """ Return the set of addresses where the process is running. """
+        return set(self.addresses) if self.running() else set()
+
     def pid_running_on(self, address):
         """ Return True if process is RUNNING on address.
         Different from running_on as it considers only the RUNNING state and
@@ -200,6 +207,38 @@ class ProcessStatus(object):
     def state(self, new_state):
         if self._state != new_state:
             self._state = new_state
+            self._serial = None
+
+    @property
+    def expected_exit(self):
+        return self._expected_exit
+
+    @expected_exit.setter
+    def expected_exit(self, expected):
+        if self._expected_exit != expected:
+            self._expected_exit = expected
+            self._serial = None
+
+    @property
+    def last_event_time(self):
+        return self._last_event_time
+
+    @last_event_time.setter
+    def last_event_time(self, event_time):
+        if self._last_event_time != event_time:
+            self._last_event_time = event_time
+            self._serial = None
+
+    # the set is updated in place in this class only,
+    # where the serializable form is reset accordingly
+    @property
+    def addresses(self):
+        return self._addresses
+
+    @addresses.setter
+    def addresses(self, addresses):
+        self._addresses = addresses
+        self._serial = None
 
     def conflicting(self):
         """ Return True if the process is in a conflicting state (more than one
@@ -208,14 +247,18 @@ class ProcessStatus(object):
 
     # serialization
     def serial(self):
-        """ Return a serializable form of the ProcessStatus. """
-        return {'application_name': self.application_name,
-                'process_name': self.process_name,
-                'statecode': self.state,
-                'statename': self.state_string(),
-                'expected_exit': self.expected_exit,
-                'last_event_time': self.last_event_time,
-                'addresses': list(self.addresses)}
+        """ Return a serializable form of the ProcessStatus.
+        The same structure is returned until the status changes,
+        so it must not be modified by the caller. """
+        if self._serial is None:
+            self._serial = {'application_name': self.application_name,
+                            'process_name': self.process_name,
+                            'statecode': self.state,
+                            'statename': self.state_string(),
+                            'expected_exit': self.expected_exit,
+                            'last_event_time': self.last_event_time,
+                            'addresses': list(self.addresses)}
+        return self._serial
 
     # methods
     def state_string(self):
@@ -228,7 +271,6 @@ class ProcessStatus(object):
         self.last_event_time = int(time())
         # store information
         info = self.infos[address] = payload
-        self.update_uptime(info)
         self.logger.debug('adding {} at {}'.format(info, address))
         # update process status
         self.update_status(address, info['state'], info['expected'])
@@ -237,6 +279,11 @@ class ProcessStatus(object):
             if self.address_mapper.addresses.index(address) == self.options.procnumbers[self.process_name]:
                 self.rules.addresses = [address]
 
+    def remove_info(self, address):
+        """ Remove the process information of address, when the process
+        is not handled by the Supervisor of address anymore. """
+        del self.infos[address]
+
     def update_info(self, address, payload):
         """ Update the internal process information with event payload. """
         # do not consider process event while not added through tick
@@ -252,7 +299,6 @@ class ProcessStatus(object):
             # reset start time if process in a starting state
             if new_state in [ProcessStates.STARTING, ProcessStates.BACKOFF]:
                 info['start'] = info['now']
-            self.update_uptime(info)
             # update / check running addresses
             self.update_status(address, new_state, info['expected'])
             self.logger.debug('new process info: {}'.format(info))
@@ -260,27 +306,27 @@ class ProcessStatus(object):
             self.logger.warn('ProcessEvent rejected for {}.'
                 ' wait for tick from {}'.format(self.process_name, address))
 
-    def update_times(self, address, remote_time):
-        """ Update the time entries of the internal process information when a new tick
-        is received from the remote Supvisors instance. """
-        if address in self.infos:
-            info = self.infos[address]
-            info['now'] = remote_time
-            self.update_uptime(info)
-
-    @staticmethod
-    def update_uptime(info):
-        """ Update uptime entry of a process information. """
-        info['uptime'] = (info['now'] - info['start']) if info['state'] \
-            in [ProcessStates.RUNNING, ProcessStates.STOPPING] else 0
+    def uptime(self, address):
+        """ Return the uptime of the process at address.
+        The uptime is derived from the start date and from the latest remote
+        date known, i.e. the date of the last event or the date of the last
+        tick received from address, so that the ticks do not have to update
+        the process information. """
+        info = self.infos[address]
+        if info['state'] in [ProcessStates.RUNNING, ProcessStates.STOPPING]:
+            remote_time = self.supvisors.context.addresses[address].remote_time
+            return max(info['now'], remote_time) - info['start']
+        return 0
 
     def invalidate_address(self, address, is_master):
         """ Update status of a process that was running on a lost address. """
         self.logger.debug('{} invalidateAddress {} / {}'.format(
             self.namespec(), self.addresses, address))
+        previous_addresses = self.running_on_addresses()
         # reassign the difference between current set and parameter
         if address in self.addresses:
             self.addresses.remove(address)
+            self._serial = None
         if address in self.infos:
             # force process info to UNKNOWN at address
             self.infos[address]['state'] = ProcessStates.UNKNOWN
@@ -308,18 +354,23 @@ class ProcessStatus(object):
         else:
             self.logger.debug('process {} still in conflict after address '\
                               'invalidation'.format(self.namespec()))
+        # update the running processes of the addresses and application
+        self.supvisors.context.update_running(self, previous_addresses)
 
     def update_status(self, address, new_state, expected):
         """ Updates the state and list of running address iaw the new event. """
+        previous_addresses = self.running_on_addresses()
         # update addresses list
         if new_state in STOPPED_STATES:
             self.addresses.discard(address)
+            self._serial = None
         elif new_state in RUNNING_STATES:
             # replace if current state stopped-like, add otherwise
             if self.stopped():
                 self.addresses = {address}
             else:
                 self.addresses.add(address)
+                self._serial = None
         # evaluate state iaw running addresses
         if not self.evaluate_conflict():
             # if zero element, state is the state of the program addressed
@@ -330,6 +381,8 @@ class ProcessStatus(object):
             else:
                 self.state = new_state
                 self.expected_exit = expected
+        # update the running processes of the addresses and application
+        self.supvisors.context.update_running(self, previous_addresses)
         # log the new status
         log_trace = 'Process {} is {}'.format(self.namespec(),
                                               self.state_string())
@@ -339,8 +392,12 @@ class ProcessStatus(object):
 
     def evaluate_conflict(self):
         """ Gets a synthetic state if several processes are in a RUNNING-like
-        state. """
-        if self.conflicting():
+        state.
+        The context is notified so that it keeps the set of conflicting
+        processes without scanning all of them. """
+        conflicting = self.conflicting()
+        self.supvisors.context.update_conflict(self, conflicting)
+        if conflicting:
             # several processes seems to be in a running state
             # so that becomes tricky
             states = {self.infos[address]['state']
@@ -20,14 +20,15 @@
 import os
 
 from supervisor.http import NOT_DONE_YET
-from supervisor.options import split_namespec
+from supervisor.options import make_namespec, split_namespec
 from supervisor.xmlrpc import Faults, RPCError
 
 from supvisors.initializer import Supvisors
 from supvisors.strategy import conciliate_conflicts
 from supvisors.ttypes import (ApplicationStates, ConciliationStrategies,
     StartingStrategies, SupvisorsStates)
-from supvisors.utils import supvisors_short_cuts
+from supvisors.utils import (supvisors_short_cuts, compact_process_info,
+    extract_process_info)
 
 # get Supvisors version from file
 here = os.path.abspath(os.path.dirname(__file__))
@@ -204,9 +205,85 @@ class RPCInterface(object):
         *@return* ``list(dict)``: a list of structures containing data about the conflicting processes.
         """
         self._check_from_deployment()
-        return [process.serial()
-            for process in self.context.processes.values()
-                if process.conflicting()]
+        return [process.serial() for process in self.context.conflicts()]
+
+    def get_compact_process_info(self, generation=0, namespecs=()):
+        """ Get information about the processes handled by the local Supervisor,
+        limited to the data used by **Supvisors** and in a compact form.
+        This is used by the **Supvisors** instances to check the local **Supvisors** instance.
+
+        *@param* ``int generation``: the generation returned by a previous call, 0 to get all the processes.
+
+        *@param* ``list(str) namespecs``: the processes to return even if unchanged since the generation.
+
+        *@return* ``dict``: a structure containing the generation and the processes changed since the generation given.
+        """
+        publisher = self.supvisors.zmq.internal_publisher
+        supervisor_intf = self.info_source.supervisor_rpc_interface
+        current_generation = publisher.sequence
+        if 0 < generation <= current_generation:
+            # only the processes that changed since the generation
+            changed = {make_namespec(payload['group'], payload['name'])
+                for _, payload in publisher.process_events_since(generation)}
+            changed.update(namespecs)
+            all_info = []
+            for namespec in changed:
+                try:
+                    all_info.append(supervisor_intf.getProcessInfo(namespec))
+                except RPCError:
+                    # process not handled by the local Supervisor
+                    pass
+        else:
+            all_info = supervisor_intf.getAllProcessInfo()
+        return {'epoch': publisher.epoch,
+            'generation': current_generation,
+            'processes': [compact_process_info(extract_process_info(info))
+                for info in all_info]}
+
+    def get_request_queue(self):
+        """ Get the state of the queue of the deferred XML-RPC requests
+        sent by **Supvisors** to the Supervisor instances.
+
+        *@return* ``dict``: a structure containing data about the queue and its usage per priority.
+        """
+        stats = self.supvisors.listener.main_loop.request_statistics()
+        stats['unsent'] = self.supvisors.zmq.pusher.unsent
+        return stats
+
+    def get_proxy_statistics(self):
+        """ Get the usage of the persistent XML-RPC proxies used by **Supvisors**
+        to send the deferred requests to the Supervisor instances.
+
+        *@return* ``list(dict)``: a list of structures containing data about the proxies, per address.
+        """
+        stats = self.supvisors.listener.main_loop.proxy_statistics()
+        return [dict(address_stats, address_name=address_name)
+                for address_name, address_stats in sorted(stats.items())]
+
+    def get_failover_statistics(self):
+        """ Get the last failover incidents recorded by the **Supvisors** master,
+        i.e. the restarts of the processes that were running on a lost address.
+
+        *@return* ``list(dict)``: a list of structures containing data about the failover incidents.
+        """
+        return self.supvisors.failure_handler.statistics()
+
+    def get_process_events(self, sequence):
+        """ Get the last event published by the local **Supvisors** instance for each process,
+        restricted to the events published after the sequence number.
+        This is used by the **Supvisors** instances to resynchronize when they detect that events have been lost.
+
+        *@param* ``int sequence``: the sequence number of the last event received.
+
+        *@return* ``list(dict)``: a list of structures containing data about the process events.
+        """
+        events = []
+        publisher = self.supvisors.zmq.internal_publisher
+        for event_sequence, payload in publisher.process_events_since(sequence):
+            event = payload.copy()
+            event['sequence'] = event_sequence
+            events.append(event)
+        return events
 
     # RPC Command methods
     def start_application(self, strategy, application_name, wait=True):
@@ -417,7 +494,8 @@ class RPCInterface(object):
         application, process = self._get_application_process(namespec)
         processes = [process] if process else application.processes.values()
         # check processes are not already running
-        for process in processes:
+        running = [process] if process else application.running_processes()
+        for process in running:
             if process.running():
                 raise RPCError(Faults.ALREADY_STARTED, process.namespec())
         # start all processes
@@ -17,8 +17,13 @@
 # limitations under the License.
 # ======================================================================
 
+import httplib
+import socket
 import xmlrpclib
 
+from threading import Lock
+from time import time
+
 from supervisor.xmlrpc import SupervisorTransport
 
 
@@ -40,5 +45,187 @@ def getRPCInterface(address, env):
     serverurl[1] = '//' + address
     serverurl = ':'.join(serverurl)
     # create transport and return proxy
-    transport = SupervisorTransport(username, password, serverurl)
+    transport = TimeoutTransport(username, password, serverurl)
     return xmlrpclib.ServerProxy('http://{}'.format(address), transport)
+
+
+class TimeoutTransport(SupervisorTransport):
+    """ SupervisorTransport with a configurable timeout on socket operations.
+
+    Attributes are:
+
+        - timeout: the timeout in seconds (None means blocking).
+    """
+
+    def __init__(self, username=None, password=None, serverurl=None):
+        """ Initialization of the attributes. """
+        SupervisorTransport.__init__(self, username, password, serverurl)
+        self.timeout = None
+        # the connection is created by Supervisor in request
+        get_connection = self._get_connection
+        def get_timed_connection():
+            connection = get_connection()
+            connection.timeout = self.timeout
+            return connection
+        self._get_connection = get_timed_connection
+
+    def set_timeout(self, timeout):
+        """ Set the timeout, including for the current connection. """
+        self.timeout = timeout
+        if self.connection:
+            self.connection.timeout = timeout
+            if self.connection.sock:
+                self.connection.sock.settimeout(timeout)
+
+
+class RPCProxyPool(object):
+    """ Pool of persistent XML-RPC proxies, one per address.
+
+    The SupervisorTransport keeps its HTTP connection alive, so reusing
+    the proxy avoids a new connection (and a new DNS lookup) per request.
+    The proxy of an address is dropped when a connection error occurs,
+    and a new one is created at the next request.
+
+    The pool is shared by the threads of the request executor and by the
+    main loop thread, so the proxies and the counters are protected by a lock.
+    The XML-RPC itself is performed outside the lock. The requests related
+    to the same address are serialized by the request executor.
+
+    Attributes are:
+
+        - env: the environment used to create the proxies,
+        - proxies: the proxies per address name,
+        - stats: the usage counters per address name,
+        - lock: the lock protecting the proxies and the counters.
+    """
+
+    # errors raised when a kept-alive connection has been closed by the server
+    ConnectionErrors = (socket.error, httplib.HTTPException)
+
+    # read-only methods that can be sent again without side effect
+    IdempotentMethods = frozenset(['supervisor.getState',
+                                   'supervisor.getAllProcessInfo',
+                                   'supvisors.get_address_info',
+                                   'supvisors.get_compact_process_info',
+                                   'supvisors.get_process_events'])
+
+    def __init__(self, env):
+        """ Initialization of the attributes. """
+        self.env = env
+        self.proxies = {}
+        self.stats = {}
+        self.lock = Lock()
+
+    def close(self):
+        """ Close all the connections. """
+        with self.lock:
+            address_names = self.proxies.keys()
+        self.invalidate(address_names)
+
+    def address_stats(self, address_name):
+        """ Return the usage counters of the address.
+        The lock must be held by the caller. """
+        return self.stats.setdefault(address_name, {'hits': 0, 'misses': 0,
+            'failures': 0, 'calls': 0, 'latency_total': 0.0,
+            'latency_max': 0.0})
+
+    def get_proxy(self, address_name):
+        """ Return the proxy of the address, created if not existing. """
+        with self.lock:
+            stats = self.address_stats(address_name)
+            proxy = self.proxies.get(address_name)
+            if proxy is None:
+                stats['misses'] += 1
+                proxy = self.proxies[address_name] = getRPCInterface(
+                    address_name, self.env)
+            else:
+                stats['hits'] += 1
+            return proxy
+
+    def invalidate(self, address_names):
+        """ Close and remove the proxies of the addresses. """
+        with self.lock:
+            proxies = [self.proxies.pop(address_name, None)
+                       for address_name in address_names]
+        for proxy in proxies:
+            self._close(proxy)
+
+    def discard(self, address_name, proxy):
+        """ Close and remove the proxy of the address, unless it has
+        already been replaced by another thread. """
+        with self.lock:
+            if self.proxies.get(address_name) is proxy:
+                del self.proxies[address_name]
+        self._close(proxy)
+
+    @staticmethod
+    def _close(proxy):
+        """ Close the kept-alive connection of the proxy.
+        The transport of Supervisor holds it in its connection attribute. """
+        if proxy is not None:
+            transport = proxy('transport')
+            if transport.connection:
+                try:
+                    transport.connection.close()
+                except:
+                    # closing is best effort
+                    pass
+                transport.connection = None
+
+    def call(self, address_name, method_name, *args, **kwargs):
+        """ Perform the XML-RPC on the address and return its result.
+        The method name is a dotted path like 'supervisor.getState'.
+        The optional keyword 'timeout' sets the timeout of the request
+        in seconds.
+        If the connection of a reused proxy turns out to be closed,
+        the request is sent again once through a new proxy, provided that
+        the method is idempotent. Indeed, the connection may have been lost
+        after the request has been processed by the remote Supervisor. """
+        timeout = kwargs.get('timeout')
+        with self.lock:
+            reused = address_name in self.proxies
+        try:
+            return self._call(address_name, method_name, args, timeout)
+        except self.ConnectionErrors:
+            if not reused or method_name not in self.IdempotentMethods:
+                raise
+            return self._call(address_name, method_name, args, timeout)
+
+    def _call(self, address_name, method_name, args, timeout):
+        """ Perform the XML-RPC and update the usage counters. """
+        proxy = self.get_proxy(address_name)
+        proxy('transport').set_timeout(timeout)
+        start = time()
+        failed = False
+        try:
+            result = reduce(getattr, method_name.split('.'), proxy)(*args)
+        except xmlrpclib.Fault:
+            # the XML-RPC has been processed so the connection is fine
+            raise
+        except:
+            failed = True
+            self.discard(address_name, proxy)
+            raise
+        finally:
+            latency = time() - start
+            with self.lock:
+                stats = self.address_stats(address_name)
+                if failed:
+                    stats['failures'] += 1
+                stats['calls'] += 1
+                stats['latency_total'] += latency
+                stats['latency_max'] = max(stats['latency_max'], latency)
+        return result
+
+    def statistics(self):
+        """ Return a copy of the usage counters, including the mean latency,
+        per address name. """
+        result = {}
+        with self.lock:
+            stats_list = [(address_name, stats.copy())
+                          for address_name, stats in self.stats.items()]
+        for address_name, stats in stats_list:
+            stats['latency_mean'] = (stats['latency_total'] / stats['calls']
+                                     if stats['calls'] else 0.0)
+            result[address_name] = stats
+        return result
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import marshal
+import os
+import zlib
+
+from supervisor.options import make_namespec
+
+from supvisors.ttypes import ProcessStates
+from supvisors.utils import supvisors_short_cuts
+
+
+class ContextSnapshot(object):
+    """ Persistence of the process information and of the statistics,
+    so that a restarted Supvisors instance has data to display before all
+    the other Supvisors instances have been checked.
+
+    The file starts with a header, followed by the zlib compression of the
+    marshalled data. It is written in a temporary file that is renamed
+    afterwards, so that a crash cannot leave a truncated file behind.
+    The periodic writing is performed by the request executor of the main
+    loop, so that the Supervisor thread only takes a copy of the data.
+
+    The process information is restored with an UNKNOWN state, as if all
+    the addresses had been lost. The live information replaces it when the
+    addresses are checked. The processes restored and not reported by their
+    address at that time are removed, as well as all the processes restored
+    for an address that is lost before being checked, so that they are not
+    considered in the deployment and failover decisions.
+
+    Attributes are:
+
+        - supvisors: a reference to the Supvisors global structure,
+        - filename: the path of the file, empty to disable the persistence,
+        - period: the period in seconds at which the file is written,
+        - last_save: the date of the last writing,
+        - restored: the namespecs of the processes restored per address name,
+        until the address is checked.
+    """
+
+    # header used to reject a file of another format or version
+    HEADER = 'SVCTX001'
+
+    def __init__(self, supvisors):
+        """ Initialization of the attributes. """
+        self.supvisors = supvisors
+        supvisors_short_cuts(self, ['context', 'logger', 'statistician'])
+        self.filename = supvisors.options.context_file
+        self.period = supvisors.options.context_period
+        self.last_save = 0
+        self.restored = {}
+
+    def serial(self):
+        """ Return the process information and the statistics
+        of all addresses. """
+        processes = {address_name: [process.infos[address_name]
+                                    for process in status.processes.values()]
+                     for address_name, status in self.context.addresses.items()}
+        statistics = {address_name: (self.statistician.nbcores[address_name],
+                                     {period: (instance.cpu, instance.mem,
+                                               instance.io, instance.proc)
+                                      for period, instance in periods.items()})
+                      for address_name, periods in self.statistician.data.items()}
+        return {'processes': processes, 'statistics': statistics}
+
+    def on_tick(self, now):
+        """ Hand over the data to the main loop if the period has elapsed
+        since the last writing.
+        The data is copied when pushed, so that it is not updated by the
+        Supervisor thread while the file is written. """
+        if self.filename and now - self.last_save >= self.period:
+            self.supvisors.zmq.pusher.send_save_context(self.filename,
+                                                        self.serial())
+            self.last_save = now
+
+    def save(self):
+        """ Write the process information and the statistics in the file.
+        This is used when Supervisor is stopping, once the main loop
+        is stopped. """
+        if self.filename:
+            try:
+                self.write(self.serial())
+            except (IOError, OSError, ValueError) as exc:
+                self.logger.error('cannot save context file {}: {}'.format(
+                    self.filename, exc))
+
+    def write(self, data):
+        """ Write the data in the file.
+        This is called from the executor threads, where the Supervisor logger
+        cannot be used, so the exceptions are left to the caller. """
+        temp_filename = self.filename + '.tmp'
+        payload = zlib.compress(marshal.dumps(data))
+        with open(temp_filename, 'wb') as stream:
+            stream.write(self.HEADER)
+            stream.write(payload)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.rename(temp_filename, self.filename)
+
+    def load(self):
+        """ Return the data read from the file, or None if the file is
+        disabled, missing or invalid. """
+        if self.filename:
+            try:
+                with open(self.filename, 'rb') as stream:
+                    data = stream.read()
+                if not data.startswith(self.HEADER):
+                    raise ValueError('unexpected header')
+                return marshal.loads(zlib.decompress(data[len(self.HEADER):]))
+            except (IOError, EOFError, TypeError, ValueError,
+                    zlib.error) as exc:
+                self.logger.warn('cannot load context file {}: {}'.format(
+                    self.filename, exc))
+
+    def restore(self):
+        """ Load the process information and the statistics from the file
+        into the context and the statistics compiler. """
+        data = self.load()
+        if data:
+            try:
+                self.restore_processes(data['processes'])
+                self.restore_statistics(data['statistics'])
+            except (KeyError, TypeError, ValueError) as exc:
+                self.logger.warn('cannot restore context file {}: {}'.format(
+                    self.filename, exc))
+            else:
+                self.logger.info('context restored from {}'.format(
+                    self.filename))
+
+    def restore_processes(self, processes):
+        """ Load the process information of the known addresses, with an
+        UNKNOWN state, and evaluate the applications. """
+        for address_name, all_info in processes.items():
+            if address_name in self.context.addresses:
+                for info in all_info:
+                    info['state'] = ProcessStates.UNKNOWN
+                self.context.load_processes(address_name, all_info)
+                self.restored[address_name] = set(
+                    make_namespec(info['group'], info['name'])
+                    for info in all_info)
+        for application in self.context.applications.values():
+            application.update_sequences()
+            application.update_status()
+
+    def obsolete_processes(self, address_name, all_info):
+        """ Return the namespecs of the processes restored for the address
+        and not reported in the process information got when checking it.
+        The restored processes are considered at the first check only. """
+        restored = self.restored.pop(address_name, None)
+        if not restored:
+            return []
+        return sorted(restored.difference(
+            make_namespec(info['group'], info['name']) for info in all_info))
+
+    def restore_statistics(self, statistics):
+        """ Load the statistics of the known addresses and periods. """
+        for address_name, (nbcores, periods) in statistics.items():
+            if address_name in self.statistician.data:
+                self.statistician.nbcores[address_name] = nbcores
+                instances = self.statistician.data[address_name]
+                for period, (cpu, mem, io, proc) in periods.items():
+                    if period in instances:
+                        instance = instances[period]
+                        depth = instance.depth
+                        instance.cpu = [lst[-depth:] for lst in cpu]
+                        instance.mem = mem[-depth:]
+                        instance.io = {intf: (recv[-depth:], sent[-depth:])
+                                       for intf, (recv, sent) in io.items()}
+                        instance.proc = {named_pid: (proc_cpu[-depth:],
+                                                     proc_mem[-depth:])
+                                         for named_pid, (proc_cpu, proc_mem)
+                                         in proc.items()}
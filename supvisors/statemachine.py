@@ -21,7 +21,7 @@ from time import time
 
 from supvisors.strategy import conciliate_conflicts
 from supvisors.ttypes import AddressStates, SupvisorsStates
-from supvisors.utils import supvisors_short_cuts
+from supvisors.utils import DeferredRequestHeaders, supvisors_short_cuts
 
 
 class AbstractState(object):
@@ -68,14 +68,17 @@ class InitializationState(AbstractState):
         """ When entering in the INITIALIZATION state, reset the status of
         addresses. """
         self.context.master_address = ''
+        self.context.announced_master = ''
         self.start_date = int(time())
+        # addresses that were running when the membership was last saved
+        self.members = self.context.load_membership()
         # clear any existing job
         self.failure_handler.clear_jobs()
         # re-init addresses that are not isolated
         for status in self.context.addresses.values():
             if not status.in_isolation():
                 # do NOT use state setter as transition may be rejected
-                status._state = AddressStates.UNKNOWN
+                status.force_state(AddressStates.UNKNOWN)
 
     def next(self):
         """ Wait for addresses to publish until all are active or timeout. """
@@ -85,6 +88,11 @@ class InitializationState(AbstractState):
             if len(self.context.unknown_addresses()) == 0:
                 # synchro done if the state of all addresses is known
                 return SupvisorsStates.DEPLOYMENT
+            # synchro done if the quorum is reached or if the addresses that
+            # were running at last shutdown are running again
+            if self.quorum_reached(addresses):
+                self.logger.info('synchro quorum reached')
+                return SupvisorsStates.DEPLOYMENT
             # if synchro timeout reached, stop synchro
             # and work with known addresses
             if (time() - self.start_date) > self.supvisors.options.synchro_timeout:
@@ -98,14 +106,30 @@ class InitializationState(AbstractState):
 
     def exit(self):
         """ When leaving the INITIALIZATION state, the working addresses are defined.
-        One of them is elected as the MASTER. """
-        # force state of missing Supvisors instances
-        self.context.end_synchro()
+        One of them is elected as the MASTER.
+        A master already in use by the other Supvisors instances is kept.
+        When the quorum is reached, the missing Supvisors instances are left
+        UNKNOWN so that they can join later. """
+        addresses = self.context.running_addresses()
+        if not self.quorum_reached(addresses):
+            # force state of missing Supvisors instances
+            self.context.end_synchro()
+            addresses = self.context.running_addresses()
         # arbitrarily choice : master address is the 'lowest' address
         # among running addresses
-        addresses = self.context.running_addresses()
         self.logger.info('working with boards {}'.format(addresses))
-        self.context.master_address = min(addresses)
+        if self.context.announced_master in addresses:
+            self.context.master_address = self.context.announced_master
+        else:
+            self.context.master_address = min(addresses)
+
+    def quorum_reached(self, addresses):
+        """ Return True if the running addresses are enough to end the
+        synchronization before the other addresses have published. """
+        quorum = self.supvisors.options.synchro_quorum
+        if quorum and len(addresses) >= quorum:
+            return True
+        return bool(self.members) and self.members.issubset(addresses)
 
 
 class DeploymentState(AbstractState):
@@ -140,14 +164,17 @@ class OperationState(AbstractState):
     def next(self):
         """ Check that all addresses are still active.
         Look after possible conflicts due to multiple running instances
-        of the same program. """
+        of the same program.
+        The loss of the master does not lead back to the INITIALIZATION state
+        as a successor is elected, unless the local address is lost too. """
         # check eventual jobs in progress
         if self.starter.check_starting() and self.stopper.check_stopping():
             # check if master and local are still RUNNING
             if self.context.addresses[self.address].state != AddressStates.RUNNING:
                 return SupvisorsStates.INITIALIZATION
             if self.context.addresses[self.context.master_address].state != AddressStates.RUNNING:
-                return SupvisorsStates.INITIALIZATION
+                if not self.context.elect_master():
+                    return SupvisorsStates.INITIALIZATION
             # check duplicated processes
             if self.context.conflicting():
                 return SupvisorsStates.CONCILIATION
@@ -175,10 +202,11 @@ class ConciliationState(AbstractState):
             local_status = self.context.addresses[self.address]
             if local_status.state != AddressStates.RUNNING:
                 return SupvisorsStates.INITIALIZATION
-            # check if master is still RUNNING
+            # check if master is still RUNNING, or elect a successor
             master_status = self.context.addresses[self.context.master_address]
             if master_status.state != AddressStates.RUNNING:
-                return SupvisorsStates.INITIALIZATION
+                if not self.context.elect_master():
+                    return SupvisorsStates.INITIALIZATION
             # back to OPERATION when there is no conflict anymore
             if not self.context.conflicting():
                 return SupvisorsStates.OPERATION
@@ -283,6 +311,9 @@ class FiniteStateMachine:
         This is also the main event on this state machine. """
         self.context.on_timer_event()
         self.next()
+        # remember the addresses running in a stable state
+        if self.state == SupvisorsStates.OPERATION:
+            self.context.save_membership()
         # fix failures if any (can happen after an address has been invalidated,
         # a process crash or a conciliation request)
         self.failure_handler.trigger_jobs()
@@ -296,30 +327,114 @@ class FiniteStateMachine:
         self.context.on_tick_event(address, when)
         # could call the same behaviour as on_timer_event if necessary
 
+    def on_local_heartbeat(self, relay_time):
+        """ The local heartbeat is the timer of the failure detectors.
+        Return True if a remote Supvisors instance has been invalidated. """
+        return bool(self.context.on_local_heartbeat(relay_time))
+
+    def on_heartbeat_event(self, address):
+        """ This event is used to feed the failure detector of the address. """
+        self.context.on_heartbeat_event(address)
+
     def on_process_event(self, address, event):
         """ This event is used to refresh the process data related
         to the event and address.
         This event also triggers the application starter and/or stopper. """
-        process = self.context.on_process_event(address, event)
-        if process:
-            # check if event is related to a starting or stopping application
-            starting = self.starter.has_application(process.application_name)
-            stopping = self.stopper.has_application(process.application_name)
-            # feed starter with event
-            self.starter.on_event(process)
-            # feed stopper with event
-            self.stopper.on_event(process)
-            # only the master is allowed to trigger an automatic behaviour
-            # for a running failure
-            if self.context.master and process.crashed() and \
-                not (starting or stopping):
+        self.on_process_events([(address, event)])
+
+    def on_process_events(self, events):
+        """ This event is used to refresh the process data related
+        to a batch of events, given as a list of (address, event).
+        The events are processed in sequence so that the application starter
+        and/or stopper are triggered as they would be one event at a time.
+        The application statuses are evaluated and published only once
+        for the whole batch, and the running failures are handled
+        after that.
+        However, the commanders rely on up-to-date application statuses, so
+        the statuses are evaluated event per event while a starting or
+        a stopping is in progress. """
+        processes, crashed = [], []
+        for address, event in events:
+            process = self.context.on_process_event(address, event)
+            if process:
+                if self.starter.in_progress() or self.stopper.in_progress():
+                    self.context.publish_process_status([process])
+                else:
+                    processes.append(process)
+                # check if event is related to a starting or stopping
+                # application
+                starting = self.starter.has_application(
+                    process.application_name)
+                stopping = self.stopper.has_application(
+                    process.application_name)
+                # feed starter with event
+                self.starter.on_event(process)
+                # feed stopper with event
+                self.stopper.on_event(process)
+                # feed failover incidents with event
+                self.failure_handler.on_event(process)
+                # only the master is allowed to trigger an automatic behaviour
+                # for a running failure
+                if self.context.master and process.crashed() and \
+                    not (starting or stopping):
+                    crashed.append(process)
+        if processes:
+            # refresh and publish process and application statuses
+            self.context.publish_process_status(processes)
+        if crashed:
+            for process in crashed:
                 self.failure_handler.add_default_job(process)
-                self.failure_handler.trigger_jobs()
+            self.failure_handler.trigger_jobs()
+
+    def on_jobs_event(self, address, jobs):
+        """ This event is used to keep a replica of the jobs of the
+        Supvisors master, so that a successor is able to resume them.
+        As only a master publishes its jobs, this event also announces
+        the master in use to a Supvisors instance that has no master.
+        When another master is in use, the lowest master announced by a
+        running address is adopted, so that all the Supvisors instances
+        converge to the same master. """
+        if not self.context.master_address:
+            self.context.announced_master = address
+            return
+        if address != self.context.master_address:
+            status = self.context.addresses.get(address)
+            if address > self.context.master_address or status is None \
+                    or status.state != AddressStates.RUNNING:
+                return
+            self.context.adopt_master(address)
+        if not self.context.master:
+            self.starter.replica = jobs['starter']
+            self.stopper.replica = jobs['stopper']
+
+    def on_request_faults(self, header, faults):
+        """ This event is used to force the state of the processes whose
+        start or stop request has been rejected by their Supervisor,
+        or dropped because the queue of deferred requests is full,
+        instead of waiting for the timeout of the commander. """
+        if header in [DeferredRequestHeaders.START_PROCESS,
+                      DeferredRequestHeaders.START_PROCESSES]:
+            commander = self.starter
+        else:
+            commander = self.stopper
+        for namespec, reason in faults:
+            commander.on_fault(namespec, reason)
+
+    def serial_jobs(self):
+        """ Return the jobs of the commanders in a serializable form. """
+        return {'starter': self.starter.serial_jobs(),
+                'stopper': self.stopper.serial_jobs()}
 
     def on_process_info(self, address_name, info):
         """ This event is used to fill the internal structures with processes
-        available on address. """
+        available on address.
+        The processes restored from the context file and not reported by
+        the address are not handled by its Supervisor anymore. """
         self.context.load_processes(address_name, info)
+        namespecs = self.supvisors.snapshot.obsolete_processes(address_name,
+                                                               info)
+        if namespecs:
+            self.context.unload_processes(address_name, namespecs)
 
     def on_authorization(self, address_name, authorized):
         """ This event is used to finalize the port-knocking
@@ -158,9 +158,12 @@ class StatisticsInstance(object):
                 	self.proc[named_pid] = [new_cpu_value], [new_mem_value]
             else:
                 # init data structures (mem unchanged)
-                self.cpu = [[] for _ in stats[1]]
-                self.io = {intf: ([], []) for intf in stats[3].keys()}
-                self.proc = {(process_name, pid_stats[0]): ([], []) for process_name, pid_stats in stats[4].items()}
+                # keep the history restored from the context file, if any
+                if len(self.cpu) != len(stats[1]):
+                    self.cpu = [[] for _ in stats[1]]
+                self.io = {intf: self.io.get(intf, ([], [])) for intf in stats[3].keys()}
+                self.proc = {(process_name, pid_stats[0]): self.proc.get((process_name, pid_stats[0]), ([], []))
+                    for process_name, pid_stats in stats[4].items()}
             self.ref_stats = stats
 
     # remove first data of all lists if size exceeds depth
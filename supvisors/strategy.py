@@ -17,8 +17,11 @@
 # limitations under the License.
 # ======================================================================
 
+from collections import deque
+from time import time
+
 from supvisors.ttypes import (AddressStates, ConciliationStrategies,
-    StartingStrategies, RunningFailureStrategies)
+    ProcessStates, StartingStrategies, RunningFailureStrategies)
 from supvisors.utils import supvisors_short_cuts
 
 
@@ -32,7 +35,17 @@ class AbstractStrategy(object):
 
 # Strategy management for Starting
 class AbstractStartingStrategy(AbstractStrategy):
-    """ Base class for a starting strategy. """
+    """ Base class for a starting strategy.
+
+    Attributes are:
+
+        - planned_loading: the loading of the processes already placed
+        but not running yet, per address.
+    """
+
+    def __init__(self, supvisors, planned_loading=None):
+        AbstractStrategy.__init__(self, supvisors)
+        self.planned_loading = planned_loading or {}
 
     def is_loading_valid(self, address, expected_loading):
         """ Return True and current loading if remote Supvisors instance is
@@ -42,7 +55,7 @@ class AbstractStartingStrategy(AbstractStrategy):
             self.logger.trace('address {} state={}'.format(
                 address, status.state_string()))
             if status.state == AddressStates.RUNNING:
-                loading = status.loading()
+                loading = status.loading() + self.planned_loading.get(address, 0)
                 self.logger.debug('address={} loading={} expected_loading={}'.format(
                     address, loading, expected_loading))
                 return (loading + expected_loading < 100, loading)
@@ -121,15 +134,18 @@ class MostLoadedStrategy(AbstractStartingStrategy):
         return sorted_addresses[-1][0]  if sorted_addresses else None
 
 
-def get_address(supvisors, strategy, addresses, expected_loading):
+def get_address(supvisors, strategy, addresses, expected_loading,
+                planned_loading=None):
     """ Creates a strategy and let it find an address to start a process
-    having a defined loading. """
+    having a defined loading.
+    The loading of the processes already placed but not running yet can be
+    given, per address. """
     if strategy == StartingStrategies.CONFIG:
-        instance = ConfigStrategy(supvisors)
+        instance = ConfigStrategy(supvisors, planned_loading)
     if strategy == StartingStrategies.LESS_LOADED:
-        instance = LessLoadedStrategy(supvisors)
+        instance = LessLoadedStrategy(supvisors, planned_loading)
     if strategy == StartingStrategies.MOST_LOADED:
-        instance = MostLoadedStrategy(supvisors)
+        instance = MostLoadedStrategy(supvisors, planned_loading)
     # apply strategy result
     return instance.get_address(addresses, expected_loading)
 
@@ -144,7 +160,7 @@ class SenicideStrategy(AbstractStrategy):
         for process in conflicts:
             # determine running address with lower uptime (the youngest)
             saved_address = min(process.addresses,
-                                key=lambda x: process.infos[x]['uptime'])
+                                key=process.uptime)
             self.logger.warn('senicide conciliation: keep {} at {}'.format(
                 process.namespec(), saved_address))
             # stop other processes. work on copy as it may change during iteration
@@ -167,7 +183,7 @@ class InfanticideStrategy(AbstractStrategy):
         for process in conflicts:
             # determine running address with lower uptime (the youngest)
             saved_address = max(process.addresses,
-                                key=lambda x: process.infos[x]['uptime'])
+                                key=process.uptime)
             self.logger.warn('infanticide conciliation: keep {} at {}'.format(
                 process.namespec(), saved_address))
             # stop other processes. work on copy as it may change during iteration
@@ -252,6 +268,84 @@ def conciliate_conflicts(supvisors, strategy, conflicts):
 
 
 # Strategy management for a Running Failure
+class FailoverIncident(object):
+    """ Record of the restart of the processes that were running on a lost
+    address.
+
+    Attributes are:
+
+        - address_name: the name of the lost address,
+        - last_seen: the date of the last sign of life of the address,
+        - detection_time: the date when the address has been declared lost,
+        - start_time: the date when the processes have been requested
+        to start (0 until then),
+        - end_time: the date when all processes have been restored or have
+        failed (0 until then),
+        - processes: the namespecs of the processes to restart,
+        - pending: the processes not restored yet,
+        - failed: the namespecs of the processes that could not be restored.
+    """
+
+    def __init__(self, address_name, last_seen, processes, now):
+        """ Initialization of the attributes. """
+        self.address_name = address_name
+        self.last_seen = last_seen
+        self.detection_time = now
+        self.start_time = 0
+        self.end_time = 0
+        self.processes = sorted(process.namespec() for process in processes)
+        self.pending = set(processes)
+        self.failed = []
+
+    def on_start(self, processes, now):
+        """ Record the date of the first start request. """
+        if not self.start_time and self.pending.intersection(processes):
+            self.start_time = now
+
+    def on_event(self, process, now):
+        """ Update the incident with the new state of the process.
+        Once requested to start, a process is restored when RUNNING and
+        failed when stopped again. """
+        if self.start_time and process in self.pending:
+            if process.state == ProcessStates.RUNNING:
+                self.pending.remove(process)
+            elif process.stopped():
+                self.pending.remove(process)
+                self.failed.append(process.namespec())
+            self.check_end(now)
+
+    def discard(self, application_name, now):
+        """ The processes of the application will not be restarted,
+        so they are considered as failed. """
+        for process in [process for process in self.pending
+                        if process.application_name == application_name]:
+            self.pending.remove(process)
+            self.failed.append(process.namespec())
+        self.check_end(now)
+
+    def check_end(self, now):
+        """ Set the end date when no more process is pending. """
+        if not self.pending and not self.end_time:
+            self.end_time = now
+
+    def serial(self, now):
+        """ Get a serializable form of the incident.
+        The delays are given in seconds. The duration runs from the detection
+        of the loss to the restoration of the last process. """
+        detection_delay = max(self.detection_time - self.last_seen, 0)
+        start_delay = (self.start_time - self.detection_time
+                       if self.start_time else 0)
+        duration = (self.end_time or now) - self.detection_time
+        return {'address_name': self.address_name,
+                'detection_time': self.detection_time,
+                'detection_delay': detection_delay,
+                'start_delay': start_delay,
+                'duration': duration,
+                'processes': self.processes,
+                'failed': sorted(self.failed),
+                'completed': self.end_time > 0}
+
+
 class RunningFailureHandler(AbstractStrategy):
     """ Handler of running failures.
     The strategies are linked to the RunningFailureStrategies enumeration.
@@ -278,8 +372,13 @@ class RunningFailureHandler(AbstractStrategy):
         - continue_process_jobs: the set of processes to be ignored (only for log).
         - start_application_jobs: the set of application to be started (deferred job).
         - start_process_jobs: the set of processes to be started (deferred job).
+        - incidents: the last failover incidents, i.e. the restarts of the
+        processes that were running on a lost address.
     """
 
+    # number of failover incidents kept
+    INCIDENTS_DEPTH = 20
+
     def __init__(self, supvisors):
         AbstractStrategy.__init__(self, supvisors)
         supvisors_short_cuts(self, ['starter', 'stopper'])
@@ -291,6 +390,8 @@ class RunningFailureHandler(AbstractStrategy):
         # the deferred jobs
         self.start_application_jobs = set()
         self.start_process_jobs = set()
+        # the failover records
+        self.incidents = deque(maxlen=self.INCIDENTS_DEPTH)
 
     def clear_jobs(self):
         """ Clear all sets. """
@@ -341,6 +442,30 @@ class RunningFailureHandler(AbstractStrategy):
         iaw the strategy set in process rules and the priorities defined above. """
         self.add_job(process.rules.running_failure_strategy, process)
 
+    def add_incident(self, address_name, last_seen, processes):
+        """ Record a failover incident for the processes that were running
+        on the lost address and that are to be restarted.
+        This method must be called after the jobs have been added. """
+        processes = [process for process in processes
+                     if process in self.restart_process_jobs]
+        if processes:
+            self.logger.warn('failover of {} processes from address {}'.format(
+                len(processes), address_name))
+            self.incidents.append(FailoverIncident(address_name, last_seen,
+                                                   processes, time()))
+
+    def on_event(self, process):
+        """ Update the failover incidents with the new process state. """
+        if self.incidents:
+            now = time()
+            for incident in self.incidents:
+                incident.on_event(process, now)
+
+    def statistics(self):
+        """ Return the failover incidents in a serializable form. """
+        now = time()
+        return [incident.serial(now) for incident in self.incidents]
+
     def trigger_jobs(self):
         """ Trigger the configured strategy when a process of a running
         application crashes. """
@@ -350,6 +475,7 @@ class RunningFailureHandler(AbstractStrategy):
                 self.logger.warn('stop application {}'.format(application_name))
                 application = self.context.applications[application_name]
                 self.stopper.stop_application(application)
+                self.discard_incidents(application_name)
             self.stop_application_jobs = set()
         # consider applications to restart
         if self.restart_application_jobs:
@@ -378,15 +504,32 @@ class RunningFailureHandler(AbstractStrategy):
                     self.start_application_jobs.remove(application)
         # consider processes to start
         if self.start_process_jobs:
-            for process in self.start_process_jobs.copy():
-                if process.stopped():
+            processes = [process for process in self.start_process_jobs
+                         if process.stopped()]
+            if processes:
+                for process in processes:
                     self.logger.warn('restart process {}'.format(
                         process.namespec()))
-                    self.starter.default_start_process(process)
-                    self.start_process_jobs.remove(process)
+                if self.supvisors.options.fast_failover:
+                    # all placements are planned before any request is sent
+                    self.starter.start_processes(
+                        self.supvisors.options.starting_strategy, processes)
+                else:
+                    for process in processes:
+                        self.starter.default_start_process(process)
+                self.start_process_jobs.difference_update(processes)
+                now = time()
+                for incident in self.incidents:
+                    incident.on_start(processes, now)
         # log only the continuation jobs
         if self.continue_process_jobs:
             for process in self.continue_process_jobs:
                 self.logger.info('continue despite of crashed process {}'.format(
                     process.namespec()))
             self.continue_process_jobs = set()
+
+    def discard_incidents(self, application_name):
+        """ The processes of the application will not be restarted. """
+        now = time()
+        for incident in self.incidents:
+            incident.discard(application_name, now)
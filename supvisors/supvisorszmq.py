@@ -19,12 +19,29 @@
 
 import zmq
 
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from uuid import uuid4
+from zmq.utils import jsonapi
+
+from supvisors.codec import SEQUENCE_MASK, decode, encode
 from supvisors.utils import *
 
 # Constant for Zmq sockets
 INPROC_NAME = 'supvisors'
 ZMQ_LINGER = 0
 
+# the relay is replaced if no event is received through it during this number
+# of heartbeat periods. as the local heartbeats are also received through the
+# relay, a silent relay is not forwarding anything anymore.
+# the failure detectors are suspended while the relay is replaced, so that a
+# relay failure is not taken for the failure of all the addresses
+RELAY_PERIODS = 3
+
+# separator of the header and the names in the topics of the events published
+TOPIC_SEPARATOR = u'/'
+
 # reference to the Zmq Context instance
 ZmqContext = zmq.Context.instance()
 
@@ -37,17 +54,32 @@ class InternalEventPublisher(object):
 
         - logger: a reference to the Supvisors logger,
         - address: the address name where this process is running,
+        - legacy_codec: when True, the events are pickled instead of being
+        encoded with the binary codec,
+        - epoch: the identifier of this publisher, so that the sequence numbers
+        of a restarted Supvisors instance are not confused with the previous ones,
+        - sequence: the sequence number of the last event published,
+        - process_events: the last process event published and its sequence
+        number, per process,
+        - lock: the lock protecting the socket and the sequence number,
+        as the heartbeats are published from the Supvisors thread,
         - socket: the ZeroMQ socket with a PUBLISH pattern,
         bound on the internal_port defined in the ['supvisors'] section
         of the Supervisor configuration file.
     """
 
-    def __init__(self, address, port, logger):
+    def __init__(self, address, port, logger, legacy_codec=False):
         """ Initialization of the attributes. """
         # keep a reference to supvisors
         self.logger = logger
         # get local address
         self.address = address
+        self.legacy_codec = legacy_codec
+        # sequence numbers are used by subscribers to detect lost events
+        self.epoch = uuid4().hex
+        self.sequence = 0
+        self.process_events = {}
+        self.lock = Lock()
         # create ZMQ socket
         self.socket = ZmqContext.socket(zmq.PUB)
         url = 'tcp://*:{}'.format(port)
@@ -61,38 +93,105 @@ class InternalEventPublisher(object):
     def send_tick_event(self, payload):
         """ Publishes the tick event with ZeroMQ. """
         self.logger.trace('send TickEvent {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.TICK,
-                                self.address, payload))
+        self.send(InternalEventHeaders.TICK, payload)
 
     def send_process_event(self, payload):
         """ Publishes the process event with ZeroMQ. """
         self.logger.trace('send ProcessEvent {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.PROCESS,
-                                self.address, payload))
+        self.send(InternalEventHeaders.PROCESS, payload)
+        # keep the last event per process for resynchronization
+        self.process_events[(payload['group'], payload['name'])] = \
+            self.sequence, payload
 
     def send_statistics(self, payload):
         """ Publishes the statistics with ZeroMQ. """
         self.logger.trace('send Statistics {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.STATISTICS,
-                                self.address, payload))
+        self.send(InternalEventHeaders.STATISTICS, payload)
+
+    def send_jobs(self, payload):
+        """ Publishes the jobs of the commanders with ZeroMQ. """
+        self.logger.trace('send Jobs {}'.format(payload))
+        self.send(InternalEventHeaders.JOBS, payload)
+
+    def send_heartbeat(self):
+        """ Publishes a heartbeat with ZeroMQ.
+        This method is called from the Supvisors thread.
+        The heartbeat does not consume any sequence number as it does not
+        change the state of the Supvisors instance. """
+        with self.lock:
+            self._send(InternalEventHeaders.HEARTBEAT, {})
+
+    def send(self, event_type, payload):
+        """ Encodes and publishes the event with ZeroMQ. """
+        with self.lock:
+            self.sequence = (self.sequence + 1) & SEQUENCE_MASK
+            self._send(event_type, payload)
+
+    def _send(self, event_type, payload):
+        """ Encodes and publishes the event with the epoch and the current
+        sequence number.
+        The legacy codec is used to communicate with Supvisors instances
+        that cannot decode the binary codec (rolling upgrade).
+        The lock must be held by the caller. """
+        if self.legacy_codec:
+            self.socket.send_pyobj((event_type, self.address, payload))
+        else:
+            self.socket.send(encode(event_type, self.address, self.epoch,
+                                    self.sequence, payload))
+
+    def process_events_since(self, sequence):
+        """ Return the last process events published after the sequence
+        number, with their sequence number. """
+        return [(event_sequence, payload)
+                for event_sequence, payload in self.process_events.values()
+                if event_sequence > sequence]
 
 
 class InternalEventSubscriber(object):
     """ Class for subscription to Listener events.
 
+    The subscriber is either connected to all the addresses expected,
+    or connected to one relay that forwards the events of all the addresses.
+    In the latter case, the relay is replaced by the next relay of the list
+    when no event is received through it during RELAY_PERIODS heartbeat
+    periods, or when it is disconnected.
+    The events of the addresses that are not expected, e.g. the local address
+    or the isolated addresses, are discarded.
+
     Attributes:
         - port: the port number used for internal events,
+        - addresses: the addresses whose events are expected,
+        - relays: the addresses of the relays, in the order of use,
+        - relay_port: the port number used by the relays,
+        - relay: the address of the relay connected, None if the addresses
+        are directly connected,
+        - relay_timeout: the time in seconds after which a silent relay is
+        replaced,
+        - receive_time: the date of the last event received through the relay
+        or of the connection of the relay,
+        - event_time: the date of the last event received through any relay,
         - socket: the PyZMQ subscriber.
     """
 
-    def __init__(self, addresses, port):
+    def __init__(self, addresses, port, relays=(), relay_port=None,
+                 heartbeat_period=1.0):
         """ Initialization of the attributes. """
         self.port = port
+        self.addresses = set(addresses)
+        self.relays = list(relays)
+        self.relay_port = relay_port
+        self.relay_timeout = RELAY_PERIODS * heartbeat_period
+        self.relay = None
+        self.receive_time = self.event_time = time()
         self.socket = ZmqContext.socket(zmq.SUB)
-        # connect all addresses
-        for address in addresses:
-            url = 'tcp://{}:{}'.format(address, self.port)
-            self.socket.connect(url)
+        if self.relays:
+            # connect the first relay
+            self.connect_relay(self.relays[0])
+        else:
+            # connect all addresses
+            for address in addresses:
+                url = 'tcp://{}:{}'.format(address, self.port)
+                self.socket.connect(url)
         self.socket.setsockopt(zmq.SUBSCRIBE, '')
 
     def close(self):
@@ -100,24 +199,153 @@ class InternalEventSubscriber(object):
         self.socket.close(ZMQ_LINGER)
 
     def receive(self):
-        """ Reception and pyobj de-serialization of one message. """
-        return self.socket.recv_pyobj(zmq.NOBLOCK)
+        """ Reception and decoding of one message, returned as a tuple
+        (event_type, address, epoch, sequence, payload).
+        Both binary and pickled messages are accepted.
+        The messages of the addresses not expected are skipped. """
+        while True:
+            data = self.socket.recv(zmq.NOBLOCK)
+            # any message received, even undecodable, proves the relay alive
+            if self.relay:
+                self.receive_time = self.event_time = time()
+            message = decode(data)
+            if message[1] in self.addresses:
+                return message
 
     def disconnect(self, addresses):
         """ This method disconnects from the PyZMQ socket all addresses
-        passed in parameter. """
+        passed in parameter.
+        If the relay is part of them, the next relay is connected. """
+        for address in self.addresses.intersection(addresses):
+            self.addresses.discard(address)
+            if not self.relay:
+                url = 'tcp://{}:{}'.format(address, self.port)
+                self.socket.disconnect(url)
+        if self.relay in addresses:
+            self.failover()
+
+    def connect_relay(self, relay):
+        """ Connect the relay to the PyZMQ socket. """
+        self.relay = relay
+        self.receive_time = time()
+        url = 'tcp://{}:{}'.format(relay, self.relay_port)
+        self.socket.connect(url)
+
+    def failover(self):
+        """ Replace the relay connected by the next relay of the list.
+        The events lost in between are detected by their sequence number. """
+        url = 'tcp://{}:{}'.format(self.relay, self.relay_port)
+        self.socket.disconnect(url)
+        index = self.relays.index(self.relay)
+        self.connect_relay(self.relays[(index + 1) % len(self.relays)])
+
+    def check_relay(self):
+        """ Replace the relay connected if no event has been received
+        through it for too long.
+        Return True if the relay has been replaced. """
+        if self.relay and time() - self.receive_time > self.relay_timeout:
+            self.failover()
+            return True
+        return False
+
+
+class RelayForwarder(object):
+    """ Class used by a relay to forward the internal events of all the
+    addresses to the Supvisors instances connected to it.
+
+    The forwarding is performed from the Supvisors thread.
+    The subscriptions of the Supvisors instances are forwarded the other way.
+
+    Attributes:
+        - frontend: the PyZMQ socket with a XSUB pattern, connected to the
+        internal_port of all the addresses,
+        - backend: the PyZMQ socket with a XPUB pattern, bound on the
+        relay_port defined in the ['supvisors'] section of the Supervisor
+        configuration file.
+    """
+
+    def __init__(self, addresses, port, relay_port):
+        """ Initialization of the attributes. """
+        self.frontend = ZmqContext.socket(zmq.XSUB)
         for address in addresses:
-            url = 'tcp://{}:{}'.format(address, self.port)
-            self.socket.disconnect(url)
+            url = 'tcp://{}:{}'.format(address, port)
+            self.frontend.connect(url)
+        self.backend = ZmqContext.socket(zmq.XPUB)
+        self.backend.bind('tcp://*:{}'.format(relay_port))
+
+    def close(self):
+        """ This method closes the PyZMQ sockets. """
+        self.backend.close(ZMQ_LINGER)
+        self.frontend.close(ZMQ_LINGER)
+
+    def forward(self, socks):
+        """ Forward all the messages available on the sockets polled. """
+        for source, target in [(self.frontend, self.backend),
+                               (self.backend, self.frontend)]:
+            if socks.get(source) == zmq.POLLIN:
+                while True:
+                    try:
+                        message = source.recv_multipart(zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    target.send_multipart(message)
+
+
+def make_topic(header, *names):
+    """ Return the topic of an event published, made of the header and the
+    names of the entity concerned, e.g. process/<application>/<process>/.
+    The topic ends with the separator, so that a subscription to a name
+    does not match a longer name. """
+    return TOPIC_SEPARATOR.join((header, ) + names + (u'', ))
+
+
+def topic_header(topic):
+    """ Return the header of the topic. """
+    return topic.split(TOPIC_SEPARATOR, 1)[0]
 
 
 class EventPublisher(object):
-    """ Class for ZMQ publication of Supvisors events. """
+    """ Class for ZMQ publication of Supvisors events.
+
+    Each message is published under a topic made of the header and the names
+    of the entity concerned, so that a client is able to subscribe to
+    a single address, application or process.
+    Each message is also published with a sequence number, so that a client
+    is able to match the messages received with the snapshot of the last
+    statuses.
+
+    In conflating mode, the statuses are not published immediately.
+    Only the last status of each entity is kept and published when flushing,
+    which is done periodically from the Supvisors thread.
+    The process events are always published immediately.
+
+    Attributes are:
+
+        - logger: a reference to the Supvisors logger,
+        - conflating: True if the statuses are conflated,
+        - sequence: the sequence number of the last message published,
+        - cache: the last status published and its JSON encoding, per topic,
+        - pending: the last status not published yet, per topic
+        (conflating mode only),
+        - lock: the lock protecting the socket, the sequence number and the
+        caches, as the snapshot and the flush are performed from the
+        Supvisors thread,
+        - socket: the ZeroMQ socket with a PUBLISH pattern, bound on the
+        event_port defined in the ['supvisors'] section of the Supervisor
+        configuration file.
+    """
 
-    def __init__(self, port, logger):
+    def __init__(self, port, logger, hwm=1000, conflating=False):
         """ Initialization of the attributes. """
         self.logger = logger
+        self.conflating = conflating
+        self.sequence = 0
+        self.cache = {}
+        self.pending = OrderedDict()
+        self.lock = Lock()
         self.socket = ZmqContext.socket(zmq.PUB)
+        # the high water mark must be set before binding
+        self.socket.setsockopt(zmq.SNDHWM, hwm)
         # WARN: this is a local binding, only visible to processes
         # located on the same address
         url = 'tcp://127.0.0.1:%d' % port
@@ -125,29 +353,31 @@ class EventPublisher(object):
         self.socket.bind(url)
 
     def close(self):
-        """ This method closes the PyZMQ socket. """
+        """ This method publishes the pending statuses and closes the PyZMQ
+        socket. """
+        self.flush()
         self.socket.close(ZMQ_LINGER)
 
     def send_supvisors_status(self, status):
         """ This method sends a serialized form of the supvisors status
         through the socket. """
         self.logger.trace('send SupvisorsStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.SUPVISORS, zmq.SNDMORE)
-        self.socket.send_json(status.serial())
+        self.send(make_topic(EventHeaders.SUPVISORS), status.serial())
 
     def send_address_status(self, status):
         """ This method sends a serialized form of the address status
         through the socket. """
         self.logger.trace('send RemoteStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.ADDRESS, zmq.SNDMORE)
-        self.socket.send_json(status.serial())
+        data = status.serial()
+        self.send(make_topic(EventHeaders.ADDRESS, data['address_name']), data)
 
     def send_application_status(self, status):
         """ This method sends a serialized form of the application status
         through the socket. """
         self.logger.trace('send ApplicationStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.APPLICATION, zmq.SNDMORE)
-        self.socket.send_json(status.serial())
+        data = status.serial()
+        self.send(make_topic(EventHeaders.APPLICATION,
+                             data['application_name']), data)
 
     def send_process_event(self, address, event):
         """ This method sends a process event through the socket. """
@@ -155,15 +385,108 @@ class EventPublisher(object):
         evt = event.copy()
         evt['address'] = address
         self.logger.trace('send Process Event {}'.format(evt))
-        self.socket.send_string(EventHeaders.PROCESS_EVENT, zmq.SNDMORE)
-        self.socket.send_json(evt)
+        # the events are not kept in the cache
+        self.send(make_topic(EventHeaders.PROCESS_EVENT, evt['group'],
+                             evt['name']), evt, False)
 
     def send_process_status(self, status):
         """ This method sends a serialized form of the process status
         through the socket. """
         self.logger.trace('send Process Status {}'.format(status))
-        self.socket.send_string(EventHeaders.PROCESS_STATUS, zmq.SNDMORE)
-        self.socket.send_json(status.serial())
+        data = status.serial()
+        self.send(make_topic(EventHeaders.PROCESS_STATUS,
+                             data['application_name'], data['process_name']),
+                  data)
+
+    def send(self, topic, data, status=True):
+        """ Publish the data, or keep it until the next flush in conflating
+        mode. Only the statuses are kept in the cache. """
+        with self.lock:
+            if self.conflating and status:
+                self.pending[topic] = data
+            else:
+                self._publish(topic, data, status)
+
+    def flush(self):
+        """ Publish the statuses kept in conflating mode. """
+        with self.lock:
+            pending, self.pending = self.pending, OrderedDict()
+            for topic, data in pending.items():
+                self._publish(topic, data, True)
+
+    def _publish(self, topic, data, status):
+        """ Send a three-parts message: the topic, the data encoded in JSON
+        and the sequence number.
+        The status objects return the same data until they change, so the
+        JSON encoding of the cache is re-used when the data is unchanged.
+        The frames are not copied by ZeroMQ.
+        The lock must be held by the caller. """
+        self.sequence = (self.sequence + 1) & SEQUENCE_MASK
+        if status:
+            cached_data, frame = self.cache.get(topic, (None, None))
+            if data is not cached_data:
+                frame = jsonapi.dumps(data)
+                self.cache[topic] = data, frame
+        else:
+            frame = jsonapi.dumps(data)
+        self.socket.send_multipart([topic.encode('utf-8'), frame,
+                                    str(self.sequence)], copy=False)
+
+    def snapshot(self, prefixes):
+        """ Return the sequence number of the last message published and the
+        last statuses published whose topic starts with one of the prefixes.
+        Such a snapshot includes all the messages published up to this
+        sequence number. """
+        with self.lock:
+            return {'sequence': self.sequence,
+                    'events': [[topic_header(topic), data]
+                               for topic, (data, _) in sorted(self.cache.items())
+                               if any(topic.startswith(prefix)
+                                      for prefix in prefixes)]}
+
+
+class SnapshotServer(object):
+    """ Class for serving the last statuses published by the EventPublisher,
+    so that a client connecting late does not have to wait for the next
+    change to know the current state.
+
+    The request is the list of topic prefixes the client has subscribed to,
+    encoded in JSON.
+    The reply is the structure returned by EventPublisher.snapshot,
+    encoded in JSON.
+
+    Attributes are:
+
+        - publisher: the EventPublisher holding the last statuses,
+        - socket: the ZeroMQ socket with a REPLY pattern, bound on the
+        snapshot_port defined in the ['supvisors'] section of the Supervisor
+        configuration file.
+    """
+
+    def __init__(self, publisher, port):
+        """ Initialization of the attributes.
+        The Supervisor logger cannot be used here (not thread-safe). """
+        self.publisher = publisher
+        self.socket = ZmqContext.socket(zmq.REP)
+        # WARN: this is a local binding, only visible to processes
+        # located on the same address
+        url = 'tcp://127.0.0.1:%d' % port
+        self.socket.bind(url)
+
+    def close(self):
+        """ This method closes the PyZMQ socket. """
+        self.socket.close(ZMQ_LINGER)
+
+    def reply(self):
+        """ Receive a snapshot request and send the snapshot.
+        The REPLY pattern requires a reply, even to an invalid request. """
+        try:
+            prefixes = self.socket.recv_json()
+            if not isinstance(prefixes, list):
+                raise ValueError('list expected')
+        except ValueError:
+            prefixes = []
+        self.socket.send_json(self.publisher.snapshot(prefixes))
 
 
 class EventSubscriber(object):
@@ -181,13 +504,17 @@ class EventSubscriber(object):
 
     Attributes:
 
+        - zmq_context: the ZeroMQ context used to create the sockets,
         - logger: the reference to the logger,
+        - subscriptions: the topic prefixes subscribed to,
         - socket: the ZeroMQ socket connected to **Supvisors**.
     """
 
     def __init__(self, zmq_context, port, logger):
         """ Initialization of the attributes. """
+        self.zmq_context = zmq_context
         self.logger = logger
+        self.subscriptions = set()
         # create ZeroMQ socket
         self.socket = zmq_context.socket(zmq.SUB)
         # WARN: this is a local binding, only visible to processes
@@ -202,71 +529,154 @@ class EventSubscriber(object):
         self.socket.close(ZMQ_LINGER)
 
     # subscription part
+    # the address, application and process subscriptions can be restricted
+    # to a single entity.
     def subscribe_all(self):
         """ Subscription to all events. """
-        self.socket.setsockopt(zmq.SUBSCRIBE, '')
+        self.subscribe(u'')
 
     def subscribe_supvisors_status(self):
         """ Subscription to Supvisors Status messages. """
-        self.subscribe(EventHeaders.SUPVISORS)
+        self.subscribe(self.topic(EventHeaders.SUPVISORS))
 
-    def subscribe_address_status(self):
+    def subscribe_address_status(self, address_name=None):
         """ Subscription to Address Status messages. """
-        self.subscribe(EventHeaders.ADDRESS)
+        self.subscribe(self.topic(EventHeaders.ADDRESS, address_name))
 
-    def subscribe_application_status(self):
+    def subscribe_application_status(self, application_name=None):
         """ Subscription to Application Status messages. """
-        self.subscribe(EventHeaders.APPLICATION)
+        self.subscribe(self.topic(EventHeaders.APPLICATION, application_name))
 
-    def subscribe_process_event(self):
+    def subscribe_process_event(self, application_name=None,
+                                process_name=None):
         """ Subscription to Process Event messages. """
-        self.subscribe(EventHeaders.PROCESS_EVENT)
+        self.subscribe(self.topic(EventHeaders.PROCESS_EVENT,
+                                  application_name, process_name))
 
-    def subscribe_process_status(self):
+    def subscribe_process_status(self, application_name=None,
+                                 process_name=None):
         """ Subscription to Process Status messages. """
-        self.subscribe(EventHeaders.PROCESS_STATUS)
+        self.subscribe(self.topic(EventHeaders.PROCESS_STATUS,
+                                  application_name, process_name))
+
+    def subscribe_application(self, application_name):
+        """ Subscription to the Application Status messages, the Process
+        Status messages and the Process Event messages of the application. """
+        self.subscribe_application_status(application_name)
+        self.subscribe_process_status(application_name)
+        self.subscribe_process_event(application_name)
 
     def subscribe(self, code):
         """ Subscription to the event named code. """
+        self.subscriptions.add(code)
         self.socket.setsockopt(zmq.SUBSCRIBE, code.encode('utf-8'))
 
     # unsubscription part
     def unsubscribe_all(self):
         """ Subscription to all events. """
-        self.socket.setsockopt(zmq.UNSUBSCRIBE, '')
+        self.unsubscribe(u'')
 
     def unsubscribe_supvisors_status(self):
         """ Subscription to Supvisors Status messages. """
-        self.unsubscribe(EventHeaders.SUPVISORS)
+        self.unsubscribe(self.topic(EventHeaders.SUPVISORS))
 
-    def unsubscribe_address_status(self):
+    def unsubscribe_address_status(self, address_name=None):
         """ Subscription to Address Status messages. """
-        self.unsubscribe(EventHeaders.ADDRESS)
+        self.unsubscribe(self.topic(EventHeaders.ADDRESS, address_name))
 
-    def unsubscribe_application_status(self):
+    def unsubscribe_application_status(self, application_name=None):
         """ Subscription to Application Status messages. """
-        self.unsubscribe(EventHeaders.APPLICATION)
+        self.unsubscribe(self.topic(EventHeaders.APPLICATION,
+                                    application_name))
 
-    def unsubscribe_process_event(self):
+    def unsubscribe_process_event(self, application_name=None,
+                                  process_name=None):
         """ Subscription to Process Event messages. """
-        self.unsubscribe(EventHeaders.PROCESS_EVENT)
+        self.unsubscribe(self.topic(EventHeaders.PROCESS_EVENT,
+                                    application_name, process_name))
 
-    def unsubscribe_process_status(self):
+    def unsubscribe_process_status(self, application_name=None,
+                                   process_name=None):
         """ Subscription to Process Status messages. """
-        self.unsubscribe(EventHeaders.PROCESS_STATUS)
+        self.unsubscribe(self.topic(EventHeaders.PROCESS_STATUS,
+                                    application_name, process_name))
+
+    def unsubscribe_application(self, application_name):
+        """ Remove subscription to the Application Status messages,
+        the Process Status messages and the Process Event messages
+        of the application. """
+        self.unsubscribe_application_status(application_name)
+        self.unsubscribe_process_status(application_name)
+        self.unsubscribe_process_event(application_name)
 
     def unsubscribe(self, code):
         """ Remove subscription to the event named code. """
+        self.subscriptions.discard(code)
         self.socket.setsockopt(zmq.UNSUBSCRIBE, code.encode('utf-8'))
 
+    @staticmethod
+    def topic(header, *names):
+        """ Return the topic prefix used to subscribe to the header,
+        restricted to the names given, until the first None.
+        As the topics published, the prefix ends with the separator,
+        so that it does not match a longer name. """
+        topic = [header]
+        for name in names:
+            if name is None:
+                break
+            topic.append(name)
+        return make_topic(*topic)
+
     # reception part
     def receive(self):
         """ Reception of two-parts message:
 
             - header as an unicode string,
             - data encoded in JSON.
+
+        The sequence number is discarded.
+        The header is extracted from the topic of the message.
+        """
+        return self.receive_sequenced()[1:]
+
+    def receive_sequenced(self):
+        """ Reception of three-parts message:
+
+            - topic as an unicode string,
+            - data encoded in JSON,
+            - sequence number as an unicode string.
+
+        The header is extracted from the topic of the message.
+        The sequence number returned is None if the message does not include
+        it (older **Supvisors** versions).
         """
-        return self.socket.recv_string(), self.socket.recv_json()
+        header = topic_header(self.socket.recv_string())
+        data = self.socket.recv_json()
+        sequence = None
+        if self.socket.getsockopt(zmq.RCVMORE):
+            sequence = int(self.socket.recv_string())
+        return sequence, header, data
+
+    # snapshot part
+    def request_snapshot(self, port, timeout=5000):
+        """ Request the last statuses published by **Supvisors**, restricted
+        to the subscriptions, using the snapshot port.
+        Return the sequence number of the last message included in the
+        snapshot and the list of (header, data), or None if **Supvisors**
+        did not reply within the timeout (in milliseconds). """
+        socket = self.zmq_context.socket(zmq.REQ)
+        try:
+            url = 'tcp://127.0.0.1:%d' % port
+            self.logger.debug('requesting snapshot to Supvisors at %s' % url)
+            socket.connect(url)
+            socket.send_json(sorted(self.subscriptions))
+            if socket.poll(timeout):
+                snapshot = socket.recv_json()
+                return snapshot['sequence'], [tuple(event)
+                    for event in snapshot['events']]
+            self.logger.warn('no snapshot received from Supvisors')
+        finally:
+            socket.close(ZMQ_LINGER)
 
 
 class RequestPuller(object):
@@ -292,9 +702,9 @@ class RequestPuller(object):
         """ This method closes the PyZMQ socket. """
         self.socket.close(ZMQ_LINGER)
 
-    def receive(self):
+    def receive(self, flags=0):
         """ Reception and pyobj unserialization of one message. """
-        return self.socket.recv_pyobj()
+        return self.socket.recv_pyobj(flags)
 
 
 class RequestPusher(object):
@@ -302,7 +712,9 @@ class RequestPusher(object):
 
     Attributes:
         - logger: a reference to the Supvisors logger,
-        - socket: the PyZMQ pusher.
+        - socket: the PyZMQ pusher,
+        - unsent: the number of requests that could not be pushed
+        because the channel was full.
 
     As it uses an inproc transport, this implies the following conditions:
         - the RequestPusher instance and the RequestPuller instance MUST share
@@ -314,6 +726,7 @@ class RequestPusher(object):
     def __init__(self, logger):
         """ Initialization of the attributes. """
         self.logger = logger
+        self.unsent = 0
         self.socket = ZmqContext.socket(zmq.PUSH)
         url = 'inproc://' + INPROC_NAME
         self.logger.info('binding RequestPuller to %s' % url)
@@ -323,67 +736,73 @@ class RequestPusher(object):
         """ This method closes the PyZMQ socket. """
         self.socket.close(ZMQ_LINGER)
 
-    def send_check_address(self, address_name):
-        """ Send request to check address. """
+    def send_check_address(self, address_name, namespecs=()):
+        """ Send request to check address.
+        namespecs are the processes whose information must be reloaded,
+        even if unchanged since the last check. """
         self.logger.trace('send CHECK_ADDRESS {}'.format(address_name))
-        try:
-            self.socket.send_pyobj((DeferredRequestHeaders.CHECK_ADDRESS,
-                                    (address_name, )),
-                                   zmq.NOBLOCK)
-        except zmq.error.Again:
-            self.logger.error('CHECK_ADDRESS not sent')
+        self.send(DeferredRequestHeaders.CHECK_ADDRESS,
+                  (address_name, list(namespecs)))
 
     def send_isolate_addresses(self, address_names):
         """ Send request to isolate address. """
         self.logger.trace('send ISOLATE_ADDRESSES {}'.format(address_names))
-        try:
-            self.socket.send_pyobj((DeferredRequestHeaders.ISOLATE_ADDRESSES,
-                                    address_names),
-                                   zmq.NOBLOCK)
-        except zmq.error.Again:
-            self.logger.error('ISOLATE_ADDRESSES not sent')
+        self.send(DeferredRequestHeaders.ISOLATE_ADDRESSES, address_names)
 
     def send_start_process(self, address_name, namespec, extra_args):
         """ Send request to start process. """
         self.logger.trace('send START_PROCESS {} to {} with {}'.format(
             namespec, address_name, extra_args))
-        try:
-            self.socket.send_pyobj((DeferredRequestHeaders.START_PROCESS,
-                                    (address_name, namespec, extra_args)),
-                                   zmq.NOBLOCK)
-        except zmq.error.Again:
-            self.logger.error('START_PROCESS not sent')
+        self.send(DeferredRequestHeaders.START_PROCESS,
+                  (address_name, namespec, extra_args))
 
     def send_stop_process(self, address_name, namespec):
         """ Send request to stop process. """
         self.logger.trace('send STOP_PROCESS {} to {}'.format(
             namespec, address_name))
-        try:
-            self.socket.send_pyobj((DeferredRequestHeaders.STOP_PROCESS,
-                                    (address_name, namespec)),
-                                   zmq.NOBLOCK)
-        except zmq.error.Again:
-            self.logger.error('STOP_PROCESS not sent')
+        self.send(DeferredRequestHeaders.STOP_PROCESS,
+                  (address_name, namespec))
+
+    def send_start_processes(self, address_name, processes):
+        """ Send request to start processes on the same address.
+        processes is a list of (namespec, extra_args). """
+        self.logger.trace('send START_PROCESSES {} to {}'.format(
+            processes, address_name))
+        self.send(DeferredRequestHeaders.START_PROCESSES,
+                  (address_name, processes))
+
+    def send_stop_processes(self, address_name, namespecs):
+        """ Send request to stop processes on the same address. """
+        self.logger.trace('send STOP_PROCESSES {} to {}'.format(
+            namespecs, address_name))
+        self.send(DeferredRequestHeaders.STOP_PROCESSES,
+                  (address_name, namespecs))
 
     def send_restart(self, address_name):
         """ Send request to restart a Supervisor. """
         self.logger.trace('send RESTART {}'.format(address_name))
-        try:
-            self.socket.send_pyobj((DeferredRequestHeaders.RESTART,
-                                    (address_name, )),
-                                   zmq.NOBLOCK)
-        except zmq.error.Again:
-            self.logger.error('RESTART not sent')
+        self.send(DeferredRequestHeaders.RESTART, (address_name, ))
 
     def send_shutdown(self, address_name):
         """ Send request to shutdown a Supervisor. """
         self.logger.trace('send SHUTDOWN {}'.format(address_name))
+        self.send(DeferredRequestHeaders.SHUTDOWN, (address_name, ))
+
+    def send_save_context(self, filename, data):
+        """ Send request to write the context file.
+        The file name is used by the executor to serialize the writings. """
+        self.logger.trace('send SAVE_CONTEXT {}'.format(filename))
+        self.send(DeferredRequestHeaders.SAVE_CONTEXT, (filename, data))
+
+    def send(self, header, body):
+        """ Push the request without blocking.
+        A request that cannot be pushed is counted and logged. """
         try:
-            self.socket.send_pyobj((DeferredRequestHeaders.SHUTDOWN,
-                                    (address_name, )),
-                                   zmq.NOBLOCK)
+            self.socket.send_pyobj((header, body), zmq.NOBLOCK)
         except zmq.error.Again:
-            self.logger.error('SHUTDOWN not sent')
+            self.unsent += 1
+            self.logger.error('{} not sent'.format(
+                enum_to_string(DeferredRequestHeaders.__dict__, header)))
 
 
 class SupervisorZmq():
@@ -397,11 +816,14 @@ class SupervisorZmq():
         """ Create the sockets. """
         self.publisher = EventPublisher(
             supvisors.options.event_port,
-            supvisors.logger)
+            supvisors.logger,
+            supvisors.options.event_hwm,
+            supvisors.options.event_conflation_period > 0)
         self.internal_publisher = InternalEventPublisher(
             supvisors.address_mapper.local_address,
             supvisors.options.internal_port,
-            supvisors.logger)
+            supvisors.logger,
+            supvisors.options.legacy_codec)
         self.pusher = RequestPusher(
             supvisors.logger)
 
@@ -418,13 +840,35 @@ class SupvisorsZmq():
 
     def __init__(self, supvisors):
         """ Create the sockets.
-        The Supervisor logger cannot be used here (not thread-safe). """
+        The Supervisor logger cannot be used here (not thread-safe).
+        The local address is not connected to the internal subscriber
+        as the local events are applied directly in the Supervisor thread. """
+        options = supvisors.options
+        local_address = supvisors.address_mapper.local_address
+        addresses = supvisors.address_mapper.addresses
+        # a relay uses itself first
+        relays = sorted(options.relay_list,
+                        key=lambda relay: relay != local_address)
         self.internal_subscriber = InternalEventSubscriber(
-            supvisors.address_mapper.addresses,
-            supvisors.options.internal_port)
+            [address for address in addresses if address != local_address],
+            options.internal_port, relays, options.relay_port,
+            options.heartbeat_period / 1000.0)
+        self.relay = None
+        if local_address in relays:
+            self.relay = RelayForwarder(addresses, options.internal_port,
+                                        options.relay_port)
         self.puller = RequestPuller()
+        # the publishers are created in the Supervisor thread
+        self.internal_publisher = supvisors.zmq.internal_publisher
+        self.publisher = supvisors.zmq.publisher
+        self.snapshot_server = SnapshotServer(
+            self.publisher,
+            supvisors.options.snapshot_port)
 
     def close(self):
         """ Close the sockets. """
+        self.snapshot_server.close()
         self.puller.close()
         self.internal_subscriber.close()
+        if self.relay:
+            self.relay.close()
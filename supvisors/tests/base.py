@@ -23,6 +23,7 @@ import random
 from mock import patch, Mock
 
 from supervisor.loggers import Logger
+from supervisor.medusa import asyncore_25 as asyncore
 from supervisor.rpcinterface import SupervisorNamespaceRPCInterface
 from supervisor.states import RUNNING_STATES, STOPPED_STATES
 
@@ -47,13 +48,30 @@ class DummyOptions:
         # configuration options
         self.internal_port = 65100
         self.event_port = 65200
+        self.snapshot_port = 65300
+        self.relay_list = []
+        self.relay_port = 65400
+        self.event_hwm = 1000
+        self.event_conflation_period = 0
         self.synchro_timeout = 10
+        self.synchro_quorum = 0
+        self.membership_file = ''
+        self.heartbeat_period = 1000
+        self.phi_threshold = 8
+        self.event_batch_size = 100
+        self.legacy_codec = False
+        self.request_workers = 4
+        self.request_queue_depth = 1000
+        self.request_timeouts = {0: 30, 2: 10, 3: 10, 4: 10, 5: 10}
         self.auto_fence = True
         self.rules_file = ''
         self.starting_strategy = 0
+        self.fast_failover = False
         self.conciliation_strategy = 0
         self.stats_periods = 5, 15, 60
         self.stats_histo = 10
+        self.context_file = ''
+        self.context_period = 60
         # additional process configuration
         self.procnumbers = {'xclock': 2}
 
@@ -70,6 +88,7 @@ class MockedSupvisors:
         self.context.__init__()
         self.context.addresses = {}
         self.context.applications = {}
+        self.context.load_membership.return_value = set()
         # simple mocks
         self.fsm = Mock()
         self.pool = Mock()
@@ -95,6 +114,9 @@ class MockedSupvisors:
         from supvisors.supvisorszmq import SupvisorsZmq
         self.zmq = Mock(spec=SupvisorsZmq)
         self.zmq.__init__()
+        from supvisors.snapshot import ContextSnapshot
+        self.snapshot = Mock(spec=ContextSnapshot,
+                             **{'obsolete_processes.return_value': []})
 
 
 class DummyRpcHandler:
@@ -118,6 +140,12 @@ class DummyRpcInterface:
         with patch('supvisors.rpcinterface.Supvisors',
                    side_effect=create_supvisors):
             self.supvisors = RPCInterface(supervisord)
+        # mock the transport
+        self.transport = Mock()
+
+    def __call__(self, attr):
+        """ Same as ServerProxy: access to the transport and its closure. """
+        return self.transport if attr == 'transport' else self.transport.close
 
 
 class DummyHttpServer:
@@ -144,6 +172,8 @@ class DummyServerOptions:
         self.storage = None
     def close_httpservers(self):
         self.storage = self.httpservers
+    def get_socket_map(self):
+        return asyncore.socket_map
 
 
 class DummyProcess:
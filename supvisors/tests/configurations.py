@@ -78,12 +78,29 @@ rules_file=my_movies.xml
 auto_fence=true
 internal_port=60001
 event_port=60002
+snapshot_port=60003
+relay_list=cliche02,cliche01
+relay_port=60004
+event_hwm=500
+event_conflation_period=200
 synchro_timeout=20
+synchro_quorum=2
+membership_file=/tmp/supvisors.members
+heartbeat_period=500
+phi_threshold=10.5
+event_batch_size=50
+legacy_codec=true
+request_workers=8
+request_queue_depth=200
+request_timeouts=check_address:60,start_process:5,shutdown:20
 starting_strategy=MOST_LOADED
+fast_failover=true
 conciliation_strategy=SENICIDE
 stats_periods=5,60,600
 stats_histo=100
 stats_irix_mode=true
+context_file=/tmp/supvisors.context
+context_period=30
 logfile=/tmp/supvisors.log
 logfile_maxbytes=50KB
 logfile_backups=5
@@ -17,7 +17,6 @@
 # limitations under the License.
 # ======================================================================
 
-import random
 import sys
 import time
 import unittest
@@ -45,7 +44,33 @@ class AddressTest(unittest.TestCase):
         self.assertEqual(AddressStates.UNKNOWN, status.state)
         self.assertEqual(0, status.remote_time)
         self.assertEqual(0, status.local_time)
+        self.assertIsNone(status.detector)
         self.assertDictEqual({}, status.processes)
+        self.assertEqual(0, status.running_count)
+        self.assertEqual(0, status.running_load)
+        self.assertIsNone(status.states_index)
+
+    def test_states_index(self):
+        """ Test the registration of the address in the state index. """
+        from supvisors.address import AddressStatus
+        from supvisors.ttypes import AddressStates
+        index = {state: set() for state in self.all_states}
+        status = AddressStatus('10.0.0.1', self.supvisors.logger, None, index)
+        self.assertIs(index, status.states_index)
+        self.assertSetEqual({'10.0.0.1'}, index[AddressStates.UNKNOWN])
+        # through a transition
+        status.state = AddressStates.CHECKING
+        self.assertSetEqual(set(), index[AddressStates.UNKNOWN])
+        self.assertSetEqual({'10.0.0.1'}, index[AddressStates.CHECKING])
+        # through a forced state
+        status.force_state(AddressStates.ISOLATED)
+        self.assertEqual(AddressStates.ISOLATED, status.state)
+        self.assertSetEqual(set(), index[AddressStates.CHECKING])
+        self.assertSetEqual({'10.0.0.1'}, index[AddressStates.ISOLATED])
+        # the address is never registered twice
+        status.force_state(AddressStates.ISOLATED)
+        self.assertSetEqual({'10.0.0.1'},
+                            set.union(*index.values()))
 
     def test_isolation(self):
         """ Test the in_isolation method. """
@@ -96,6 +121,55 @@ class AddressTest(unittest.TestCase):
                     with self.assertRaises(InvalidTransition):
                         status.state = state2
 
+    def test_last_seen(self):
+        """ Test the date of the last sign of life. """
+        from supvisors.address import AddressStatus
+        from supvisors.detector import PhiAccrualDetector
+        status = AddressStatus('10.0.0.1', self.supvisors.logger)
+        status.local_time = 1000
+        self.assertEqual(1000, status.last_seen())
+        # with a detector but without heartbeat
+        status.detector = PhiAccrualDetector(1.0, 8)
+        self.assertEqual(1000, status.last_seen())
+        # with heartbeats
+        status.detector.heartbeat(1002.5)
+        self.assertEqual(1002.5, status.last_seen())
+        status.local_time = 1003
+        self.assertEqual(1003, status.last_seen())
+
+    def test_suspected(self):
+        """ Test the suspicion of the loss of the Supvisors instance. """
+        from supvisors.address import AddressStatus
+        from supvisors.detector import PhiAccrualDetector
+        from supvisors.ttypes import AddressStates
+        # without detector, the last tick received is used
+        status = AddressStatus('10.0.0.1', self.supvisors.logger)
+        status.local_time = 1000
+        self.assertFalse(status.suspected(1010))
+        self.assertTrue(status.suspected(1011))
+        # with a detector but without heartbeat, the last tick is still used
+        status.detector = PhiAccrualDetector(1.0, 8)
+        self.assertFalse(status.suspected(1010))
+        self.assertTrue(status.suspected(1011))
+        # with heartbeats, the detector is used
+        status.detector.heartbeat(1008)
+        self.assertFalse(status.suspected(1009))
+        self.assertTrue(status.suspected(1011))
+        # the detector is reset when the address is lost
+        status._state = AddressStates.RUNNING
+        status.state = AddressStates.SILENT
+        self.assertIsNone(status.detector.last_time)
+        status.detector.heartbeat(1008)
+        status._state = AddressStates.RUNNING
+        status.state = AddressStates.ISOLATING
+        self.assertIsNone(status.detector.last_time)
+        # but not on the other transitions
+        status._state = AddressStates.SILENT
+        status.detector.heartbeat(1008)
+        status.state = AddressStates.CHECKING
+        status.state = AddressStates.RUNNING
+        self.assertEqual(1008, status.detector.last_time)
+
     def test_add_process(self):
         """ Test the add_process method. """
         from supvisors.address import AddressStatus
@@ -108,48 +182,56 @@ class AddressTest(unittest.TestCase):
         self.assertIn(process.namespec(), status.processes.keys())
         self.assertIs(process, status.processes[process.namespec()])
 
-    def test_times(self):
-        """ Test the update_times method. """
-        from supervisor.states import ProcessStates
+    def test_remove_process(self):
+        """ Test the remove_process method. """
         from supvisors.address import AddressStatus
         from supvisors.process import ProcessStatus
         status = AddressStatus('10.0.0.1', self.supvisors.logger)
-        # add processes
-        for info in database_copy():
-            process = ProcessStatus(info['group'], info['name'], self.supvisors)
-            process.add_info('10.0.0.1', info)
-            status.add_process(process)
+        info = any_process_info()
+        process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        status.add_process(process)
+        status.add_running(process)
+        status.remove_process(process)
+        self.assertDictEqual({}, status.processes)
+        self.assertListEqual([], status.running_processes())
+        self.assertEqual(0, status.loading())
+
+    def load_context(self):
+        """ Return the AddressStatus of a context loaded with the processes
+        of the database.
+        The processes notify this context when they start or stop running. """
+        from supvisors.context import Context
+        self.supvisors.context = Context(self.supvisors)
+        self.supvisors.context.load_processes('10.0.0.1', database_copy())
+        return self.supvisors.context.addresses['10.0.0.1']
+
+    def test_times(self):
+        """ Test the update_times method. """
+        from supervisor.states import ProcessStates
+        status = self.load_context()
         # get current process times
-        ref_data = {process.namespec(): (process.state, info['now'], info['uptime'])
-            for process in status.processes.values()
-                for info in [process.infos['10.0.0.1']]}
+        ref_data = {process.namespec(): (dict(process.infos['10.0.0.1']),
+                                         process.uptime('10.0.0.1'))
+                    for process in status.processes.values()}
         # update times and check
         now = int(time.time())
         status.update_times(now + 10, now)
         self.assertEqual(now + 10, status.remote_time)
         self.assertEqual(now, status.local_time)
-        # test process times: only RUNNING and STOPPING have a positive uptime
-        new_data = {process.namespec(): (process.state, info['now'], info['uptime'])
-            for process in status.processes.values()
-                for info in [process.infos['10.0.0.1']]}
-        for namespec, new_info in new_data.items():
-            ref_info = ref_data[namespec]
-            self.assertEqual(new_info[0], ref_info[0])
-            self.assertGreater(new_info[1], ref_info[1])
-            if new_info[0] in [ProcessStates.RUNNING, ProcessStates.STOPPING]:
-                self.assertGreater(new_info[2], ref_info[2])
+        # the process information is left unchanged
+        # only RUNNING and STOPPING processes have a positive uptime
+        for process in status.processes.values():
+            ref_info, ref_uptime = ref_data[process.namespec()]
+            self.assertDictEqual(ref_info, process.infos['10.0.0.1'])
+            uptime = process.uptime('10.0.0.1')
+            if process.state in [ProcessStates.RUNNING, ProcessStates.STOPPING]:
+                self.assertGreater(uptime, ref_uptime)
             else:
-                self.assertEqual(new_info[2], ref_info[2])
+                self.assertEqual(0, uptime)
 
     def test_running_process(self):
         """ Test the running_process method. """
-        from supvisors.address import AddressStatus
-        from supvisors.process import ProcessStatus
-        status = AddressStatus('10.0.0.1', self.supvisors.logger)
-        for info in database_copy():
-            process = ProcessStatus(info['group'], info['name'], self.supvisors)
-            process.add_info('10.0.0.1', info)
-            status.add_process(process)
+        status = self.load_context()
         # check the name of the running processes
         self.assertItemsEqual(['late_segv','segv', 'xfontsel', 'yeux_01'],
             [proc.process_name for proc in status.running_processes()])
@@ -166,26 +248,53 @@ class AddressTest(unittest.TestCase):
         # check the namespec and pid of the running processes
         self.assertItemsEqual([('sample_test_1:xfontsel', 80879), ('sample_test_2:yeux_01', 80882)], status.pid_processes())
 
+    def test_invalidated_processes(self):
+        """ Test the invalidated_processes method. """
+        status = self.load_context()
+        # no process is invalidated in the database
+        self.assertListEqual([], status.invalidated_processes())
+        # invalidate the address for the running processes
+        for process in status.running_processes():
+            process.invalidate_address('10.0.0.1', False)
+        self.assertItemsEqual(['sample_test_1:xfontsel', 'sample_test_2:yeux_01',
+            'crash:late_segv', 'crash:segv'], status.invalidated_processes())
+
     def test_loading(self):
         """ Test the loading method. """
-        from supvisors.address import AddressStatus
-        from supvisors.process import ProcessStatus
-        status = AddressStatus('10.0.0.1', self.supvisors.logger)
-        for info in database_copy():
-            process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        from supvisors.context import Context
+        from supvisors.ttypes import ProcessStates
+        # the processes notify the context that holds the address
+        self.supvisors.context = Context(self.supvisors)
+        status = self.supvisors.context.addresses['10.0.0.1']
+        self.assertEqual(0, status.running_count)
+        self.assertEqual(0, status.loading())
+        # the expected loading is set by the rules before the process runs
+        for idx, info in enumerate(database_copy()):
+            process = self.supvisors.context.setdefault_process(info)
+            process.rules.expected_loading = idx + 1
             process.add_info('10.0.0.1', info)
             status.add_process(process)
-        # check the loading of the address: gives 5 (1 per running process) by default because no rule has been loaded
-        self.assertEqual(4, status.loading())
-        # change expected_loading of any stopped process
-        process = random.choice([proc for proc in status.processes.values() if proc.stopped()])
-        process.rules.expected_loading = 50
-        self.assertEqual(4, status.loading())
-        # change expected_loading of any running process
-        process = random.choice([proc for proc in status.processes.values() if proc.running()])
-        process.rules.expected_loading = 50
-        self.assertEqual(53, status.loading())
-
+        running = [proc for proc in status.processes.values() if proc.running()]
+        self.assertEqual(4, len(running))
+        self.assertEqual(4, status.running_count)
+        self.assertItemsEqual(running, status.running_processes())
+        self.assertEqual(sum(proc.rules.expected_loading for proc in running),
+                         status.loading())
+        # stop one running process
+        process = running.pop()
+        process.update_info('10.0.0.1', {'state': ProcessStates.STOPPED})
+        self.assertEqual(3, status.running_count)
+        self.assertEqual(sum(proc.rules.expected_loading for proc in running),
+                         status.loading())
+        # a running event on a running process does not change the loading
+        running[0].update_info('10.0.0.1', {'state': ProcessStates.RUNNING})
+        self.assertEqual(3, status.running_count)
+        # invalidate the address for another running process
+        process = running.pop()
+        process.invalidate_address('10.0.0.1', False)
+        self.assertEqual(2, status.running_count)
+        self.assertEqual(sum(proc.rules.expected_loading for proc in running),
+                         status.loading())
 
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
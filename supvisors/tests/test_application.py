@@ -21,8 +21,11 @@ import random
 import sys
 import unittest
 
+from mock import Mock
+
 from supvisors.tests.base import (MockedSupvisors, database_copy,
-    any_process_info, any_stopped_process_info, any_running_process_info)
+    any_process_info, any_process_info_by_state, any_stopped_process_info,
+    any_running_process_info)
 
 
 class ApplicationRulesTest(unittest.TestCase):
@@ -141,6 +144,22 @@ class ApplicationStatusTest(unittest.TestCase):
         dumped = pickle.dumps(serialized)
         loaded = pickle.loads(dumped)
         self.assertDictEqual(serialized, loaded)
+        # test that the same structure is returned while unchanged
+        application.state = ApplicationStates.RUNNING
+        application.major_failure = False
+        application.minor_failure = True
+        self.assertIs(serialized, application.serial())
+        # test that the structure is rebuilt when the application changes
+        application.minor_failure = False
+        self.assertIsNot(serialized, application.serial())
+        self.assertFalse(application.serial()['minor_failure'])
+        serialized = application.serial()
+        application.major_failure = True
+        self.assertIsNot(serialized, application.serial())
+        serialized = application.serial()
+        application.state = ApplicationStates.STOPPING
+        self.assertIsNot(serialized, application.serial())
+        self.assertEqual('STOPPING', application.serial()['statename'])
 
     def test_add_process(self):
         """ Test the add_process method. """
@@ -156,6 +175,38 @@ class ApplicationStatusTest(unittest.TestCase):
         self.assertIn(process.process_name, application.processes.keys())
         self.assertIs(process, application.processes[process.process_name])
 
+    def test_remove_process(self):
+        """ Test the remove_process method. """
+        from supvisors.application import ApplicationStatus
+        from supvisors.process import ProcessStatus
+        application = ApplicationStatus('ApplicationTest', self.supvisors.logger)
+        info = any_process_info()
+        process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        process.add_info('10.0.0.1', info)
+        application.add_process(process)
+        application.add_running(process)
+        application.remove_process(process)
+        # check that process and its contribution are removed
+        self.assertDictEqual({}, application.processes)
+        self.assertDictEqual({}, application._contributions)
+        self.assertEqual(0, sum(application._counters.values()))
+        self.assertListEqual([], application.running_processes())
+
+    def test_running_processes(self):
+        """ Test the set of running processes. """
+        from supvisors.application import ApplicationStatus
+        application = ApplicationStatus('ApplicationTest', self.supvisors.logger)
+        self.assertListEqual([], application.running_processes())
+        process_1, process_2 = Mock(), Mock()
+        application.add_running(process_1)
+        application.add_running(process_2)
+        application.add_running(process_1)
+        self.assertItemsEqual([process_1, process_2],
+                              application.running_processes())
+        application.remove_running(process_1)
+        application.remove_running(process_1)
+        self.assertListEqual([process_2], application.running_processes())
+
     def test_update_sequences(self):
         """ Test the sequencing of the update_sequences method. """
         from supvisors.application import ApplicationStatus
@@ -186,6 +237,45 @@ class ApplicationStatusTest(unittest.TestCase):
             self.assertListEqual(sorted(processes, key=lambda x: x.process_name),
                 sorted([proc for proc in application.processes.values() if sequence == proc.rules.stop_sequence], key=lambda x: x.process_name))
 
+    def test_update_process(self):
+        """ Test the counters updated by the contribution of the processes. """
+        from supervisor.states import ProcessStates
+        from supvisors.application import ApplicationStatus
+        from supvisors.process import ProcessStatus
+        application = ApplicationStatus('ApplicationTest', self.supvisors.logger)
+        self.assertDictEqual(dict.fromkeys(ApplicationStatus.Contributions, 0),
+                             application._counters)
+        info = any_process_info_by_state(ProcessStates.STOPPED)
+        process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        process.add_info('10.0.0.1', info)
+        process.rules.required = True
+        # the process is counted when added
+        application.add_process(process)
+        self.assertEqual(1, application._counters['major_failure'])
+        # the previous contribution is replaced
+        for state, contribution in [(ProcessStates.STARTING, 'starting'),
+                                    (ProcessStates.BACKOFF, 'starting'),
+                                    (ProcessStates.RUNNING, 'running'),
+                                    (ProcessStates.STOPPING, 'stopping'),
+                                    (ProcessStates.FATAL, 'major_failure')]:
+            process.state = state
+            application.update_process(process)
+            self.assertEqual(contribution,
+                             application._contributions[process.process_name])
+            self.assertEqual(1, application._counters[contribution])
+            self.assertEqual(1, sum(application._counters.values()))
+        # an optional process leads to a minor failure
+        process.rules.required = False
+        application.update_process(process)
+        self.assertEqual(1, application._counters['minor_failure'])
+        self.assertEqual(1, sum(application._counters.values()))
+        # an expected exit is normal
+        process.state = ProcessStates.EXITED
+        process.expected_exit = True
+        application.update_process(process)
+        self.assertEqual(1, application._counters['none'])
+        self.assertEqual(1, sum(application._counters.values()))
+
     def test_update_status(self):
         """ Test the rules to update the status of the application method. """
         from supervisor.states import ProcessStates
@@ -210,6 +300,7 @@ class ApplicationStatusTest(unittest.TestCase):
         # set FATAL process to major
         fatal_process = next((process for process in application.processes.values() if process.state == ProcessStates.FATAL), None)
         fatal_process.rules.required = True
+        application.update_process(fatal_process)
         # update status. major failure is now expected
         application.update_status()
         self.assertEqual(ApplicationStates.STARTING, application.state)
@@ -218,6 +309,7 @@ class ApplicationStatusTest(unittest.TestCase):
         # set STARTING process to RUNNING
         starting_process = next((process for process in application.processes.values() if process.state == ProcessStates.STARTING), None)
         starting_process.state = ProcessStates.RUNNING
+        application.update_process(starting_process)
         # update status. there is still one BACKOFF process leading to STARTING application
         application.update_status()
         self.assertEqual(ApplicationStates.STARTING, application.state)
@@ -226,6 +318,7 @@ class ApplicationStatusTest(unittest.TestCase):
         # set BACKOFF process to EXITED
         backoff_process = next((process for process in application.processes.values() if process.state == ProcessStates.BACKOFF), None)
         backoff_process.state = ProcessStates.EXITED
+        application.update_process(backoff_process)
         # update status. the 'strongest' state is now STOPPING
         # as STOPPING is not a 'running' state, failures are not applicable
         application.update_status()
@@ -235,6 +328,7 @@ class ApplicationStatusTest(unittest.TestCase):
         # set STOPPING process to STOPPED
         stopping_process = next((process for process in application.processes.values() if process.state == ProcessStates.STOPPING), None)
         stopping_process.state = ProcessStates.STOPPED
+        application.update_process(stopping_process)
         # update status. the 'strongest' state is now RUNNING
         # failures are applicable again
         application.update_status()
@@ -245,6 +339,7 @@ class ApplicationStatusTest(unittest.TestCase):
         for process in application.processes.values():
             if process.state == ProcessStates.RUNNING:
                 process.state = ProcessStates.STOPPED
+                application.update_process(process)
         # update status. the 'strongest' state is now RUNNING
         # failures are not applicable anymore
         application.update_status()
@@ -0,0 +1,185 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import cPickle
+import sys
+import unittest
+
+
+class CodecTest(unittest.TestCase):
+    """ Test case for the codec module. """
+
+    def test_tick(self):
+        """ Test the encoding and decoding of a tick event. """
+        from supvisors.codec import decode, encode
+        from supvisors.utils import InternalEventHeaders
+        data = encode(InternalEventHeaders.TICK, '10.0.0.1', 'a1b2', 12,
+                      {'when': 1234})
+        self.assertTupleEqual((InternalEventHeaders.TICK, '10.0.0.1', 'a1b2',
+                               12, {'when': 1234}), decode(data))
+
+    def test_process(self):
+        """ Test the encoding and decoding of a process event. """
+        from supvisors.codec import decode, encode
+        from supvisors.utils import InternalEventHeaders
+        payload = {'name': 'dummy_proc', 'group': u'dummy_appli',
+                   'state': 1000, 'now': 1234, 'pid': 0, 'expected': False}
+        data = encode(InternalEventHeaders.PROCESS, u'10.0.0.1', 'a1b2',
+                      2 ** 31 - 1, payload)
+        self.assertTupleEqual((InternalEventHeaders.PROCESS, '10.0.0.1',
+                               'a1b2', 2 ** 31 - 1, payload), decode(data))
+        # the binary encoding is smaller than the pickled one
+        pickled = cPickle.dumps((InternalEventHeaders.PROCESS, '10.0.0.1',
+                                 payload), cPickle.HIGHEST_PROTOCOL)
+        self.assertLess(len(data), len(pickled))
+
+    def test_statistics(self):
+        """ Test the encoding and decoding of a statistics event. """
+        from supvisors.codec import decode, encode
+        from supvisors.utils import InternalEventHeaders
+        payload = (1234.5, [(20.5, 80.5), (10.0, 90.0), (31.0, 69.0)], 35.5,
+                   {'lo': (100, 200), 'eth0': (2 ** 40, 4321)},
+                   {'appli:proc_1': (4321, (12.5, 0.5)),
+                    'appli:proc_2': (0, (0, 0))})
+        data = encode(InternalEventHeaders.STATISTICS, '10.0.0.1', 'a1b2', 1,
+                      payload)
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS, '10.0.0.1',
+                               'a1b2', 1, payload), decode(data))
+        # test empty structures
+        payload = (1234.5, [], 0, {}, {})
+        data = encode(InternalEventHeaders.STATISTICS, '10.0.0.1', 'a1b2', 1,
+                      payload)
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS, '10.0.0.1',
+                               'a1b2', 1, payload), decode(data))
+
+    def test_heartbeat(self):
+        """ Test the encoding and decoding of a heartbeat. """
+        from supvisors.codec import decode, encode
+        from supvisors.utils import InternalEventHeaders
+        data = encode(InternalEventHeaders.HEARTBEAT, '10.0.0.1', 'a1b2', 12,
+                      {})
+        self.assertTupleEqual((InternalEventHeaders.HEARTBEAT, '10.0.0.1',
+                               'a1b2', 12, {}), decode(data))
+
+    def test_jobs(self):
+        """ Test the encoding and decoding of the commander jobs. """
+        from supvisors.codec import decode, encode
+        from supvisors.utils import InternalEventHeaders
+        payload = {'starter': [(0, 2, 'appli_B', 1, ['appli_B:proc_1']),
+                               (1, 0, 'appli_A', 3, ['appli_A:proc_1',
+                                                     'appli_A:proc_2']),
+                               (2, 0, 'appli_A', 0, ['appli_A:proc_3'])],
+                   'stopper': [(1, 0, 'appli_C', 0, [])]}
+        data = encode(InternalEventHeaders.JOBS, '10.0.0.1', 'a1b2', 12,
+                      payload)
+        self.assertTupleEqual((InternalEventHeaders.JOBS, '10.0.0.1', 'a1b2',
+                               12, payload), decode(data))
+        # test empty structures
+        payload = {'starter': [], 'stopper': []}
+        data = encode(InternalEventHeaders.JOBS, '10.0.0.1', 'a1b2', 12,
+                      payload)
+        self.assertTupleEqual((InternalEventHeaders.JOBS, '10.0.0.1', 'a1b2',
+                               12, payload), decode(data))
+
+    def test_pickle(self):
+        """ Test the decoding of a pickled message. """
+        from supvisors.codec import decode
+        message = (0, '10.0.0.1', {'date': 1234})
+        self.assertTupleEqual((0, '10.0.0.1', None, None, {'date': 1234}),
+                              decode(cPickle.dumps(message, 2)))
+
+    def test_epoch(self):
+        """ Test the decoding of a message without epoch. """
+        from supvisors.codec import decode, encode
+        from supvisors.utils import InternalEventHeaders
+        data = encode(InternalEventHeaders.TICK, '10.0.0.1', None, 12,
+                      {'when': 1234})
+        self.assertTupleEqual((InternalEventHeaders.TICK, '10.0.0.1', None,
+                               12, {'when': 1234}), decode(data))
+        # the epoch is appended to the message without epoch
+        self.assertEqual(data + '\x00\x04a1b2',
+                         encode(InternalEventHeaders.TICK, '10.0.0.1', 'a1b2',
+                                12, {'when': 1234}))
+
+    def test_version_1(self):
+        """ Test the decoding of a message encoded with the version 1
+        of the codec, that has no sequence number. """
+        from supvisors.codec import decode, encode
+        from supvisors.utils import InternalEventHeaders
+        data = encode(InternalEventHeaders.TICK, '10.0.0.1', None, 12,
+                      {'when': 1234})
+        data = data[0] + chr(1) + data[2:3] + data[7:]
+        self.assertTupleEqual((InternalEventHeaders.TICK, '10.0.0.1', None,
+                               None, {'when': 1234}), decode(data))
+
+    def test_versions(self):
+        """ Test that each message is encoded with the lowest version
+        of the codec able to decode it. """
+        from supvisors.codec import decode, encode
+        from supvisors.utils import InternalEventHeaders
+        data = encode(InternalEventHeaders.TICK, '10.0.0.1', 'a1b2', 12,
+                      {'when': 1234})
+        self.assertEqual(2, ord(data[1]))
+        data = encode(InternalEventHeaders.HEARTBEAT, '10.0.0.1', 'a1b2', 12,
+                      {})
+        self.assertEqual(3, ord(data[1]))
+        self.assertTupleEqual((InternalEventHeaders.HEARTBEAT, '10.0.0.1',
+                               'a1b2', 12, {}), decode(data))
+        data = encode(InternalEventHeaders.JOBS, '10.0.0.1', 'a1b2', 12,
+                      {'starter': [], 'stopper': []})
+        self.assertEqual(3, ord(data[1]))
+        # messages encoded with the version 2 are still decoded
+        data = data[0] + chr(2) + data[2:]
+        self.assertTupleEqual((InternalEventHeaders.JOBS, '10.0.0.1', 'a1b2',
+                               12, {'starter': [], 'stopper': []}),
+                              decode(data))
+
+    def test_errors(self):
+        """ Test the decoding of invalid messages. """
+        from supvisors.codec import CodecError, UnsupportedMessage, decode, encode
+        from supvisors.utils import InternalEventHeaders
+        data = encode(InternalEventHeaders.TICK, '10.0.0.1', None, 12,
+                      {'when': 1234})
+        # test unsupported version
+        with self.assertRaisesRegexp(UnsupportedMessage,
+                                     'unsupported codec version'):
+            decode(data[0] + chr(4) + data[2:])
+        with self.assertRaisesRegexp(UnsupportedMessage,
+                                     'unsupported codec version'):
+            decode(data[0] + chr(0) + data[2:])
+        # test unknown event type
+        with self.assertRaisesRegexp(UnsupportedMessage, 'unknown event type'):
+            decode(data[:2] + chr(7) + data[3:])
+        # test truncated messages
+        with self.assertRaisesRegexp(CodecError, 'cannot decode message'):
+            decode(data[:-1])
+        with self.assertRaisesRegexp(CodecError, 'truncated string'):
+            decode(data[:10])
+        # test truncated epoch
+        data = encode(InternalEventHeaders.TICK, '10.0.0.1', 'a1b2', 12,
+                      {'when': 1234})
+        with self.assertRaisesRegexp(CodecError, 'truncated string'):
+            decode(data[:-1])
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -21,7 +21,7 @@ import sys
 import time
 import unittest
 
-from mock import call, patch, Mock
+from mock import call, patch, Mock, DEFAULT
 
 from supvisors.tests.base import MockedSupvisors, database_copy
 
@@ -48,6 +48,8 @@ class CommanderTest(unittest.TestCase):
         self.assertDictEqual({}, commander.planned_sequence)
         self.assertDictEqual({}, commander.planned_jobs)
         self.assertDictEqual({}, commander.current_jobs)
+        self.assertIsNone(commander.batched_requests)
+        self.assertListEqual([], commander.replica)
 
     def test_in_progress(self):
         """ Test the in_progress method. """
@@ -98,6 +100,20 @@ class CommanderTest(unittest.TestCase):
         self.assertFalse(commander.has_application('then'))
         self.assertFalse(commander.has_application('else'))
 
+    def test_abort(self):
+        """ Test the abort method. """
+        from supvisors.commander import Commander
+        commander = Commander(self.supvisors)
+        # fill attributes
+        commander.planned_sequence = {3: {'else': {}}}
+        commander.planned_jobs = {'if': {2: []}}
+        commander.current_jobs = {'if': ['dummy_1', 'dummy_2'], 'then': ['dummy_3']}
+        # call abort and check attributes
+        commander.abort()
+        self.assertDictEqual({}, commander.planned_sequence)
+        self.assertDictEqual({}, commander.planned_jobs)
+        self.assertDictEqual({}, commander.current_jobs)
+
     def test_printable_process_list(self):
         """ Test the printable_process_list method. """
         from supvisors.commander import Commander
@@ -187,6 +203,44 @@ class CommanderTest(unittest.TestCase):
         self.assertDictEqual({'then': {}, 'else': {}}, commander.planned_jobs)
         self.assertDictEqual({'then': []}, commander.current_jobs)
 
+    def test_process_application_jobs_batched(self):
+        """ Test that the requests of a sequence group are sent per address. """
+        from supvisors.commander import Commander
+        commander = Commander(self.supvisors)
+        commander.planned_jobs = {'if': {0: self.process_list_1}}
+        # define patch function
+        def push_jobs(*args, **kwargs):
+            address = '10.0.0.2' if args[0].process_name == 'dummy_A2' else '10.0.0.1'
+            commander.push_request(address, args[0].namespec())
+            args[1].append(args[0])
+        with patch.object(commander, 'process_job', side_effect=push_jobs):
+            with patch.object(commander, 'send_requests') as mocked_send:
+                commander.process_application_jobs('if')
+                self.assertItemsEqual([call('10.0.0.1', ['appli_A:dummy_A1', 'appli_A:dummy_A3']),
+                    call('10.0.0.2', ['appli_A:dummy_A2'])], mocked_send.call_args_list)
+        self.assertIsNone(commander.batched_requests)
+
+    def test_push_request(self):
+        """ Test the push_request method. """
+        from supvisors.commander import Commander
+        commander = Commander(self.supvisors)
+        with patch.object(commander, 'send_requests') as mocked_send:
+            # test out of a sequence group: request is sent immediately
+            commander.push_request('10.0.0.1', 'request_1')
+            self.assertEqual([call('10.0.0.1', ['request_1'])], mocked_send.call_args_list)
+            mocked_send.reset_mock()
+            # test in a sequence group: requests are stored
+            commander.batched_requests = {}
+            commander.push_request('10.0.0.1', 'request_1')
+            commander.push_request('10.0.0.2', 'request_2')
+            commander.push_request('10.0.0.1', 'request_3')
+            self.assertEqual(0, mocked_send.call_count)
+            self.assertDictEqual({'10.0.0.1': ['request_1', 'request_3'],
+                '10.0.0.2': ['request_2']}, commander.batched_requests)
+        # test that send_requests method must be implemented
+        with self.assertRaises(NotImplementedError):
+            commander.send_requests('10.0.0.1', ['request_1'])
+
     def test_initial_jobs(self):
         """ Test the initial_jobs method. """
         from supvisors.commander import Commander
@@ -209,6 +263,89 @@ class CommanderTest(unittest.TestCase):
             self.assertDictEqual({'if': self.process_list_1, 'then': self.process_list_2}, commander.current_jobs)
             self.assertEqual(4, mocked_job.call_count)
 
+    def test_serial_jobs(self):
+        """ Test the serialization of the jobs. """
+        from supvisors.commander import Commander
+        from supvisors.ttypes import JobStages
+        commander = Commander(self.supvisors)
+        self.assertListEqual([], commander.serial_jobs())
+        commander.planned_sequence = {2: {'appli_B': {1: self.process_list_2}}}
+        commander.planned_jobs = {'appli_A': {3: self.process_list_1[1:]}}
+        commander.current_jobs = {'appli_A': self.process_list_1[:1]}
+        self.assertListEqual([
+            (JobStages.PLANNED_SEQUENCE, 2, 'appli_B', 1, ['appli_B:dummy_B1']),
+            (JobStages.PLANNED_JOBS, 0, 'appli_A', 3,
+             ['appli_A:dummy_A2', 'appli_A:dummy_A3']),
+            (JobStages.CURRENT_JOBS, 0, 'appli_A', 0, ['appli_A:dummy_A1'])],
+            commander.serial_jobs())
+
+    def test_take_over(self):
+        """ Test the resumption of the jobs replicated from the former master. """
+        from supvisors.commander import Commander
+        from supvisors.ttypes import JobStages
+        commander = Commander(self.supvisors)
+        self.supvisors.context.processes = {process.namespec(): process
+            for process in self.process_list_1 + self.process_list_2}
+        # nothing done without replica
+        with patch.object(commander, 'initial_jobs') as mocked_initial:
+            commander.take_over()
+            self.assertEqual(0, mocked_initial.call_count)
+        # the jobs are restored and the request times are reset
+        commander.replica = [
+            (JobStages.PLANNED_SEQUENCE, 2, 'appli_B', 1, ['appli_B:dummy_B1']),
+            (JobStages.PLANNED_JOBS, 0, 'appli_A', 3,
+             ['appli_A:dummy_A2', 'appli_A:dummy_A3', 'appli_A:unknown']),
+            (JobStages.CURRENT_JOBS, 0, 'appli_A', 0, ['appli_A:dummy_A1'])]
+        with patch.multiple(commander, initial_jobs=DEFAULT,
+                            process_application_jobs=DEFAULT):
+            commander.take_over()
+            self.assertEqual(0, commander.initial_jobs.call_count)
+            self.assertEqual(0, commander.process_application_jobs.call_count)
+        self.assertListEqual([], commander.replica)
+        self.assertDictEqual({2: {'appli_B': {1: self.process_list_2}}},
+                             commander.planned_sequence)
+        self.assertDictEqual({'appli_A': {3: self.process_list_1[1:]}},
+                             commander.planned_jobs)
+        self.assertDictEqual({'appli_A': self.process_list_1[:1]},
+                             commander.current_jobs)
+        self.assertGreater(self.process_list_1[0].request_time, 0)
+        # the applications without job in progress are triggered
+        commander.planned_sequence, commander.current_jobs = {}, {}
+        commander.replica = [(JobStages.PLANNED_JOBS, 0, 'appli_B', 1,
+                              ['appli_B:dummy_B1'])]
+        with patch.multiple(commander, initial_jobs=DEFAULT,
+                            process_application_jobs=DEFAULT):
+            commander.take_over()
+            self.assertEqual(0, commander.initial_jobs.call_count)
+            self.assertItemsEqual([call('appli_A'), call('appli_B')],
+                commander.process_application_jobs.call_args_list)
+        # the planned sequence is started if there is no job at all
+        commander.planned_jobs = {}
+        commander.replica = [(JobStages.PLANNED_SEQUENCE, 2, 'appli_B', 1,
+                              ['appli_B:dummy_B1'])]
+        with patch.multiple(commander, initial_jobs=DEFAULT,
+                            process_application_jobs=DEFAULT):
+            commander.take_over()
+            self.assertEqual([call()], commander.initial_jobs.call_args_list)
+            self.assertEqual(0, commander.process_application_jobs.call_count)
+        # the current jobs of the processes being invalidated are dropped
+        commander.planned_sequence = {}
+        commander.current_jobs = {}
+        self.process_list_1[0].request_time = 0
+        self.process_list_1[1].request_time = 0
+        commander.replica = [(JobStages.CURRENT_JOBS, 0, 'appli_A', 0,
+                              ['appli_A:dummy_A1', 'appli_A:dummy_A2']),
+                             (JobStages.CURRENT_JOBS, 0, 'appli_B', 0,
+                              ['appli_B:dummy_B1'])]
+        with patch.multiple(commander, initial_jobs=DEFAULT,
+                            process_application_jobs=DEFAULT):
+            commander.take_over(self.process_list_1[1:] + self.process_list_2)
+        self.assertDictEqual({'appli_A': self.process_list_1[:1]},
+                             commander.current_jobs)
+        self.assertGreater(self.process_list_1[0].request_time, 0)
+        self.assertEqual(0, self.process_list_1[1].request_time)
+
+
 
 class StarterTest(unittest.TestCase):
     """ Test case for the Starter class of the commander module. """
@@ -238,20 +375,6 @@ class StarterTest(unittest.TestCase):
         starter.strategy = StartingStrategies.LESS_LOADED
         self.assertEqual(StartingStrategies.LESS_LOADED, starter.strategy)
 
-    def test_abort(self):
-        """ Test the abort method. """
-        from supvisors.commander import Starter
-        starter = Starter(self.supvisors)
-        # fill attributes
-        starter.planned_sequence = {3: {'else': {}}}
-        starter.planned_jobs = {'if': {2: []}}
-        starter.current_jobs = {'if': ['dummy_1', 'dummy_2'], 'then': ['dummy_3']}
-        # call abort and check attributes
-        starter.abort()
-        self.assertDictEqual({}, starter.planned_sequence)
-        self.assertDictEqual({}, starter.planned_jobs)
-        self.assertDictEqual({}, starter.current_jobs)
-
     def test_store_application_start_sequence(self):
         """ Test the store_application_start_sequence method. """
         from supvisors.application import ApplicationStatus
@@ -527,6 +650,29 @@ class StarterTest(unittest.TestCase):
             starter.on_event_out_of_sequence(process)
             self.assertEqual(0, mocked_failure.call_count)
 
+    @patch('supvisors.commander.Starter.force_process_fatal')
+    def test_on_fault(self, mocked_force):
+        """ Test the processing of a rejected start request. """
+        from supvisors.commander import Starter
+        starter = Starter(self.supvisors)
+        self.supvisors.context.processes = {process.namespec(): process
+                                            for process in self.process_list}
+        # xfontsel is RUNNING, xlogo is STOPPED
+        xfontsel = self._get_test_process('xfontsel')
+        xlogo = self._get_test_process('xlogo')
+        # nothing done for a process unknown or not in current jobs
+        starter.on_fault('sample_test_1:unknown', 'rejected')
+        starter.on_fault('sample_test_1:xlogo', 'rejected')
+        self.assertEqual(0, mocked_force.call_count)
+        # nothing done for a process that is not stopped
+        starter.current_jobs = {'sample_test_1': [xfontsel, xlogo]}
+        starter.on_fault('sample_test_1:xfontsel', 'rejected')
+        self.assertEqual(0, mocked_force.call_count)
+        # the process is forced at once
+        starter.on_fault('sample_test_1:xlogo', 'rejected')
+        self.assertEqual([call('sample_test_1:xlogo', 'rejected')],
+                         mocked_force.call_args_list)
+
     def test_check_starting(self):
         """ Test the check_starting method. """
         from supvisors.commander import Starter
@@ -620,6 +766,24 @@ class StarterTest(unittest.TestCase):
             self.assertEqual([call('sample_test_1:xlogo', 'no resource available')],
                 mocked_force.call_args_list)
 
+    def test_send_requests(self):
+        """ Test the send_requests method. """
+        from supvisors.commander import Starter
+        starter = Starter(self.supvisors)
+        pusher = self.supvisors.zmq.pusher
+        # test with one single request
+        starter.send_requests('10.0.0.1', [('sample_test_1:xlogo', '')])
+        self.assertEqual([call('10.0.0.1', 'sample_test_1:xlogo', '')],
+            pusher.send_start_process.call_args_list)
+        self.assertEqual(0, pusher.send_start_processes.call_count)
+        pusher.send_start_process.reset_mock()
+        # test with several requests
+        requests = [('sample_test_1:xlogo', ''), ('sample_test_1:xclock', '-x')]
+        starter.send_requests('10.0.0.1', requests)
+        self.assertEqual(0, pusher.send_start_process.call_count)
+        self.assertEqual([call('10.0.0.1', requests)],
+            pusher.send_start_processes.call_args_list)
+
     def test_start_process(self):
         """ Test the start_process method. """
         from supvisors.commander import Starter
@@ -658,6 +822,48 @@ class StarterTest(unittest.TestCase):
             self.assertEqual(2, mocked_jobs.call_count)
             self.assertFalse(start_result)
 
+    @patch('supvisors.commander.Starter.force_process_fatal')
+    def test_start_processes(self, mocked_force):
+        """ Test the start_processes method. """
+        from supvisors.commander import Starter
+        starter = Starter(self.supvisors)
+        # get patches
+        mocked_pusher = self.supvisors.zmq.pusher
+        # get stopped processes
+        xlogo_process = self._get_test_process('xlogo')
+        firefox_process = self._get_test_process('firefox')
+        yeux_process = self._get_test_process('yeux_00')
+        for process, loading in [(xlogo_process, 10), (firefox_process, 20),
+                                 (yeux_process, 30)]:
+            process.rules.expected_loading = loading
+        # the planned loading is given to the strategy
+        planned = []
+        def choose_address(supvisors, strategy, addresses, expected_loading,
+                           planned_loading):
+            planned.append(planned_loading.copy())
+            return [None, '10.0.0.2', '10.0.0.2'][len(planned) % 3]
+        with patch('supvisors.commander.get_address',
+                   side_effect=choose_address):
+            result = starter.start_processes(2, [xlogo_process, firefox_process,
+                                                 yeux_process])
+        self.assertEqual(2, starter.strategy)
+        self.assertListEqual([xlogo_process, firefox_process], result)
+        self.assertListEqual([{}, {'10.0.0.2': 10}, {'10.0.0.2': 30}], planned)
+        self.assertIsNone(starter.planned_loading)
+        self.assertIsNone(starter.batched_requests)
+        # the requests are sent at once per address
+        self.assertEqual([call('10.0.0.2', [('sample_test_1:xlogo', ''),
+                                            ('firefox', '')])],
+                         mocked_pusher.send_start_processes.call_args_list)
+        self.assertEqual(0, mocked_pusher.send_start_process.call_count)
+        # the process without address is forced to FATAL
+        self.assertEqual([call('sample_test_2:yeux_00', 'no resource available')],
+                         mocked_force.call_args_list)
+        self.assertFalse(yeux_process.ignore_wait_exit)
+        self.assertTrue(xlogo_process.ignore_wait_exit)
+        self.assertDictEqual({'sample_test_1': [xlogo_process],
+                              'firefox': [firefox_process]}, starter.current_jobs)
+
     def test_default_start_process(self):
         """ Test the default_start_process method. """
         from supvisors.commander import Starter
@@ -777,6 +983,29 @@ class StopperTest(unittest.TestCase):
         stopper = Stopper(self.supvisors)
         self.assertIsInstance(stopper, Commander)
 
+    @patch('supvisors.commander.Stopper.force_process_unknown')
+    def test_on_fault(self, mocked_force):
+        """ Test the processing of a rejected stop request. """
+        from supvisors.commander import Stopper
+        stopper = Stopper(self.supvisors)
+        self.supvisors.context.processes = {process.namespec(): process
+                                            for process in self.process_list}
+        # xfontsel is RUNNING, xlogo is STOPPED
+        xfontsel = self._get_test_process('xfontsel')
+        xlogo = self._get_test_process('xlogo')
+        # nothing done for a process unknown or not in current jobs
+        stopper.on_fault('sample_test_1:unknown', 'rejected')
+        stopper.on_fault('sample_test_1:xfontsel', 'rejected')
+        self.assertEqual(0, mocked_force.call_count)
+        # nothing done for a process that is not running
+        stopper.current_jobs = {'sample_test_1': [xfontsel, xlogo]}
+        stopper.on_fault('sample_test_1:xlogo', 'rejected')
+        self.assertEqual(0, mocked_force.call_count)
+        # the process is forced at once
+        stopper.on_fault('sample_test_1:xfontsel', 'rejected')
+        self.assertEqual([call('sample_test_1:xfontsel', 'rejected')],
+                         mocked_force.call_args_list)
+
     @patch('supvisors.commander.Stopper.force_process_unknown')
     def test_check_stopping(self, mocked_force):
         """ Test the check_stopping method. """
@@ -982,6 +1211,24 @@ class StopperTest(unittest.TestCase):
         self.assertEqual([call('10.0.0.1', 'sample_test_1:xfontsel')],
             mocked_pusher.call_args_list)
 
+    def test_send_requests(self):
+        """ Test the send_requests method. """
+        from supvisors.commander import Stopper
+        stopper = Stopper(self.supvisors)
+        pusher = self.supvisors.zmq.pusher
+        # test with one single request
+        stopper.send_requests('10.0.0.1', ['sample_test_1:xfontsel'])
+        self.assertEqual([call('10.0.0.1', 'sample_test_1:xfontsel')],
+            pusher.send_stop_process.call_args_list)
+        self.assertEqual(0, pusher.send_stop_processes.call_count)
+        pusher.send_stop_process.reset_mock()
+        # test with several requests
+        requests = ['sample_test_1:xfontsel', 'sample_test_1:xclock']
+        stopper.send_requests('10.0.0.1', requests)
+        self.assertEqual(0, pusher.send_stop_process.call_count)
+        self.assertEqual([call('10.0.0.1', requests)],
+            pusher.send_stop_processes.call_args_list)
+
     def test_stop_process(self):
         """ Test the stop_process method. """
         from supvisors.commander import Stopper
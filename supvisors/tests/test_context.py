@@ -25,7 +25,7 @@ import unittest
 from mock import call, patch, Mock
 
 from supvisors.tests.base import (DummyAddressMapper, MockedSupvisors,
-    database_copy, any_process_info)
+    database_copy, any_process_info, any_process_info_by_state)
 
 
 class ContextTest(unittest.TestCase):
@@ -47,10 +47,14 @@ class ContextTest(unittest.TestCase):
         for address_name, address in context.addresses.items():
             self.assertEqual(address_name, address.address_name)
             self.assertIsInstance(address, AddressStatus)
+            self.assertEqual(1.0, address.detector.period)
+            self.assertEqual(8, address.detector.threshold)
         self.assertDictEqual({}, context.applications)
         self.assertDictEqual({}, context.processes)
         self.assertEqual('', context._master_address)
         self.assertFalse(context.master)
+        self.assertEqual('', context.membership.filename)
+        self.assertIs(self.supvisors.logger, context.membership.logger)
 
     def test_master_address(self):
         """ Test the access to master address. """
@@ -82,11 +86,11 @@ class ContextTest(unittest.TestCase):
         self.assertItemsEqual(DummyAddressMapper().addresses,
             context.addresses_by_states([AddressStates.UNKNOWN]))
         # change states
-        context.addresses['127.0.0.1']._state = AddressStates.RUNNING
-        context.addresses['10.0.0.1']._state = AddressStates.SILENT
-        context.addresses['10.0.0.2']._state = AddressStates.ISOLATING
-        context.addresses['10.0.0.3']._state = AddressStates.ISOLATED
-        context.addresses['10.0.0.4']._state = AddressStates.RUNNING
+        context.addresses['127.0.0.1'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.1'].force_state(AddressStates.SILENT)
+        context.addresses['10.0.0.2'].force_state(AddressStates.ISOLATING)
+        context.addresses['10.0.0.3'].force_state(AddressStates.ISOLATED)
+        context.addresses['10.0.0.4'].force_state(AddressStates.RUNNING)
         # test new states
         self.assertItemsEqual(['10.0.0.5'], context.unknown_addresses())
         self.assertItemsEqual(['127.0.0.1', '10.0.0.4'], context.running_addresses())
@@ -118,6 +122,7 @@ class ContextTest(unittest.TestCase):
             # invalidate address
             proc_1 = Mock(**{'invalidate_address.return_value': None})
             proc_2 = Mock(**{'invalidate_address.return_value': None})
+            address_status.local_time = 1234
             with patch.object(address_status, 'running_processes',
                     return_value=[proc_1, proc_2]) as mocked_running:
                 context.invalid(address_status)
@@ -127,8 +132,20 @@ class ContextTest(unittest.TestCase):
             self.assertEqual([call()], mocked_running.call_args_list)
             self.assertEqual([call(address_name, False)], proc_1.invalidate_address.call_args_list)
             self.assertEqual([call(address_name, False)], proc_2.invalidate_address.call_args_list)
+            # no failover incident if not master
+            self.assertEqual(0, self.supvisors.failure_handler.add_incident.call_count)
+            # test again as master
+            context.master = True
+            address_status.force_state(AddressStates.UNKNOWN)
+            with patch.object(address_status, 'running_processes',
+                    return_value=[proc_1, proc_2]):
+                context.invalid(address_status)
+            self.assertEqual([call(address_name, 1234, [proc_1, proc_2])],
+                self.supvisors.failure_handler.add_incident.call_args_list)
+            self.supvisors.failure_handler.add_incident.reset_mock()
+            context.master = False
             # restore address state
-            address_status._state = AddressStates.UNKNOWN
+            address_status.force_state(AddressStates.UNKNOWN)
         # test address state with auto_fence and local_address
         check_address_status('127.0.0.1', AddressStates.SILENT)
         # test address state with auto_fence and other than local_address
@@ -140,6 +157,105 @@ class ContextTest(unittest.TestCase):
             # test address state without auto_fence and other than local_address
             check_address_status('10.0.0.2', AddressStates.SILENT)
 
+    def test_invalid_restored(self):
+        """ Test that the processes restored from the context file
+        are removed when their address is lost before being checked. """
+        from supvisors.context import Context
+        context = Context(self.supvisors)
+        mocked_obsolete = self.supvisors.snapshot.obsolete_processes
+        # test without restored process
+        with patch.object(context, 'unload_processes') as mocked_unload:
+            context.invalid(context.addresses['10.0.0.1'])
+            self.assertEqual([call('10.0.0.1', [])],
+                             mocked_obsolete.call_args_list)
+            self.assertEqual(0, mocked_unload.call_count)
+            # test with restored processes
+            mocked_obsolete.reset_mock()
+            mocked_obsolete.return_value = ['appli:proc_1', 'appli:proc_2']
+            context.invalid(context.addresses['10.0.0.2'])
+            self.assertEqual([call('10.0.0.2', [])],
+                             mocked_obsolete.call_args_list)
+            self.assertEqual([call('10.0.0.2', ['appli:proc_1', 'appli:proc_2'])],
+                             mocked_unload.call_args_list)
+
+    def test_invalid_master(self):
+        """ Test the invalidation of the master address. """
+        from supvisors.context import Context
+        context = Context(self.supvisors)
+        context.master_address = '10.0.0.1'
+        manager = Mock()
+        proc_1 = Mock()
+        manager.attach_mock(proc_1.invalidate_address, 'invalidate_address')
+        with patch.object(context, 'elect_master') as mocked_elect:
+            manager.attach_mock(mocked_elect, 'elect_master')
+            with patch.object(context.addresses['10.0.0.1'], 'running_processes',
+                              return_value=[proc_1]):
+                context.invalid(context.addresses['10.0.0.1'])
+        # the successor is elected before the processes are invalidated
+        # and the processes being invalidated are passed to the election
+        self.assertEqual([call.elect_master([proc_1]),
+                          call.invalidate_address('10.0.0.1', False)],
+                         manager.mock_calls)
+        # no election when another address is invalidated
+        with patch.object(context, 'elect_master') as mocked_elect:
+            context.invalid(context.addresses['10.0.0.2'])
+            self.assertEqual(0, mocked_elect.call_count)
+
+    def test_elect_master(self):
+        """ Test the election of a successor to the master. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        context = Context(self.supvisors)
+        context.master_address = '10.0.0.1'
+        context.addresses['10.0.0.2'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.4'].force_state(AddressStates.RUNNING)
+        mocked_starter = self.supvisors.starter.take_over
+        mocked_stopper = self.supvisors.stopper.take_over
+        # no election if the local address is not running
+        self.assertFalse(context.elect_master())
+        self.assertEqual('10.0.0.1', context.master_address)
+        # the lowest running address is elected
+        context.addresses['127.0.0.1'].force_state(AddressStates.RUNNING)
+        self.supvisors.starter.replica = ['jobs']
+        self.supvisors.stopper.replica = ['jobs']
+        self.assertTrue(context.elect_master())
+        self.assertEqual('10.0.0.2', context.master_address)
+        self.assertFalse(context.master)
+        # the replicas are useless if not master
+        self.assertListEqual([], self.supvisors.starter.replica)
+        self.assertListEqual([], self.supvisors.stopper.replica)
+        self.assertEqual(0, mocked_starter.call_count)
+        self.assertEqual(0, mocked_stopper.call_count)
+        # the new master takes over the jobs
+        context.addresses['10.0.0.2'].force_state(AddressStates.SILENT)
+        context.addresses['10.0.0.4'].force_state(AddressStates.SILENT)
+        self.assertTrue(context.elect_master(['proc']))
+        self.assertEqual('127.0.0.1', context.master_address)
+        self.assertTrue(context.master)
+        self.assertEqual([call(['proc'])], mocked_starter.call_args_list)
+        self.assertEqual([call(['proc'])], mocked_stopper.call_args_list)
+
+    def test_adopt_master(self):
+        """ Test the adoption of a master announced by another address. """
+        from supvisors.context import Context
+        context = Context(self.supvisors)
+        # a local master steps down and drops its jobs
+        context.master_address = '127.0.0.1'
+        self.assertTrue(context.master)
+        context.adopt_master('10.0.0.1')
+        self.assertEqual('10.0.0.1', context.master_address)
+        self.assertFalse(context.master)
+        self.assertEqual([call()], self.supvisors.starter.abort.call_args_list)
+        self.assertEqual([call()], self.supvisors.stopper.abort.call_args_list)
+        self.assertEqual([call()],
+                         self.supvisors.failure_handler.clear_jobs.call_args_list)
+        # nothing to drop if not master
+        context.adopt_master('10.0.0.0')
+        self.assertEqual('10.0.0.0', context.master_address)
+        self.assertEqual(1, self.supvisors.starter.abort.call_count)
+        self.assertEqual(1, self.supvisors.stopper.abort.call_count)
+        self.assertEqual(1, self.supvisors.failure_handler.clear_jobs.call_count)
+
     def test_end_synchro(self):
         """ Test the end of synchronization phase. """
         from supvisors.context import Context
@@ -148,8 +264,8 @@ class ContextTest(unittest.TestCase):
         # choose two addresses and change their state
         for address_status in context.addresses.values():
             self.assertEqual(AddressStates.UNKNOWN, address_status.state)
-        context.addresses['10.0.0.2']._state = AddressStates.RUNNING
-        context.addresses['10.0.0.4']._state = AddressStates.ISOLATED
+        context.addresses['10.0.0.2'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.4'].force_state(AddressStates.ISOLATED)
         # call end of synchro with auto_fence activated
         context.end_synchro()
         # check that UNKNOWN addresses became ISOLATING, but local address
@@ -158,9 +274,9 @@ class ContextTest(unittest.TestCase):
         self.assertEqual(AddressStates.ISOLATING, context.addresses['10.0.0.3'].state)
         self.assertEqual(AddressStates.ISOLATING, context.addresses['10.0.0.5'].state)
         # reset states and set (local excepted)
-        context.addresses['10.0.0.1']._state = AddressStates.UNKNOWN
-        context.addresses['10.0.0.3']._state = AddressStates.UNKNOWN
-        context.addresses['10.0.0.5']._state = AddressStates.UNKNOWN
+        context.addresses['10.0.0.1'].force_state(AddressStates.UNKNOWN)
+        context.addresses['10.0.0.3'].force_state(AddressStates.UNKNOWN)
+        context.addresses['10.0.0.5'].force_state(AddressStates.UNKNOWN)
         with patch.object(self.supvisors.options, 'auto_fence', False):
             # call end of synchro with auto_fencing deactivated
             context.end_synchro()
@@ -169,34 +285,95 @@ class ContextTest(unittest.TestCase):
         self.assertEqual(AddressStates.SILENT, context.addresses['10.0.0.3'].state)
         self.assertEqual(AddressStates.SILENT, context.addresses['10.0.0.5'].state)
 
+    def test_membership(self):
+        """ Test the persistence of the running addresses. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        context = Context(self.supvisors)
+        context.membership = Mock(**{'load.return_value': {'10.0.0.1',
+                                                           '10.0.0.2',
+                                                           '192.168.0.1'}})
+        # test that unknown addresses are filtered out
+        self.assertSetEqual({'10.0.0.1', '10.0.0.2'}, context.load_membership())
+        # test that the running addresses are saved
+        context.addresses['10.0.0.2'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.4'].force_state(AddressStates.RUNNING)
+        context.save_membership()
+        self.assertItemsEqual(['10.0.0.2', '10.0.0.4'],
+                              context.membership.save.call_args[0][0])
+
+    def test_update_running(self):
+        """ Test the update of the address counters. """
+        from supvisors.context import Context
+        context = Context(self.supvisors)
+        application = context.applications['appli'] = Mock()
+        process = Mock(application_name='appli',
+                       **{'rules.expected_loading': 15,
+                          'running_on_addresses.return_value': {'10.0.0.1',
+                                                                '10.0.0.2'}})
+        # test the start of the process on two addresses
+        context.update_running(process, set())
+        for address_name in ['10.0.0.1', '10.0.0.2']:
+            self.assertListEqual([process],
+                                 context.addresses[address_name].running_processes())
+            self.assertEqual(1, context.addresses[address_name].running_count)
+            self.assertEqual(15, context.addresses[address_name].loading())
+        self.assertEqual([call(process)], application.add_running.call_args_list)
+        # test the move of the process from one address to another
+        process.running_on_addresses.return_value = {'10.0.0.2', '10.0.0.3'}
+        context.update_running(process, {'10.0.0.1', '10.0.0.2'})
+        self.assertListEqual([], context.addresses['10.0.0.1'].running_processes())
+        self.assertEqual(0, context.addresses['10.0.0.1'].running_count)
+        self.assertEqual(0, context.addresses['10.0.0.1'].loading())
+        for address_name in ['10.0.0.2', '10.0.0.3']:
+            self.assertEqual(1, context.addresses[address_name].running_count)
+            self.assertEqual(15, context.addresses[address_name].loading())
+        # test the stop of the process
+        process.running_on_addresses.return_value = set()
+        context.update_running(process, {'10.0.0.2', '10.0.0.3'})
+        for address_name in ['10.0.0.2', '10.0.0.3']:
+            self.assertEqual(0, context.addresses[address_name].running_count)
+            self.assertEqual(0, context.addresses[address_name].loading())
+        self.assertEqual([call(process)], application.remove_running.call_args_list)
+        # the counters of the application are updated each time
+        self.assertEqual([call(process)] * 3,
+                         application.update_process.call_args_list)
+
     def test_conflicts(self):
         """ Test the detection of conflicting processes. """
+        from supervisor.states import ProcessStates
         from supvisors.context import Context
         context = Context(self.supvisors)
+        # the processes notify the context under test
+        self.supvisors.context = context
         # add processes to context
         self.random_fill_processes(context)
         # test no conflict
         self.assertFalse(context.conflicting())
         self.assertListEqual([], context.conflicts())
-        # add addresses to one process
+        # add running addresses to one process
         process1 = next(process for process in context.processes.values() if process.running())
-        process1.addresses.update(context.addresses.keys())
+        for address_name in context.addresses:
+            process1.add_info(address_name, any_process_info_by_state(ProcessStates.RUNNING))
         # test conflict is detected
         self.assertTrue(context.conflicting())
         self.assertListEqual([process1], context.conflicts())
-        # add addresses to one other process
+        # add running addresses to one other process
         process2 = next(process for process in context.processes.values() if process.stopped())
-        process2.addresses.update(context.addresses.keys())
+        for address_name in context.addresses:
+            process2.add_info(address_name, any_process_info_by_state(ProcessStates.STARTING))
         # test conflict is detected
         self.assertTrue(context.conflicting())
         self.assertItemsEqual([process1, process2], context.conflicts())
-        # empty addresses of first process list
-        process1.addresses.clear()
+        # stop all instances of the first process but one
+        for address_name in list(process1.addresses)[1:]:
+            process1.update_info(address_name, {'state': ProcessStates.STOPPED})
         # test conflict is still detected
         self.assertTrue(context.conflicting())
         self.assertListEqual([process2], context.conflicts())
-        # empty addresses of second process list
-        process2.addresses.clear()
+        # invalidate all addresses of the second process but one
+        for address_name in list(process2.addresses)[1:]:
+            process2.invalidate_address(address_name, False)
         # test no conflict
         self.assertFalse(context.conflicting())
         self.assertListEqual([], context.conflicts())
@@ -307,6 +484,34 @@ class ContextTest(unittest.TestCase):
         self.assertDictContainsSubset(context.addresses['10.0.0.2'].processes, context.processes)
         self.assertDictContainsSubset(context.addresses['10.0.0.4'].processes, context.processes)
 
+    def test_unload_processes(self):
+        """ Test the removal of the processes not handled anymore
+        by the Supervisor of an address. """
+        from supvisors.context import Context
+        context = Context(self.supvisors)
+        all_info = database_copy()
+        context.load_processes('10.0.0.1', all_info[:4])
+        context.load_processes('10.0.0.2', all_info[3:4])
+        namespecs = context.addresses['10.0.0.1'].processes.keys()
+        # the process also known on another address is kept
+        shared = next(namespec for namespec, process
+                      in context.processes.items()
+                      if '10.0.0.2' in process.infos)
+        context.unload_processes('10.0.0.1', namespecs + ['dummy:unknown'])
+        self.assertDictEqual({}, context.addresses['10.0.0.1'].processes)
+        self.assertListEqual([shared], context.processes.keys())
+        process = context.processes[shared]
+        self.assertListEqual(['10.0.0.2'], process.infos.keys())
+        # the applications without process are removed
+        self.assertListEqual([process.application_name],
+                             context.applications.keys())
+        application = context.applications[process.application_name]
+        self.assertListEqual([process.process_name],
+                             application.processes.keys())
+        # nothing done if the address does not handle the process
+        context.unload_processes('10.0.0.1', [shared])
+        self.assertListEqual([shared], context.processes.keys())
+
     def test_authorization(self):
         """ Test the handling of an authorization event. """
         from supvisors.context import Context
@@ -317,34 +522,34 @@ class ContextTest(unittest.TestCase):
         # check no change with known address in isolation
         for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
             for authorization in [True, False]:
-                context.addresses['10.0.0.1']._state = state
+                context.addresses['10.0.0.1'].force_state(state)
                 context.on_authorization('10.0.0.1', authorization)
                 self.assertEqual(state, context.addresses['10.0.0.1'].state)
         # check exception if authorized and current state not CHECKING
         for state in [AddressStates.UNKNOWN, AddressStates.SILENT]:
-            context.addresses['10.0.0.2']._state = state
+            context.addresses['10.0.0.2'].force_state(state)
             with self.assertRaises(InvalidTransition):
                 context.on_authorization('10.0.0.2', True)
             self.assertEqual(state, context.addresses['10.0.0.2'].state)
         # check state becomes RUNNING if authorized and current state in CHECKING
         for state in [AddressStates.CHECKING, AddressStates.RUNNING]:
-            context.addresses['10.0.0.2']._state = state
+            context.addresses['10.0.0.2'].force_state(state)
             context.on_authorization('10.0.0.2', True)
             self.assertEqual(AddressStates.RUNNING, context.addresses['10.0.0.2'].state)
         # check state becomes ISOLATING if not authorized and auto fencing activated
         for state in [AddressStates.UNKNOWN, AddressStates.CHECKING, AddressStates.RUNNING]:
-            context.addresses['10.0.0.4']._state = state
+            context.addresses['10.0.0.4'].force_state(state)
             context.on_authorization('10.0.0.4', False)
             self.assertEqual(AddressStates.ISOLATING, context.addresses['10.0.0.4'].state)
         # check exception if not authorized and auto fencing activated and current is SILENT
-        context.addresses['10.0.0.4']._state = AddressStates.SILENT
+        context.addresses['10.0.0.4'].force_state(AddressStates.SILENT)
         with self.assertRaises(InvalidTransition):
             context.on_authorization('10.0.0.4', True)
         self.assertEqual(AddressStates.SILENT, context.addresses['10.0.0.4'].state)
         # check state becomes SILENT if not authorized and auto fencing deactivated
         with patch.object(self.supvisors.options, 'auto_fence', False):
             for state in [AddressStates.UNKNOWN, AddressStates.CHECKING, AddressStates.SILENT, AddressStates.RUNNING]:
-                context.addresses['10.0.0.5']._state = state
+                context.addresses['10.0.0.5'].force_state(state)
                 context.on_authorization('10.0.0.5', False)
                 self.assertEqual(AddressStates.SILENT, context.addresses['10.0.0.5'].state)
 
@@ -363,7 +568,7 @@ class ContextTest(unittest.TestCase):
                 address = context.addresses['10.0.0.1']
                 # check no change with known address in isolation
                 for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
-                    address._state = state
+                    address.force_state(state)
                     context.on_tick_event('10.0.0.1', {})
                     self.assertEqual(state, address.state)
                     self.assertEqual(0, mocked_check.call_count)
@@ -371,67 +576,112 @@ class ContextTest(unittest.TestCase):
                 # check that address is CHECKING and check_address is called
                 # before address time is updated and address status is sent
                 for state in [AddressStates.UNKNOWN, AddressStates.SILENT]:
-                    address._state = state
+                    address.force_state(state)
                     context.on_tick_event('10.0.0.1', {'when': 1234})
                     self.assertEqual(AddressStates.CHECKING, address.state)
-                    self.assertEqual(call('10.0.0.1'), mocked_check.call_args)
+                    self.assertEqual(call('10.0.0.1', []), mocked_check.call_args)
                     self.assertEqual(call(address), mocked_send.call_args)
                     self.assertEqual(1234, address.remote_time)
                 # check that address time is updated and address status is sent
                 mocked_check.reset_mock()
                 mocked_send.reset_mock()
                 for state in [AddressStates.CHECKING, AddressStates.RUNNING]:
-                    address._state = state
+                    address.force_state(state)
                     context.on_tick_event('10.0.0.1', {'when': 5678})
                     self.assertEqual(state, address.state)
                     self.assertEqual(0, mocked_check.call_count)
                     self.assertEqual(call(address), mocked_send.call_args)
                     self.assertEqual(5678, address.remote_time)
 
+    @patch('supvisors.context.time', return_value=1234)
+    def test_heartbeat_event(self, _):
+        """ Test the handling of a heartbeat. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        context = Context(self.supvisors)
+        # check no exception with unknown address
+        context.on_heartbeat_event('10.0.0.0')
+        # check no change with known address in isolation
+        address = context.addresses['10.0.0.1']
+        for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
+            address.force_state(state)
+            context.on_heartbeat_event('10.0.0.1')
+            self.assertIsNone(address.detector.last_time)
+        # check that the detector is fed in the other states
+        for state in [AddressStates.UNKNOWN, AddressStates.SILENT,
+                      AddressStates.CHECKING, AddressStates.RUNNING]:
+            address.force_state(state)
+            address.detector.reset()
+            context.on_heartbeat_event('10.0.0.1')
+            self.assertEqual(1234, address.detector.last_time)
+
     def test_process_event(self):
         """ Test the handling of a process event. """
         from supvisors.context import Context
         from supvisors.ttypes import AddressStates, ApplicationStates
         context = Context(self.supvisors)
-        with patch.object(self.supvisors.zmq.publisher, 'send_application_status') as mocked_appli:
-            with patch.object(self.supvisors.zmq.publisher, 'send_process_status') as mocked_proc:
-                # check no exception with unknown address
-                result = context.on_process_event('10.0.0.0', {})
+        with patch.object(self.supvisors.zmq.publisher, 'send_process_event') as mocked_evt:
+            # check no exception with unknown address
+            result = context.on_process_event('10.0.0.0', {})
+            self.assertIsNone(result)
+            self.assertEqual(0, mocked_evt.call_count)
+            # get address status used for tests
+            address = context.addresses['10.0.0.1']
+            # check no change with known address in isolation
+            for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
+                address.force_state(state)
+                result = context.on_process_event('10.0.0.1', {})
                 self.assertIsNone(result)
-                self.assertEqual(0, mocked_appli.call_count)
-                self.assertEqual(0, mocked_proc.call_count)
-                # get address status used for tests
-                address = context.addresses['10.0.0.1']
-                # check no change with known address in isolation
-                for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
-                    address._state = state
-                    result = context.on_process_event('10.0.0.1', {})
-                    self.assertIsNone(result)
-                    self.assertEqual(0, mocked_appli.call_count)
-                    self.assertEqual(0, mocked_proc.call_count)
-                # check no exception with unknown process
-                for state in [AddressStates.UNKNOWN, AddressStates.SILENT, AddressStates.CHECKING, AddressStates.RUNNING]:
-                    address._state = state
-                    result = context.on_process_event('10.0.0.1', {'groupname': 'dummy_application', 'processname': 'dummy_process'})
-                    self.assertIsNone(result)
-                    self.assertEqual(0, mocked_appli.call_count)
-                    self.assertEqual(0, mocked_proc.call_count)
-                # fill context with one process
-                dummy_info = {'group': 'dummy_application', 'name': 'dummy_process', 'expected': True, 'now': 1234, 'state': 0}
-                process = context.setdefault_process(dummy_info)
-                process.add_info('10.0.0.1', dummy_info)
-                application = context.applications['dummy_application']
+                self.assertEqual(0, mocked_evt.call_count)
+            # check no exception with unknown process
+            for state in [AddressStates.UNKNOWN, AddressStates.SILENT, AddressStates.CHECKING, AddressStates.RUNNING]:
+                address.force_state(state)
+                result = context.on_process_event('10.0.0.1', {'groupname': 'dummy_application', 'processname': 'dummy_process'})
+                self.assertIsNone(result)
+                self.assertEqual(0, mocked_evt.call_count)
+            # fill context with one process
+            dummy_info = {'group': 'dummy_application', 'name': 'dummy_process', 'expected': True, 'now': 1234, 'state': 0}
+            process = context.setdefault_process(dummy_info)
+            process.add_info('10.0.0.1', dummy_info)
+            application = context.applications['dummy_application']
+            self.assertEqual(ApplicationStates.STOPPED, application.state)
+            # check normal behaviour with known process
+            # application status is not evaluated here
+            dummy_event = {'group': 'dummy_application', 'name': 'dummy_process', 'state': 10, 'now': 2345}
+            for state in [AddressStates.UNKNOWN, AddressStates.SILENT, AddressStates.CHECKING, AddressStates.RUNNING]:
+                address.force_state(state)
+                result = context.on_process_event('10.0.0.1', dummy_event)
+                self.assertIs(process, result)
+                self.assertEqual(10, process.state)
                 self.assertEqual(ApplicationStates.STOPPED, application.state)
-                # check normal behaviour with known process
-                dummy_event = {'group': 'dummy_application', 'name': 'dummy_process', 'state': 10, 'now': 2345}
-                for state in [AddressStates.UNKNOWN, AddressStates.SILENT, AddressStates.CHECKING, AddressStates.RUNNING]:
-                    address._state = state
-                    result = context.on_process_event('10.0.0.1', dummy_event)
-                    self.assertIs(process, result)
-                    self.assertEqual(10, process.state)
-                    self.assertEqual(ApplicationStates.STARTING, application.state)
-                    self.assertEqual(call(application), mocked_appli.call_args)
-                    self.assertEqual(call(process), mocked_proc.call_args)
+                self.assertEqual(call('10.0.0.1', dummy_event), mocked_evt.call_args)
+
+    def test_publish_process_status(self):
+        """ Test the publication of the process and application statuses. """
+        from supvisors.context import Context
+        from supvisors.ttypes import ApplicationStates
+        # the processes notify the context of their changes
+        context = self.supvisors.context = Context(self.supvisors)
+        # fill context with 3 processes in 2 applications
+        processes = []
+        for application_name, process_name in [('appli_1', 'proc_1'), ('appli_1', 'proc_2'), ('appli_2', 'proc_3')]:
+            info = {'group': application_name, 'name': process_name, 'expected': True, 'now': 1234, 'state': 10}
+            process = context.setdefault_process(info)
+            process.add_info('10.0.0.1', info)
+            processes.append(process)
+        proc_1, proc_2, proc_3 = processes
+        appli_1 = context.applications['appli_1']
+        appli_2 = context.applications['appli_2']
+        self.assertEqual(ApplicationStates.STOPPED, appli_1.state)
+        self.assertEqual(ApplicationStates.STOPPED, appli_2.state)
+        with patch.object(self.supvisors.zmq.publisher, 'send_application_status') as mocked_appli:
+            with patch.object(self.supvisors.zmq.publisher, 'send_process_status') as mocked_proc:
+                # each status is evaluated and published only once
+                context.publish_process_status([proc_1, proc_2, proc_1, proc_3, proc_2])
+                self.assertEqual([call(proc_1), call(proc_2), call(proc_3)], mocked_proc.call_args_list)
+                self.assertEqual([call(appli_1), call(appli_2)], mocked_appli.call_args_list)
+                self.assertEqual(ApplicationStates.STARTING, appli_1.state)
+                self.assertEqual(ApplicationStates.STARTING, appli_2.state)
 
     def test_timer_event(self):
         """ Test the handling of a timer event. """
@@ -449,7 +699,7 @@ class ContextTest(unittest.TestCase):
             test_addresses = ['10.0.0.1', '10.0.0.3',  '10.0.0.5']
             for address_name in test_addresses:
                 address = context.addresses[address_name]
-                address._state = AddressStates.RUNNING
+                address.force_state(AddressStates.RUNNING)
                 address.local_time = time.time()
             context.on_timer_event()
             for address_name in test_addresses:
@@ -481,6 +731,46 @@ class ContextTest(unittest.TestCase):
                 for address_name in [x for x in context.addresses.keys() if x not in test_addresses]:
                     self.assertEqual(AddressStates.UNKNOWN, context.addresses[address_name].state)
                 self.assertItemsEqual([call(address2), call(address3)], mocked_send.call_args_list)
+            # test RUNNING address state with heartbeats: the detector is used
+            mocked_send.reset_mock()
+            address4 = context.addresses['10.0.0.2']
+            address4.force_state(AddressStates.RUNNING)
+            address4.local_time = time.time() - 100
+            address4.detector.heartbeat(time.time())
+            context.on_timer_event()
+            self.assertEqual(AddressStates.RUNNING, address4.state)
+            self.assertEqual(0, mocked_send.call_count)
+            address4.detector.last_time -= 5
+            self.assertListEqual(['10.0.0.2'], context.on_timer_event())
+            self.assertEqual(AddressStates.ISOLATING, address4.state)
+            self.assertEqual([call(address4)], mocked_send.call_args_list)
+
+    def test_local_heartbeat(self):
+        """ Test the suspension of the failure detectors while the relay
+        is silent. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        context = Context(self.supvisors)
+        self.assertEqual(1.0, context.heartbeat_period)
+        self.assertIsNone(context.relay_time)
+        status = context.addresses['10.0.0.1']
+        status.force_state(AddressStates.RUNNING)
+        now = time.time()
+        status.detector.heartbeat(now - 10)
+        with patch.object(self.supvisors.zmq.publisher, 'send_address_status'):
+            # nothing has been received through the relay since the last
+            # heartbeat of the address: the detector is suspended
+            self.assertListEqual([], context.on_local_heartbeat(now - 10))
+            self.assertEqual(now - 10, context.relay_time)
+            self.assertEqual(AddressStates.RUNNING, status.state)
+            # the relay is working again
+            self.assertListEqual(['10.0.0.1'], context.on_local_heartbeat(now))
+            self.assertEqual(AddressStates.ISOLATING, status.state)
+        # without relay, the detector is always used
+        status.force_state(AddressStates.RUNNING)
+        with patch.object(self.supvisors.zmq.publisher, 'send_address_status'):
+            self.assertListEqual(['10.0.0.1'], context.on_local_heartbeat(None))
+        self.assertIsNone(context.relay_time)
 
     def test_handle_isolation(self):
         """ Test the isolation of addresses. """
@@ -489,12 +779,12 @@ class ContextTest(unittest.TestCase):
         context = Context(self.supvisors)
         with patch.object(self.supvisors.zmq.publisher, 'send_address_status') as mocked_send:
             # update address states
-            context.addresses['127.0.0.1']._state = AddressStates.CHECKING
-            context.addresses['10.0.0.1']._state = AddressStates.RUNNING
-            context.addresses['10.0.0.2']._state = AddressStates.SILENT
-            context.addresses['10.0.0.3']._state = AddressStates.ISOLATED
-            context.addresses['10.0.0.4']._state = AddressStates.ISOLATING
-            context.addresses['10.0.0.5']._state = AddressStates.ISOLATING
+            context.addresses['127.0.0.1'].force_state(AddressStates.CHECKING)
+            context.addresses['10.0.0.1'].force_state(AddressStates.RUNNING)
+            context.addresses['10.0.0.2'].force_state(AddressStates.SILENT)
+            context.addresses['10.0.0.3'].force_state(AddressStates.ISOLATED)
+            context.addresses['10.0.0.4'].force_state(AddressStates.ISOLATING)
+            context.addresses['10.0.0.5'].force_state(AddressStates.ISOLATING)
             # call method and check result
             result = context.handle_isolation()
             self.assertEqual(AddressStates.CHECKING, context.addresses['127.0.0.1'].state)
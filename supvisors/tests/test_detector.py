@@ -0,0 +1,98 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import sys
+import unittest
+
+
+class PhiAccrualDetectorTest(unittest.TestCase):
+    """ Test case for the detector module. """
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        from supvisors.detector import PhiAccrualDetector
+        detector = PhiAccrualDetector(1.0, 8)
+        self.assertEqual(1.0, detector.period)
+        self.assertEqual(8, detector.threshold)
+        self.assertEqual(0.1, detector.min_std_deviation)
+        self.assertEqual(0, len(detector.intervals))
+        self.assertIsNone(detector.last_time)
+        # no suspicion without heartbeat
+        self.assertEqual(0.0, detector.phi(1000))
+        self.assertFalse(detector.suspected(1000))
+
+    def test_first_heartbeat(self):
+        """ Test the estimation given by the first heartbeat. """
+        from supvisors.detector import PhiAccrualDetector
+        detector = PhiAccrualDetector(1.0, 8)
+        detector.heartbeat(100)
+        self.assertEqual(100, detector.last_time)
+        self.assertListEqual([0.75, 1.25], list(detector.intervals))
+        # the suspicion level grows with the time elapsed
+        self.assertLess(detector.phi(100.5), 1)
+        self.assertLess(detector.phi(101), detector.phi(101.5))
+        self.assertFalse(detector.suspected(102))
+        self.assertTrue(detector.suspected(103))
+
+    def test_regular_heartbeats(self):
+        """ Test the detection time with regular heartbeats. """
+        from supvisors.detector import PhiAccrualDetector
+        detector = PhiAccrualDetector(1.0, 8)
+        for idx in range(200):
+            detector.heartbeat(100 + idx)
+        # the window is bounded
+        self.assertEqual(PhiAccrualDetector.WINDOW_SIZE, len(detector.intervals))
+        self.assertAlmostEqual(100.0, detector.total)
+        # the standard deviation is bounded by the minimum
+        self.assertFalse(detector.suspected(299 + 1.4))
+        self.assertTrue(detector.suspected(299 + 1.6))
+        # no overflow for extreme values
+        self.assertEqual(0.0, detector.phi(299))
+        self.assertGreater(detector.phi(10000), 100)
+
+    def test_irregular_heartbeats(self):
+        """ Test that the detector adapts to irregular heartbeats. """
+        from supvisors.detector import PhiAccrualDetector
+        detector = PhiAccrualDetector(1.0, 8)
+        now = 100
+        for idx in range(100):
+            now += 0.5 if idx % 2 else 1.5
+            detector.heartbeat(now)
+        self.assertFalse(detector.suspected(now + 2.5))
+        self.assertTrue(detector.suspected(now + 4))
+
+    def test_reset(self):
+        """ Test the reset of the detector. """
+        from supvisors.detector import PhiAccrualDetector
+        detector = PhiAccrualDetector(1.0, 8)
+        detector.heartbeat(100)
+        detector.heartbeat(101)
+        detector.reset()
+        self.assertEqual(0, len(detector.intervals))
+        self.assertEqual(0.0, detector.total)
+        self.assertEqual(0.0, detector.squares)
+        self.assertIsNone(detector.last_time)
+        self.assertFalse(detector.suspected(1000))
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
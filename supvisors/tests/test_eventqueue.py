@@ -0,0 +1,176 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import asyncore
+import select
+import sys
+import unittest
+
+from mock import call, Mock
+from threading import Thread
+
+from supervisor.medusa import asyncore_25
+
+from supvisors.tests.base import MockedSupvisors
+
+
+class EventQueueTest(unittest.TestCase):
+    """ Test case for the eventqueue module. """
+
+    def setUp(self):
+        """ Create a logger and an event queue. """
+        from supvisors.eventqueue import EventQueue
+        self.supvisors = MockedSupvisors()
+        self.callback = Mock()
+        self.socket_map = {}
+        self.queue = EventQueue(self.callback, self.supvisors.logger,
+                                self.socket_map)
+
+    def tearDown(self):
+        """ Close the event queue if not done in test. """
+        if self.queue._fileno in self.socket_map:
+            self.queue.close()
+
+    def wait_wakeup(self):
+        """ Return True if the read end of the pipe is readable. """
+        readable, _, _ = select.select([self.queue._fileno], [], [], 1)
+        return bool(readable)
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        self.assertIs(self.callback, self.queue.callback)
+        self.assertIs(self.supvisors.logger, self.queue.logger)
+        self.assertTrue(self.queue.queue.empty())
+        self.assertFalse(self.queue.processing)
+        self.assertFalse(self.queue.nested)
+        # the dispatcher is registered in the socket map
+        self.assertIs(self.queue, self.socket_map[self.queue._fileno])
+        self.assertTrue(self.queue.readable())
+        self.assertFalse(self.queue.writable())
+        self.assertFalse(self.wait_wakeup())
+
+    def test_supervisord_map(self):
+        """ Test that the dispatcher is registered in the socket map
+        polled by supervisord, not in the standard asyncore one. """
+        from supervisor.options import ServerOptions
+        from supvisors.eventqueue import EventQueue
+        queue = EventQueue(self.callback, self.supvisors.logger,
+                           ServerOptions().get_socket_map())
+        fileno = queue._fileno
+        try:
+            self.assertIs(queue, asyncore_25.socket_map[fileno])
+            self.assertNotIn(fileno, asyncore.socket_map)
+        finally:
+            queue.close()
+        self.assertNotIn(fileno, asyncore_25.socket_map)
+
+    def test_close(self):
+        """ Test the removal of the dispatcher from the socket map. """
+        fileno = self.queue._fileno
+        self.queue.close()
+        self.assertNotIn(fileno, self.socket_map)
+
+    def test_push_read(self):
+        """ Test the hand-over of events between threads. """
+        # push events from another thread
+        def push_events():
+            self.queue.push('event', (0, '10.0.0.1', {'when': 1234}))
+            self.queue.push('info', ('10.0.0.2', [{'name': 'dummy'}]))
+        thread = Thread(target=push_events)
+        thread.start()
+        thread.join()
+        # the pipe is readable
+        self.assertTrue(self.wait_wakeup())
+        # process the read event as supervisord would do
+        self.queue.handle_read_event()
+        # all the events have been unstacked with a single wake-up
+        self.assertEqual([call('event', (0, '10.0.0.1', {'when': 1234})),
+                          call('info', ('10.0.0.2', [{'name': 'dummy'}]))],
+                         self.callback.call_args_list)
+        self.assertTrue(self.queue.queue.empty())
+        self.assertFalse(self.wait_wakeup())
+        # nothing happens on a spurious wake-up
+        self.callback.reset_mock()
+        self.queue.handle_read_event()
+        self.assertFalse(self.callback.called)
+
+    def test_callback_error(self):
+        """ Test that an exception in the callback does not break
+        the unstacking. """
+        self.callback.side_effect = [KeyError, None]
+        self.queue.push('event', 'data 1')
+        self.queue.push('event', 'data 2')
+        self.queue.handle_read_event()
+        self.assertEqual([call('event', 'data 1'), call('event', 'data 2')],
+                         self.callback.call_args_list)
+        self.assertEqual(1, self.supvisors.logger.error.call_count)
+        self.assertIn(self.queue._fileno, self.socket_map)
+
+    def test_process(self):
+        """ Test the direct processing of events after the events
+        already queued. """
+        self.queue.push('event', 'remote 1')
+        self.queue.push('event', 'remote 2')
+        self.queue.process('event', 'local')
+        # all the events are processed in order, without waiting
+        # for the wake-up
+        self.assertEqual([call('event', 'remote 1'), call('event', 'remote 2'),
+                          call('event', 'local')],
+                         self.callback.call_args_list)
+        self.assertTrue(self.queue.queue.empty())
+        self.assertFalse(self.queue.processing)
+        # the pending wake-up leads to nothing
+        self.callback.reset_mock()
+        self.queue.handle_read_event()
+        self.assertFalse(self.callback.called)
+
+    def test_process_nested(self):
+        """ Test that an event produced while processing an event
+        is processed after it. """
+        processed = []
+        def callback(event_type, event_data):
+            processed.append(event_data)
+            self.assertTrue(self.queue.processing)
+            if event_data == 'local 1':
+                self.queue.process('event', 'local 2')
+                # not processed yet
+                self.assertEqual('local 1', processed[-1])
+        self.queue.callback = callback
+        self.queue.process('event', 'local 1')
+        self.assertListEqual(['local 1', 'local 2'], processed)
+        self.assertFalse(self.queue.processing)
+        # the nested event is processed before the other events queued
+        del processed[:]
+        self.queue.push('event', 'remote')
+        self.queue.process('event', 'local 1')
+        self.assertListEqual(['remote', 'local 1', 'local 2'], processed)
+        del processed[:]
+        self.queue.push('event', 'local 1')
+        self.queue.push('event', 'remote')
+        self.queue.handle_read_event()
+        self.assertListEqual(['local 1', 'local 2', 'remote'], processed)
+        self.assertFalse(self.queue.nested)
+        self.assertFalse(self.supvisors.logger.error.called)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
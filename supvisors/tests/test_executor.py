@@ -0,0 +1,315 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import sys
+import unittest
+
+from mock import patch
+from threading import Event, Lock
+
+
+class RequestExecutorTest(unittest.TestCase):
+    """ Test case for the executor module. """
+
+    def setUp(self):
+        """ Create a handler recording the requests. """
+        self.requests = []
+        self.requests_lock = Lock()
+        self.dropped = []
+        self.blocked = {}
+        self.executor = None
+
+    def tearDown(self):
+        """ Stop the executor threads. """
+        for event in self.blocked.values():
+            event.set()
+        if self.executor:
+            self.executor.stop()
+
+    def handler(self, header, body):
+        """ Record the request, blocking if requested for the address. """
+        address_name = body[0]
+        if address_name in self.blocked:
+            self.blocked[address_name].wait(5)
+        with self.requests_lock:
+            self.requests.append((header, body))
+
+    def drop_handler(self, header, body):
+        """ Record the request dropped. """
+        self.dropped.append((header, body))
+
+    def create_executor(self, nb_workers, depth=100):
+        """ Create the executor. """
+        from supvisors.executor import RequestExecutor
+        self.executor = RequestExecutor(self.handler, nb_workers, depth,
+                                        self.drop_handler)
+        return self.executor
+
+    def wait_requests(self, nb_requests):
+        """ Wait until the number of requests is performed. """
+        for _ in range(500):
+            with self.requests_lock:
+                if len(self.requests) >= nb_requests:
+                    return
+            Event().wait(0.01)
+        self.fail('requests not performed')
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        executor = self.create_executor(3, 20)
+        self.assertEqual(self.handler, executor.handler)
+        self.assertEqual(20, executor.depth)
+        self.assertEqual(self.drop_handler, executor.drop_handler)
+        self.assertDictEqual({}, executor.pending)
+        self.assertEqual(0, executor.queued)
+        self.assertSetEqual(set(), executor.busy)
+        self.assertTrue(executor.ready.empty())
+        self.assertEqual(3, len(executor.workers))
+        for worker in executor.workers:
+            self.assertTrue(worker.is_alive())
+            self.assertTrue(worker.daemon)
+
+    def test_stop(self):
+        """ Test the stopping of the threads. """
+        executor = self.create_executor(2)
+        executor.stop()
+        for worker in executor.workers:
+            self.assertFalse(worker.is_alive())
+        self.executor = None
+
+    def test_address_ordering(self):
+        """ Test that the requests of one address and one priority
+        are performed in order. """
+        from supvisors.utils import DeferredRequestHeaders
+        executor = self.create_executor(4)
+        for idx in range(20):
+            self.assertTrue(executor.submit('10.0.0.1',
+                DeferredRequestHeaders.START_PROCESS, ('10.0.0.1', idx)))
+        self.wait_requests(20)
+        self.assertListEqual(range(20), [body[1] for _, body in self.requests])
+        self.assertEqual(0, executor.pending_requests())
+        self.assertDictEqual({}, executor.pending)
+
+    def test_address_fifo(self):
+        """ Test that the requests of one address are performed in order,
+        whatever their priority. """
+        from supvisors.utils import DeferredRequestHeaders
+        executor = self.create_executor(1)
+        # block the only worker on a first request
+        self.blocked['10.0.0.1'] = Event()
+        executor.submit('10.0.0.1', DeferredRequestHeaders.CHECK_ADDRESS,
+                        ('10.0.0.1', ))
+        for _ in range(100):
+            if executor.busy:
+                break
+            Event().wait(0.01)
+        # a START then a STOP of the same process
+        executor.submit('10.0.0.1', DeferredRequestHeaders.START_PROCESS,
+                        ('10.0.0.1', 'appli:proc', ''))
+        executor.submit('10.0.0.1', DeferredRequestHeaders.STOP_PROCESS,
+                        ('10.0.0.1', 'appli:proc'))
+        self.blocked['10.0.0.1'].set()
+        self.wait_requests(3)
+        self.assertListEqual([DeferredRequestHeaders.CHECK_ADDRESS,
+                              DeferredRequestHeaders.START_PROCESS,
+                              DeferredRequestHeaders.STOP_PROCESS],
+                             [header for header, _ in self.requests])
+
+    def test_parallel_addresses(self):
+        """ Test that a blocked address does not delay the other addresses. """
+        from supvisors.utils import DeferredRequestHeaders
+        header = DeferredRequestHeaders.CHECK_ADDRESS
+        executor = self.create_executor(2)
+        self.blocked['10.0.0.1'] = Event()
+        executor.submit('10.0.0.1', header, ('10.0.0.1', 0))
+        executor.submit('10.0.0.1', header, ('10.0.0.1', 1))
+        for idx in range(5):
+            executor.submit('10.0.0.2', header, ('10.0.0.2', idx))
+        # all the requests to 10.0.0.2 are performed
+        self.wait_requests(5)
+        self.assertListEqual([(header, ('10.0.0.2', idx)) for idx in range(5)],
+                             self.requests)
+        # the requests to 10.0.0.1 are still pending
+        self.assertEqual(2, executor.pending_requests())
+        # unblock 10.0.0.1
+        self.blocked['10.0.0.1'].set()
+        self.wait_requests(7)
+        self.assertListEqual([(header, ('10.0.0.1', 0)),
+                              (header, ('10.0.0.1', 1))], self.requests[5:])
+
+    def test_priorities(self):
+        """ Test that the addresses having the most urgent requests are served
+        first, the requests of an address being performed in order. """
+        from supvisors.utils import DeferredRequestHeaders
+        executor = self.create_executor(1)
+        # block the only worker on a first request
+        self.blocked['10.0.0.1'] = Event()
+        executor.submit('10.0.0.1', DeferredRequestHeaders.CHECK_ADDRESS,
+                        ('10.0.0.1', ))
+        for _ in range(100):
+            if executor.busy:
+                break
+            Event().wait(0.01)
+        # submit requests of all priorities
+        executor.submit('10.0.0.2', DeferredRequestHeaders.CHECK_ADDRESS,
+                        ('10.0.0.2', ))
+        executor.submit('10.0.0.2', DeferredRequestHeaders.START_PROCESS,
+                        ('10.0.0.2', 'appli:proc_1', ''))
+        executor.submit('10.0.0.3', DeferredRequestHeaders.START_PROCESSES,
+                        ('10.0.0.3', [('appli:proc_2', '')]))
+        executor.submit('10.0.0.1', DeferredRequestHeaders.STOP_PROCESS,
+                        ('10.0.0.1', 'appli:proc_3'))
+        executor.submit('10.0.0.3', DeferredRequestHeaders.SHUTDOWN,
+                        ('10.0.0.3', ))
+        self.blocked['10.0.0.1'].set()
+        self.wait_requests(6)
+        self.assertListEqual([(DeferredRequestHeaders.CHECK_ADDRESS, '10.0.0.1'),
+                              (DeferredRequestHeaders.START_PROCESSES, '10.0.0.3'),
+                              (DeferredRequestHeaders.SHUTDOWN, '10.0.0.3'),
+                              (DeferredRequestHeaders.STOP_PROCESS, '10.0.0.1'),
+                              (DeferredRequestHeaders.CHECK_ADDRESS, '10.0.0.2'),
+                              (DeferredRequestHeaders.START_PROCESS, '10.0.0.2')],
+                             [(header, body[0]) for header, body in self.requests])
+        # test the statistics
+        stats = executor.statistics()
+        self.assertEqual(100, stats['depth'])
+        self.assertEqual(0, stats['queued'])
+        self.assertEqual(0, stats['in_progress'])
+        self.assertListEqual(['SUPERVISOR', 'STOP', 'START', 'CHECK'],
+                             [entry['priority'] for entry in stats['priorities']])
+        self.assertListEqual([1, 1, 2, 2], [entry['enqueued']
+                                            for entry in stats['priorities']])
+        self.assertListEqual([1, 1, 2, 2], [entry['performed']
+                                            for entry in stats['priorities']])
+        for entry in stats['priorities']:
+            self.assertEqual(0, entry['dropped'])
+            self.assertEqual(0, entry['queued'])
+            self.assertLessEqual(entry['latency_mean'], entry['latency_max'])
+
+    @patch('supvisors.executor.stderr')
+    def test_overflow(self, _):
+        """ Test the dropping of requests when the queue is full. """
+        from supvisors.utils import DeferredRequestHeaders
+        executor = self.create_executor(1, 3)
+        # block the only worker on a first request
+        self.blocked['10.0.0.1'] = Event()
+        executor.submit('10.0.0.1', DeferredRequestHeaders.CHECK_ADDRESS,
+                        ('10.0.0.1', ))
+        for _ in range(100):
+            if executor.busy:
+                break
+            Event().wait(0.01)
+        # fill the queue
+        for idx in range(3):
+            self.assertTrue(executor.submit('10.0.0.%d' % (idx + 2),
+                DeferredRequestHeaders.CHECK_ADDRESS, ('10.0.0.%d' % (idx + 2), )))
+        self.assertEqual(3, executor.queued)
+        # a request of the same priority is dropped
+        self.assertFalse(executor.submit('10.0.0.5',
+            DeferredRequestHeaders.CHECK_ADDRESS, ('10.0.0.5', )))
+        self.assertListEqual([(DeferredRequestHeaders.CHECK_ADDRESS,
+                               ('10.0.0.5', ))], self.dropped)
+        # a request of higher priority evicts the most recent request
+        # of lower priority
+        self.assertTrue(executor.submit('10.0.0.2',
+            DeferredRequestHeaders.STOP_PROCESS, ('10.0.0.2', 'appli:proc')))
+        self.assertEqual(3, executor.queued)
+        self.assertNotIn('10.0.0.4', executor.pending)
+        self.assertListEqual([(DeferredRequestHeaders.CHECK_ADDRESS,
+                               ('10.0.0.4', ))], self.dropped[1:])
+        stats = executor.statistics()
+        self.assertEqual(3, stats['queued'])
+        self.assertEqual(1, stats['in_progress'])
+        self.assertListEqual([0, 1, 0, 4], [entry['enqueued']
+                                            for entry in stats['priorities']])
+        self.assertListEqual([0, 0, 0, 2], [entry['dropped']
+                                            for entry in stats['priorities']])
+        self.assertListEqual([0, 1, 0, 2], [entry['queued']
+                                            for entry in stats['priorities']])
+        # unblock and check the order of execution
+        self.blocked['10.0.0.1'].set()
+        self.wait_requests(4)
+        self.assertListEqual([('10.0.0.1', ), ('10.0.0.2', ),
+                              ('10.0.0.2', 'appli:proc'), ('10.0.0.3', )],
+                             [body for _, body in self.requests])
+
+    @patch('supvisors.executor.stderr')
+    def test_overflow_process(self, _):
+        """ Test that the process requests evicted when the queue is full
+        are given to the drop handler. """
+        from supvisors.utils import DeferredRequestHeaders
+        executor = self.create_executor(1, 1)
+        # block the only worker on a first request
+        self.blocked['10.0.0.1'] = Event()
+        executor.submit('10.0.0.1', DeferredRequestHeaders.CHECK_ADDRESS,
+                        ('10.0.0.1', ))
+        for _ in range(100):
+            if executor.busy:
+                break
+            Event().wait(0.01)
+        # the STOP request evicts the START request
+        self.assertTrue(executor.submit('10.0.0.2',
+            DeferredRequestHeaders.START_PROCESS, ('10.0.0.2', 'appli:proc', '')))
+        self.assertListEqual([], self.dropped)
+        self.assertTrue(executor.submit('10.0.0.2',
+            DeferredRequestHeaders.STOP_PROCESS, ('10.0.0.2', 'appli:proc')))
+        self.assertListEqual([(DeferredRequestHeaders.START_PROCESS,
+                               ('10.0.0.2', 'appli:proc', ''))], self.dropped)
+        # unblock and check that only the STOP request is performed
+        self.blocked['10.0.0.1'].set()
+        self.wait_requests(2)
+        self.assertListEqual([DeferredRequestHeaders.CHECK_ADDRESS,
+                              DeferredRequestHeaders.STOP_PROCESS],
+                             [header for header, _ in self.requests])
+
+    def test_stop_discard(self):
+        """ Test that pending requests are discarded on stop. """
+        from supvisors.utils import DeferredRequestHeaders
+        header = DeferredRequestHeaders.CHECK_ADDRESS
+        executor = self.create_executor(1)
+        self.blocked['10.0.0.1'] = Event()
+        executor.submit('10.0.0.1', header, ('10.0.0.1', 0))
+        executor.submit('10.0.0.1', header, ('10.0.0.1', 1))
+        executor.submit('10.0.0.2', header, ('10.0.0.2', 2))
+        self.blocked['10.0.0.1'].set()
+        executor.stop()
+        self.executor = None
+        # only the request in progress may have been completed
+        self.assertLessEqual(len(self.requests), 1)
+        self.assertDictEqual({}, executor.pending)
+
+    @patch('supvisors.executor.stderr')
+    def test_handler_error(self, _):
+        """ Test that an exception in the handler does not stop the worker. """
+        from supvisors.utils import DeferredRequestHeaders
+        header = DeferredRequestHeaders.CHECK_ADDRESS
+        executor = self.create_executor(1)
+        executor.handler = lambda header, body: (
+            self.handler(header, body) if body[1] else 1 / 0)
+        executor.submit('10.0.0.1', header, ('10.0.0.1', 0))
+        executor.submit('10.0.0.1', header, ('10.0.0.1', 1))
+        self.wait_requests(1)
+        self.assertListEqual([(header, ('10.0.0.1', 1))], self.requests)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -72,6 +72,13 @@ class InfoSourceTest(unittest.TestCase):
         self.assertDictEqual({'SUPERVISOR_SERVER_URL': 'url', 'SUPERVISOR_USERNAME': 'user',
             'SUPERVISOR_PASSWORD': 'p@$$w0rd'}, source.get_env())
 
+    def test_socket_map(self):
+        """ Test the access to the socket map polled by supervisord. """
+        from supervisor.medusa import asyncore_25
+        from supvisors.infosource import SupervisordSource
+        source = SupervisordSource(self.supervisor)
+        self.assertIs(asyncore_25.socket_map, source.get_socket_map())
+
     def test_close_server(self):
         """ Test the closing of supervisord HTTP servers. """
         from supvisors.infosource import SupervisordSource
@@ -37,6 +37,8 @@ class InitializerTest(unittest.TestCase):
         """ Test the values set at construction. """
         from supvisors.initializer import Supvisors
         # create Supvisors instance
+        args[0].return_value.supvisors_options.membership_file = ''
+        args[0].return_value.supvisors_options.context_file = ''
         supervisord = DummySupervisor()
         supvisors = Supvisors(supervisord)
         # test inclusion of Supvisors into Supervisor
@@ -57,6 +59,7 @@ class InitializerTest(unittest.TestCase):
         self.assertIsNotNone(supvisors.statistician)
         self.assertIsNotNone(supvisors.fsm)
         self.assertIsNotNone(supvisors.parser)
+        self.assertIsNotNone(supvisors.snapshot)
         self.assertIsNotNone(supvisors.listener)
 
     @patch('supvisors.initializer.getLogger')
@@ -80,6 +83,8 @@ class InitializerTest(unittest.TestCase):
         """ Test the values set at construction. """
         from supvisors.initializer import Supvisors
         # create Supvisors instance
+        args[0].return_value.supvisors_options.membership_file = ''
+        args[0].return_value.supvisors_options.context_file = ''
         supervisord = DummySupervisor()
         supvisors = Supvisors(supervisord)
         # test that parser exception is accepted
@@ -17,13 +17,16 @@
 # limitations under the License.
 # ======================================================================
 
+import select
 import sys
 import unittest
 
 from mock import call, patch, Mock, DEFAULT
+from threading import Thread
 from supervisor.events import *
 
 from supvisors.tests.base import MockedSupvisors
+from supvisors.utils import InternalEventHeaders
 
 
 class ListenerTest(unittest.TestCase):
@@ -44,12 +47,14 @@ class ListenerTest(unittest.TestCase):
         self.assertEqual('127.0.0.1', listener.address)
         self.assertIsNone(listener.publisher)
         self.assertIsNone(listener.main_loop)
+        self.assertIsNone(listener.event_queue)
         # test that callbacks are set in Supervisor
         self.assertIn((SupervisorRunningEvent, listener.on_running), callbacks)
         self.assertIn((SupervisorStoppingEvent, listener.on_stopping), callbacks)
         self.assertIn((ProcessStateEvent, listener.on_process), callbacks)
         self.assertIn((Tick5Event, listener.on_tick), callbacks)
-        self.assertIn((RemoteCommunicationEvent, listener.on_remote_event), callbacks)
+        self.assertNotIn(RemoteCommunicationEvent,
+                         [event_type for event_type, _ in callbacks])
 
     @patch.dict('sys.modules', **{'supvisors.statscollector':
         Mock(**{'instant_statistics.side_effect': lambda: True})})
@@ -63,12 +68,14 @@ class ListenerTest(unittest.TestCase):
         self.assertEqual('127.0.0.1', listener.address)
         self.assertIsNone(listener.publisher)
         self.assertIsNone(listener.main_loop)
+        self.assertIsNone(listener.event_queue)
         # test that callbacks are set in Supervisor
         self.assertIn((SupervisorRunningEvent, listener.on_running), callbacks)
         self.assertIn((SupervisorStoppingEvent, listener.on_stopping), callbacks)
         self.assertIn((ProcessStateEvent, listener.on_process), callbacks)
         self.assertIn((Tick5Event, listener.on_tick), callbacks)
-        self.assertIn((RemoteCommunicationEvent, listener.on_remote_event), callbacks)
+        self.assertNotIn(RemoteCommunicationEvent,
+                         [event_type for event_type, _ in callbacks])
 
     def test_on_running(self):
         """ Test the reception of a Supervisor RUNNING event. """
@@ -79,14 +86,24 @@ class ListenerTest(unittest.TestCase):
         with patch.object(self.supvisors.info_source, 'replace_default_handler') as mocked_infosource:
             with patch('supvisors.listener.SupervisorZmq') as mocked_zmq:
                 with patch('supvisors.listener.SupvisorsMainLoop') as mocked_loop:
-                    listener.on_running('')
-                    # test attributes and calls
-                    self.assertTrue(mocked_infosource.called)
-                    self.assertTrue(mocked_zmq.called)
-                    self.assertIsNot(ref_publisher, listener.publisher)
-                    self.assertTrue(mocked_loop.called)
-                    self.assertIsNot(ref_main_loop, listener.main_loop)
-                    self.assertTrue(listener.main_loop.start.called)
+                    with patch('supvisors.listener.EventQueue') as mocked_queue:
+                        listener.on_running('')
+                        # test attributes and calls
+                        self.assertTrue(mocked_infosource.called)
+                        self.assertTrue(mocked_zmq.called)
+                        self.assertIsNot(ref_publisher, listener.publisher)
+                        self.assertEqual([call(listener.on_remote_event,
+                                               listener.logger,
+                                               self.supvisors.info_source.
+                                               get_socket_map.return_value)],
+                                         mocked_queue.call_args_list)
+                        self.assertIs(mocked_queue.return_value,
+                                      listener.event_queue)
+                        self.assertEqual([call(self.supvisors,
+                                               listener.event_queue)],
+                                         mocked_loop.call_args_list)
+                        self.assertIsNot(ref_main_loop, listener.main_loop)
+                        self.assertTrue(listener.main_loop.start.called)
 
     def test_on_stopping(self):
         """ Test the reception of a Supervisor STOPPING event. """
@@ -94,12 +111,15 @@ class ListenerTest(unittest.TestCase):
         listener = SupervisorListener(self.supvisors)
         # create a main_loop patch
         listener.main_loop = Mock(**{'stop.return_value': None})
+        listener.event_queue = Mock(**{'close.return_value': None})
         with patch.object(self.supvisors.info_source, 'close_httpservers') as mocked_infosource:
             listener.on_stopping('')
             self.assertEqual([], callbacks)
             self.assertTrue(mocked_infosource.called)
             self.assertTrue(listener.main_loop.stop.called)
+            self.assertTrue(listener.event_queue.close.called)
             self.assertTrue(self.supvisors.zmq.close.called)
+            self.assertTrue(self.supvisors.snapshot.save.called)
             self.assertTrue(self.supvisors.logger.close.called)
 
     @patch('supvisors.listener.time.time', return_value=77)
@@ -109,6 +129,7 @@ class ListenerTest(unittest.TestCase):
         listener = SupervisorListener(self.supvisors)
         # create a publisher patch
         listener.publisher = Mock(**{'send_process_event.return_value': None})
+        listener.on_local_event = Mock()
         # test non-process event
         with self.assertRaises(AttributeError):
             listener.on_process(Tick60Event(0, None))
@@ -116,9 +137,12 @@ class ListenerTest(unittest.TestCase):
         process = Mock(pid=1234, **{'config.name': 'dummy_process', 'group.config.name': 'dummy_group'})
         event = ProcessStateFatalEvent(process, '')
         listener.on_process(event)
-        self.assertEqual([call({'name': 'dummy_process', 'group': 'dummy_group',
-            'state': 200, 'now': 77, 'pid': 1234, 'expected': True})],
+        payload = {'name': 'dummy_process', 'group': 'dummy_group',
+                   'state': 200, 'now': 77, 'pid': 1234, 'expected': True}
+        self.assertEqual([call(payload)],
             listener.publisher.send_process_event.call_args_list)
+        self.assertEqual([call(InternalEventHeaders.PROCESS, payload)],
+            listener.on_local_event.call_args_list)
 
     @patch.dict('sys.modules', **{'supvisors.statscollector':
         Mock(**{'instant_statistics.return_value':
@@ -130,7 +154,9 @@ class ListenerTest(unittest.TestCase):
         # create patches
         listener.publisher = Mock(**{'send_tick_event.return_value': None,
             'send_statistics.return_value': None})
+        listener.on_local_event = Mock()
         listener.fsm.on_timer_event.return_value = ['10.0.0.1', '10.0.0.4']
+        listener.jobs = 'jobs'
         self.supvisors.context.addresses['127.0.0.1'] = Mock(**{'pid_processes.return_value': []})
         # test non-process event
         with self.assertRaises(AttributeError):
@@ -140,90 +166,279 @@ class ListenerTest(unittest.TestCase):
         listener.on_tick(event)
         self.assertEqual([call({'when': 120})],
             listener.publisher.send_tick_event.call_args_list)
-        self.assertEqual([call((8.5, [(25, 400)], 76.1, {'lo': (500, 500)}, {}))],
+        statistics = (8.5, [(25, 400)], 76.1, {'lo': (500, 500)}, {})
+        self.assertEqual([call(statistics)],
             listener.publisher.send_statistics.call_args_list)
+        self.assertEqual([call(InternalEventHeaders.TICK, {'when': 120}),
+                          call(InternalEventHeaders.STATISTICS, statistics)],
+            listener.on_local_event.call_args_list)
         self.assertEqual([call()], listener.fsm.on_timer_event.call_args_list)
         self.assertEqual([call(['10.0.0.1', '10.0.0.4'])],
             self.supvisors.zmq.pusher.send_isolate_addresses.call_args_list)
+        # the jobs are published at every tick
+        self.assertEqual([call(listener.fsm.serial_jobs.return_value)],
+            listener.publisher.send_jobs.call_args_list)
+        # the context is saved periodically
+        self.assertEqual([call(120)],
+            self.supvisors.snapshot.on_tick.call_args_list)
 
-    def test_unstack_event(self):
-        """ Test the processing of a Supvisors event. """
+    def test_on_local_event(self):
+        """ Test the direct processing of a local event. """
         from supvisors.listener import SupervisorListener
+        from supvisors.utils import RemoteCommEvents
         listener = SupervisorListener(self.supvisors)
+        listener.event_queue = Mock()
+        listener.on_local_event(InternalEventHeaders.TICK, {'when': 120})
+        self.assertEqual([call(RemoteCommEvents.SUPVISORS_EVENT,
+                               [(InternalEventHeaders.TICK,
+                                 listener.address, {'when': 120})])],
+                         listener.event_queue.process.call_args_list)
+
+    def supervisord_loop(self, socket_map):
+        """ Perform one iteration of the supervisord loop on socket_map. """
+        readable = [fd for fd, dispatcher in socket_map.items()
+                    if dispatcher.readable()]
+        for fd in select.select(readable, [], [], 1)[0]:
+            socket_map[fd].handle_read_event()
+
+    def test_event_queue(self):
+        """ Test the ordering of the remote and local events from the
+        Supvisors thread to the context, through the socket map polled by
+        supervisord. """
+        from supvisors.eventqueue import EventQueue
+        from supvisors.listener import SupervisorListener
+        from supvisors.utils import RemoteCommEvents
+        listener = SupervisorListener(self.supvisors)
+        listener.publisher = Mock()
+        socket_map = {}
+        listener.event_queue = EventQueue(listener.on_remote_event,
+                                          listener.logger, socket_map)
+        ticks = []
+        def on_tick_event(address, event):
+            ticks.append((address, event['when']))
+            # a local event produced while processing a remote event
+            # is processed after it
+            if address == '10.0.0.1':
+                listener.on_local_event(InternalEventHeaders.TICK,
+                                        {'when': event['when'] + 1})
+        self.supvisors.fsm.on_tick_event.side_effect = on_tick_event
+        try:
+            # the remote events are handed over by the Supvisors thread
+            def push_events():
+                for when in [10, 20]:
+                    listener.event_queue.push(
+                        RemoteCommEvents.SUPVISORS_EVENT,
+                        [(InternalEventHeaders.TICK, '10.0.0.1',
+                          {'when': when})])
+            thread = Thread(target=push_events)
+            thread.start()
+            thread.join()
+            # they are processed without any local event
+            self.supervisord_loop(socket_map)
+            self.assertListEqual([('10.0.0.1', 10), ('127.0.0.1', 11),
+                                  ('10.0.0.1', 20), ('127.0.0.1', 21)],
+                                 ticks)
+            self.assertFalse(listener.logger.error.called)
+            # a local event is processed after the remote events queued
+            del ticks[:]
+            listener.event_queue.push(RemoteCommEvents.SUPVISORS_EVENT,
+                [(InternalEventHeaders.TICK, '10.0.0.2', {'when': 30})])
+            listener.on_local_event(InternalEventHeaders.TICK, {'when': 40})
+            self.assertListEqual([('10.0.0.2', 30), ('127.0.0.1', 40)], ticks)
+            # the pending wake-up leads to nothing
+            self.supervisord_loop(socket_map)
+            self.assertListEqual([('10.0.0.2', 30), ('127.0.0.1', 40)], ticks)
+            self.assertFalse(listener.event_queue.processing)
+        finally:
+            listener.event_queue.close()
+
+    def test_unstack_events(self):
+        """ Test the processing of a batch of Supvisors events. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        # use a common mock to check the ordering of the calls
+        manager = Mock()
+        manager.attach_mock(listener.fsm.on_tick_event, 'on_tick_event')
+        manager.attach_mock(listener.fsm.on_process_events, 'on_process_events')
+        manager.attach_mock(listener.statistician.push_statistics,
+                            'push_statistics')
         # test tick event
-        listener.unstack_event('[0, "10.0.0.1", "data"]')
-        self.assertEqual([call('10.0.0.1', 'data')],
-            listener.fsm.on_tick_event.call_args_list)
-        self.assertFalse(listener.fsm.on_process_event.called)
-        self.assertFalse(listener.statistician.push_statistics.called)
-        listener.fsm.on_tick_event.reset_mock()
+        listener.unstack_events([(0, '10.0.0.1', 'data')])
+        self.assertEqual([call.on_tick_event('10.0.0.1', 'data')],
+                         manager.mock_calls)
+        manager.reset_mock()
         # test process event
-        listener.unstack_event('[1, "10.0.0.2", {"name": "dummy"}]')
-        self.assertFalse(listener.fsm.on_tick_event.called)
-        self.assertEqual([call('10.0.0.2', {"name": "dummy"})],
-            listener.fsm.on_process_event.call_args_list)
-        self.assertFalse(listener.statistician.push_statistics.called)
-        listener.fsm.on_process_event.reset_mock()
+        listener.unstack_events([(1, '10.0.0.2', {'name': 'dummy'})])
+        self.assertEqual([call.on_process_events([('10.0.0.2',
+                                                   {'name': 'dummy'})])],
+                         manager.mock_calls)
+        manager.reset_mock()
         # test statistics event
-        listener.unstack_event('[2, "10.0.0.3", [0, [[20, 30]], {"lo": [100, 200]}, {}]]')
-        self.assertFalse(listener.fsm.on_tick_event.called)
-        self.assertFalse(listener.fsm.on_process_event.called)
-        self.assertEqual([call('10.0.0.3', [0, [[20, 30]], {"lo": [100, 200]}, {}])],
-            listener.statistician.push_statistics.call_args_list)
+        listener.unstack_events([(2, '10.0.0.3',
+                                  (0, [(20, 30)], {'lo': (100, 200)}, {}))])
+        self.assertEqual([call.push_statistics('10.0.0.3',
+                            (0, [(20, 30)], {'lo': (100, 200)}, {}))],
+                         manager.mock_calls)
+        manager.reset_mock()
+        # test that consecutive process events are grouped
+        # and that the ordering is preserved
+        listener.unstack_events([(1, '10.0.0.1', {'name': 'dummy_1'}),
+                                 (1, '10.0.0.2', {'name': 'dummy_2'}),
+                                 (0, '10.0.0.1', 'data'),
+                                 (1, '10.0.0.3', {'name': 'dummy_3'}),
+                                 (2, '10.0.0.3', 'stats'),
+                                 (1, '10.0.0.4', {'name': 'dummy_4'}),
+                                 (1, '10.0.0.4', {'name': 'dummy_5'})])
+        self.assertEqual([call.on_process_events([
+                              ('10.0.0.1', {'name': 'dummy_1'}),
+                              ('10.0.0.2', {'name': 'dummy_2'})]),
+                          call.on_tick_event('10.0.0.1', 'data'),
+                          call.on_process_events([
+                              ('10.0.0.3', {'name': 'dummy_3'})]),
+                          call.push_statistics('10.0.0.3', 'stats'),
+                          call.on_process_events([
+                              ('10.0.0.4', {'name': 'dummy_4'}),
+                              ('10.0.0.4', {'name': 'dummy_5'})])],
+                         manager.mock_calls)
+        manager.reset_mock()
+        # test heartbeats: the local heartbeat triggers the check of the
+        # failure detectors, and the periodic check only when an address
+        # has been invalidated
+        manager.attach_mock(listener.fsm.on_heartbeat_event,
+                            'on_heartbeat_event')
+        manager.attach_mock(listener.fsm.on_local_heartbeat,
+                            'on_local_heartbeat')
+        listener.fsm.on_local_heartbeat.return_value = False
+        with patch.object(listener, 'periodic_check') as mocked_check:
+            manager.attach_mock(mocked_check, 'periodic_check')
+            listener.unstack_events([(3, '10.0.0.1', {}),
+                                     (3, listener.address, {}),
+                                     (3, '10.0.0.2', {})])
+            self.assertEqual([call.on_heartbeat_event('10.0.0.1'),
+                              call.on_local_heartbeat(None),
+                              call.on_heartbeat_event('10.0.0.2')],
+                             manager.mock_calls)
+            manager.reset_mock()
+            listener.fsm.on_local_heartbeat.return_value = True
+            listener.unstack_events([(3, listener.address,
+                                      {'relay_time': 1234.5})])
+            self.assertEqual([call.on_local_heartbeat(1234.5),
+                              call.periodic_check()],
+                             manager.mock_calls)
+        manager.reset_mock()
+        # test jobs event
+        manager.attach_mock(listener.fsm.on_jobs_event, 'on_jobs_event')
+        listener.unstack_events([(4, '10.0.0.1', {'starter': [], 'stopper': []})])
+        self.assertEqual([call.on_jobs_event('10.0.0.1', {'starter': [],
+                                                          'stopper': []})],
+                         manager.mock_calls)
+
+    def test_periodic_check(self):
+        """ Test the periodic check of the Supvisors instances. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        listener.fsm.on_timer_event.return_value = ['10.0.0.3']
+        listener.publisher = Mock()
+        with patch.object(listener, 'publish_jobs') as mocked_publish:
+            listener.periodic_check()
+            self.assertEqual([call()], mocked_publish.call_args_list)
+        self.assertEqual([call()], listener.fsm.on_timer_event.call_args_list)
+        self.assertEqual([call(['10.0.0.3'])],
+            self.supvisors.zmq.pusher.send_isolate_addresses.call_args_list)
+
+    def test_publish_jobs(self):
+        """ Test the publication of the jobs of the master. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        listener.publisher = Mock()
+        listener.fsm.serial_jobs.return_value = {'starter': [], 'stopper': []}
+        # not published if not master
+        self.supvisors.context.master = False
+        listener.jobs = 'jobs'
+        listener.publish_jobs()
+        self.assertIsNone(listener.jobs)
+        self.assertEqual(0, listener.publisher.send_jobs.call_count)
+        # published if master
+        self.supvisors.context.master = True
+        listener.publish_jobs()
+        self.assertDictEqual({'starter': [], 'stopper': []}, listener.jobs)
+        self.assertEqual([call({'starter': [], 'stopper': []})],
+            listener.publisher.send_jobs.call_args_list)
+        # not published again if unchanged
+        listener.publish_jobs()
+        self.assertEqual(1, listener.publisher.send_jobs.call_count)
+        # published again if changed
+        listener.fsm.serial_jobs.return_value = {'starter': [(2, 0, 'appli', 0, ['appli:proc'])],
+                                                 'stopper': []}
+        listener.publish_jobs()
+        self.assertEqual(2, listener.publisher.send_jobs.call_count)
 
     def test_unstack_info(self):
         """ Test the processing of a Supvisors information. """
         from supvisors.listener import SupervisorListener
         listener = SupervisorListener(self.supvisors)
         # test info event
-        listener.unstack_info('["10.0.0.4", {"name": "dummy"}]')
+        listener.unstack_info(('10.0.0.4', {'name': 'dummy'}))
         self.assertEqual([call('10.0.0.4', {"name": "dummy"})],
             listener.fsm.on_process_info.call_args_list)
 
+    def test_unstack_faults(self):
+        """ Test the processing of the rejected requests. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        listener.unstack_faults((6, [('appli:proc', 'rejected')]))
+        self.assertEqual([call(6, [('appli:proc', 'rejected')])],
+            listener.fsm.on_request_faults.call_args_list)
+
     def test_authorization(self):
         """ Test the processing of a Supvisors authorization. """
         from supvisors.listener import SupervisorListener
         listener = SupervisorListener(self.supvisors)
-        listener.authorization('address_name:10.0.0.5 authorized:False')
+        listener.authorization(('10.0.0.5', False))
         self.assertEqual([call('10.0.0.5', False)],
             listener.fsm.on_authorization.call_args_list)
 
     def test_on_remote_event(self):
-        """ Test the reception of a Supervisor remote comm event. """
+        """ Test the reception of an event from the event queue. """
         from supvisors.listener import SupervisorListener
         listener = SupervisorListener(self.supvisors)
         # add patches for what is tested just above
-        with patch.multiple(listener, unstack_event=DEFAULT,
+        with patch.multiple(listener, unstack_events=DEFAULT,
                 unstack_info=DEFAULT, authorization=DEFAULT):
             # test unknown type
-            event = Mock(type='unknown', data='')
-            listener.on_remote_event(event)
-            self.assertFalse(listener.unstack_event.called)
+            listener.on_remote_event('unknown', '')
+            self.assertFalse(listener.unstack_events.called)
             self.assertFalse(listener.unstack_info.called)
             self.assertFalse(listener.authorization.called)
             # test event
-            event = Mock(type='event', data={'state': 'RUNNING'})
-            listener.on_remote_event(event)
+            listener.on_remote_event('event', {'state': 'RUNNING'})
             self.assertEqual([call({'state': 'RUNNING'})],
-                listener.unstack_event.call_args_list)
+                listener.unstack_events.call_args_list)
             self.assertFalse(listener.unstack_info.called)
             self.assertFalse(listener.authorization.called)
-            listener.unstack_event.reset_mock()
+            listener.unstack_events.reset_mock()
             # test info
-            event = Mock(type='info', data={'name': 'dummy_process'})
-            listener.on_remote_event(event)
-            self.assertFalse(listener.unstack_event.called)
+            listener.on_remote_event('info', {'name': 'dummy_process'})
+            self.assertFalse(listener.unstack_events.called)
             self.assertEqual([call({'name': 'dummy_process'})],
                 listener.unstack_info.call_args_list)
             self.assertFalse(listener.authorization.called)
             listener.unstack_info.reset_mock()
             # test authorization
-            event = Mock(type='auth', data=('10.0.0.1', True))
-            listener.on_remote_event(event)
-            self.assertFalse(listener.unstack_event.called)
+            listener.on_remote_event('auth', ('10.0.0.1', True))
+            self.assertFalse(listener.unstack_events.called)
             self.assertFalse(listener.unstack_info.called)
             self.assertEqual([call(('10.0.0.1', True))],
                 listener.authorization.call_args_list)
+            listener.authorization.reset_mock()
+            # test faults
+            with patch.object(listener, 'unstack_faults') as mocked_faults:
+                listener.on_remote_event('fault', (6, [('appli:proc', 'x')]))
+                self.assertEqual([call((6, [('appli:proc', 'x')]))],
+                                 mocked_faults.call_args_list)
+            self.assertFalse(listener.unstack_events.called)
+            self.assertFalse(listener.unstack_info.called)
+            self.assertFalse(listener.authorization.called)
 
     @patch('supvisors.listener.time.time', return_value=56)
     def test_force_process_state(self, mocked_time):
@@ -232,11 +447,15 @@ class ListenerTest(unittest.TestCase):
         listener = SupervisorListener(self.supvisors)
         # patch publisher
         listener.publisher = Mock(**{'send_process_event.return_value': None})
+        listener.on_local_event = Mock()
         # test the call
         listener.force_process_state('appli:process', 200)
-        self.assertEqual([call({'processname': 'process', 'groupname': 'appli', 'state': 200,
-            'now': 56, 'pid': 0, 'expected': False})],
+        payload = {'name': 'process', 'group': 'appli', 'state': 200,
+                   'now': 56, 'pid': 0, 'expected': False}
+        self.assertEqual([call(payload)],
             listener.publisher.send_process_event.call_args_list)
+        self.assertEqual([call(InternalEventHeaders.PROCESS, payload)],
+            listener.on_local_event.call_args_list)
 
     def test_force_process_fatal(self):
         """ Test the sending of a fake FATAL Supervisor process event. """
@@ -19,8 +19,9 @@
 
 import sys
 import unittest
+import xmlrpclib
 
-from mock import call, patch, Mock, DEFAULT
+from mock import call, patch, MagicMock, Mock, DEFAULT
 from threading import Thread
 
 from supvisors.tests.base import MockedSupvisors, DummyRpcInterface
@@ -32,7 +33,8 @@ class MainLoopTest(unittest.TestCase):
     def setUp(self):
         """ Create a Supvisors-like structure and patch getRPCInterface. """
         self.supvisors = MockedSupvisors()
-        self.rpc_patch = patch('supvisors.mainloop.getRPCInterface')
+        self.event_queue = Mock(**{'push.return_value': None})
+        self.rpc_patch = patch('supvisors.rpcrequests.getRPCInterface')
         self.mocked_rpc = self.rpc_patch.start()
 
     def tearDown(self):
@@ -42,22 +44,34 @@ class MainLoopTest(unittest.TestCase):
     def test_creation(self):
         """ Test the values set at construction. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        from supvisors.rpcrequests import RPCProxyPool
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         self.assertIsInstance(main_loop, Thread)
         self.assertIs(self.supvisors, main_loop.supvisors)
+        self.assertIs(self.event_queue, main_loop.event_queue)
+        self.assertEqual(100, main_loop.batch_size)
+        self.assertIs(self.supvisors.options.request_timeouts,
+                      main_loop.timeouts)
+        self.assertIsNone(main_loop.executor)
+        self.assertDictEqual({}, main_loop.sequences)
+        self.assertDictEqual({}, main_loop.process_sequences)
+        self.assertDictEqual({}, main_loop.generations)
+        self.assertEqual(0, main_loop.conflation_period)
+        self.assertEqual(0, main_loop.flush_time)
         self.assertFalse(main_loop.stop_event.is_set())
         self.assertDictEqual({'SUPERVISOR_SERVER_URL': 'http://127.0.0.1:65000',
                               'SUPERVISOR_USERNAME': '',
                               'SUPERVISOR_PASSWORD': ''},
                              main_loop.env)
-        self.assertEqual(1, self.mocked_rpc.call_count)
-        self.assertEqual(call('localhost', main_loop.env),
-                         self.mocked_rpc.call_args)
+        self.assertIsInstance(main_loop.proxies, RPCProxyPool)
+        self.assertIs(main_loop.env, main_loop.proxies.env)
+        # no XML-RPC proxy is created before the first request
+        self.assertEqual(0, self.mocked_rpc.call_count)
 
     def test_stopping(self):
         """ Test the get_loop method. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         self.assertFalse(main_loop.stopping())
         main_loop.stop_event.set()
         self.assertTrue(main_loop.stopping())
@@ -65,7 +79,7 @@ class MainLoopTest(unittest.TestCase):
     def test_stop(self):
         """ Test the stopping of the main loop thread. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         with patch.object(main_loop, 'join') as mocked_join:
             # try to stop main loop before it is started
             main_loop.stop()
@@ -77,35 +91,43 @@ class MainLoopTest(unittest.TestCase):
                 self.assertTrue(main_loop.stop_event.is_set())
                 self.assertEqual(1, mocked_join.call_count)
 
+    @patch('supvisors.mainloop.RequestExecutor')
     @patch('supvisors.mainloop.SupvisorsMainLoop.check_events')
     @patch('supvisors.mainloop.SupvisorsMainLoop.check_requests')
     @patch.multiple('supvisors.mainloop.zmq.Poller', register=DEFAULT,
                     unregister=DEFAULT, poll=DEFAULT)
-    def test_run(self, check_evt, check_rqt, register, unregister, poll):
+    def test_run(self, check_evt, check_rqt, mocked_executor,
+                 register, unregister, poll):
         """ Test the running of the main loop thread. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         # patch one loops
         with patch.object(main_loop, 'stopping',
                           side_effect=[False, False, True]):
             main_loop.run()
-        # test that register was called twice
-        self.assertEqual(2, register.call_count)
+        # test that register was called three times
+        self.assertEqual(3, register.call_count)
         # test that poll was called once
         self.assertEqual([call(500)], poll.call_args_list)
         # test that check_events was called once
         self.assertEqual(1, check_evt.call_count)
         # test that check_requests was called once
         self.assertEqual(1, check_rqt.call_count)
-        # test that unregister was called twice
-        self.assertEqual(2, unregister.call_count)
+        # test that unregister was called three times
+        self.assertEqual(3, unregister.call_count)
+        # test that the executor has been created and stopped
+        self.assertEqual([call(main_loop.send_request, 4, 1000,
+                               main_loop.drop_request)],
+                         mocked_executor.call_args_list)
+        self.assertIs(mocked_executor.return_value, main_loop.executor)
+        self.assertEqual(1, main_loop.executor.stop.call_count)
 
     @patch('supvisors.mainloop.stderr')
-    @patch('supvisors.mainloop.SupvisorsMainLoop.send_remote_comm_event')
-    def test_check_events(self, mocked_send, mocked_stderr):
+    def test_check_events(self, mocked_stderr):
         """ Test the processing of the events received. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        mocked_send = self.event_queue.push
         # test with empty socks
         mocked_subscriber = Mock(socket='zmq socket')
         socks = {}
@@ -121,19 +143,299 @@ class MainLoopTest(unittest.TestCase):
         self.assertEqual(0, mocked_send.call_count)
         mocked_subscriber.receive.reset_mock()
         # test with appropriate socks and without exception
-        mocked_subscriber = Mock(
-            socket='zmq socket', **{'receive.return_value': 'a zmq message'})
+        # all the events available are drained and pushed at once
+        import zmq
+        mocked_subscriber = Mock(socket='zmq socket', **{'receive.side_effect':
+            [(0, '10.0.0.1', None, None, 'a zmq message'),
+             (2, '10.0.0.2', None, None,
+              'another zmq message'), zmq.Again]})
         main_loop.check_events(mocked_subscriber, socks)
-        self.assertEqual(1, mocked_subscriber.receive.call_count)
-        self.assertEqual([call('event', '"a zmq message"')],
+        self.assertEqual(3, mocked_subscriber.receive.call_count)
+        self.assertEqual([call('event', [(0, '10.0.0.1', 'a zmq message'),
+                                         (2, '10.0.0.2', 'another zmq message')])],
+                         mocked_send.call_args_list)
+        # events without sequence number are not tracked
+        self.assertDictEqual({}, main_loop.sequences)
+        mocked_send.reset_mock()
+        # test that the batch size limits the number of events pushed
+        main_loop.batch_size = 2
+        mocked_subscriber = Mock(socket='zmq socket', **{'receive.side_effect':
+            [(0, '10.0.0.1', None, None, 'message 1'),
+             (0, '10.0.0.1', None, None, 'message 2'),
+             (0, '10.0.0.1', None, None, 'message 3'), zmq.Again]})
+        main_loop.check_events(mocked_subscriber, socks)
+        self.assertEqual(2, mocked_subscriber.receive.call_count)
+        self.assertEqual([call('event', [(0, '10.0.0.1', 'message 1'),
+                                         (0, '10.0.0.1', 'message 2')])],
+                         mocked_send.call_args_list)
+        mocked_send.reset_mock()
+        # remaining events are pushed at next call
+        main_loop.check_events(mocked_subscriber, socks)
+        self.assertEqual(4, mocked_subscriber.receive.call_count)
+        self.assertEqual([call('event', [(0, '10.0.0.1', 'message 3')])],
+                         mocked_send.call_args_list)
+        mocked_send.reset_mock()
+        # heartbeats are pushed but their sequence number is not tracked
+        mocked_subscriber = Mock(socket='zmq socket', **{'receive.side_effect':
+            [(3, '10.0.0.1', 'a1b2', 12, {}), zmq.Again]})
+        main_loop.check_events(mocked_subscriber, socks)
+        self.assertEqual([call('event', [(3, '10.0.0.1', {})])],
+                         mocked_send.call_args_list)
+        self.assertDictEqual({}, main_loop.sequences)
+        mocked_send.reset_mock()
+        # unsupported messages are skipped and the socket is still drained
+        from supvisors.codec import UnsupportedMessage
+        main_loop.batch_size = 10
+        mocked_subscriber = Mock(socket='zmq socket', **{'receive.side_effect':
+            [(0, '10.0.0.1', None, None, 'message 1'),
+             UnsupportedMessage('unknown event type: 7'),
+             (0, '10.0.0.1', None, None, 'message 2'), zmq.Again]})
+        main_loop.check_events(mocked_subscriber, socks)
+        self.assertEqual(4, mocked_subscriber.receive.call_count)
+        self.assertEqual([call('event', [(0, '10.0.0.1', 'message 1'),
+                                         (0, '10.0.0.1', 'message 2')])],
                          mocked_send.call_args_list)
 
     @patch('supvisors.mainloop.stderr')
-    @patch('supvisors.mainloop.SupvisorsMainLoop.send_request')
-    def test_check_requests(self, mocked_send, mocked_stderr):
+    def test_check_snapshot(self, mocked_stderr):
+        """ Test the reply to the snapshot requests. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        mocked_server = Mock(socket='zmq socket')
+        # test with empty socks
+        main_loop.check_snapshot(mocked_server, {})
+        self.assertEqual(0, mocked_server.reply.call_count)
+        # test with appropriate socks
+        main_loop.check_snapshot(mocked_server, {'zmq socket': 1})
+        self.assertEqual(1, mocked_server.reply.call_count)
+        # test that an exception is caught
+        mocked_server.reply.side_effect = Exception
+        main_loop.check_snapshot(mocked_server, {'zmq socket': 1})
+        self.assertEqual(2, mocked_server.reply.call_count)
+        self.assertTrue(mocked_stderr.write.called)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_check_heartbeat(self, mocked_stderr):
+        """ Test the periodic publication of the heartbeats. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.utils import InternalEventHeaders
+        self.supvisors.options.heartbeat_period = 200
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        self.assertEqual(0.2, main_loop.heartbeat_period)
+        self.assertEqual(0, main_loop.heartbeat_time)
+        mocked_publisher = Mock(address='127.0.0.1')
+        mocked_subscriber = Mock(relay=None, event_time=999.5)
+        expected_push = call('event', [(InternalEventHeaders.HEARTBEAT,
+                                        '127.0.0.1', {})])
+        # test first heartbeat
+        with patch('supvisors.mainloop.time', return_value=1000):
+            main_loop.check_heartbeat(mocked_publisher, mocked_subscriber)
+        self.assertEqual(1000, main_loop.heartbeat_time)
+        self.assertEqual(1, mocked_publisher.send_heartbeat.call_count)
+        self.assertEqual([expected_push], self.event_queue.push.call_args_list)
+        # test no heartbeat before the period
+        with patch('supvisors.mainloop.time', return_value=1000.1):
+            main_loop.check_heartbeat(mocked_publisher, mocked_subscriber)
+        self.assertEqual(1, mocked_publisher.send_heartbeat.call_count)
+        self.assertEqual(1, self.event_queue.push.call_count)
+        # test that an exception is caught and that the local heartbeat
+        # is pushed anyway
+        mocked_publisher.send_heartbeat.side_effect = Exception
+        with patch('supvisors.mainloop.time', return_value=1000.2):
+            main_loop.check_heartbeat(mocked_publisher, mocked_subscriber)
+        self.assertEqual(2, mocked_publisher.send_heartbeat.call_count)
+        self.assertEqual([expected_push, expected_push],
+                         self.event_queue.push.call_args_list)
+        self.assertTrue(mocked_stderr.write.called)
+        # test that the date of the last event received through the relay
+        # is given with the local heartbeat
+        mocked_subscriber.relay = '10.0.0.1'
+        self.event_queue.push.reset_mock()
+        with patch('supvisors.mainloop.time', return_value=1000.5):
+            main_loop.check_heartbeat(mocked_publisher, mocked_subscriber)
+        self.assertEqual([call('event', [(InternalEventHeaders.HEARTBEAT,
+                                          '127.0.0.1',
+                                          {'relay_time': 999.5})])],
+                         self.event_queue.push.call_args_list)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_check_relay(self, mocked_stderr):
+        """ Test the forwarding of the internal events by a relay
+        and the replacement of a silent relay. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        sockets = Mock(relay=None, **{'internal_subscriber.check_relay.return_value': False})
+        # test without relay
+        main_loop.check_relay(sockets, {})
+        self.assertEqual(1, sockets.internal_subscriber.check_relay.call_count)
+        self.assertFalse(mocked_stderr.write.called)
+        # test with relay
+        sockets.relay = Mock()
+        main_loop.check_relay(sockets, {'zmq socket': 1})
+        self.assertEqual([call({'zmq socket': 1})],
+                         sockets.relay.forward.call_args_list)
+        # test that an exception is caught
+        sockets.relay.forward.side_effect = Exception
+        main_loop.check_relay(sockets, {})
+        self.assertTrue(mocked_stderr.write.called)
+        mocked_stderr.write.reset_mock()
+        # test the replacement of the relay
+        sockets.internal_subscriber.check_relay.return_value = True
+        sockets.relay = None
+        main_loop.check_relay(sockets, {})
+        self.assertTrue(mocked_stderr.write.called)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_check_conflation(self, mocked_stderr):
+        """ Test the periodic publication of the conflated statuses. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        self.supvisors.options.event_conflation_period = 200
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        self.assertEqual(0.2, main_loop.conflation_period)
+        mocked_publisher = Mock()
+        # test first flush
+        with patch('supvisors.mainloop.time', return_value=1000.0):
+            main_loop.check_conflation(mocked_publisher)
+        self.assertEqual(1, mocked_publisher.flush.call_count)
+        self.assertEqual(1000.0, main_loop.flush_time)
+        # test that nothing is done before the period is reached
+        with patch('supvisors.mainloop.time', return_value=1000.1):
+            main_loop.check_conflation(mocked_publisher)
+        self.assertEqual(1, mocked_publisher.flush.call_count)
+        # test next flush, with an exception caught
+        mocked_publisher.flush.side_effect = Exception
+        with patch('supvisors.mainloop.time', return_value=1000.2):
+            main_loop.check_conflation(mocked_publisher)
+        self.assertEqual(2, mocked_publisher.flush.call_count)
+        self.assertEqual(1000.2, main_loop.flush_time)
+        self.assertTrue(mocked_stderr.write.called)
+
+    def test_check_events_sequence(self):
+        """ Test the tracking of the sequence numbers of the events received. """
+        import zmq
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        payload = {'group': 'appli', 'name': 'proc', 'state': 20}
+        mocked_subscriber = Mock(socket='zmq socket', **{'receive.side_effect':
+            [(0, '10.0.0.1', 'a1b2', 3, {'when': 1234}),
+             (1, '10.0.0.1', 'a1b2', 4, payload), zmq.Again]})
+        with patch.object(main_loop, 'check_sequence') as mocked_check:
+            main_loop.check_events(mocked_subscriber, {'zmq socket': 1})
+        self.assertEqual([call('10.0.0.1', 'a1b2', 3),
+                          call('10.0.0.1', 'a1b2', 4)],
+                         mocked_check.call_args_list)
+        self.assertDictEqual({'10.0.0.1': {('appli', 'proc'): 4}},
+                             main_loop.process_sequences)
+        self.assertEqual([call('event', [(0, '10.0.0.1', {'when': 1234}),
+                                         (1, '10.0.0.1', payload)])],
+                         self.event_queue.push.call_args_list)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_check_sequence(self, mocked_stderr):
+        """ Test the detection of the events lost. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.utils import DeferredRequestHeaders
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        main_loop.executor = Mock()
+        mocked_submit = main_loop.executor.submit
+        # test first event received from address
+        main_loop.check_sequence('10.0.0.1', 'a1b2', 12)
+        self.assertDictEqual({'10.0.0.1': ('a1b2', 12)}, main_loop.sequences)
+        # test next event
+        main_loop.check_sequence('10.0.0.1', 'a1b2', 13)
+        self.assertDictEqual({'10.0.0.1': ('a1b2', 13)}, main_loop.sequences)
+        self.assertEqual(0, mocked_submit.call_count)
+        # test events lost
+        main_loop.check_sequence('10.0.0.1', 'a1b2', 16)
+        self.assertDictEqual({'10.0.0.1': ('a1b2', 16)}, main_loop.sequences)
+        self.assertEqual([call('10.0.0.1',
+                               DeferredRequestHeaders.RESYNC_PROCESSES,
+                               ('10.0.0.1', 13))],
+                         mocked_submit.call_args_list)
+        self.assertTrue(mocked_stderr.write.called)
+        mocked_submit.reset_mock()
+        # test restart of the remote Supvisors instance
+        # the new sequence number overtakes the previous one
+        main_loop.process_sequences = {'10.0.0.1': {('appli', 'proc'): 15}}
+        main_loop.check_sequence('10.0.0.1', 'c3d4', 17)
+        self.assertDictEqual({'10.0.0.1': ('c3d4', 17)}, main_loop.sequences)
+        self.assertDictEqual({}, main_loop.process_sequences)
+        self.assertEqual([call('10.0.0.1',
+                               DeferredRequestHeaders.RESYNC_PROCESSES,
+                               ('10.0.0.1', 0))],
+                         mocked_submit.call_args_list)
+        mocked_submit.reset_mock()
+        # the new sequence number is lower than the previous one
+        main_loop.process_sequences = {'10.0.0.1': {('appli', 'proc'): 17}}
+        main_loop.check_sequence('10.0.0.1', 'e5f6', 1)
+        self.assertDictEqual({'10.0.0.1': ('e5f6', 1)}, main_loop.sequences)
+        self.assertDictEqual({}, main_loop.process_sequences)
+        self.assertEqual([call('10.0.0.1',
+                               DeferredRequestHeaders.RESYNC_PROCESSES,
+                               ('10.0.0.1', 0))],
+                         mocked_submit.call_args_list)
+        mocked_submit.reset_mock()
+        # test restart of a remote Supvisors instance without epoch
+        main_loop.sequences = {'10.0.0.1': (None, 12)}
+        main_loop.process_sequences = {'10.0.0.1': {('appli', 'proc'): 12}}
+        main_loop.check_sequence('10.0.0.1', None, 1)
+        self.assertDictEqual({'10.0.0.1': (None, 1)}, main_loop.sequences)
+        self.assertDictEqual({}, main_loop.process_sequences)
+        self.assertEqual(0, mocked_submit.call_count)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_resync_processes(self, mocked_stderr):
+        """ Test the resynchronization of the processes of an address. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        mocked_push = self.event_queue.push
+        # test rpc error
+        self.mocked_rpc.side_effect = Exception
+        main_loop.sequences = {'10.0.0.1': ('a1b2', 20)}
+        main_loop.resync_processes('10.0.0.1', 12)
+        self.assertTrue(mocked_stderr.write.called)
+        self.assertEqual(0, mocked_push.call_count)
+        # test with a mocked rpc interface
+        rpc_intf = Mock()
+        self.mocked_rpc.side_effect = None
+        self.mocked_rpc.return_value = rpc_intf
+        mocked_events = rpc_intf.supvisors.get_process_events
+        # the event of proc_1 has been superseded by a more recent event
+        main_loop.process_sequences = {'10.0.0.1': {('appli', 'proc_1'): 18}}
+        mocked_events.return_value = [
+            {'group': 'appli', 'name': 'proc_2', 'state': 0, 'sequence': 15},
+            {'group': 'appli', 'name': 'proc_1', 'state': 20, 'sequence': 14},
+            {'group': 'appli', 'name': 'proc_3', 'state': 100, 'sequence': 13}]
+        main_loop.resync_processes('10.0.0.1', 12)
+        self.assertEqual([call(12)], mocked_events.call_args_list)
+        self.assertEqual([call('event', [
+            (1, '10.0.0.1', {'group': 'appli', 'name': 'proc_3', 'state': 100}),
+            (1, '10.0.0.1', {'group': 'appli', 'name': 'proc_2', 'state': 0})])],
+            mocked_push.call_args_list)
+        self.assertDictEqual({'10.0.0.1': {('appli', 'proc_1'): 18,
+                                           ('appli', 'proc_2'): 15,
+                                           ('appli', 'proc_3'): 13}},
+                             main_loop.process_sequences)
+        mocked_push.reset_mock()
+        # test with nothing new
+        mocked_events.return_value = [
+            {'group': 'appli', 'name': 'proc_2', 'state': 0, 'sequence': 15}]
+        main_loop.resync_processes('10.0.0.1', 12)
+        self.assertEqual(0, mocked_push.call_count)
+        # test with isolated address
+        mocked_events.return_value = [
+            {'group': 'appli', 'name': 'proc_4', 'state': 0, 'sequence': 16}]
+        main_loop.sequences = {}
+        main_loop.resync_processes('10.0.0.1', 12)
+        self.assertEqual(0, mocked_push.call_count)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_check_requests(self, mocked_stderr):
         """ Test the processing of the requests received. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        main_loop.executor = Mock()
+        mocked_send = main_loop.executor.submit
         # mock parameters
         mocked_sockets = Mock(
             puller=Mock(socket='zmq socket',
@@ -141,6 +443,7 @@ class MainLoopTest(unittest.TestCase):
             internal_subscriber=Mock(**{'disconnect.return_value': None}))
         mocked_receive = mocked_sockets.puller.receive
         mocked_disconnect = mocked_sockets.internal_subscriber.disconnect
+        mocked_invalidate = main_loop.proxies.invalidate = Mock()
         # test with empty socks
         socks = {}
         main_loop.check_requests(mocked_sockets, socks)
@@ -155,21 +458,57 @@ class MainLoopTest(unittest.TestCase):
         self.assertEqual(0, mocked_disconnect.call_count)
         mocked_receive.reset_mock()
         # test with appropriate socks and without exception
-        mocked_receive.side_effect = None
-        mocked_receive.return_value = ('a zmq header', 'a zmq message')
+        # all the requests available are drained
+        import zmq
+        mocked_receive.side_effect = [
+            ('a zmq header', ('10.0.0.1', 'a zmq message')),
+            ('another zmq header', ('10.0.0.2', 'another zmq message')),
+            zmq.Again]
         main_loop.check_requests(mocked_sockets, socks)
-        self.assertEqual([call('a zmq header', 'a zmq message')],
+        self.assertEqual([call(zmq.NOBLOCK)] * 3,
+                         mocked_receive.call_args_list)
+        self.assertEqual([call('10.0.0.1', 'a zmq header',
+                               ('10.0.0.1', 'a zmq message')),
+                          call('10.0.0.2', 'another zmq header',
+                               ('10.0.0.2', 'another zmq message'))],
                          mocked_send.call_args_list)
         self.assertEqual(0, mocked_disconnect.call_count)
         mocked_receive.reset_mock()
         mocked_send.reset_mock()
         # test disconnection request
-        mocked_receive.return_value = (1, 'an address')
+        main_loop.sequences = {'an address': 12, '10.0.0.1': 3}
+        main_loop.process_sequences = {'an address': {('appli', 'proc'): 10}}
+        main_loop.generations = {'an address': ('abc', 10)}
+        mocked_receive.side_effect = [(1, ['an address']), zmq.Again]
         main_loop.check_requests(mocked_sockets, socks)
-        self.assertEqual(1, mocked_receive.call_count)
-        self.assertEqual([call('an address')],
+        self.assertDictEqual({'10.0.0.1': 3}, main_loop.sequences)
+        self.assertDictEqual({}, main_loop.process_sequences)
+        self.assertDictEqual({}, main_loop.generations)
+        self.assertEqual(2, mocked_receive.call_count)
+        self.assertEqual([call(['an address'])],
                          mocked_disconnect.call_args_list)
         self.assertEqual(0, mocked_send.call_count)
+        self.assertEqual([call(['an address'])], mocked_invalidate.call_args_list)
+
+    def test_request_statistics(self):
+        """ Test the statistics of the deferred requests. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        # test before the executor is created
+        self.assertDictEqual({}, main_loop.request_statistics())
+        # test with executor
+        main_loop.executor = Mock(**{'statistics.return_value': {'depth': 10}})
+        self.assertDictEqual({'depth': 10}, main_loop.request_statistics())
+
+    def test_proxy_statistics(self):
+        """ Test the statistics of the XML-RPC proxies. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        self.assertDictEqual({}, main_loop.proxy_statistics())
+        with patch.object(main_loop.proxies, 'statistics',
+                          return_value={'10.0.0.1': {'hits': 2}}):
+            self.assertDictEqual({'10.0.0.1': {'hits': 2}},
+                                 main_loop.proxy_statistics())
 
     @patch('supvisors.mainloop.stderr')
     def test_check_address(self, mocked_stderr):
@@ -177,71 +516,126 @@ class MainLoopTest(unittest.TestCase):
         Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
         from supvisors.ttypes import AddressStates
-        main_loop = SupvisorsMainLoop(self.supvisors)
-        # patch the main loop send_remote_comm_event
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         # test the check_address behaviour through the calls to internal events
-        with patch.object(main_loop, 'send_remote_comm_event') as mocked_evt:
-            # test rpc error: no event is sent to local Supervisor
-            self.mocked_rpc.side_effect = Exception
-            main_loop.check_address('10.0.0.1')
-            self.assertEqual(2, self.mocked_rpc.call_count)
-            self.assertEqual(call('10.0.0.1', main_loop.env),
-                             self.mocked_rpc.call_args)
-            self.assertEqual(0, mocked_evt.call_count)
-            # test with a mocked rpc interface
-            rpc_intf = DummyRpcInterface()
-            self.mocked_rpc.side_effect = None
-            self.mocked_rpc.return_value = rpc_intf
-            self.mocked_rpc.reset_mock()
-            # test with address in isolation
-            with patch.object(rpc_intf.supervisor,
-                              'getAllProcessInfo') as mocked_supervisor:
-                for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
-                    with patch.object(rpc_intf.supvisors, 'get_address_info',
-                        return_value={'statecode': state}):
-                        main_loop.check_address('10.0.0.1')
-                        self.assertEqual(1, self.mocked_rpc.call_count)
-                        self.assertEqual(call('10.0.0.1', main_loop.env),
-                                         self.mocked_rpc.call_args)
-                        self.assertEqual(1, mocked_evt.call_count)
-                        self.assertEqual(call(
-                            'auth', 'address_name:10.0.0.1 authorized:False'),
-                            mocked_evt.call_args)
-                        self.assertEqual(0, mocked_supervisor.call_count)
-                        # reset counters
-                        mocked_evt.reset_mock()
-                        self.mocked_rpc.reset_mock()
-            # test with address not in isolation
-            dummy_info = [{'name': 'proc', 'group': 'appli',
-                           'state': 10, 'start': 5,
-                'now': 10, 'pid': 1234, 'spawnerr': ''}]
-            with patch.object(rpc_intf.supervisor, 'getAllProcessInfo',
-                return_value=dummy_info) as mocked_supervisor:
-                for state in [AddressStates.UNKNOWN, AddressStates.CHECKING,
-                    AddressStates.RUNNING, AddressStates.SILENT]:
-                    with patch.object(rpc_intf.supvisors, 'get_address_info',
-                        return_value={'statecode': state}):
-                        main_loop.check_address('10.0.0.1')
-                        self.assertEqual(1, self.mocked_rpc.call_count)
-                        self.assertEqual(call('10.0.0.1', main_loop.env),
-                                         self.mocked_rpc.call_args)
-                        self.assertEqual(2, mocked_evt.call_count)
-                        self.assertEqual(1, mocked_supervisor.call_count)
-                        # reset counters
-                        mocked_evt.reset_mock()
-                        mocked_supervisor.reset_mock()
-                        self.mocked_rpc.reset_mock()
+        mocked_evt = self.event_queue.push
+        # test rpc error: no event is sent to local Supervisor
+        self.mocked_rpc.side_effect = Exception
+        main_loop.check_address('10.0.0.1')
+        self.assertEqual(1, self.mocked_rpc.call_count)
+        self.assertEqual(call('10.0.0.1', main_loop.env),
+                         self.mocked_rpc.call_args)
+        self.assertEqual(0, mocked_evt.call_count)
+        # test with a mocked rpc interface
+        rpc_intf = DummyRpcInterface()
+        self.mocked_rpc.side_effect = None
+        self.mocked_rpc.return_value = rpc_intf
+        self.mocked_rpc.reset_mock()
+        # test with address in isolation
+        with patch.object(rpc_intf.supervisor,
+                          'getAllProcessInfo') as mocked_supervisor:
+            for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
+                with patch.object(rpc_intf.supvisors, 'get_address_info',
+                    return_value={'statecode': state}):
+                    main_loop.check_address('10.0.0.1')
+                    self.assertEqual(1, mocked_evt.call_count)
+                    self.assertEqual(call('auth', ('10.0.0.1', False)),
+                                     mocked_evt.call_args)
+                    self.assertEqual(0, mocked_supervisor.call_count)
+                    # reset counters
+                    mocked_evt.reset_mock()
+        # test with address not in isolation
+        # the remote Supvisors does not provide the compact process info
+        dummy_info = [{'name': 'proc', 'group': 'appli',
+                       'state': 10, 'start': 5,
+            'now': 10, 'pid': 1234, 'spawnerr': ''}]
+        with patch.object(rpc_intf.supervisor, 'getAllProcessInfo',
+            return_value=dummy_info) as mocked_supervisor, \
+             patch.object(rpc_intf.supvisors, 'get_compact_process_info',
+                side_effect=xmlrpclib.Fault(1, 'UNKNOWN_METHOD')):
+            for state in [AddressStates.UNKNOWN, AddressStates.CHECKING,
+                AddressStates.RUNNING, AddressStates.SILENT]:
+                with patch.object(rpc_intf.supvisors, 'get_address_info',
+                    return_value={'statecode': state}):
+                    main_loop.check_address('10.0.0.1')
+                    self.assertEqual([call('info', ('10.0.0.1',
+                        [{'name': 'proc', 'group': 'appli', 'state': 10,
+                          'start': 5, 'now': 10, 'pid': 1234,
+                          'expected': True}])),
+                        call('auth', ('10.0.0.1', True))],
+                        mocked_evt.call_args_list)
+                    self.assertEqual(1, mocked_supervisor.call_count)
+                    # reset counters
+                    mocked_evt.reset_mock()
+                    mocked_supervisor.reset_mock()
+        # the check_address timeout is applied to all the requests
+        self.assertTrue(all(args == call(30) for args in
+                            rpc_intf.transport.set_timeout.call_args_list))
+        # the proxy has been created once and reused for all the requests
+        self.assertEqual([call('10.0.0.1', main_loop.env)],
+                         self.mocked_rpc.call_args_list)
+
+    def test_get_process_info(self):
+        """ Test the request of the compact process info. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        rpc_intf = Mock()
+        self.mocked_rpc.return_value = rpc_intf
+        mocked_compact = rpc_intf.supvisors.get_compact_process_info
+        expected = [{'group': 'appli', 'name': 'proc', 'state': 10,
+                     'start': 5, 'now': 10, 'pid': 1234, 'expected': True}]
+        # test first request: all the processes are requested
+        mocked_compact.return_value = {'epoch': 'abc', 'generation': 12,
+            'processes': [['appli', 'proc', 10, 5, 10, 1234, True]]}
+        self.assertListEqual(expected, main_loop.get_process_info(
+            '10.0.0.1', ['appli:proc'], 30))
+        self.assertEqual([call(0, ['appli:proc'])],
+                         mocked_compact.call_args_list)
+        self.assertDictEqual({'10.0.0.1': ('abc', 12)}, main_loop.generations)
+        mocked_compact.reset_mock()
+        # test next request: only the changes are requested
+        mocked_compact.return_value = {'epoch': 'abc', 'generation': 20,
+            'processes': []}
+        self.assertListEqual([], main_loop.get_process_info(
+            '10.0.0.1', [], 30))
+        self.assertEqual([call(12, [])], mocked_compact.call_args_list)
+        self.assertDictEqual({'10.0.0.1': ('abc', 20)}, main_loop.generations)
+        mocked_compact.reset_mock()
+        # test request after a restart of the remote Supvisors instance:
+        # all the processes are requested again
+        mocked_compact.side_effect = [
+            {'epoch': 'def', 'generation': 40, 'processes': []},
+            {'epoch': 'def', 'generation': 40,
+             'processes': [['appli', 'proc', 10, 5, 10, 1234, True]]}]
+        self.assertListEqual(expected, main_loop.get_process_info(
+            '10.0.0.1', [], 30))
+        self.assertEqual([call(20, []), call(0, [])],
+                         mocked_compact.call_args_list)
+        self.assertDictEqual({'10.0.0.1': ('def', 40)}, main_loop.generations)
+        mocked_compact.reset_mock()
+        # test that the generations are accessed under the sequence lock
+        # and that the XML-RPC is performed outside
+        def check_unlocked(*args):
+            self.assertEqual(1, main_loop.sequence_lock.__exit__.call_count)
+            return {'epoch': 'def', 'generation': 50, 'processes': []}
+        main_loop.sequence_lock = MagicMock()
+        mocked_compact.side_effect = check_unlocked
+        self.assertListEqual([], main_loop.get_process_info('10.0.0.1', [], 30))
+        self.assertEqual([call(40, [])], mocked_compact.call_args_list)
+        self.assertEqual(2, main_loop.sequence_lock.__enter__.call_count)
+        self.assertEqual(2, main_loop.sequence_lock.__exit__.call_count)
+        self.assertDictEqual({'10.0.0.1': ('def', 50)}, main_loop.generations)
 
     @patch('supvisors.mainloop.stderr')
     def test_start_process(self, mocked_stderr):
         """ Test the protocol to start a process handled by a remote
         Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         # test rpc error
         self.mocked_rpc.side_effect = Exception
         main_loop.start_process('10.0.0.1', 'dummy_process', 'extra args')
-        self.assertEqual(2, self.mocked_rpc.call_count)
+        self.assertEqual(1, self.mocked_rpc.call_count)
         self.assertEqual(call('10.0.0.1', main_loop.env),
                          self.mocked_rpc.call_args)
         # test with a mocked rpc interface
@@ -251,23 +645,29 @@ class MainLoopTest(unittest.TestCase):
         with patch.object(rpc_intf.supvisors,
                           'start_args') as mocked_supvisors:
             main_loop.start_process('10.0.0.1', 'dummy_process', 'extra args')
-            self.assertEqual(3, self.mocked_rpc.call_count)
+            self.assertEqual(2, self.mocked_rpc.call_count)
             self.assertEqual(call('10.0.0.1', main_loop.env),
                              self.mocked_rpc.call_args)
             self.assertEqual(1, mocked_supvisors.call_count)
             self.assertEqual(call('dummy_process', 'extra args', False),
                              mocked_supvisors.call_args)
+            self.assertEqual([call(10)],
+                             rpc_intf.transport.set_timeout.call_args_list)
+            # test that the proxy is reused
+            main_loop.start_process('10.0.0.1', 'dummy_process', 'extra args')
+            self.assertEqual(2, self.mocked_rpc.call_count)
+            self.assertEqual(2, mocked_supvisors.call_count)
 
     @patch('supvisors.mainloop.stderr')
     def test_stop_process(self, mocked_stderr):
         """ Test the protocol to stop a process handled by a remote
         Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         # test rpc error
         self.mocked_rpc.side_effect = Exception
         main_loop.stop_process('10.0.0.1', 'dummy_process')
-        self.assertEqual(2, self.mocked_rpc.call_count)
+        self.assertEqual(1, self.mocked_rpc.call_count)
         self.assertEqual(call('10.0.0.1', main_loop.env),
                          self.mocked_rpc.call_args)
         # test with a mocked rpc interface
@@ -277,22 +677,114 @@ class MainLoopTest(unittest.TestCase):
         with patch.object(rpc_intf.supervisor,
                           'stopProcess') as mocked_supervisor:
             main_loop.stop_process('10.0.0.1', 'dummy_process')
-            self.assertEqual(3, self.mocked_rpc.call_count)
+            self.assertEqual(2, self.mocked_rpc.call_count)
             self.assertEqual(call('10.0.0.1', main_loop.env),
                              self.mocked_rpc.call_args)
             self.assertEqual(1, mocked_supervisor.call_count)
             self.assertEqual(call('dummy_process', False),
                              mocked_supervisor.call_args)
+            # test that the proxy is reused
+            main_loop.stop_process('10.0.0.1', 'dummy_process')
+            self.assertEqual(2, self.mocked_rpc.call_count)
+            self.assertEqual(2, mocked_supervisor.call_count)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_start_processes(self, mocked_stderr):
+        """ Test the protocol to start processes handled by a remote
+        Supervisor. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        processes = [('appli:proc_1', ''), ('appli:proc_2', '-x')]
+        # test rpc error
+        self.mocked_rpc.side_effect = Exception
+        main_loop.start_processes('10.0.0.1', processes)
+        self.assertEqual(1, self.mocked_rpc.call_count)
+        self.assertTrue(mocked_stderr.write.called)
+        mocked_stderr.reset_mock()
+        # test with a mocked rpc interface
+        rpc_intf = Mock()
+        self.mocked_rpc.side_effect = None
+        self.mocked_rpc.return_value = rpc_intf
+        mocked_multicall = rpc_intf.system.multicall
+        mocked_multicall.return_value = [[True], [True]]
+        main_loop.start_processes('10.0.0.1', processes)
+        self.assertEqual([call([
+            {'methodName': 'supvisors.start_args',
+             'params': ['appli:proc_1', '', False]},
+            {'methodName': 'supvisors.start_args',
+             'params': ['appli:proc_2', '-x', False]}])],
+            mocked_multicall.call_args_list)
+        self.assertEqual([call(10)],
+                         rpc_intf.return_value.set_timeout.call_args_list)
+        self.assertFalse(mocked_stderr.write.called)
+        # test with a fault on one process
+        mocked_multicall.return_value = [
+            {'faultCode': 60, 'faultString': 'ALREADY_STARTED'}, [True]]
+        main_loop.start_processes('10.0.0.1', processes)
+        self.assertIn('appli:proc_1', str(mocked_stderr.write.call_args_list))
+        self.assertNotIn('appli:proc_2', str(mocked_stderr.write.call_args_list))
+        # a process already started is not a failure
+        self.assertEqual(0, self.event_queue.push.call_count)
+        # the processes rejected are handed over
+        mocked_multicall.return_value = [
+            [True], {'faultCode': 50, 'faultString': 'SPAWN_ERROR'}]
+        main_loop.start_processes('10.0.0.1', processes)
+        self.assertEqual([call('fault', (6, [('appli:proc_2',
+            'request rejected by 10.0.0.1: SPAWN_ERROR')]))],
+            self.event_queue.push.call_args_list)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_stop_processes(self, mocked_stderr):
+        """ Test the protocol to stop processes handled by a remote
+        Supervisor. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        namespecs = ['appli:proc_1', 'appli:proc_2']
+        # test rpc error
+        self.mocked_rpc.side_effect = Exception
+        main_loop.stop_processes('10.0.0.1', namespecs)
+        self.assertEqual(1, self.mocked_rpc.call_count)
+        self.assertTrue(mocked_stderr.write.called)
+        mocked_stderr.reset_mock()
+        # test with a mocked rpc interface
+        rpc_intf = Mock()
+        self.mocked_rpc.side_effect = None
+        self.mocked_rpc.return_value = rpc_intf
+        mocked_multicall = rpc_intf.system.multicall
+        mocked_multicall.return_value = [[True], [True]]
+        main_loop.stop_processes('10.0.0.1', namespecs)
+        self.assertEqual([call([
+            {'methodName': 'supervisor.stopProcess',
+             'params': ['appli:proc_1', False]},
+            {'methodName': 'supervisor.stopProcess',
+             'params': ['appli:proc_2', False]}])],
+            mocked_multicall.call_args_list)
+        self.assertFalse(mocked_stderr.write.called)
+        # test with a fault on one process
+        mocked_multicall.return_value = [
+            [True], {'faultCode': 70, 'faultString': 'NOT_RUNNING'}]
+        main_loop.stop_processes('10.0.0.1', namespecs)
+        self.assertIn('appli:proc_2', str(mocked_stderr.write.call_args_list))
+        self.assertNotIn('appli:proc_1', str(mocked_stderr.write.call_args_list))
+        # a process already stopped is not a failure
+        self.assertEqual(0, self.event_queue.push.call_count)
+        # the processes rejected are handed over
+        mocked_multicall.return_value = [
+            {'faultCode': 10, 'faultString': 'BAD_NAME'}, [True]]
+        main_loop.stop_processes('10.0.0.1', namespecs)
+        self.assertEqual([call('fault', (7, [('appli:proc_1',
+            'request rejected by 10.0.0.1: BAD_NAME')]))],
+            self.event_queue.push.call_args_list)
 
     @patch('supvisors.mainloop.stderr')
     def test_restart(self, mocked_stderr):
         """ Test the protocol to restart a remote Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         # test rpc error
         self.mocked_rpc.side_effect = Exception
         main_loop.restart('10.0.0.1')
-        self.assertEqual(2, self.mocked_rpc.call_count)
+        self.assertEqual(1, self.mocked_rpc.call_count)
         self.assertEqual(call('10.0.0.1', main_loop.env),
                          self.mocked_rpc.call_args)
         # test with a mocked rpc interface
@@ -302,21 +794,23 @@ class MainLoopTest(unittest.TestCase):
         with patch.object(rpc_intf.supervisor,
                           'restart') as mocked_supervisor:
             main_loop.restart('10.0.0.1')
-            self.assertEqual(3, self.mocked_rpc.call_count)
+            self.assertEqual(2, self.mocked_rpc.call_count)
             self.assertEqual(call('10.0.0.1', main_loop.env),
                              self.mocked_rpc.call_args)
             self.assertEqual(1, mocked_supervisor.call_count)
             self.assertEqual(call(), mocked_supervisor.call_args)
+            # test that the proxy is not reused after a restart
+            self.assertNotIn('10.0.0.1', main_loop.proxies.proxies)
 
     @patch('supvisors.mainloop.stderr')
     def test_shutdown(self, mocked_stderr):
         """ Test the protocol to shutdown a remote Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         # test rpc error
         self.mocked_rpc.side_effect = Exception
         main_loop.shutdown('10.0.0.1')
-        self.assertEqual(2, self.mocked_rpc.call_count)
+        self.assertEqual(1, self.mocked_rpc.call_count)
         self.assertEqual(call('10.0.0.1', main_loop.env),
                          self.mocked_rpc.call_args)
         # test with a mocked rpc interface
@@ -325,28 +819,13 @@ class MainLoopTest(unittest.TestCase):
         self.mocked_rpc.return_value = rpc_intf
         with patch.object(rpc_intf.supervisor, 'shutdown') as mocked_shutdown:
             main_loop.shutdown('10.0.0.1')
-            self.assertEqual(3, self.mocked_rpc.call_count)
+            self.assertEqual(2, self.mocked_rpc.call_count)
             self.assertEqual(call('10.0.0.1', main_loop.env),
                              self.mocked_rpc.call_args)
             self.assertEqual(1, mocked_shutdown.call_count)
             self.assertEqual(call(), mocked_shutdown.call_args)
-
-    @patch('supvisors.mainloop.stderr')
-    def test_comm_event(self, mocked_stderr):
-        """ Test the protocol to send a comm event to the local Supervisor. """
-        from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
-        # test rpc error
-        with patch.object(main_loop.proxy.supervisor,'sendRemoteCommEvent',
-                          side_effect=Exception):
-            main_loop.send_remote_comm_event('event type', 'event data')
-        # test with a mocked rpc interface
-        with patch.object(main_loop.proxy.supervisor,
-                          'sendRemoteCommEvent') as mocked_supervisor:
-            main_loop.send_remote_comm_event('event type', 'event data')
-            self.assertEqual(1, mocked_supervisor.call_count)
-            self.assertEqual(call('event type', 'event data'),
-                             mocked_supervisor.call_args)
+            # test that the proxy is not reused after a shutdown
+            self.assertNotIn('10.0.0.1', main_loop.proxies.proxies)
 
     def check_call(self, main_loop, mocked_loop,
                    method_name, request, args):
@@ -366,15 +845,17 @@ class MainLoopTest(unittest.TestCase):
         """ Test the execution of a deferred Supervisor request. """
         from supvisors.mainloop import SupvisorsMainLoop
         from supvisors.utils import DeferredRequestHeaders
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         # patch main loop subscriber
         with patch.multiple(main_loop, check_address=DEFAULT,
             start_process=DEFAULT, stop_process=DEFAULT,
-            restart=DEFAULT, shutdown=DEFAULT) as mocked_loop:
+            start_processes=DEFAULT, stop_processes=DEFAULT,
+            resync_processes=DEFAULT, restart=DEFAULT,
+            shutdown=DEFAULT, save_context=DEFAULT) as mocked_loop:
             # test check address
             self.check_call(main_loop, mocked_loop, 'check_address',
                             DeferredRequestHeaders.CHECK_ADDRESS,
-                            ('10.0.0.2', ))
+                            ('10.0.0.2', ['appli:proc']))
             # test start process
             self.check_call(main_loop, mocked_loop, 'start_process',
                             DeferredRequestHeaders.START_PROCESS,
@@ -383,6 +864,18 @@ class MainLoopTest(unittest.TestCase):
             self.check_call(main_loop, mocked_loop, 'stop_process',
                             DeferredRequestHeaders.STOP_PROCESS,
                             ('10.0.0.2', 'dummy_process'))
+            # test start processes
+            self.check_call(main_loop, mocked_loop, 'start_processes',
+                            DeferredRequestHeaders.START_PROCESSES,
+                            ('10.0.0.2', [('dummy_process', 'extra args')]))
+            # test stop processes
+            self.check_call(main_loop, mocked_loop, 'stop_processes',
+                            DeferredRequestHeaders.STOP_PROCESSES,
+                            ('10.0.0.2', ['dummy_process']))
+            # test resync processes
+            self.check_call(main_loop, mocked_loop, 'resync_processes',
+                            DeferredRequestHeaders.RESYNC_PROCESSES,
+                            ('10.0.0.2', 12))
             # test restart
             self.check_call(main_loop, mocked_loop, 'restart',
                             DeferredRequestHeaders.RESTART,
@@ -391,6 +884,58 @@ class MainLoopTest(unittest.TestCase):
             self.check_call(main_loop, mocked_loop, 'shutdown',
                             DeferredRequestHeaders.SHUTDOWN,
                             ('10.0.0.2', ))
+            # test save context
+            main_loop.send_request(DeferredRequestHeaders.SAVE_CONTEXT,
+                                   ('/tmp/ctx', {'processes': {}}))
+            self.assertEqual([call({'processes': {}})],
+                             mocked_loop['save_context'].call_args_list)
+
+    def test_drop_request(self):
+        """ Test the hand over of the processes whose request has been
+        dropped by the executor. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.utils import DeferredRequestHeaders
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        mocked_push = self.event_queue.push
+        reason = 'request to 10.0.0.1 dropped: queue full'
+        # test the requests not related to processes
+        main_loop.drop_request(DeferredRequestHeaders.CHECK_ADDRESS,
+                               ('10.0.0.1', ))
+        self.assertEqual(0, mocked_push.call_count)
+        # test the requests related to processes
+        main_loop.drop_request(DeferredRequestHeaders.START_PROCESS,
+                               ('10.0.0.1', 'appli:proc_1', '-x'))
+        main_loop.drop_request(DeferredRequestHeaders.STOP_PROCESS,
+                               ('10.0.0.1', 'appli:proc_1'))
+        main_loop.drop_request(DeferredRequestHeaders.START_PROCESSES,
+            ('10.0.0.1', [('appli:proc_1', ''), ('appli:proc_2', '-x')]))
+        main_loop.drop_request(DeferredRequestHeaders.STOP_PROCESSES,
+            ('10.0.0.1', ['appli:proc_2']))
+        self.assertEqual([call('fault', (DeferredRequestHeaders.START_PROCESS,
+                                         [('appli:proc_1', reason)])),
+                          call('fault', (DeferredRequestHeaders.STOP_PROCESS,
+                                         [('appli:proc_1', reason)])),
+                          call('fault', (DeferredRequestHeaders.START_PROCESSES,
+                                         [('appli:proc_1', reason),
+                                          ('appli:proc_2', reason)])),
+                          call('fault', (DeferredRequestHeaders.STOP_PROCESSES,
+                                         [('appli:proc_2', reason)]))],
+                         mocked_push.call_args_list)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_save_context(self, mocked_stderr):
+        """ Test the writing of the context file from the executor. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
+        mocked_write = self.supvisors.snapshot.write
+        main_loop.save_context({'processes': {}})
+        self.assertEqual([call({'processes': {}})],
+                         mocked_write.call_args_list)
+        self.assertFalse(mocked_stderr.write.called)
+        # the errors are printed
+        mocked_write.side_effect = IOError('disk full')
+        main_loop.save_context({'processes': {}})
+        self.assertIn('disk full', str(mocked_stderr.write.call_args_list))
 
 
 def test_suite():
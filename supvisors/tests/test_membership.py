@@ -0,0 +1,95 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+
+class MembershipCacheTest(unittest.TestCase):
+    """ Test case for the membership module. """
+
+    def setUp(self):
+        """ Create a temporary directory. """
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'supvisors.members')
+        self.logger = Mock()
+
+    def tearDown(self):
+        """ Remove the temporary directory. """
+        shutil.rmtree(self.directory)
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        from supvisors.membership import MembershipCache
+        cache = MembershipCache(self.filename, self.logger)
+        self.assertEqual(self.filename, cache.filename)
+        self.assertIs(self.logger, cache.logger)
+        self.assertSetEqual(set(), cache.addresses)
+
+    def test_disabled(self):
+        """ Test that nothing is done when there is no file. """
+        from supvisors.membership import MembershipCache
+        cache = MembershipCache('', self.logger)
+        cache.save(['10.0.0.1'])
+        self.assertSetEqual(set(), cache.addresses)
+        self.assertSetEqual(set(), cache.load())
+        self.assertEqual(0, self.logger.warn.call_count)
+
+    def test_save_load(self):
+        """ Test the persistence of the addresses. """
+        from supvisors.membership import MembershipCache
+        cache = MembershipCache(self.filename, self.logger)
+        # missing file
+        self.assertSetEqual(set(), cache.load())
+        self.assertEqual(1, self.logger.warn.call_count)
+        # save addresses
+        cache.save(['10.0.0.2', '10.0.0.1'])
+        self.assertSetEqual({'10.0.0.1', '10.0.0.2'}, cache.addresses)
+        with open(self.filename) as stream:
+            self.assertEqual('10.0.0.1\n10.0.0.2\n', stream.read())
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+        # the file is not written again if unchanged
+        with patch('supvisors.membership.os.rename') as mocked_rename:
+            cache.save(['10.0.0.1', '10.0.0.2'])
+            self.assertEqual(0, mocked_rename.call_count)
+        # load addresses in another instance
+        cache = MembershipCache(self.filename, self.logger)
+        self.assertSetEqual({'10.0.0.1', '10.0.0.2'}, cache.load())
+        self.assertSetEqual({'10.0.0.1', '10.0.0.2'}, cache.addresses)
+
+    def test_save_error(self):
+        """ Test the error when the file cannot be written. """
+        from supvisors.membership import MembershipCache
+        filename = os.path.join(self.directory, 'missing', 'supvisors.members')
+        cache = MembershipCache(filename, self.logger)
+        cache.save(['10.0.0.1'])
+        self.assertSetEqual(set(), cache.addresses)
+        self.assertEqual(1, self.logger.error.call_count)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -40,13 +40,30 @@ class SupvisorsOptionsTest(unittest.TestCase):
         self.assertIsNone(opt.rules_file)
         self.assertIsNone(opt.internal_port)
         self.assertIsNone(opt.event_port)
+        self.assertIsNone(opt.snapshot_port)
+        self.assertIsNone(opt.relay_list)
+        self.assertIsNone(opt.relay_port)
+        self.assertIsNone(opt.event_hwm)
+        self.assertIsNone(opt.event_conflation_period)
         self.assertIsNone(opt.auto_fence)
         self.assertIsNone(opt.synchro_timeout)
+        self.assertIsNone(opt.synchro_quorum)
+        self.assertIsNone(opt.membership_file)
+        self.assertIsNone(opt.heartbeat_period)
+        self.assertIsNone(opt.phi_threshold)
+        self.assertIsNone(opt.event_batch_size)
+        self.assertIsNone(opt.legacy_codec)
+        self.assertIsNone(opt.request_workers)
+        self.assertIsNone(opt.request_queue_depth)
+        self.assertIsNone(opt.request_timeouts)
         self.assertIsNone(opt.conciliation_strategy)
         self.assertIsNone(opt.starting_strategy)
+        self.assertIsNone(opt.fast_failover)
         self.assertIsNone(opt.stats_periods)
         self.assertIsNone(opt.stats_histo)
         self.assertIsNone(opt.stats_irix_mode)
+        self.assertIsNone(opt.context_file)
+        self.assertIsNone(opt.context_period)
         self.assertIsNone(opt.logfile)
         self.assertIsNone(opt.logfile_maxbytes)
         self.assertIsNone(opt.logfile_backups)
@@ -57,10 +74,17 @@ class SupvisorsOptionsTest(unittest.TestCase):
         from supvisors.options import SupvisorsOptions
         opt = SupvisorsOptions()
         self.assertEqual('address_list=None rules_file=None '
-            'internal_port=None event_port=None auto_fence=None '
-            'synchro_timeout=None conciliation_strategy=None '
-            'starting_strategy=None stats_periods=None stats_histo=None '
-            'stats_irix_mode=None logfile=None logfile_maxbytes=None '
+            'internal_port=None event_port=None snapshot_port=None '
+            'relay_list=None relay_port=None event_hwm=None '
+            'event_conflation_period=None auto_fence=None '
+            'synchro_timeout=None synchro_quorum=None membership_file=None '
+            'heartbeat_period=None phi_threshold=None '
+            'event_batch_size=None '
+            'legacy_codec=None request_workers=None request_queue_depth=None '
+            'request_timeouts=None '
+            'conciliation_strategy=None '
+            'starting_strategy=None fast_failover=None stats_periods=None stats_histo=None '
+            'stats_irix_mode=None context_file=None context_period=None logfile=None logfile_maxbytes=None '
             'logfile_backups=None loglevel=None', str(opt))
 
 
@@ -100,6 +124,144 @@ class SupvisorsServerOptionsTest(unittest.TestCase):
         self.assertEqual(1, SupvisorsServerOptions.to_timeout('1'))
         self.assertEqual(1000, SupvisorsServerOptions.to_timeout('1000'))
 
+    def test_synchro_quorum(self):
+        """ Test the conversion of a string to a synchronization quorum. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('synchro_quorum')
+        address_list = ['10.0.0.1', '10.0.0.2', '10.0.0.3']
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_synchro_quorum('-1', address_list)
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_synchro_quorum('4', address_list)
+        # test valid values
+        self.assertEqual(0, SupvisorsServerOptions.to_synchro_quorum('0', address_list))
+        self.assertEqual(3, SupvisorsServerOptions.to_synchro_quorum('3', address_list))
+
+    def test_relay_list(self):
+        """ Test the conversion of a string to a list of relays. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('relay_list')
+        address_list = ['10.0.0.1', '10.0.0.2', '10.0.0.3']
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_relay_list('10.0.0.1,10.0.0.4', address_list)
+        # test valid values
+        self.assertListEqual([], SupvisorsServerOptions.to_relay_list('', address_list))
+        self.assertListEqual(['10.0.0.3', '10.0.0.1'],
+            SupvisorsServerOptions.to_relay_list('10.0.0.3,,10.0.0.1,10.0.0.3', address_list))
+
+    def test_heartbeat_period(self):
+        """ Test the conversion of a string to a heartbeat period. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('heartbeat_period')
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_heartbeat_period('99')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_heartbeat_period('60001')
+        # test valid values
+        self.assertEqual(100, SupvisorsServerOptions.to_heartbeat_period('100'))
+        self.assertEqual(60000, SupvisorsServerOptions.to_heartbeat_period('60000'))
+
+    def test_phi_threshold(self):
+        """ Test the conversion of a string to a suspicion threshold. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('phi_threshold')
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_phi_threshold('0')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_phi_threshold('100.5')
+        # test valid values
+        self.assertEqual(0.5, SupvisorsServerOptions.to_phi_threshold('0.5'))
+        self.assertEqual(100, SupvisorsServerOptions.to_phi_threshold('100'))
+
+    def test_hwm(self):
+        """ Test the conversion of a string to a high water mark. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('event_hwm')
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_hwm('-1')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_hwm('1000001')
+        # test valid values
+        self.assertEqual(0, SupvisorsServerOptions.to_hwm('0'))
+        self.assertEqual(1000000, SupvisorsServerOptions.to_hwm('1000000'))
+
+    def test_conflation_period(self):
+        """ Test the conversion of a string to a conflation period. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('event_conflation_period')
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_conflation_period('-1')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_conflation_period('60001')
+        # test valid values
+        self.assertEqual(0, SupvisorsServerOptions.to_conflation_period('0'))
+        self.assertEqual(60000, SupvisorsServerOptions.to_conflation_period('60000'))
+
+    def test_batch_size(self):
+        """ Test the conversion of a string to a batch size. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('event_batch_size')
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_batch_size('-1')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_batch_size('0')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_batch_size('10001')
+        # test valid values
+        self.assertEqual(1, SupvisorsServerOptions.to_batch_size('1'))
+        self.assertEqual(10000, SupvisorsServerOptions.to_batch_size('10000'))
+
+    def test_workers(self):
+        """ Test the conversion of a string to a number of workers. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('request_workers')
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_workers('-1')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_workers('0')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_workers('65')
+        # test valid values
+        self.assertEqual(1, SupvisorsServerOptions.to_workers('1'))
+        self.assertEqual(64, SupvisorsServerOptions.to_workers('64'))
+
+    def test_queue_depth(self):
+        """ Test the conversion of a string to a queue depth. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('request_queue_depth')
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_queue_depth('-1')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_queue_depth('0')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_queue_depth('100001')
+        # test valid values
+        self.assertEqual(1, SupvisorsServerOptions.to_queue_depth('1'))
+        self.assertEqual(100000, SupvisorsServerOptions.to_queue_depth('100000'))
+
+    def test_request_timeouts(self):
+        """ Test the conversion of a list of strings to request timeouts. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('request_timeouts')
+        # test invalid values
+        for value in [['start_process'], ['start_process:5:6'], ['start_process:a'],
+                      ['isolate_addresses:5'], ['dummy:5'], ['start_process:0'], ['stop_process:1001']]:
+            with self.assertRaisesRegexp(ValueError, error_message):
+                SupvisorsServerOptions.to_request_timeouts(value)
+        # test valid values
+        self.assertDictEqual({0: 30, 2: 10, 3: 10, 4: 10, 5: 10}, SupvisorsServerOptions.to_request_timeouts([]))
+        self.assertDictEqual({0: 1, 2: 10, 3: 1000, 4: 10, 5: 10},
+            SupvisorsServerOptions.to_request_timeouts(['check_address:1', 'STOP_PROCESS:1000']))
+
     def test_conciliation_strategy(self):
         """ Test the conversion of a string to a conciliation strategy. """
         from supvisors.options import SupvisorsServerOptions
@@ -179,6 +341,21 @@ class SupvisorsServerOptionsTest(unittest.TestCase):
         self.assertEqual(10, SupvisorsServerOptions.to_histo('10'))
         self.assertEqual(1500, SupvisorsServerOptions.to_histo('1500'))
 
+    def test_context_period(self):
+        """ Test the conversion of a string to a period of context persistence. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('context_period')
+        # test invalid values
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_context_period('-1')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_context_period('4')
+        with self.assertRaisesRegexp(ValueError, error_message):
+            SupvisorsServerOptions.to_context_period('3601')
+        # test valid values
+        self.assertEqual(5, SupvisorsServerOptions.to_context_period('5'))
+        self.assertEqual(3600, SupvisorsServerOptions.to_context_period('3600'))
+
     def test_incorrect_supvisors(self):
         """ Test that exception is raised when the supvisors section is missing. """
         with self.assertRaises(ValueError):
@@ -199,13 +376,30 @@ class SupvisorsServerOptionsTest(unittest.TestCase):
         self.assertIsNone(opt.rules_file)
         self.assertEqual(65001, opt.internal_port)
         self.assertEqual(65002, opt.event_port)
+        self.assertEqual(65003, opt.snapshot_port)
+        self.assertListEqual([], opt.relay_list)
+        self.assertEqual(65004, opt.relay_port)
+        self.assertEqual(1000, opt.event_hwm)
+        self.assertEqual(0, opt.event_conflation_period)
         self.assertFalse(opt.auto_fence)
         self.assertEqual(15, opt.synchro_timeout)
+        self.assertEqual(0, opt.synchro_quorum)
+        self.assertEqual('', opt.membership_file)
+        self.assertEqual(1000, opt.heartbeat_period)
+        self.assertEqual(8, opt.phi_threshold)
+        self.assertEqual(100, opt.event_batch_size)
+        self.assertFalse(opt.legacy_codec)
+        self.assertEqual(4, opt.request_workers)
+        self.assertEqual(1000, opt.request_queue_depth)
+        self.assertDictEqual({0: 30, 2: 10, 3: 10, 4: 10, 5: 10}, opt.request_timeouts)
         self.assertEqual(ConciliationStrategies.USER, opt.conciliation_strategy)
         self.assertEqual(StartingStrategies.CONFIG, opt.starting_strategy)
+        self.assertFalse(opt.fast_failover)
         self.assertListEqual([10], opt.stats_periods)
         self.assertEqual(200, opt.stats_histo)
         self.assertFalse(opt.stats_irix_mode)
+        self.assertEqual('', opt.context_file)
+        self.assertEqual(60, opt.context_period)
         self.assertEqual('supvisors.log', opt.logfile)
         self.assertEqual(50*1024*1024, opt.logfile_maxbytes)
         self.assertEqual(10, opt.logfile_backups)
@@ -220,13 +414,30 @@ class SupvisorsServerOptionsTest(unittest.TestCase):
         self.assertEqual('my_movies.xml', opt.rules_file)
         self.assertEqual(60001, opt.internal_port)
         self.assertEqual(60002, opt.event_port)
+        self.assertEqual(60003, opt.snapshot_port)
+        self.assertListEqual(['cliche02', 'cliche01'], opt.relay_list)
+        self.assertEqual(60004, opt.relay_port)
+        self.assertEqual(500, opt.event_hwm)
+        self.assertEqual(200, opt.event_conflation_period)
         self.assertTrue(opt.auto_fence)
         self.assertEqual(20, opt.synchro_timeout)
+        self.assertEqual(2, opt.synchro_quorum)
+        self.assertEqual('/tmp/supvisors.members', opt.membership_file)
+        self.assertEqual(500, opt.heartbeat_period)
+        self.assertEqual(10.5, opt.phi_threshold)
+        self.assertEqual(50, opt.event_batch_size)
+        self.assertTrue(opt.legacy_codec)
+        self.assertEqual(8, opt.request_workers)
+        self.assertEqual(200, opt.request_queue_depth)
+        self.assertDictEqual({0: 60, 2: 5, 3: 10, 4: 10, 5: 20}, opt.request_timeouts)
         self.assertEqual(ConciliationStrategies.SENICIDE, opt.conciliation_strategy)
         self.assertEqual(StartingStrategies.MOST_LOADED, opt.starting_strategy)
+        self.assertTrue(opt.fast_failover)
         self.assertListEqual([5, 60, 600], opt.stats_periods)
         self.assertEqual(100, opt.stats_histo)
         self.assertTrue(opt.stats_irix_mode)
+        self.assertEqual('/tmp/supvisors.context', opt.context_file)
+        self.assertEqual(30, opt.context_period)
         self.assertEqual('/tmp/supvisors.log', opt.logfile)
         self.assertEqual(50*1024, opt.logfile_maxbytes)
         self.assertEqual(5, opt.logfile_backups)
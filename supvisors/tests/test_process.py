@@ -20,7 +20,7 @@
 import sys
 import unittest
 
-from mock import call
+from mock import Mock, call
 
 from supvisors.tests.base import (MockedSupvisors,
     any_process_info, any_stopped_process_info,
@@ -155,6 +155,10 @@ class ProcessTest(unittest.TestCase):
     def setUp(self):
         """ Create a logger that stores log traces. """
         self.supvisors = MockedSupvisors()
+        # the uptimes use the last remote time of the addresses
+        self.supvisors.context.addresses = {
+            address_name: Mock(remote_time=0)
+            for address_name in ['10.0.0.1', '10.0.0.2']}
 
     def test_create(self):
         """ Test the values set at construction. """
@@ -277,6 +281,31 @@ class ProcessTest(unittest.TestCase):
         dumped = pickle.dumps(serialized)
         loaded = pickle.loads(dumped)
         self.assertDictEqual(serialized, loaded)
+        # test that the same structure is returned while unchanged
+        process.state = ProcessStates.STOPPED
+        process.expected_exit = info['expected']
+        self.assertIs(serialized, process.serial())
+        # test that the structure is rebuilt when the process changes
+        process.infos['10.0.0.2'] = {'state': ProcessStates.RUNNING}
+        process.update_status('10.0.0.2', ProcessStates.RUNNING, True)
+        self.assertIsNot(serialized, process.serial())
+        serialized = process.serial()
+        self.assertEqual(['10.0.0.2'], serialized['addresses'])
+        process.infos['10.0.0.1']['state'] = ProcessStates.RUNNING
+        process.update_status('10.0.0.1', ProcessStates.RUNNING, True)
+        self.assertIsNot(serialized, process.serial())
+        self.assertItemsEqual(['10.0.0.1', '10.0.0.2'],
+                              process.serial()['addresses'])
+        serialized = process.serial()
+        process.invalidate_address('10.0.0.1', False)
+        self.assertIsNot(serialized, process.serial())
+        self.assertEqual(['10.0.0.2'], process.serial()['addresses'])
+        serialized = process.serial()
+        process.last_event_time += 1
+        self.assertIsNot(serialized, process.serial())
+        serialized = process.serial()
+        process.expected_exit = not process.expected_exit
+        self.assertIsNot(serialized, process.serial())
 
     def test_add_info(self):
         """ Test the addition of a process info into the ProcessStatus. """
@@ -284,7 +313,6 @@ class ProcessTest(unittest.TestCase):
         from supvisors.process import ProcessStatus
         # ProcessStatus constructor uses add_info
         info = process_info_by_name('xclock')
-        self.assertNotIn('uptime', info)
         process = ProcessStatus(info['group'], info['name'], self.supvisors)
         process.add_info('10.0.0.1', info)
         # check contents
@@ -292,8 +320,8 @@ class ProcessTest(unittest.TestCase):
         self.assertIs(info, process.infos['10.0.0.1'])
         self.assertGreater(process.last_event_time, 0)
         last_event_time = process.last_event_time
-        self.assertIn('uptime', info)
-        self.assertEqual(info['now'] - info['start'], info['uptime'])
+        self.assertEqual(info['now'] - info['start'],
+                         process.uptime('10.0.0.1'))
         self.assertFalse(process.addresses)
         self.assertEqual(ProcessStates.STOPPING, process.state)
         self.assertTrue(process.expected_exit)
@@ -309,7 +337,7 @@ class ProcessTest(unittest.TestCase):
         self.assertIs(info, process.infos['10.0.0.1'])
         self.assertGreaterEqual(process.last_event_time, last_event_time)
         last_event_time = process.last_event_time
-        self.assertIn('uptime', info)
+        self.assertEqual(0, process.uptime('10.0.0.1'))
         self.assertFalse(process.addresses)
         self.assertEqual(ProcessStates.EXITED, process.state)
         self.assertTrue(process.expected_exit)
@@ -330,6 +358,16 @@ class ProcessTest(unittest.TestCase):
         # address rule changes to '10.0.0.2'
         self.assertListEqual(['10.0.0.2'], process.rules.addresses)
 
+    def test_remove_info(self):
+        """ Test the removal of a process info from the ProcessStatus. """
+        from supvisors.process import ProcessStatus
+        info = process_info_by_name('xclock')
+        process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        process.add_info('10.0.0.1', info)
+        process.add_info('10.0.0.2', process_info_by_name('xclock'))
+        process.remove_info('10.0.0.1')
+        self.assertListEqual(['10.0.0.2'], process.infos.keys())
+
     def test_update_info(self):
         """ Test the update of the ProcessStatus upon reception of a process event. """
         from supervisor.states import ProcessStates
@@ -360,7 +398,7 @@ class ProcessTest(unittest.TestCase):
         self.assertGreaterEqual(process.last_event_time, local_time)
         local_time = process.last_event_time
         self.assertEqual(10, info['start'])
-        self.assertEqual(0, info['uptime'])
+        self.assertEqual(0, process.uptime('10.0.0.1'))
         # update with a RUNNING event
         process.update_info('10.0.0.1', {'state': ProcessStates.RUNNING, 'now': 15, 'pid': 1234})
         # check changes
@@ -372,7 +410,7 @@ class ProcessTest(unittest.TestCase):
         self.assertGreaterEqual(process.last_event_time, local_time)
         local_time = process.last_event_time
         self.assertEqual(10, info['start'])
-        self.assertEqual(5, info['uptime'])
+        self.assertEqual(5, process.uptime('10.0.0.1'))
         # add a new STOPPED process info and update with STARTING / RUNNING events
         process.add_info('10.0.0.2', any_process_info_by_state(ProcessStates.STOPPED))
         process.update_info('10.0.0.2', {'state': ProcessStates.STARTING, 'now': 20})
@@ -390,7 +428,7 @@ class ProcessTest(unittest.TestCase):
         self.assertEqual(30, info['now'])
         self.assertGreaterEqual(process.last_event_time, local_time)
         self.assertEqual(10, info['start'])
-        self.assertEqual(0, info['uptime'])
+        self.assertEqual(0, process.uptime('10.0.0.1'))
         self.assertFalse(info['expected'])
         # update with an STOPPING event
         info = process.infos['10.0.0.2']
@@ -405,7 +443,7 @@ class ProcessTest(unittest.TestCase):
         self.assertGreaterEqual(process.last_event_time, local_time)
         local_time = process.last_event_time
         self.assertEqual(20, info['start'])
-        self.assertEqual(15, info['uptime'])
+        self.assertEqual(15, process.uptime('10.0.0.2'))
         self.assertTrue(info['expected'])
        # update with an STOPPED event
         process.update_info('10.0.0.2', {'state': ProcessStates.STOPPED, 'now': 40})
@@ -417,52 +455,38 @@ class ProcessTest(unittest.TestCase):
         self.assertEqual(40, info['now'])
         self.assertGreaterEqual(process.last_event_time, local_time)
         self.assertEqual(20, info['start'])
-        self.assertEqual(0, info['uptime'])
+        self.assertEqual(0, process.uptime('10.0.0.2'))
         self.assertTrue(info['expected'])
 
-    def test_update_times(self):
-        """ Test the update of the time entries for a process info belonging to a ProcessStatus. """
-        from supervisor.states import ProcessStates
+    def test_uptime(self):
+        """ Test the uptime derived from the start date and from the last
+        remote date of the address. """
         from supvisors.process import ProcessStatus
-        # add 2 process infos into a process status
-        info = any_process_info_by_state(ProcessStates.STOPPING)
+        from supvisors.ttypes import ProcessStates
+        info = any_process_info_by_state(ProcessStates.STOPPED)
         process = ProcessStatus(info['group'], info['name'], self.supvisors)
         process.add_info('10.0.0.1', info)
-        process.add_info('10.0.0.2', any_process_info_by_state(ProcessStates.STOPPED))
-        # get their time values
-        now_1 = process.infos['10.0.0.1']['now']
-        uptime_1 = process.infos['10.0.0.1']['uptime']
-        now_2 = process.infos['10.0.0.2']['now']
-        # update times on address 2
-        process.update_times('10.0.0.2', now_2 + 10)
-        # check that nothing changed for address 1
-        self.assertEqual(now_1, process.infos['10.0.0.1']['now'])
-        self.assertEqual(uptime_1, process.infos['10.0.0.1']['uptime'])
-        # check that times changed for address 2 (uptime excepted)
-        self.assertEqual(now_2 + 10, process.infos['10.0.0.2']['now'])
-        self.assertEqual(0, process.infos['10.0.0.2']['uptime'])
-        # update times on address 1
-        process.update_times('10.0.0.1', now_1 + 20)
-        # check that times changed for address 1 (including uptime)
-        self.assertEqual(now_1 + 20, process.infos['10.0.0.1']['now'])
-        self.assertEqual(uptime_1 + 20, process.infos['10.0.0.1']['uptime'])
-        # check that nothing changed for address 2
-        self.assertEqual(now_2 + 10, process.infos['10.0.0.2']['now'])
-        self.assertEqual(0, process.infos['10.0.0.2']['uptime'])
-
-    def test_update_uptime(self):
-        """ Test the update of uptime entry in a Process info dictionary. """
-        from supvisors.process import ProcessStatus
-        from supvisors.ttypes import ProcessStates
-        # check times on a RUNNING process info
-        info = {'start': 50, 'now':75}
+        info.update({'start': 50, 'now': 75})
+        address = self.supvisors.context.addresses['10.0.0.1']
         for state in ProcessStates._values():
             info['state'] = state
-            ProcessStatus.update_uptime(info)
+            # the date of the last event is the latest
+            address.remote_time = 60
+            uptime = process.uptime('10.0.0.1')
             if state in [ProcessStates.RUNNING, ProcessStates.STOPPING]:
-                self.assertEqual(25, info['uptime'])
+                self.assertEqual(25, uptime)
             else:
-                self.assertEqual(0, info['uptime'])
+                self.assertEqual(0, uptime)
+            # the date of the last tick is the latest
+            address.remote_time = 90
+            uptime = process.uptime('10.0.0.1')
+            if state in [ProcessStates.RUNNING, ProcessStates.STOPPING]:
+                self.assertEqual(40, uptime)
+            else:
+                self.assertEqual(0, uptime)
+        # the tick does not modify the process information
+        self.assertEqual(75, info['now'])
+        self.assertNotIn('uptime', info)
 
     def test_invalidate_address(self):
         """ Test the invalidation of addresses. """
@@ -535,6 +559,9 @@ class ProcessTest(unittest.TestCase):
         process.infos['10.0.0.2'] = any_process_info_by_state(ProcessStates.STARTING)
         process.update_status('10.0.0.2', ProcessStates.STARTING, True)
         self.assertSetEqual({'10.0.0.2'}, process.addresses)
+        # the context is notified of the change of the running addresses
+        self.assertEqual(call(process, set()),
+                         self.supvisors.context.update_running.call_args)
         self.assertEqual(ProcessStates.STARTING, process.state)
         self.assertTrue(process.expected_exit)
         # add a BACKOFF process info
@@ -581,6 +608,9 @@ class ProcessTest(unittest.TestCase):
         process.addresses.add('10.0.0.3')
         self.assertTrue(process.evaluate_conflict())
         self.assertEqual(ProcessStates.RUNNING, process.state)
+        # the context is notified of the conflict
+        self.assertEqual(call(process, True),
+                         self.supvisors.context.update_conflict.call_args)
         # replace the RUNNING process info with a BACKOFF process info
         process.infos['10.0.0.2'] = any_process_info_by_state(ProcessStates.BACKOFF)
         self.assertTrue(process.evaluate_conflict())
@@ -594,6 +624,8 @@ class ProcessTest(unittest.TestCase):
         process.addresses.remove('10.0.0.2')
         self.assertFalse(process.evaluate_conflict())
         self.assertEqual(ProcessStates.STARTING, process.state)
+        self.assertEqual(call(process, False),
+                         self.supvisors.context.update_conflict.call_args)
 
     def test_running_state(self):
         """ Test the choice of a single state among a list of states. """
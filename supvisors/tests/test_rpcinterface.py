@@ -235,13 +235,9 @@ class RpcInterfaceTest(unittest.TestCase):
         """ Test the get_conflicts RPC. """
         from supvisors.rpcinterface import RPCInterface
         # prepare context
-        self.supervisor.supvisors.context.processes = {
-            'proc_1': Mock(**{'conflicting.return_value': True,
-                'serial.return_value': {'name': 'proc_1'}}),
-            'proc_2': Mock(**{'conflicting.return_value': False,
-                'serial.return_value': {'name': 'proc_2'}}),
-            'proc_3': Mock(**{'conflicting.return_value': True,
-                'serial.return_value': {'name': 'proc_3'}})}
+        self.supervisor.supvisors.context.conflicts.return_value = [
+            Mock(**{'serial.return_value': {'name': 'proc_1'}}),
+            Mock(**{'serial.return_value': {'name': 'proc_3'}})]
         # create RPC instance
         rpc = RPCInterface(self.supervisor)
         # test RPC call
@@ -249,6 +245,109 @@ class RpcInterfaceTest(unittest.TestCase):
             rpc.get_conflicts())
         self.assertEqual([call()], mocked_check.call_args_list)
 
+    def test_process_events(self):
+        """ Test the get_process_events RPC. """
+        from supvisors.rpcinterface import RPCInterface
+        # prepare context
+        payload_1 = {'group': 'appli', 'name': 'proc_1', 'state': 20}
+        payload_2 = {'group': 'appli', 'name': 'proc_2', 'state': 0}
+        self.supervisor.supvisors.zmq.internal_publisher = Mock(
+            **{'process_events_since.return_value': [(13, payload_1), (15, payload_2)]})
+        # create RPC instance
+        rpc = RPCInterface(self.supervisor)
+        # test RPC call
+        self.assertItemsEqual([{'group': 'appli', 'name': 'proc_1', 'state': 20, 'sequence': 13},
+            {'group': 'appli', 'name': 'proc_2', 'state': 0, 'sequence': 15}],
+            rpc.get_process_events(12))
+        self.assertEqual([call(12)],
+            self.supervisor.supvisors.zmq.internal_publisher.process_events_since.call_args_list)
+        # the published payloads are not modified
+        self.assertNotIn('sequence', payload_1)
+
+    def test_compact_process_info(self):
+        """ Test the get_compact_process_info RPC. """
+        from supvisors.rpcinterface import RPCInterface
+        # prepare context
+        def process_info(group, name):
+            return {'group': group, 'name': name, 'state': 20, 'start': 1000,
+                'now': 1234, 'pid': 4321, 'spawnerr': ''}
+        def get_process_info(namespec):
+            if namespec == 'appli:unknown':
+                raise RPCError(Faults.BAD_NAME)
+            return process_info(*namespec.split(':'))
+        publisher = Mock(epoch='1234abcd', sequence=20,
+            **{'process_events_since.return_value': [(13, {'group': 'appli', 'name': 'proc_1'})]})
+        self.supervisor.supvisors.zmq.internal_publisher = publisher
+        supervisor_intf = Mock(**{'getAllProcessInfo.return_value':
+            [process_info('appli', 'proc_1'), process_info('appli', 'proc_2')],
+            'getProcessInfo.side_effect': get_process_info})
+        self.supervisor.supvisors.info_source.supervisor_rpc_interface = supervisor_intf
+        # create RPC instance
+        rpc = RPCInterface(self.supervisor)
+        # test RPC call without generation
+        self.assertDictEqual({'epoch': '1234abcd', 'generation': 20,
+            'processes': [['appli', 'proc_1', 20, 1000, 1234, 4321, True],
+                ['appli', 'proc_2', 20, 1000, 1234, 4321, True]]},
+            rpc.get_compact_process_info())
+        self.assertFalse(publisher.process_events_since.called)
+        self.assertFalse(supervisor_intf.getProcessInfo.called)
+        # test RPC call with a generation greater than the current one
+        # (the remote Supvisors instance has been restarted)
+        self.assertEqual(2, len(rpc.get_compact_process_info(25)['processes']))
+        self.assertFalse(publisher.process_events_since.called)
+        self.assertEqual(2, supervisor_intf.getAllProcessInfo.call_count)
+        # test RPC call with a valid generation and invalidated processes
+        result = rpc.get_compact_process_info(12, ['appli:proc_3', 'appli:unknown'])
+        self.assertEqual(20, result['generation'])
+        self.assertItemsEqual([['appli', 'proc_1', 20, 1000, 1234, 4321, True],
+            ['appli', 'proc_3', 20, 1000, 1234, 4321, True]], result['processes'])
+        self.assertEqual([call(12)], publisher.process_events_since.call_args_list)
+        self.assertItemsEqual([call('appli:proc_1'), call('appli:proc_3'),
+            call('appli:unknown')], supervisor_intf.getProcessInfo.call_args_list)
+        self.assertEqual(2, supervisor_intf.getAllProcessInfo.call_count)
+
+    def test_request_queue(self):
+        """ Test the get_request_queue RPC. """
+        from supvisors.rpcinterface import RPCInterface
+        # prepare context
+        supvisors = self.supervisor.supvisors
+        supvisors.listener.main_loop = Mock(**{'request_statistics.return_value':
+            {'depth': 1000, 'queued': 3, 'in_progress': 1, 'priorities': []}})
+        supvisors.zmq.pusher = Mock(unsent=2)
+        # create RPC instance
+        rpc = RPCInterface(self.supervisor)
+        # test RPC call
+        self.assertDictEqual({'depth': 1000, 'queued': 3, 'in_progress': 1,
+            'unsent': 2, 'priorities': []}, rpc.get_request_queue())
+
+    def test_proxy_statistics(self):
+        """ Test the get_proxy_statistics RPC. """
+        from supvisors.rpcinterface import RPCInterface
+        # prepare context
+        supvisors = self.supervisor.supvisors
+        supvisors.listener.main_loop = Mock(**{'proxy_statistics.return_value':
+            {'10.0.0.2': {'hits': 0, 'misses': 1, 'failures': 1},
+             '10.0.0.1': {'hits': 3, 'misses': 1, 'failures': 0}}})
+        # create RPC instance
+        rpc = RPCInterface(self.supervisor)
+        # test RPC call
+        self.assertListEqual([
+            {'address_name': '10.0.0.1', 'hits': 3, 'misses': 1, 'failures': 0},
+            {'address_name': '10.0.0.2', 'hits': 0, 'misses': 1, 'failures': 1}],
+            rpc.get_proxy_statistics())
+
+    def test_failover_statistics(self):
+        """ Test the get_failover_statistics RPC. """
+        from supvisors.rpcinterface import RPCInterface
+        # prepare context
+        supvisors = self.supervisor.supvisors
+        supvisors.failure_handler.statistics.return_value = [{'address_name': '10.0.0.1'}]
+        # create RPC instance
+        rpc = RPCInterface(self.supervisor)
+        # test RPC call
+        self.assertListEqual([{'address_name': '10.0.0.1'}],
+            rpc.get_failover_statistics())
+
     @patch('supvisors.rpcinterface.RPCInterface._check_operating')
     def test_start_application(self, mocked_check):
         """ Test the start_application RPC. """
@@ -625,8 +724,7 @@ class RpcInterfaceTest(unittest.TestCase):
         mocked_check.reset_mock()
         # test RPC call with running processes
         rpc._get_application_process.return_value = (
-            Mock(**{'processes.values.return_value': [
-                Mock(**{'running.return_value': False}),
+            Mock(**{'running_processes.return_value': [
                 Mock(**{'running.return_value': True,
                     'namespec.return_value': 'proc2'})]}), None)
         with self.assertRaises(RPCError) as exc:
@@ -645,8 +743,8 @@ class RpcInterfaceTest(unittest.TestCase):
             'stopped.return_value': False,
             'namespec.return_value': 'proc2'})
         rpc._get_application_process.return_value = (
-            Mock(**{'processes.values.return_value': [
-                proc_1, proc_2]}), None)
+            Mock(**{'processes.values.return_value': [proc_1, proc_2],
+                'running_processes.return_value': []}), None)
         # test RPC call with no wait and not done
         mocked_start.return_value = False
         result = rpc.start_process(1, 'appli:*', 'argument list', False)
@@ -749,8 +847,8 @@ class RpcInterfaceTest(unittest.TestCase):
             'stopped.return_value': False,
             'namespec.return_value': 'proc2'})
         rpc._get_application_process.return_value = (
-            Mock(**{'processes.values.return_value': [
-                proc_1, proc_2]}), None)
+            Mock(**{'processes.values.return_value': [proc_1, proc_2],
+                'running_processes.return_value': []}), None)
         # test RPC call with no wait and not done
         mocked_stop.return_value = False
         result = rpc.stop_process('appli:*', False)
@@ -17,10 +17,13 @@
 # limitations under the License.
 # ======================================================================
 
+import socket
 import sys
 import unittest
 
-from xmlrpclib import ServerProxy
+from mock import call, patch, Mock
+from threading import Lock
+from xmlrpclib import Fault, ServerProxy
 
 class RpcRequestsTest(unittest.TestCase):
     """ Test case for the rpcrequests module. """
@@ -58,7 +61,201 @@ class RpcRequestsTest(unittest.TestCase):
         self.assertEqual('p@$$w0rd', proxy._ServerProxy__transport.password)
         # if no server is started, call would block
 
- 
+    def test_timeout_transport(self):
+        """ Test the timeout set on the transport connection. """
+        from supvisors.rpcrequests import TimeoutTransport
+        transport = TimeoutTransport('', '', 'http://10.0.0.1:1000')
+        self.assertIsNone(transport.timeout)
+        # test timeout applied to the new connections
+        transport.set_timeout(5)
+        connection = transport._get_connection()
+        self.assertEqual(5, connection.timeout)
+        self.assertEqual('10.0.0.1', connection.host)
+        self.assertEqual(1000, connection.port)
+        # test timeout applied to the current connection
+        transport.connection = connection
+        connection.sock = Mock()
+        transport.set_timeout(10)
+        self.assertEqual(10, connection.timeout)
+        self.assertEqual([call(10)], connection.sock.settimeout.call_args_list)
+
+
+class RPCProxyPoolTest(unittest.TestCase):
+    """ Test case for the RPCProxyPool class of the rpcrequests module. """
+
+    def setUp(self):
+        """ Create a pool and patch getRPCInterface. """
+        from supvisors.rpcrequests import RPCProxyPool
+        self.env = {'SUPERVISOR_SERVER_URL': 'http://localhost:1000'}
+        self.pool = RPCProxyPool(self.env)
+        self.rpc_patch = patch('supvisors.rpcrequests.getRPCInterface')
+        self.mocked_rpc = self.rpc_patch.start()
+        self.mocked_rpc.side_effect = lambda address, env: Mock(
+            **{'supervisor.getState.return_value': address})
+
+    def tearDown(self):
+        """ Remove patch of getRPCInterface. """
+        self.rpc_patch.stop()
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        self.assertIs(self.env, self.pool.env)
+        self.assertDictEqual({}, self.pool.proxies)
+        self.assertDictEqual({}, self.pool.stats)
+        self.assertIsInstance(self.pool.lock, type(Lock()))
+
+    def test_get_proxy(self):
+        """ Test the creation and the reuse of the proxies. """
+        proxy = self.pool.get_proxy('10.0.0.1')
+        self.assertIs(proxy, self.pool.get_proxy('10.0.0.1'))
+        self.assertIsNot(proxy, self.pool.get_proxy('10.0.0.2'))
+        self.assertEqual([call('10.0.0.1', self.env),
+                          call('10.0.0.2', self.env)],
+                         self.mocked_rpc.call_args_list)
+        self.assertEqual(1, self.pool.stats['10.0.0.1']['hits'])
+        self.assertEqual(1, self.pool.stats['10.0.0.1']['misses'])
+        self.assertEqual(0, self.pool.stats['10.0.0.2']['hits'])
+        self.assertEqual(1, self.pool.stats['10.0.0.2']['misses'])
+
+    def use_real_proxies(self):
+        """ Make the pool create real proxies with an open HTTP connection. """
+        self.rpc_patch.stop()
+        from supvisors.rpcrequests import getRPCInterface
+        def get_proxy(address, env):
+            proxy = getRPCInterface(address, env)
+            transport = proxy('transport')
+            transport.connection = transport._get_connection()
+            transport.connection.sock = Mock()
+            return proxy
+        self.mocked_rpc = self.rpc_patch.start()
+        self.mocked_rpc.side_effect = get_proxy
+
+    def assert_closed(self, proxy, sock):
+        """ Check that the connection of the proxy has been closed. """
+        self.assertIsNone(proxy('transport').connection)
+        self.assertEqual(1, sock.close.call_count)
+
+    def test_invalidate(self):
+        """ Test the removal of the proxies. """
+        self.use_real_proxies()
+        proxy_1 = self.pool.get_proxy('10.0.0.1')
+        sock_1 = proxy_1('transport').connection.sock
+        proxy_2 = self.pool.get_proxy('10.0.0.2')
+        sock_2 = proxy_2('transport').connection.sock
+        # unknown addresses are ignored
+        self.pool.invalidate(['10.0.0.1', '10.0.0.3'])
+        self.assert_closed(proxy_1, sock_1)
+        self.assertEqual(0, sock_2.close.call_count)
+        self.assertListEqual(['10.0.0.2'], self.pool.proxies.keys())
+        # exception on close is ignored
+        sock_2.close.side_effect = socket.error
+        self.pool.close()
+        self.assert_closed(proxy_2, sock_2)
+        self.assertDictEqual({}, self.pool.proxies)
+        # a proxy without connection is ignored
+        proxy_3 = self.pool.get_proxy('10.0.0.3')
+        proxy_3('transport').connection = None
+        self.pool.invalidate(['10.0.0.3'])
+        self.assertIsNone(proxy_3('transport').connection)
+        # a new proxy is created at next request
+        self.assertIsNot(proxy_1, self.pool.get_proxy('10.0.0.1'))
+
+    def test_discard(self):
+        """ Test the removal of a proxy that may have been replaced. """
+        self.use_real_proxies()
+        proxy_1 = self.pool.get_proxy('10.0.0.1')
+        sock_1 = proxy_1('transport').connection.sock
+        self.pool.discard('10.0.0.1', proxy_1)
+        self.assert_closed(proxy_1, sock_1)
+        self.assertDictEqual({}, self.pool.proxies)
+        # the proxy created in the meantime by another thread is kept
+        # but the connection of the discarded proxy is closed
+        proxy_2 = self.pool.get_proxy('10.0.0.1')
+        sock_2 = proxy_2('transport').connection.sock
+        proxy_1('transport').connection = connection = \
+            proxy_1('transport')._get_connection()
+        connection.sock = sock_1 = Mock()
+        self.pool.discard('10.0.0.1', proxy_1)
+        self.assert_closed(proxy_1, sock_1)
+        self.assertIs(proxy_2, self.pool.proxies['10.0.0.1'])
+        self.assertIsNotNone(proxy_2('transport').connection)
+        self.assertEqual(0, sock_2.close.call_count)
+
+    @patch('supvisors.rpcrequests.time', side_effect=[1, 3, 10, 11])
+    def test_call(self, _):
+        """ Test the XML-RPC through the pool. """
+        # test normal behaviour
+        self.assertEqual('10.0.0.1', self.pool.call('10.0.0.1',
+                                                    'supervisor.getState'))
+        self.assertEqual('10.0.0.1', self.pool.call('10.0.0.1',
+                                                    'supervisor.getState'))
+        self.assertDictEqual({'10.0.0.1': {'hits': 1, 'misses': 1,
+            'failures': 0, 'calls': 2, 'latency_total': 3.0,
+            'latency_max': 2.0, 'latency_mean': 1.5}},
+            self.pool.statistics())
+        # test that arguments are passed
+        proxy = self.pool.proxies['10.0.0.1']
+        with patch('supvisors.rpcrequests.time', return_value=0):
+            self.pool.call('10.0.0.1', 'supvisors.start_args',
+                           'appli:proc', '-x', False)
+        self.assertEqual([call('appli:proc', '-x', False)],
+                         proxy.supvisors.start_args.call_args_list)
+        # test that the timeout is set on the transport
+        self.assertEqual([call('transport')] * 3, proxy.call_args_list)
+        self.assertEqual([call(None)] * 3,
+                         proxy.return_value.set_timeout.call_args_list)
+        with patch('supvisors.rpcrequests.time', return_value=0):
+            self.pool.call('10.0.0.1', 'supervisor.getState', timeout=12)
+        self.assertEqual(call(12), proxy.return_value.set_timeout.call_args)
+
+    @patch('supvisors.rpcrequests.time', return_value=0)
+    def test_call_fault(self, _):
+        """ Test that a XML-RPC fault keeps the proxy. """
+        proxy = self.pool.get_proxy('10.0.0.1')
+        proxy.supervisor.getState.side_effect = Fault(10, 'BAD_NAME')
+        with self.assertRaises(Fault):
+            self.pool.call('10.0.0.1', 'supervisor.getState')
+        self.assertIs(proxy, self.pool.proxies['10.0.0.1'])
+        self.assertEqual(0, self.pool.stats['10.0.0.1']['failures'])
+
+    @patch('supvisors.rpcrequests.time', return_value=0)
+    def test_call_failure(self, _):
+        """ Test the reconnection upon connection failure. """
+        # a closed kept-alive connection leads to a second attempt
+        proxy = self.pool.get_proxy('10.0.0.1')
+        proxy.supervisor.getState.side_effect = socket.error
+        self.assertEqual('10.0.0.1', self.pool.call('10.0.0.1',
+                                                    'supervisor.getState'))
+        self.assertIsNot(proxy, self.pool.proxies['10.0.0.1'])
+        self.assertEqual(1, self.pool.stats['10.0.0.1']['failures'])
+        self.assertEqual(2, self.pool.stats['10.0.0.1']['misses'])
+        # no second attempt with a new proxy
+        self.pool.invalidate(['10.0.0.1'])
+        self.mocked_rpc.side_effect = lambda address, env: Mock(
+            **{'supervisor.getState.side_effect': socket.error})
+        with self.assertRaises(socket.error):
+            self.pool.call('10.0.0.1', 'supervisor.getState')
+        self.assertNotIn('10.0.0.1', self.pool.proxies)
+        self.assertEqual(2, self.pool.stats['10.0.0.1']['failures'])
+        # no second attempt when the error is not a connection error
+        proxy = self.pool.get_proxy('10.0.0.1')
+        proxy.supervisor.getState.side_effect = KeyError
+        with self.assertRaises(KeyError):
+            self.pool.call('10.0.0.1', 'supervisor.getState')
+        self.assertEqual(1, proxy.supervisor.getState.call_count)
+        self.assertNotIn('10.0.0.1', self.pool.proxies)
+        # no second attempt when the method is not idempotent
+        self.mocked_rpc.side_effect = None
+        proxy = self.pool.get_proxy('10.0.0.1')
+        proxy.supvisors.start_args.side_effect = socket.error
+        with self.assertRaises(socket.error):
+            self.pool.call('10.0.0.1', 'supvisors.start_args', 'appli:proc',
+                           '', False)
+        self.assertEqual(1, proxy.supvisors.start_args.call_count)
+        self.assertNotIn('10.0.0.1', self.pool.proxies)
+        self.assertEqual(4, self.pool.stats['10.0.0.1']['failures'])
+
+
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
 
@@ -0,0 +1,244 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from mock import call, patch
+from supervisor.options import make_namespec
+
+from supvisors.tests.base import MockedSupvisors, database_copy
+
+
+class ContextSnapshotTest(unittest.TestCase):
+    """ Test case for the snapshot module. """
+
+    def setUp(self):
+        """ Create a Supvisors-like structure with a real context and
+        a real statistics compiler. """
+        from supvisors.context import Context
+        from supvisors.statscompiler import StatisticsCompiler
+        self.directory = tempfile.mkdtemp()
+        self.supvisors = MockedSupvisors()
+        self.supvisors.options.context_file = os.path.join(self.directory,
+                                                           'supvisors.context')
+        self.supvisors.context = Context(self.supvisors)
+        self.supvisors.statistician = StatisticsCompiler(self.supvisors)
+
+    def tearDown(self):
+        """ Remove the temporary directory. """
+        shutil.rmtree(self.directory)
+
+    def fill_context(self):
+        """ Load processes and statistics into the context. """
+        all_info = database_copy()
+        self.supvisors.context.load_processes('10.0.0.1', all_info[:4])
+        self.supvisors.context.load_processes('10.0.0.2', all_info[2:6])
+        instance = self.supvisors.statistician.data['10.0.0.1'][5]
+        instance.cpu = [[6.25, 10.0], [20.0, 15.0]]
+        instance.mem = [76.1, 75.9]
+        instance.io = {'eth0': ([0.4, 0.8], [0.2, 0.2])}
+        instance.proc = {('myself', 118612): ([0.5, 3.125], [1.9, 1.87])}
+        self.supvisors.statistician.nbcores['10.0.0.1'] = 1
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        from supvisors.snapshot import ContextSnapshot
+        snapshot = ContextSnapshot(self.supvisors)
+        self.assertIs(self.supvisors, snapshot.supvisors)
+        self.assertIs(self.supvisors.context, snapshot.context)
+        self.assertIs(self.supvisors.statistician, snapshot.statistician)
+        self.assertIs(self.supvisors.logger, snapshot.logger)
+        self.assertEqual(self.supvisors.options.context_file, snapshot.filename)
+        self.assertEqual(60, snapshot.period)
+        self.assertEqual(0, snapshot.last_save)
+        self.assertDictEqual({}, snapshot.restored)
+
+    def test_on_tick(self):
+        """ Test the periodic writing of the file. """
+        from supvisors.snapshot import ContextSnapshot
+        snapshot = ContextSnapshot(self.supvisors)
+        mocked_send = self.supvisors.zmq.pusher.send_save_context
+        # the writing is deferred to the main loop
+        with patch.object(snapshot, 'serial', return_value='data'):
+            snapshot.on_tick(100)
+            self.assertEqual([call(snapshot.filename, 'data')],
+                             mocked_send.call_args_list)
+            self.assertEqual(100, snapshot.last_save)
+            snapshot.on_tick(159)
+            self.assertEqual(1, mocked_send.call_count)
+            snapshot.on_tick(160)
+            self.assertEqual(2, mocked_send.call_count)
+            self.assertEqual(160, snapshot.last_save)
+        self.assertListEqual([], os.listdir(self.directory))
+        # the data written by the executor is restored
+        self.fill_context()
+        data = snapshot.serial()
+        snapshot.write(data)
+        self.assertDictEqual(data, snapshot.load())
+
+    def test_disabled(self):
+        """ Test that nothing is done when there is no file. """
+        from supvisors.snapshot import ContextSnapshot
+        self.supvisors.options.context_file = ''
+        snapshot = ContextSnapshot(self.supvisors)
+        snapshot.save()
+        snapshot.on_tick(100)
+        self.assertEqual(0, self.supvisors.zmq.pusher.send_save_context.call_count)
+        self.assertListEqual([], os.listdir(self.directory))
+        self.assertIsNone(snapshot.load())
+        self.assertEqual(0, self.supvisors.logger.warn.call_count)
+
+    def test_save_restore(self):
+        """ Test the saving and the restoration of the context. """
+        from supvisors.context import Context
+        from supvisors.snapshot import ContextSnapshot
+        from supvisors.statscompiler import StatisticsCompiler
+        from supvisors.ttypes import ProcessStates
+        self.fill_context()
+        ContextSnapshot(self.supvisors).save()
+        self.assertListEqual(['supvisors.context'],
+                             os.listdir(self.directory))
+        # restore in an empty context
+        saved_context = self.supvisors.context
+        self.supvisors.context = Context(self.supvisors)
+        self.supvisors.statistician = StatisticsCompiler(self.supvisors)
+        ContextSnapshot(self.supvisors).restore()
+        context = self.supvisors.context
+        self.assertItemsEqual(saved_context.processes.keys(),
+                              context.processes.keys())
+        self.assertItemsEqual(saved_context.applications.keys(),
+                              context.applications.keys())
+        for address_name in ['10.0.0.1', '10.0.0.2']:
+            self.assertItemsEqual(
+                saved_context.addresses[address_name].processes.keys(),
+                context.addresses[address_name].processes.keys())
+        # the processes are not considered running until checked
+        for process in context.processes.values():
+            self.assertEqual(ProcessStates.UNKNOWN, process.state)
+            self.assertFalse(process.addresses)
+        # the statistics are restored
+        instance = self.supvisors.statistician.data['10.0.0.1'][5]
+        self.assertListEqual([[6.25, 10.0], [20.0, 15.0]], instance.cpu)
+        self.assertListEqual([76.1, 75.9], instance.mem)
+        self.assertDictEqual({'eth0': ([0.4, 0.8], [0.2, 0.2])}, instance.io)
+        self.assertDictEqual({('myself', 118612): ([0.5, 3.125], [1.9, 1.87])},
+                             instance.proc)
+        self.assertEqual(1, self.supvisors.statistician.nbcores['10.0.0.1'])
+
+    def test_obsolete_processes(self):
+        """ Test the processes restored and not reported when checking
+        their address. """
+        from supvisors.snapshot import ContextSnapshot
+        self.fill_context()
+        ContextSnapshot(self.supvisors).save()
+        from supvisors.context import Context
+        self.supvisors.context = Context(self.supvisors)
+        snapshot = ContextSnapshot(self.supvisors)
+        snapshot.restore()
+        all_info = database_copy()
+        restored = [make_namespec(info['group'], info['name'])
+                    for info in all_info[:4]]
+        self.assertItemsEqual(restored, snapshot.restored['10.0.0.1'])
+        # nothing obsolete for an address that has not been restored
+        self.assertListEqual([], snapshot.obsolete_processes('10.0.0.3',
+                                                             all_info))
+        # the processes not reported are obsolete
+        self.assertListEqual(sorted(restored[2:]),
+            snapshot.obsolete_processes('10.0.0.1', all_info[:2]))
+        # only the first check of the address is considered
+        self.assertNotIn('10.0.0.1', snapshot.restored)
+        self.assertListEqual([], snapshot.obsolete_processes('10.0.0.1', []))
+
+    def test_lost_address(self):
+        """ Test that the processes restored are removed when their address
+        is lost before being checked. """
+        from supvisors.snapshot import ContextSnapshot
+        self.fill_context()
+        ContextSnapshot(self.supvisors).save()
+        from supvisors.context import Context
+        context = self.supvisors.context = Context(self.supvisors)
+        snapshot = self.supvisors.snapshot = ContextSnapshot(self.supvisors)
+        snapshot.restore()
+        self.assertIn('10.0.0.1', snapshot.restored)
+        self.assertTrue(context.addresses['10.0.0.1'].processes)
+        # the address is declared SILENT at the end of the synchronization
+        context.end_synchro()
+        self.assertDictEqual({}, snapshot.restored)
+        self.assertDictEqual({}, context.addresses['10.0.0.1'].processes)
+        self.assertEqual(0, context.addresses['10.0.0.1'].running_load)
+        self.assertDictEqual({}, context.processes)
+        self.assertDictEqual({}, context.applications)
+
+    def test_restore_depth(self):
+        """ Test that the statistics restored are bounded by the depth. """
+        from supvisors.snapshot import ContextSnapshot
+        self.fill_context()
+        ContextSnapshot(self.supvisors).save()
+        self.supvisors.options.stats_histo = 1
+        from supvisors.statscompiler import StatisticsCompiler
+        self.supvisors.statistician = StatisticsCompiler(self.supvisors)
+        ContextSnapshot(self.supvisors).restore()
+        instance = self.supvisors.statistician.data['10.0.0.1'][5]
+        self.assertListEqual([[10.0], [15.0]], instance.cpu)
+        self.assertListEqual([75.9], instance.mem)
+        self.assertDictEqual({'eth0': ([0.8], [0.2])}, instance.io)
+        self.assertDictEqual({('myself', 118612): ([3.125], [1.87])},
+                             instance.proc)
+
+    def test_invalid_file(self):
+        """ Test the loading of missing or invalid files. """
+        from supvisors.snapshot import ContextSnapshot
+        snapshot = ContextSnapshot(self.supvisors)
+        # missing file
+        snapshot.restore()
+        self.assertEqual(1, self.supvisors.logger.warn.call_count)
+        self.assertDictEqual({}, self.supvisors.context.processes)
+        # unexpected header
+        with open(snapshot.filename, 'wb') as stream:
+            stream.write('dummy contents')
+        self.assertIsNone(snapshot.load())
+        self.assertEqual(2, self.supvisors.logger.warn.call_count)
+        # truncated file
+        self.fill_context()
+        snapshot.save()
+        with open(snapshot.filename, 'rb') as stream:
+            data = stream.read()
+        with open(snapshot.filename, 'wb') as stream:
+            stream.write(data[:-10])
+        self.assertIsNone(snapshot.load())
+        self.assertEqual(3, self.supvisors.logger.warn.call_count)
+
+    def test_save_error(self):
+        """ Test the error when the file cannot be written. """
+        from supvisors.snapshot import ContextSnapshot
+        self.supvisors.options.context_file = os.path.join(
+            self.directory, 'missing', 'supvisors.context')
+        ContextSnapshot(self.supvisors).save()
+        self.assertEqual(1, self.supvisors.logger.error.call_count)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -71,9 +71,12 @@ class StateMachinesTest(unittest.TestCase):
         self.assertIsInstance(state, AbstractState)
         # test enter method: master and start_date are reset
         # test that all addresses that are not in an isolation state are reset to UNKNOWN
+        self.supvisors.context.announced_master = '10.0.0.1'
         state.enter()
         self.assertEqual('',  state.context.master_address)
+        self.assertEqual('',  state.context.announced_master)
         self.assertGreaterEqual(int(time.time()), state.start_date)
+        self.assertSetEqual(set(), state.members)
         self.assertEqual(AddressStates.UNKNOWN, self.supvisors.context.addresses['127.0.0.1'].state)
         self.assertEqual(AddressStates.UNKNOWN, self.supvisors.context.addresses['10.0.0.1'].state)
         self.assertEqual(AddressStates.UNKNOWN, self.supvisors.context.addresses['10.0.0.2'].state)
@@ -98,6 +101,26 @@ class StateMachinesTest(unittest.TestCase):
             with patch.object(self.supvisors.context, 'unknown_addresses', return_value=[]):
                 result = state.next()
                 self.assertEqual(SupvisorsStates.DEPLOYMENT, result)
+        # test that Supvisors does not wait for all addresses when the quorum is reached
+        state.start_date = time.time()
+        with patch.object(self.supvisors.context, 'running_addresses', return_value=['127.0.0.1', '10.0.0.2']):
+            with patch.object(self.supvisors.context, 'unknown_addresses', return_value=['10.0.0.1', '10.0.0.3']):
+                with patch.object(self.supvisors.options, 'synchro_quorum', 3):
+                    self.assertEqual(SupvisorsStates.INITIALIZATION, state.next())
+                with patch.object(self.supvisors.options, 'synchro_quorum', 2):
+                    self.assertEqual(SupvisorsStates.DEPLOYMENT, state.next())
+                # test with the addresses running at last shutdown
+                state.members = {'127.0.0.1', '10.0.0.1'}
+                self.assertEqual(SupvisorsStates.INITIALIZATION, state.next())
+                state.members = {'127.0.0.1', '10.0.0.2'}
+                self.assertEqual(SupvisorsStates.DEPLOYMENT, state.next())
+        # test that end_synchro is not called when the quorum is reached
+        with patch.object(self.supvisors.context, 'running_addresses', return_value=['127.0.0.1', '10.0.0.2']):
+            with patch.object(self.supvisors.context, 'end_synchro') as mocked_synchro:
+                state.exit()
+                self.assertEqual(0, mocked_synchro.call_count)
+                self.assertEqual('10.0.0.2', self.supvisors.context.master_address)
+        state.members = set()
         # test exit method
         # test that context end_synchro is called and master is the lowest string among address names
         with patch.object(self.supvisors.context, 'running_addresses', return_value=['127.0.0.1', '10.0.0.2', '10.0.0.4']):
@@ -105,6 +128,13 @@ class StateMachinesTest(unittest.TestCase):
                 state.exit()
                 self.assertEqual(1, mocked_synchro.call_count)
                 self.assertEqual('10.0.0.2', self.supvisors.context.master_address)
+                # test that a master already in use is kept if running
+                self.supvisors.context.announced_master = '10.0.0.1'
+                state.exit()
+                self.assertEqual('10.0.0.2', self.supvisors.context.master_address)
+                self.supvisors.context.announced_master = '10.0.0.4'
+                state.exit()
+                self.assertEqual('10.0.0.4', self.supvisors.context.master_address)
 
     def test_deployment_state(self):
         """ Test the Deployment state of the FSM. """
@@ -228,14 +258,24 @@ class StateMachinesTest(unittest.TestCase):
                 with patch.object(self.supvisors.context, 'conflicting', return_value=True):
                     result = state.next()
                     self.assertEqual(SupvisorsStates.CONCILIATION, result)
-                # transit to INITIALIZATION state if the local address or master address is not RUNNING
+                # transit to INITIALIZATION state if the local address is not RUNNING
                 self.supvisors.context.addresses['127.0.0.1']._state = AddressStates.SILENT
                 result = state.next()
                 self.assertEqual(SupvisorsStates.INITIALIZATION, result)
                 self.supvisors.context.addresses['127.0.0.1']._state = AddressStates.RUNNING
+                # stay in OPERATION if the master address is not RUNNING and a successor is elected
                 self.supvisors.context.addresses['10.0.0.3']._state = AddressStates.SILENT
-                result = state.next()
-                self.assertEqual(SupvisorsStates.INITIALIZATION, result)
+                with patch.object(self.supvisors.context, 'conflicting', return_value=False):
+                    with patch.object(self.supvisors.context, 'elect_master',
+                                      return_value=True) as mocked_elect:
+                        result = state.next()
+                        self.assertEqual(SupvisorsStates.OPERATION, result)
+                        self.assertEqual([call()], mocked_elect.call_args_list)
+                    # transit to INITIALIZATION state if no successor can be elected
+                    with patch.object(self.supvisors.context, 'elect_master',
+                                      return_value=False):
+                        result = state.next()
+                        self.assertEqual(SupvisorsStates.INITIALIZATION, result)
         # no exit implementation. just call it without test
         state.exit()
 
@@ -296,14 +336,27 @@ class StateMachinesTest(unittest.TestCase):
                     result = state.next()
                     self.assertEqual(SupvisorsStates.OPERATION, result)
                 # transit to INITIALIZATION state if the local address
-                # or master address is not RUNNING
+                # is not RUNNING
                 addresses['127.0.0.1']._state = AddressStates.SILENT
                 result = state.next()
                 self.assertEqual(SupvisorsStates.INITIALIZATION, result)
                 addresses['127.0.0.1']._state = AddressStates.RUNNING
+                # go on if the master address is not RUNNING
+                # and a successor is elected
                 addresses['10.0.0.3']._state = AddressStates.SILENT
-                result = state.next()
-                self.assertEqual(SupvisorsStates.INITIALIZATION, result)
+                with patch.object(self.supvisors.context, 'conflicting',
+                                  return_value=False):
+                    with patch.object(self.supvisors.context, 'elect_master',
+                                      return_value=True) as mocked_elect:
+                        result = state.next()
+                        self.assertEqual(SupvisorsStates.OPERATION, result)
+                        self.assertEqual([call()], mocked_elect.call_args_list)
+                    # transit to INITIALIZATION state if no successor
+                    # can be elected
+                    with patch.object(self.supvisors.context, 'elect_master',
+                                      return_value=False):
+                        result = state.next()
+                        self.assertEqual(SupvisorsStates.INITIALIZATION, result)
          # no exit implementation. just call it without test
         state.exit()
 
@@ -627,6 +680,7 @@ class FiniteStateMachineTest(unittest.TestCase):
         """ Test the actions triggered in state machine upon reception
         of a timer event. """
         from supvisors.statemachine import FiniteStateMachine
+        from supvisors.ttypes import SupvisorsStates
         # create state machine instance
         fsm = FiniteStateMachine(self.supvisors)
         # apply patches
@@ -645,6 +699,34 @@ class FiniteStateMachineTest(unittest.TestCase):
             self.assertEqual(1, mocked_event.call_count)
             self.assertEqual(1, mocked_failure.call_count)
             self.assertEqual(1, mocked_isolation.call_count)
+            # test that the membership is saved only in OPERATION state
+            mocked_save = self.supvisors.context.save_membership
+            self.assertEqual(0, mocked_save.call_count)
+            fsm.state = SupvisorsStates.OPERATION
+            fsm.on_timer_event()
+            self.assertEqual(1, mocked_save.call_count)
+
+    def test_heartbeat_event(self):
+        """ Test the actions triggered in state machine upon reception
+        of a heartbeat. """
+        from supvisors.statemachine import FiniteStateMachine
+        fsm = FiniteStateMachine(self.supvisors)
+        with patch.object(self.supvisors.context, 'on_heartbeat_event') as mocked_evt:
+            fsm.on_heartbeat_event('10.0.0.1')
+            self.assertEqual([call('10.0.0.1')], mocked_evt.call_args_list)
+
+    def test_local_heartbeat(self):
+        """ Test the actions triggered in state machine upon the local
+        heartbeat. """
+        from supvisors.statemachine import FiniteStateMachine
+        fsm = FiniteStateMachine(self.supvisors)
+        with patch.object(self.supvisors.context, 'on_local_heartbeat',
+                          return_value=[]) as mocked_evt:
+            self.assertFalse(fsm.on_local_heartbeat(None))
+            mocked_evt.return_value = ['10.0.0.1']
+            self.assertTrue(fsm.on_local_heartbeat(1234.5))
+            self.assertEqual([call(None), call(1234.5)],
+                             mocked_evt.call_args_list)
 
     def test_tick_event(self):
         """ Test the actions triggered in state machine upon reception
@@ -658,65 +740,195 @@ class FiniteStateMachineTest(unittest.TestCase):
             self.assertEqual(1, mocked_evt.call_count)
             self.assertEqual(call('10.0.0.1', 1234), mocked_evt.call_args)
 
-    # FIWME: test calls to failure_handler + master + crashed
     def test_process_event(self):
         """ Test the actions triggered in state machine upon reception
         of a process event. """
         from supvisors.statemachine import FiniteStateMachine
         # create state machine instance
         fsm = FiniteStateMachine(self.supvisors)
+        with patch.object(fsm, 'on_process_events') as mocked_events:
+            fsm.on_process_event('10.0.0.1', ['dummy_event'])
+            self.assertEqual([call([('10.0.0.1', ['dummy_event'])])],
+                             mocked_events.call_args_list)
+
+    def test_jobs_event(self):
+        """ Test the actions triggered in state machine upon reception
+        of the jobs of a Supvisors master. """
+        from supvisors.statemachine import FiniteStateMachine
+        fsm = FiniteStateMachine(self.supvisors)
+        jobs = {'starter': [(2, 0, 'appli', 0, ['appli:proc'])],
+                'stopper': [(1, 0, 'appli', 1, ['appli:proc'])]}
+        # the jobs of the master are replicated
+        self.supvisors.context.announced_master = ''
+        self.supvisors.context.master = False
+        self.supvisors.context.master_address = '10.0.0.1'
+        fsm.on_jobs_event('10.0.0.1', jobs)
+        self.assertListEqual(jobs['starter'], self.supvisors.starter.replica)
+        self.assertListEqual(jobs['stopper'], self.supvisors.stopper.replica)
+        # the jobs of another Supvisors instance are ignored
+        self.supvisors.starter.replica = []
+        self.supvisors.stopper.replica = []
+        fsm.on_jobs_event('10.0.0.2', jobs)
+        self.assertListEqual([], self.supvisors.starter.replica)
+        self.assertEqual('', self.supvisors.context.announced_master)
+        # the local master ignores the jobs received
+        self.supvisors.context.master_address = '127.0.0.1'
+        self.supvisors.context.master = True
+        fsm.on_jobs_event('127.0.0.1', jobs)
+        self.assertListEqual([], self.supvisors.starter.replica)
+        self.supvisors.context.master = False
+        # without master, the sender is announced as the master in use
+        self.supvisors.context.master_address = ''
+        fsm.on_jobs_event('10.0.0.2', jobs)
+        self.assertListEqual([], self.supvisors.starter.replica)
+        self.assertEqual('10.0.0.2', self.supvisors.context.announced_master)
+        # a lower master announced by a running address is adopted
+        from supvisors.ttypes import AddressStates
+        mocked_adopt = self.supvisors.context.adopt_master
+        self.supvisors.context.announced_master = ''
+        self.supvisors.context.master_address = '10.0.0.2'
+        self.supvisors.context.addresses = {
+            '10.0.0.1': Mock(state=AddressStates.SILENT),
+            '10.0.0.3': Mock(state=AddressStates.RUNNING)}
+        # not if the address is not running
+        fsm.on_jobs_event('10.0.0.1', jobs)
+        self.assertEqual(0, mocked_adopt.call_count)
+        self.assertListEqual([], self.supvisors.starter.replica)
+        # not if the address is higher than the master in use
+        fsm.on_jobs_event('10.0.0.3', jobs)
+        self.assertEqual(0, mocked_adopt.call_count)
+        self.assertListEqual([], self.supvisors.starter.replica)
+        # the jobs of the adopted master are replicated
+        self.supvisors.context.addresses['10.0.0.1'].state = \
+            AddressStates.RUNNING
+        fsm.on_jobs_event('10.0.0.1', jobs)
+        self.assertEqual([call('10.0.0.1')], mocked_adopt.call_args_list)
+        self.assertListEqual(jobs['starter'], self.supvisors.starter.replica)
+        self.assertListEqual(jobs['stopper'], self.supvisors.stopper.replica)
+        self.assertEqual('', self.supvisors.context.announced_master)
+
+    def test_request_faults(self):
+        """ Test the actions triggered in state machine upon reception
+        of the rejected requests. """
+        from supvisors.statemachine import FiniteStateMachine
+        from supvisors.utils import DeferredRequestHeaders
+        fsm = FiniteStateMachine(self.supvisors)
+        faults = [('appli:proc_1', 'rejected'), ('appli:proc_2', 'rejected')]
+        fsm.on_request_faults(DeferredRequestHeaders.START_PROCESSES, faults)
+        self.assertEqual([call('appli:proc_1', 'rejected'),
+                          call('appli:proc_2', 'rejected')],
+                         self.supvisors.starter.on_fault.call_args_list)
+        self.assertEqual(0, self.supvisors.stopper.on_fault.call_count)
+        self.supvisors.starter.on_fault.reset_mock()
+        fsm.on_request_faults(DeferredRequestHeaders.STOP_PROCESSES, faults[1:])
+        self.assertEqual(0, self.supvisors.starter.on_fault.call_count)
+        self.assertEqual([call('appli:proc_2', 'rejected')],
+                         self.supvisors.stopper.on_fault.call_args_list)
+        # the single process requests are routed the same way
+        self.supvisors.stopper.on_fault.reset_mock()
+        fsm.on_request_faults(DeferredRequestHeaders.START_PROCESS, faults[:1])
+        self.assertEqual([call('appli:proc_1', 'rejected')],
+                         self.supvisors.starter.on_fault.call_args_list)
+        self.assertEqual(0, self.supvisors.stopper.on_fault.call_count)
+        self.supvisors.starter.on_fault.reset_mock()
+        fsm.on_request_faults(DeferredRequestHeaders.STOP_PROCESS, faults[:1])
+        self.assertEqual(0, self.supvisors.starter.on_fault.call_count)
+        self.assertEqual([call('appli:proc_1', 'rejected')],
+                         self.supvisors.stopper.on_fault.call_args_list)
+
+    def test_serial_jobs(self):
+        """ Test the serialization of the jobs of the commanders. """
+        from supvisors.statemachine import FiniteStateMachine
+        fsm = FiniteStateMachine(self.supvisors)
+        self.supvisors.starter.serial_jobs.return_value = ['starter']
+        self.supvisors.stopper.serial_jobs.return_value = ['stopper']
+        self.assertDictEqual({'starter': ['starter'], 'stopper': ['stopper']},
+                             fsm.serial_jobs())
+
+    def test_process_events(self):
+        """ Test the actions triggered in state machine upon reception
+        of a batch of process events. """
+        from supvisors.statemachine import FiniteStateMachine
+        # create state machine instance
+        fsm = FiniteStateMachine(self.supvisors)
         # prepare context
-        process = Mock(application_name='appli')
+        process = Mock(application_name='appli', **{'crashed.return_value': False})
         # get patches
         mocked_start_evt = self.supvisors.starter.on_event
         mocked_stop_evt = self.supvisors.stopper.on_event
         mocked_ctx = self.supvisors.context.on_process_event
+        mocked_publish = self.supvisors.context.publish_process_status
         mocked_start_has = self.supvisors.starter.has_application
         mocked_stop_has = self.supvisors.stopper.has_application
+        mocked_start_prg = self.supvisors.starter.in_progress
+        mocked_stop_prg = self.supvisors.stopper.in_progress
+        mocked_add = self.supvisors.failure_handler.add_default_job
+        mocked_trigger = self.supvisors.failure_handler.trigger_jobs
+        mocked_failover_evt = self.supvisors.failure_handler.on_event
         # inject process event
         mocked_ctx.return_value = None
         mocked_start_has.return_value = False
         mocked_stop_has.return_value = False
+        mocked_start_prg.return_value = False
+        mocked_stop_prg.return_value = False
         # test that context on_process_event is always called
         # test that starter and stopper are not involved when corresponding
         # process is not found
-        fsm.on_process_event('10.0.0.1', ['dummy_event'])
+        fsm.on_process_events([('10.0.0.1', ['dummy_event'])])
         self.assertEqual([call('10.0.0.1', ['dummy_event'])], mocked_ctx.call_args_list)
         self.assertEqual(0, mocked_start_has.call_count)
         self.assertEqual(0, mocked_stop_has.call_count)
         self.assertEqual(0, mocked_start_evt.call_count)
         self.assertEqual(0, mocked_stop_evt.call_count)
-        # inject process event
+        self.assertEqual(0, mocked_failover_evt.call_count)
+        self.assertEqual(0, mocked_publish.call_count)
+        # inject process events
         mocked_ctx.return_value = process
         mocked_ctx.reset_mock()
         # test that context on_process_event is always called
-        # test that event is not pushed to starter and stopper
-        # when a starting or stopping is not in progress
-        fsm.on_process_event('10.0.0.1', ['dummy_event'])
-        self.assertEqual([call('10.0.0.1', ['dummy_event'])],
+        # test that events are pushed to starter and stopper
+        # and that statuses are published once for the whole batch
+        fsm.on_process_events([('10.0.0.1', ['dummy_event_1']),
+                               ('10.0.0.2', ['dummy_event_2'])])
+        self.assertEqual([call('10.0.0.1', ['dummy_event_1']),
+                          call('10.0.0.2', ['dummy_event_2'])],
                          mocked_ctx.call_args_list)
-        self.assertEqual([call('appli')], mocked_start_has.call_args_list)
-        self.assertEqual([call('appli')], mocked_stop_has.call_args_list)
-        self.assertEqual([call(process)], mocked_start_evt.call_args_list)
-        self.assertEqual([call(process)], mocked_stop_evt.call_args_list)
-        # inject process event
-        mocked_start_has.reset_mock()
+        self.assertEqual([call('appli')] * 2, mocked_start_has.call_args_list)
+        self.assertEqual([call('appli')] * 2, mocked_stop_has.call_args_list)
+        self.assertEqual([call(process)] * 2, mocked_start_evt.call_args_list)
+        self.assertEqual([call(process)] * 2, mocked_stop_evt.call_args_list)
+        self.assertEqual([call(process)] * 2, mocked_failover_evt.call_args_list)
+        self.assertEqual([call([process, process])], mocked_publish.call_args_list)
+        self.assertEqual(0, mocked_add.call_count)
+        self.assertEqual(0, mocked_trigger.call_count)
+        # inject process events while a starting is in progress
+        mocked_start_prg.return_value = True
+        for mocked in [mocked_ctx, mocked_start_has, mocked_stop_has,
+                       mocked_start_evt, mocked_stop_evt, mocked_publish]:
+            mocked.reset_mock()
+        # test that statuses are published event per event
+        fsm.on_process_events([('10.0.0.1', ['dummy_event_1']),
+                               ('10.0.0.2', ['dummy_event_2'])])
+        self.assertEqual([call([process])] * 2, mocked_publish.call_args_list)
+        self.assertEqual([call(process)] * 2, mocked_start_evt.call_args_list)
+        self.assertEqual([call(process)] * 2, mocked_stop_evt.call_args_list)
+        mocked_start_prg.return_value = False
+        mocked_publish.reset_mock()
+        # test running failure handling when master and process crashed
+        process.crashed.return_value = True
+        self.supvisors.context.master = True
+        fsm.on_process_events([('10.0.0.1', ['dummy_event_1']),
+                               ('10.0.0.2', ['dummy_event_2'])])
+        self.assertEqual([call([process, process])], mocked_publish.call_args_list)
+        self.assertEqual([call(process)] * 2, mocked_add.call_args_list)
+        self.assertEqual(1, mocked_trigger.call_count)
+        mocked_add.reset_mock()
+        mocked_trigger.reset_mock()
+        # test no running failure handling when application is starting
         mocked_start_has.return_value = True
-        mocked_stop_has.reset_mock()
-        mocked_stop_has.return_value = True
-        mocked_ctx.reset_mock()
-        mocked_start_evt.reset_mock()
-        mocked_stop_evt.reset_mock()
-        # test that context on_process_event is always called
-        # test that event is pushed to starter and stopper
-        # when a starting or stopping is in progress
-        fsm.on_process_event('10.0.0.1', ['dummy_event'])
-        self.assertEqual([call('10.0.0.1', ['dummy_event'])],
-                         mocked_ctx.call_args_list)
-        self.assertEqual([call('appli')], mocked_start_has.call_args_list)
-        self.assertEqual([call('appli')], mocked_stop_has.call_args_list)
-        self.assertEqual([call(process)], mocked_start_evt.call_args_list)
-        self.assertEqual([call(process)], mocked_stop_evt.call_args_list)
+        fsm.on_process_events([('10.0.0.1', ['dummy_event_1'])])
+        self.assertEqual(0, mocked_add.call_count)
+        self.assertEqual(0, mocked_trigger.call_count)
 
     def test_process_info(self):
         """ Test the actions triggered in state machine upon reception
@@ -725,12 +937,22 @@ class FiniteStateMachineTest(unittest.TestCase):
         # create state machine instance
         fsm = FiniteStateMachine(self.supvisors)
         # inject process info and test call to context load_processes
+        mocked_obsolete = self.supvisors.snapshot.obsolete_processes
+        mocked_obsolete.return_value = []
         with patch.object(self.supvisors.context,
                           'load_processes') as mocked_load:
             fsm.on_process_info('10.0.0.1', {'info': 'dummy_info'})
             self.assertEqual(1, mocked_load.call_count)
             self.assertEqual(call('10.0.0.1', {'info': 'dummy_info'}),
                              mocked_load.call_args)
+        self.assertEqual([call('10.0.0.1', {'info': 'dummy_info'})],
+                         mocked_obsolete.call_args_list)
+        self.assertEqual(0, self.supvisors.context.unload_processes.call_count)
+        # the restored processes not reported are removed
+        mocked_obsolete.return_value = ['appli:proc']
+        fsm.on_process_info('10.0.0.1', {'info': 'dummy_info'})
+        self.assertEqual([call('10.0.0.1', ['appli:proc'])],
+            self.supvisors.context.unload_processes.call_args_list)
 
     def test_authorization(self):
         """ Test the actions triggered in state machine upon reception
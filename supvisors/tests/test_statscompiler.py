@@ -276,6 +276,31 @@ class StatisticsInstanceTest(unittest.TestCase):
             ('other1', 8865): ([3.125, 36.25], [1.87, 2.34])}, instance.proc)
         self.assertIs(stats7, instance.ref_stats)
 
+    def test_push_restored_statistics(self):
+        """ Test that the first measures do not erase a restored history. """
+        from supvisors.statscompiler import StatisticsInstance
+        instance = StatisticsInstance(5, 2)
+        instance.cpu = [[6.25], [20.0]]
+        instance.mem = [76.1]
+        instance.io = {'eth0': ([0.4], [0.2]), 'lo': ([0.1], [0.1])}
+        instance.proc = {('myself', 118612): ([0.5], [1.9]),
+                         ('other1', 7754): ([1.5], [2.9])}
+        # push first set of measures after the restoration
+        stats1 = (8.5, [(25, 400), (25, 125)], 76.2,
+            {'eth0': (1024, 2000), 'wlan0': (500, 500)},
+            {'myself': (118612, (0.15, 1.85)), 'other1': (826, (0.15, 1.85))})
+        instance.push_statistics(stats1)
+        # the history of the remaining elements is kept
+        self.assertListEqual([[6.25], [20.0]], instance.cpu)
+        self.assertListEqual([76.1], instance.mem)
+        self.assertDictEqual({'eth0': ([0.4], [0.2]), 'wlan0': ([], [])}, instance.io)
+        self.assertDictEqual({('myself', 118612): ([0.5], [1.9]),
+                              ('other1', 826): ([], [])}, instance.proc)
+        # the history is reset if the number of processors differs
+        instance.ref_stats = None
+        instance.push_statistics((8.5, [(25, 400)], 76.2, {}, {}))
+        self.assertListEqual([[]], instance.cpu)
+
 
 class StatisticsCompilerTest(unittest.TestCase):
     """ Test case for the StatisticsCompiler class of the statscompiler module. """
@@ -68,6 +68,24 @@ class StartingStrategyTest(unittest.TestCase):
         self.assertTupleEqual((True, 20), strategy.is_loading_valid('10.0.0.3', 75))
         self.assertTupleEqual((True, 80), strategy.is_loading_valid('10.0.0.5', 15))
 
+    def test_planned_loading(self):
+        """ Test the validity of an address considering the loading of the
+        processes already placed. """
+        from supvisors.strategy import AbstractStartingStrategy, get_address
+        from supvisors.ttypes import StartingStrategies
+        strategy = AbstractStartingStrategy(self.supvisors, {'10.0.0.3': 30})
+        self.assertDictEqual({'10.0.0.3': 30}, strategy.planned_loading)
+        self.assertTupleEqual((True, 50), strategy.is_loading_valid('10.0.0.3', 45))
+        self.assertTupleEqual((False, 50), strategy.is_loading_valid('10.0.0.3', 55))
+        self.assertTupleEqual((True, 50), strategy.is_loading_valid('10.0.0.1', 45))
+        # the placement takes the planned loading into account
+        self.assertEqual('10.0.0.3', get_address(self.supvisors,
+            StartingStrategies.LESS_LOADED, '*', 15))
+        self.assertEqual('10.0.0.1', get_address(self.supvisors,
+            StartingStrategies.LESS_LOADED, '*', 15, {'10.0.0.3': 40}))
+        self.assertIsNone(get_address(self.supvisors,
+            StartingStrategies.LESS_LOADED, ['10.0.0.3'], 75, {'10.0.0.3': 10}))
+
     def test_get_loading_and_validity(self):
         """ Test the determination of the valid addresses with an additional loading. """
         from supvisors.strategy import AbstractStartingStrategy
@@ -170,9 +188,8 @@ class ConciliationStrategyTest(unittest.TestCase):
         # create conflicting processes
         def create_process_status(name, timed_addresses):
             process_status = Mock(spec=ProcessStatus, process_name=name,
-                addresses=set(timed_addresses.keys()),
-                infos={address_name: {'uptime': time}
-                    for address_name, time in timed_addresses.items()})
+                addresses=set(timed_addresses.keys()))
+            process_status.uptime.side_effect = timed_addresses.get
             process_status.namespec.return_value = name
             return process_status
         self.conflicts = [create_process_status('conflict_1',
@@ -350,6 +367,9 @@ class RunningFailureHandlerTest(unittest.TestCase):
         self.assertEqual(set(), handler.continue_process_jobs)
         self.assertEqual(set(), handler.start_application_jobs)
         self.assertEqual(set(), handler.start_process_jobs)
+        self.assertEqual(0, len(handler.incidents))
+        self.assertEqual(RunningFailureHandler.INCIDENTS_DEPTH,
+                         handler.incidents.maxlen)
 
     def test_clear_jobs(self):
         """ Test the clearance of internal structures. """
@@ -481,6 +501,154 @@ class RunningFailureHandlerTest(unittest.TestCase):
         self.assertEqual({restart_process_1, restart_process_2},
             handler.start_process_jobs)
 
+    @patch('supvisors.strategy.time', return_value=1000)
+    def test_incidents(self, _):
+        """ Test the recording of the failover incidents. """
+        from supvisors.strategy import RunningFailureHandler
+        handler = RunningFailureHandler(self.supvisors)
+        process_1 = Mock(application_name='appli_A',
+                         **{'namespec.return_value': 'appli_A:proc_1'})
+        process_2 = Mock(application_name='appli_B',
+                         **{'namespec.return_value': 'appli_B:proc_2'})
+        # no incident if no process to restart
+        handler.add_incident('10.0.0.1', 990, [process_1, process_2])
+        self.assertEqual(0, len(handler.incidents))
+        self.assertListEqual([], handler.statistics())
+        # incident restricted to the processes to restart
+        handler.restart_process_jobs = {process_1}
+        handler.add_incident('10.0.0.1', 990, [process_1, process_2])
+        self.assertEqual(1, len(handler.incidents))
+        incident = handler.incidents[0]
+        self.assertEqual('10.0.0.1', incident.address_name)
+        self.assertEqual(990, incident.last_seen)
+        self.assertEqual(1000, incident.detection_time)
+        self.assertSetEqual({process_1}, incident.pending)
+        # events are forwarded to the incidents
+        with patch.object(incident, 'on_event') as mocked_event:
+            handler.on_event(process_1)
+            self.assertEqual([call(process_1, 1000)], mocked_event.call_args_list)
+        # application discarded
+        with patch.object(incident, 'discard') as mocked_discard:
+            handler.discard_incidents('appli_A')
+            self.assertEqual([call('appli_A', 1000)], mocked_discard.call_args_list)
+        # statistics
+        self.assertListEqual([{'address_name': '10.0.0.1', 'detection_time': 1000,
+            'detection_delay': 10, 'start_delay': 0, 'duration': 0,
+            'processes': ['appli_A:proc_1'], 'failed': [], 'completed': False}],
+            handler.statistics())
+        # the number of incidents is bounded
+        for _ in range(RunningFailureHandler.INCIDENTS_DEPTH):
+            handler.add_incident('10.0.0.2', 995, [process_1])
+        self.assertEqual(RunningFailureHandler.INCIDENTS_DEPTH, len(handler.incidents))
+        self.assertEqual('10.0.0.2', handler.incidents[0].address_name)
+
+    def test_trigger_fast_failover(self):
+        """ Test the processing of the process jobs in the fast failover mode. """
+        from supvisors.strategy import RunningFailureHandler
+        self.supvisors.options.fast_failover = True
+        handler = RunningFailureHandler(self.supvisors)
+        process_1 = Mock(application_name='appli_A',
+                         **{'namespec.return_value': 'appli_A:proc_1',
+                            'stopped.return_value': True})
+        process_2 = Mock(application_name='appli_B',
+                         **{'namespec.return_value': 'appli_B:proc_2',
+                            'stopped.return_value': True})
+        process_3 = Mock(application_name='appli_B',
+                         **{'namespec.return_value': 'appli_B:proc_3',
+                            'stopped.return_value': False})
+        handler.restart_process_jobs = {process_1, process_2, process_3}
+        handler.add_incident('10.0.0.1', 990, [process_1, process_2])
+        incident = handler.incidents[0]
+        # test jobs trigger
+        handler.trigger_jobs()
+        # stopped processes are started at once
+        mocked_starts = self.supvisors.starter.start_processes
+        self.assertEqual(1, mocked_starts.call_count)
+        strategy, processes = mocked_starts.call_args[0]
+        self.assertEqual(self.supvisors.options.starting_strategy, strategy)
+        self.assertItemsEqual([process_1, process_2], processes)
+        self.assertEqual(0, self.supvisors.starter.default_start_process.call_count)
+        self.assertEqual({process_3}, handler.start_process_jobs)
+        # the start is recorded in the incident
+        self.assertGreater(incident.start_time, 0)
+        # the incident is discarded when the application is stopped
+        self.supvisors.context.applications['appli_B'] = Mock()
+        handler.stop_application_jobs = {'appli_B'}
+        handler.trigger_jobs()
+        self.assertListEqual(['appli_B:proc_2'], incident.failed)
+
+
+class FailoverIncidentTest(unittest.TestCase):
+    """ Test case for the failover incidents of the strategy module. """
+
+    def setUp(self):
+        """ Create processes. """
+        from supvisors.ttypes import ProcessStates
+        def mocked_process(namespec, application_name):
+            return Mock(application_name=application_name, state=ProcessStates.FATAL,
+                        **{'namespec.return_value': namespec,
+                           'stopped.return_value': True})
+        self.process_1 = mocked_process('appli_A:proc_1', 'appli_A')
+        self.process_2 = mocked_process('appli_A:proc_2', 'appli_A')
+        self.process_3 = mocked_process('appli_B:proc_3', 'appli_B')
+
+    def test_create(self):
+        """ Test the values set at construction. """
+        from supvisors.strategy import FailoverIncident
+        incident = FailoverIncident('10.0.0.1', 95, [self.process_3, self.process_1], 100)
+        self.assertEqual('10.0.0.1', incident.address_name)
+        self.assertEqual(95, incident.last_seen)
+        self.assertEqual(100, incident.detection_time)
+        self.assertEqual(0, incident.start_time)
+        self.assertEqual(0, incident.end_time)
+        self.assertListEqual(['appli_A:proc_1', 'appli_B:proc_3'], incident.processes)
+        self.assertSetEqual({self.process_1, self.process_3}, incident.pending)
+        self.assertListEqual([], incident.failed)
+
+    def test_lifecycle(self):
+        """ Test the progress of an incident. """
+        from supvisors.ttypes import ProcessStates
+        from supvisors.strategy import FailoverIncident
+        incident = FailoverIncident('10.0.0.1', 95,
+            [self.process_1, self.process_2, self.process_3], 100)
+        # events are ignored before the start
+        incident.on_event(self.process_1, 100.5)
+        self.assertEqual(3, len(incident.pending))
+        # unrelated start
+        incident.on_start([Mock()], 100.7)
+        self.assertEqual(0, incident.start_time)
+        incident.on_start([self.process_1], 101)
+        self.assertEqual(101, incident.start_time)
+        incident.on_start([self.process_2], 102)
+        self.assertEqual(101, incident.start_time)
+        # starting process is still pending
+        self.process_1.state = ProcessStates.STARTING
+        self.process_1.stopped.return_value = False
+        incident.on_event(self.process_1, 102)
+        self.assertIn(self.process_1, incident.pending)
+        # running process is restored
+        self.process_1.state = ProcessStates.RUNNING
+        incident.on_event(self.process_1, 103)
+        self.assertNotIn(self.process_1, incident.pending)
+        # stopped process has failed
+        incident.on_event(self.process_2, 104)
+        self.assertListEqual(['appli_A:proc_2'], incident.failed)
+        self.assertDictEqual({'address_name': '10.0.0.1', 'detection_time': 100,
+            'detection_delay': 5, 'start_delay': 1, 'duration': 5,
+            'processes': ['appli_A:proc_1', 'appli_A:proc_2', 'appli_B:proc_3'],
+            'failed': ['appli_A:proc_2'], 'completed': False},
+            incident.serial(105))
+        # discarded application
+        incident.discard('appli_A', 106)
+        self.assertEqual(0, incident.end_time)
+        incident.discard('appli_B', 107)
+        self.assertEqual(107, incident.end_time)
+        self.assertDictEqual({'address_name': '10.0.0.1', 'detection_time': 100,
+            'detection_delay': 5, 'start_delay': 1, 'duration': 7,
+            'processes': ['appli_A:proc_1', 'appli_A:proc_2', 'appli_B:proc_3'],
+            'failed': ['appli_A:proc_2', 'appli_B:proc_3'], 'completed': True},
+            incident.serial(110))
+
 
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
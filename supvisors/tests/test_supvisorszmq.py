@@ -17,12 +17,16 @@
 # limitations under the License.
 # ======================================================================
 
+import json
 import os
 import sys
 import time
 import unittest
 import zmq
 
+from mock import call, patch, Mock
+from threading import Thread
+
 from supvisors.tests.base import MockedSupvisors
 
 
@@ -147,19 +151,23 @@ class InternalEventTest(unittest.TestCase):
                        if address != local_address)
         self.subscriber.disconnect([address])
         # send a tick event from the local publisher
-        payload = {'date': 1000}
+        payload = {'when': 1000}
         self.publisher.send_tick_event(payload)
         # check the reception of the tick event
         msg = self.receive('Tick')
         self.assertTupleEqual((InternalEventHeaders.TICK,
-                               local_address, payload), msg)
+                               local_address, self.publisher.epoch, 1,
+                               payload), msg)
         # test local disconnection
         self.subscriber.disconnect([local_address])
+        self.assertNotIn(local_address, self.subscriber.addresses)
         # send a tick event from the local publisher
         self.publisher.send_tick_event(payload)
         # check the non-reception of the tick event
         with self.assertRaises(zmq.Again):
             self.subscriber.receive()
+        # an address already disconnected is ignored
+        self.subscriber.disconnect([local_address])
 
     def test_tick_event(self):
         """ Test the publication and subscription of the messages. """
@@ -167,12 +175,19 @@ class InternalEventTest(unittest.TestCase):
         # get the local address
         local_address = self.supvisors.address_mapper.local_address
         # send a tick event
-        payload = {'date': 1000}
+        payload = {'when': 1000}
         self.publisher.send_tick_event(payload)
         # check the reception of the tick event
         msg = self.receive('Tick')
         self.assertTupleEqual((InternalEventHeaders.TICK,
-                               local_address, payload), msg)
+                               local_address, self.publisher.epoch, 1,
+                               payload), msg)
+        # the sequence number is incremented for each event
+        self.publisher.send_tick_event(payload)
+        msg = self.receive('Tick')
+        self.assertTupleEqual((InternalEventHeaders.TICK,
+                               local_address, self.publisher.epoch, 2,
+                               payload), msg)
 
     def test_process_event(self):
         """ Test the publication and subscription of the process events. """
@@ -180,12 +195,36 @@ class InternalEventTest(unittest.TestCase):
         # get the local address
         local_address = self.supvisors.address_mapper.local_address
         # send a process event
-        payload = {'name': 'dummy_program', 'state': 'running'}
+        payload = {'name': 'dummy_program', 'group': 'dummy_group',
+                   'state': 20, 'now': 1234, 'pid': 4321, 'expected': True}
         self.publisher.send_process_event(payload)
         # check the reception of the process event
         msg = self.receive('Process')
         self.assertTupleEqual((InternalEventHeaders.PROCESS,
-                               local_address, payload), msg)
+                               local_address, self.publisher.epoch, 1,
+                               payload), msg)
+        # the last event per process is kept for resynchronization
+        self.assertDictEqual({('dummy_group', 'dummy_program'): (1, payload)},
+                             self.publisher.process_events)
+
+    def test_process_events_since(self):
+        """ Test the selection of the process events for resynchronization. """
+        payload_1 = {'name': 'dummy_1', 'group': 'dummy_group', 'state': 20,
+                     'now': 1234, 'pid': 4321, 'expected': True}
+        payload_2 = {'name': 'dummy_2', 'group': 'dummy_group', 'state': 10,
+                     'now': 1235, 'pid': 0, 'expected': True}
+        payload_3 = {'name': 'dummy_1', 'group': 'dummy_group', 'state': 100,
+                     'now': 1236, 'pid': 0, 'expected': False}
+        self.publisher.send_process_event(payload_1)
+        self.publisher.send_tick_event({'when': 1000})
+        self.publisher.send_process_event(payload_2)
+        self.publisher.send_process_event(payload_3)
+        self.assertEqual(4, self.publisher.sequence)
+        self.assertItemsEqual([(3, payload_2), (4, payload_3)],
+                              self.publisher.process_events_since(0))
+        self.assertItemsEqual([(4, payload_3)],
+                              self.publisher.process_events_since(3))
+        self.assertItemsEqual([], self.publisher.process_events_since(4))
 
     def test_statistics(self):
         """ Test the publication and subscription of the statistics messages. """
@@ -193,12 +232,181 @@ class InternalEventTest(unittest.TestCase):
         # get the local address
         local_address = self.supvisors.address_mapper.local_address
         # send a statistics event
-        payload = {'cpu': 15, 'mem': 5, 'io': (1234, 4321)}
+        payload = (1234.5, [(20.5, 80.5), (10.0, 90.0)], 35.5,
+                   {'lo': (100, 200), 'eth0': (1234, 4321)},
+                   {'dummy_group:dummy_program': (4321, (12.5, 0.5))})
         self.publisher.send_statistics(payload)
         # check the reception of the statistics event
         msg = self.receive('Statistics')
         self.assertTupleEqual((InternalEventHeaders.STATISTICS,
-                               local_address, payload), msg)
+                               local_address, self.publisher.epoch, 1,
+                               payload), msg)
+
+    def test_jobs(self):
+        """ Test the publication and subscription of the commander jobs. """
+        from supvisors.utils import InternalEventHeaders
+        # get the local address
+        local_address = self.supvisors.address_mapper.local_address
+        # send a jobs event
+        payload = {'starter': [(2, 0, 'dummy_group', 0, ['dummy_group:dummy_program'])],
+                   'stopper': []}
+        self.publisher.send_jobs(payload)
+        # check the reception of the jobs event
+        msg = self.receive('Jobs')
+        self.assertTupleEqual((InternalEventHeaders.JOBS,
+                               local_address, self.publisher.epoch, 1,
+                               payload), msg)
+
+    def test_heartbeat(self):
+        """ Test the publication and subscription of the heartbeats. """
+        from supvisors.utils import InternalEventHeaders
+        # get the local address
+        local_address = self.supvisors.address_mapper.local_address
+        # the heartbeat does not consume any sequence number
+        self.publisher.send_heartbeat()
+        msg = self.receive('Heartbeat')
+        self.assertTupleEqual((InternalEventHeaders.HEARTBEAT,
+                               local_address, self.publisher.epoch, 0,
+                               {}), msg)
+        self.publisher.send_tick_event({'when': 1000})
+        self.publisher.send_heartbeat()
+        self.receive('Tick')
+        msg = self.receive('Heartbeat')
+        self.assertTupleEqual((InternalEventHeaders.HEARTBEAT,
+                               local_address, self.publisher.epoch, 1,
+                               {}), msg)
+        self.assertEqual(1, self.publisher.sequence)
+
+    def test_legacy_codec(self):
+        """ Test the publication and subscription of pickled messages. """
+        from supvisors.utils import InternalEventHeaders
+        # get the local address
+        local_address = self.supvisors.address_mapper.local_address
+        # send a process event with the legacy codec
+        self.publisher.legacy_codec = True
+        payload = {'name': 'dummy_program', 'group': 'dummy_group',
+                   'state': 'running'}
+        self.publisher.send_process_event(payload)
+        # check the reception of the process event
+        # pickled messages have no epoch and no sequence number
+        msg = self.receive('Process')
+        self.assertTupleEqual((InternalEventHeaders.PROCESS,
+                               local_address, None, None, payload), msg)
+
+
+class RelayTest(unittest.TestCase):
+    """ Test case for the RelayForwarder class and the relay mode
+    of the InternalEventSubscriber class of the supvisorszmq module. """
+
+    def setUp(self):
+        """ Create a dummy supvisors, ZMQ context and sockets. """
+        from supvisors.supvisorszmq import (InternalEventPublisher,
+                                            InternalEventSubscriber,
+                                            RelayForwarder)
+        # the dummy Supvisors is used for addresses and ports
+        self.supvisors = MockedSupvisors()
+        options = self.supvisors.options
+        self.local_address = self.supvisors.address_mapper.local_address
+        # create publisher, relay and subscriber
+        self.publisher = InternalEventPublisher(self.local_address,
+            options.internal_port, self.supvisors.logger)
+        self.relay = RelayForwarder([self.local_address],
+            options.internal_port, options.relay_port)
+        self.subscriber = InternalEventSubscriber(
+            self.supvisors.address_mapper.addresses, options.internal_port,
+            [self.local_address], options.relay_port)
+        # give some time for connections and forward the subscription
+        time.sleep(0.5)
+        self.forward()
+        time.sleep(0.5)
+
+    def tearDown(self):
+        """ Destroy the ZMQ context. """
+        # close the ZeroMQ sockets
+        self.subscriber.close()
+        self.relay.close()
+        self.publisher.close()
+
+    def forward(self):
+        """ Forward the messages available through the relay. """
+        poller = zmq.Poller()
+        poller.register(self.relay.frontend, zmq.POLLIN)
+        poller.register(self.relay.backend, zmq.POLLIN)
+        self.relay.forward(dict(poller.poll(500)))
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        self.assertFalse(self.relay.frontend.closed)
+        self.assertFalse(self.relay.backend.closed)
+        self.assertEqual([self.local_address], self.subscriber.relays)
+        self.assertEqual(self.supvisors.options.relay_port,
+                         self.subscriber.relay_port)
+        self.assertEqual(self.local_address, self.subscriber.relay)
+
+    def test_forward(self):
+        """ Test the forwarding of the internal events through the relay. """
+        from supvisors.utils import InternalEventHeaders
+        self.publisher.send_tick_event({'when': 1000})
+        self.forward()
+        self.subscriber.socket.poll(1000)
+        self.assertTupleEqual((InternalEventHeaders.TICK, self.local_address,
+                               self.publisher.epoch, 1, {'when': 1000}),
+                              self.subscriber.receive())
+        # the events of the addresses not expected are discarded
+        # the relay is the only one available so it is kept
+        self.subscriber.disconnect([self.local_address])
+        self.assertEqual(self.local_address, self.subscriber.relay)
+        time.sleep(0.5)
+        self.forward()
+        time.sleep(0.5)
+        self.publisher.send_tick_event({'when': 1005})
+        self.forward()
+        self.subscriber.socket.poll(1000)
+        with self.assertRaises(zmq.Again):
+            self.subscriber.receive()
+
+    def test_failover(self):
+        """ Test the replacement of the relay. """
+        from supvisors.supvisorszmq import InternalEventSubscriber
+        subscriber = InternalEventSubscriber(['10.0.0.1', '10.0.0.2'], 60001,
+                                             ['10.0.0.1', '10.0.0.2'], 60004,
+                                             2.0)
+        subscriber.socket.close()
+        subscriber.socket = Mock()
+        self.assertEqual('10.0.0.1', subscriber.relay)
+        self.assertEqual(6.0, subscriber.relay_timeout)
+        event_time = subscriber.event_time
+        # test the disconnection of an address that is not the relay
+        subscriber.disconnect(['10.0.0.2'])
+        self.assertEqual('10.0.0.1', subscriber.relay)
+        self.assertSetEqual({'10.0.0.1'}, subscriber.addresses)
+        self.assertFalse(subscriber.socket.disconnect.called)
+        # test the silence of the relay
+        self.assertFalse(subscriber.check_relay())
+        with patch('supvisors.supvisorszmq.time',
+                   return_value=subscriber.receive_time + 8):
+            self.assertTrue(subscriber.check_relay())
+        self.assertEqual('10.0.0.2', subscriber.relay)
+        self.assertEqual([call('tcp://10.0.0.1:60004')],
+                         subscriber.socket.disconnect.call_args_list)
+        self.assertEqual([call('tcp://10.0.0.2:60004')],
+                         subscriber.socket.connect.call_args_list)
+        # the date of the last event is not reset by the connection
+        self.assertEqual(event_time, subscriber.event_time)
+        self.assertGreater(subscriber.receive_time, event_time)
+        # test the disconnection of the relay
+        subscriber.socket.reset_mock()
+        subscriber.disconnect(['10.0.0.2'])
+        self.assertEqual('10.0.0.1', subscriber.relay)
+        self.assertEqual([call('tcp://10.0.0.2:60004')],
+                         subscriber.socket.disconnect.call_args_list)
+        self.assertEqual([call('tcp://10.0.0.1:60004')],
+                         subscriber.socket.connect.call_args_list)
+        # no relay check without relay
+        subscriber = InternalEventSubscriber([], 60001)
+        subscriber.close()
+        self.assertIsNone(subscriber.relay)
+        self.assertFalse(subscriber.check_relay())
 
 
 class RequestTest(unittest.TestCase):
@@ -236,10 +444,10 @@ class RequestTest(unittest.TestCase):
         """ The method tests that the 'Check Address' request is sent
         and received correctly. """
         from supvisors.utils import DeferredRequestHeaders
-        self.pusher.send_check_address('10.0.0.1')
+        self.pusher.send_check_address('10.0.0.1', ['appli:proc'])
         request = self.receive('Check Address')
         self.assertTupleEqual((DeferredRequestHeaders.CHECK_ADDRESS,
-                               ('10.0.0.1', )), request)
+                               ('10.0.0.1', ['appli:proc'])), request)
         # test that absence of puller does not block the pusher
         # or raise any exception
         self.puller.close()
@@ -248,6 +456,21 @@ class RequestTest(unittest.TestCase):
         except:
             self.fail('unexpected exception')
 
+    def test_unsent(self):
+        """ The method tests that the requests that cannot be pushed
+        are counted. """
+        self.assertEqual(0, self.pusher.unsent)
+        # the ZeroMQ socket is replaced to simulate a full channel
+        socket, self.pusher.socket = self.pusher.socket, Mock(
+            **{'send_pyobj.side_effect': zmq.error.Again})
+        self.pusher.send_stop_process('10.0.0.1', 'appli:proc')
+        self.pusher.send_shutdown('10.0.0.1')
+        self.pusher.socket = socket
+        self.assertEqual(2, self.pusher.unsent)
+        self.assertEqual([call('STOP_PROCESS not sent'),
+                          call('SHUTDOWN not sent')],
+                         self.supvisors.logger.error.call_args_list)
+
     def test_isolate_addresses(self):
         """ The method tests that the 'Isolate Addresses' request is sent
         and received correctly. """
@@ -300,6 +523,41 @@ class RequestTest(unittest.TestCase):
         except:
             self.fail('unexpected exception')
 
+    def test_start_processes(self):
+        """ The method tests that the 'Start Processes' request is sent
+        and received correctly. """
+        from supvisors.utils import DeferredRequestHeaders
+        processes = [('application:program_1', ''),
+                     ('application:program_2', '-extra arguments')]
+        self.pusher.send_start_processes('10.0.0.1', processes)
+        request = self.receive('Start Processes')
+        self.assertTupleEqual((DeferredRequestHeaders.START_PROCESSES,
+                               ('10.0.0.1', processes)), request)
+        # test that absence of puller does not block the pusher
+        # or raise any exception
+        self.puller.close()
+        try:
+            self.pusher.send_start_processes('10.0.0.1', processes)
+        except:
+            self.fail('unexpected exception')
+
+    def test_stop_processes(self):
+        """ The method tests that the 'Stop Processes' request is sent
+        and received correctly. """
+        from supvisors.utils import DeferredRequestHeaders
+        namespecs = ['application:program_1', 'application:program_2']
+        self.pusher.send_stop_processes('10.0.0.1', namespecs)
+        request = self.receive('Stop Processes')
+        self.assertTupleEqual((DeferredRequestHeaders.STOP_PROCESSES,
+                               ('10.0.0.1', namespecs)), request)
+        # test that absence of puller does not block the pusher
+        # or raise any exception
+        self.puller.close()
+        try:
+            self.pusher.send_stop_processes('10.0.0.1', namespecs)
+        except:
+            self.fail('unexpected exception')
+
     def test_restart(self):
         """ The method tests that the 'Restart' request is sent
         and received correctly. """
@@ -332,6 +590,15 @@ class RequestTest(unittest.TestCase):
         except:
             self.fail('unexpected exception')
 
+    def test_save_context(self):
+        """ The method tests that the 'Save Context' request is sent
+        and received correctly. """
+        from supvisors.utils import DeferredRequestHeaders
+        self.pusher.send_save_context('/tmp/ctx', {'processes': {}})
+        request = self.receive('Save Context')
+        self.assertTupleEqual((DeferredRequestHeaders.SAVE_CONTEXT,
+                               ('/tmp/ctx', {'processes': {}})), request)
+
 
 class Payload:
     """ Dummy class just implementing a serial method. """
@@ -372,10 +639,10 @@ class EventTest(unittest.TestCase):
         self.supvisors_payload = Payload({'state': 'running',
                                           'version': '1.0'})
         self.address_payload = Payload({'state': 'silent',
-                                        'name': 'cliche01',
+                                        'address_name': 'cliche01',
                                         'date': 1234})
         self.application_payload = Payload({'state': 'starting',
-                                            'name': 'supvisors'})
+                                            'application_name': 'supvisors'})
         self.process_payload = Payload({'state': 'running',
                                         'process_name': 'plugin',
                                         'application_name': 'supvisors',
@@ -560,6 +827,175 @@ class EventTest(unittest.TestCase):
         self.subscriber.unsubscribe_process_status()
         self.check_subscription(False, False, False, False, False)
 
+    def test_sequence(self):
+        """ Test the sequence number and the cache of the messages published. """
+        from supvisors.utils import EventHeaders
+        self.subscriber.subscribe_all()
+        time.sleep(1)
+        self.publisher.send_supvisors_status(self.supvisors_payload)
+        self.publisher.send_process_event('local_address', self.event_payload)
+        self.publisher.send_process_status(self.process_payload)
+        self.assertEqual(3, self.publisher.sequence)
+        self.assertTupleEqual((1, EventHeaders.SUPVISORS,
+                               self.supvisors_payload.data),
+                              self.subscriber.receive_sequenced())
+        self.assertEqual(2, self.subscriber.receive_sequenced()[0])
+        self.assertEqual(3, self.subscriber.receive_sequenced()[0])
+        # the process events are not kept in the cache
+        self.assertItemsEqual(['supvisors/', 'process/supvisors/plugin/'],
+                              self.publisher.cache.keys())
+        key = 'process/supvisors/plugin/'
+        data, frame = self.publisher.cache[key]
+        self.assertIs(self.process_payload.data, data)
+        self.assertDictEqual(data, json.loads(frame))
+        # the JSON encoding is re-used while the data is unchanged
+        self.publisher.send_process_status(self.process_payload)
+        self.assertIs(frame, self.publisher.cache[key][1])
+        self.assertTupleEqual((4, EventHeaders.PROCESS_STATUS,
+                               self.process_payload.data),
+                              self.subscriber.receive_sequenced())
+        # the last status replaces the previous one
+        process_payload = Payload({'state': 'stopped',
+                                   'process_name': 'plugin',
+                                   'application_name': 'supvisors'})
+        self.publisher.send_process_status(process_payload)
+        self.assertIs(process_payload.data, self.publisher.cache[key][0])
+        self.assertIsNot(frame, self.publisher.cache[key][1])
+        self.assertTupleEqual((5, EventHeaders.PROCESS_STATUS,
+                               process_payload.data),
+                              self.subscriber.receive_sequenced())
+
+    def test_topics(self):
+        """ Test the subscription to a single entity. """
+        from supvisors.supvisorszmq import EventSubscriber
+        from supvisors.utils import EventHeaders
+        # test the topic prefixes
+        self.assertEqual('process/', EventSubscriber.topic('process'))
+        self.assertEqual('process/',
+                         EventSubscriber.topic('process', None, None))
+        self.assertEqual('process/appli/',
+                         EventSubscriber.topic('process', 'appli', None))
+        self.assertEqual('process/appli/proc/',
+                         EventSubscriber.topic('process', 'appli', 'proc'))
+        # subscribe to the application supvisors
+        self.subscriber.subscribe_application('supvisors')
+        self.subscriber.subscribe_address_status('cliche02')
+        self.assertSetEqual({'application/supvisors/', 'process/supvisors/',
+                             'event/supvisors/', 'address/cliche02/'},
+                            self.subscriber.subscriptions)
+        time.sleep(1)
+        self.check_subscription(False, False, True, True, True)
+        # test that the other applications are filtered out
+        payload = Payload({'state': 'running', 'process_name': 'plugin',
+                           'application_name': 'supvisors_2'})
+        self.publisher.send_process_status(payload)
+        self.check_reception()
+        # subscribe to the address cliche01 and to a single process
+        self.subscriber.unsubscribe_application('supvisors')
+        self.subscriber.unsubscribe_address_status('cliche02')
+        self.subscriber.subscribe_address_status('cliche01')
+        self.subscriber.subscribe_process_status('supvisors', 'plugin')
+        self.assertSetEqual({'address/cliche01/', 'process/supvisors/plugin/'},
+                            self.subscriber.subscriptions)
+        self.check_subscription(False, True, False, False, True)
+        # test that the entities with a longer name are filtered out
+        self.publisher.send_address_status(Payload({'state': 'running',
+            'address_name': 'cliche010', 'date': 1234}))
+        self.check_reception()
+        self.publisher.send_process_status(Payload({'state': 'running',
+            'process_name': 'plugin2', 'application_name': 'supvisors'}))
+        self.check_reception()
+        self.subscriber.subscribe_application_status('supvisors')
+        time.sleep(1)
+        self.publisher.send_application_status(Payload({'state': 'running',
+            'application_name': 'supvisors2'}))
+        self.check_reception()
+        self.subscriber.unsubscribe_application_status('supvisors')
+        # test the topic of the raw message
+        self.publisher.send_process_status(self.process_payload)
+        topic, data, sequence = self.subscriber.socket.recv_multipart()
+        self.assertEqual('process/supvisors/plugin/', topic)
+        self.assertDictEqual(self.process_payload.data, json.loads(data))
+        self.assertEqual(str(self.publisher.sequence), sequence)
+
+    def test_conflation(self):
+        """ Test the conflation of the statuses published. """
+        from supvisors.utils import EventHeaders
+        # test the default high water mark
+        self.assertEqual(1000, self.publisher.socket.getsockopt(zmq.SNDHWM))
+        self.assertFalse(self.publisher.conflating)
+        self.publisher.conflating = True
+        self.subscriber.subscribe_all()
+        time.sleep(1)
+        # the statuses are kept until the flush whereas the events are sent
+        address_payload = Payload({'state': 'running',
+                                   'address_name': 'cliche01',
+                                   'date': 1240})
+        self.publisher.send_address_status(self.address_payload)
+        self.publisher.send_process_event('local_address', self.event_payload)
+        self.publisher.send_address_status(address_payload)
+        self.publisher.send_application_status(self.application_payload)
+        self.assertEqual(1, self.publisher.sequence)
+        self.assertDictEqual({}, self.publisher.cache)
+        self.assertEqual(EventHeaders.PROCESS_EVENT,
+                         self.subscriber.receive_sequenced()[1])
+        with self.assertRaises(zmq.Again):
+            self.subscriber.receive()
+        # only the last status of each entity is published
+        self.publisher.flush()
+        self.assertDictEqual({}, self.publisher.pending)
+        self.assertTupleEqual((2, EventHeaders.ADDRESS, address_payload.data),
+                              self.subscriber.receive_sequenced())
+        self.assertTupleEqual((3, EventHeaders.APPLICATION,
+                               self.application_payload.data),
+                              self.subscriber.receive_sequenced())
+        with self.assertRaises(zmq.Again):
+            self.subscriber.receive()
+        # test that the pending statuses are published when closing
+        self.publisher.send_process_status(self.process_payload)
+        self.assertEqual(1, len(self.publisher.pending))
+        self.publisher.close()
+        self.assertDictEqual({}, self.publisher.pending)
+        self.assertEqual(4, self.publisher.sequence)
+
+    def test_snapshot(self):
+        """ Test the snapshot of the last statuses published. """
+        from supvisors.supvisorszmq import SnapshotServer
+        from supvisors.utils import EventHeaders
+        self.publisher.send_supvisors_status(self.supvisors_payload)
+        self.publisher.send_address_status(self.address_payload)
+        self.publisher.send_application_status(self.application_payload)
+        self.publisher.send_process_event('local_address', self.event_payload)
+        self.publisher.send_process_status(self.process_payload)
+        # test the snapshot filtered by the prefixes
+        self.assertDictEqual({'sequence': 5, 'events': []},
+                             self.publisher.snapshot([]))
+        self.assertDictEqual({'sequence': 5, 'events': [
+            [EventHeaders.APPLICATION, self.application_payload.data],
+            [EventHeaders.PROCESS_STATUS, self.process_payload.data]]},
+            self.publisher.snapshot([EventHeaders.APPLICATION,
+                                     EventHeaders.PROCESS_STATUS]))
+        self.assertEqual(4, len(self.publisher.snapshot([''])['events']))
+        # test the request of the snapshot through the sockets
+        server = SnapshotServer(self.publisher,
+                                self.supvisors.options.snapshot_port)
+        try:
+            self.subscriber.subscribe_address_status()
+            self.subscriber.subscribe_process_event()
+            thread = Thread(target=server.reply)
+            thread.start()
+            self.assertTupleEqual((5, [(EventHeaders.ADDRESS,
+                                        self.address_payload.data)]),
+                self.subscriber.request_snapshot(
+                    self.supvisors.options.snapshot_port))
+            thread.join()
+            # test the timeout when no server replies
+            self.assertIsNone(self.subscriber.request_snapshot(
+                self.supvisors.options.snapshot_port, 100))
+        finally:
+            server.close()
+        self.assertTrue(server.socket.closed)
+
 
 class SupervisorZmqTest(unittest.TestCase):
     """ Test case for the SupervisorZmq class of the supvisorszmq module. """
@@ -576,6 +1012,8 @@ class SupervisorZmqTest(unittest.TestCase):
         # test all attribute types
         self.assertIsInstance(sockets.publisher, EventPublisher)
         self.assertFalse(sockets.publisher.socket.closed)
+        self.assertFalse(sockets.publisher.conflating)
+        self.assertEqual(1000, sockets.publisher.socket.getsockopt(zmq.SNDHWM))
         self.assertIsInstance(sockets.internal_publisher,
                               InternalEventPublisher)
         self.assertFalse(sockets.internal_publisher.socket.closed)
@@ -598,18 +1036,58 @@ class SupvisorsZmqTest(unittest.TestCase):
     def test_creation_closure(self):
         """ Test the types of the attributes created. """
         from supvisors.supvisorszmq import (SupvisorsZmq,
-            InternalEventSubscriber, RequestPuller)
+            InternalEventSubscriber, RequestPuller, SnapshotServer)
         sockets = SupvisorsZmq(self.supvisors)
         # test all attribute types
         self.assertIsInstance(sockets.internal_subscriber,
                               InternalEventSubscriber)
+        # the local address is not connected
+        self.assertSetEqual(
+            set(self.supvisors.address_mapper.addresses) -
+            {self.supvisors.address_mapper.local_address},
+            sockets.internal_subscriber.addresses)
         self.assertFalse(sockets.internal_subscriber.socket.closed)
         self.assertIsInstance(sockets.puller, RequestPuller)
         self.assertFalse(sockets.puller.socket.closed)
+        self.assertIs(self.supvisors.zmq.publisher, sockets.publisher)
+        self.assertIs(self.supvisors.zmq.internal_publisher,
+                      sockets.internal_publisher)
+        self.assertIsNone(sockets.relay)
+        self.assertIsNone(sockets.internal_subscriber.relay)
+        self.assertIsInstance(sockets.snapshot_server, SnapshotServer)
+        self.assertIs(self.supvisors.zmq.publisher,
+                      sockets.snapshot_server.publisher)
+        self.assertFalse(sockets.snapshot_server.socket.closed)
         # close the instance
         sockets.close()
         self.assertTrue(sockets.internal_subscriber.socket.closed)
         self.assertTrue(sockets.puller.socket.closed)
+        self.assertTrue(sockets.snapshot_server.socket.closed)
+
+    def test_relay(self):
+        """ Test the creation of the relay sockets. """
+        from supvisors.supvisorszmq import SupvisorsZmq, RelayForwarder
+        local_address = self.supvisors.address_mapper.local_address
+        other_address = next(address
+                             for address in self.supvisors.address_mapper.addresses
+                             if address != local_address)
+        # test with a relay that is not the local address
+        self.supvisors.options.relay_list = [other_address]
+        sockets = SupvisorsZmq(self.supvisors)
+        self.assertIsNone(sockets.relay)
+        self.assertEqual(other_address, sockets.internal_subscriber.relay)
+        sockets.close()
+        # test with the local address as second relay
+        self.supvisors.options.relay_list = [other_address, local_address]
+        sockets = SupvisorsZmq(self.supvisors)
+        self.assertIsInstance(sockets.relay, RelayForwarder)
+        # a relay uses itself first
+        self.assertEqual([local_address, other_address],
+                         sockets.internal_subscriber.relays)
+        self.assertEqual(local_address, sockets.internal_subscriber.relay)
+        sockets.close()
+        self.assertTrue(sockets.relay.frontend.closed)
+        self.assertTrue(sockets.relay.backend.closed)
 
 
 def test_suite():
@@ -33,6 +33,13 @@ class TypesTest(unittest.TestCase):
         self.assertEqual('ISOLATING', AddressStates._to_string(AddressStates.ISOLATING))
         self.assertEqual('ISOLATED', AddressStates._to_string(AddressStates.ISOLATED))
 
+    def test_JobStages(self):
+        """ Test the JobStages enumeration. """
+        from supvisors.ttypes import JobStages
+        self.assertEqual('PLANNED_SEQUENCE', JobStages._to_string(JobStages.PLANNED_SEQUENCE))
+        self.assertEqual('PLANNED_JOBS', JobStages._to_string(JobStages.PLANNED_JOBS))
+        self.assertEqual('CURRENT_JOBS', JobStages._to_string(JobStages.CURRENT_JOBS))
+
     def test_ApplicationStates(self):
         """ Test the ApplicationStates enumeration. """
         from supvisors.ttypes import ApplicationStates
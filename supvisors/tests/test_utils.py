@@ -98,6 +98,15 @@ class UtilsTest(unittest.TestCase):
             'now': 10, 'pid': 1234, 'expected': False},
             extract_process_info(dummy_info))
 
+    def test_compact_process_info(self):
+        """ Test the compact form of the process information. """
+        from supvisors.utils import compact_process_info, expand_process_info
+        payload = {'name': 'proc', 'group': 'appli', 'state': 10, 'start': 5,
+            'now': 10, 'pid': 1234, 'expected': True}
+        self.assertListEqual(['appli', 'proc', 10, 5, 10, 1234, True],
+            compact_process_info(payload))
+        self.assertDictEqual(payload, expand_process_info(compact_process_info(payload)))
+
     def test_statistics_functions(self):
         """ Test the simple statistics. """
         from supvisors.utils import mean, srate, stddev
@@ -57,6 +57,20 @@ class RunningFailureStrategies:
     """ Applicable strategies that can be applied on a failure of a running application. """
     CONTINUE, RESTART_PROCESS, STOP_APPLICATION, RESTART_APPLICATION = range(4)
 
+@enumeration_tools
+class RequestPriorities:
+    """ Priorities of the deferred XML-RPC requests, from the most urgent.
+    SUPERVISOR stands for the restart and the shutdown of a Supervisor instance. """
+    SUPERVISOR, STOP, START, CHECK = range(4)
+
+@enumeration_tools
+class JobStages:
+    """ Stages of the jobs of a commander, used to replicate them.
+    PLANNED_SEQUENCE stands for the applications waiting for their turn,
+    PLANNED_JOBS for the process groups waiting in the applications in progress
+    and CURRENT_JOBS for the processes being commanded. """
+    PLANNED_SEQUENCE, PLANNED_JOBS, CURRENT_JOBS = range(3)
+
 @enumeration_tools
 class SupvisorsStates:
     """ Internal state of Supvisors. """
@@ -24,7 +24,7 @@ from time import gmtime, localtime, strftime, time
 class InternalEventHeaders:
     """ Enumeration class for the headers in messages between Listener
     and MainLoop. """
-    TICK, PROCESS, STATISTICS = range(3)
+    TICK, PROCESS, STATISTICS, HEARTBEAT, JOBS = range(5)
 
 class RemoteCommEvents:
     """ Strings used for remote communication between the Supvisors main loop
@@ -32,6 +32,7 @@ class RemoteCommEvents:
     SUPVISORS_AUTH = u'auth'
     SUPVISORS_EVENT = u'event'
     SUPVISORS_INFO = u'info'
+    SUPVISORS_FAULT = u'fault'
 
 class EventHeaders:
     """ Strings used as headers in messages between EventPublisher
@@ -48,7 +49,8 @@ class DeferredRequestHeaders:
     """ Enumeration class for the headers of deferred XML-RPC messages
     sent to MainLoop."""
     CHECK_ADDRESS, ISOLATE_ADDRESSES, START_PROCESS, STOP_PROCESS, RESTART, \
-    SHUTDOWN = range(6)
+    SHUTDOWN, START_PROCESSES, STOP_PROCESSES, RESYNC_PROCESSES, \
+    SAVE_CONTEXT = range(10)
 
 
 # used to convert enumeration-like value to string and vice-versa
@@ -120,6 +122,17 @@ def extract_process_info(info):
     payload['expected'] = not info['spawnerr']
     return payload
 
+# Order of the process information in the compact form
+__Compact_Keys = ('group', 'name', 'state', 'start', 'now', 'pid', 'expected')
+
+def compact_process_info(payload):
+    """ Returns the process information extracted as a list of values. """
+    return [payload[key] for key in __Compact_Keys]
+
+def expand_process_info(values):
+    """ Returns the process information extracted from its compact form. """
+    return dict(zip(__Compact_Keys, values))
+
 
 # simple lambda functions
 mean = lambda x: sum(x) / float(len(x))
@@ -132,7 +132,7 @@ class SupvisorsView(MeldView, ViewHandler):
         # get data for table
         data = [{'namespec': process.namespec(),
                  'rowspan': len(process.addresses) if idx == 0 else 0,
-                 'address': address, 'uptime': process.infos[address]['uptime']}
+                 'address': address, 'uptime': process.uptime(address)}
             for process in self.supvisors.context.conflicts()
             for idx, address in enumerate(process.addresses)]
         addressIterator = div_elt.findmeld('tr_mid').repeat(data)